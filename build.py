@@ -9,6 +9,7 @@ import glob
 import json
 import base64
 import shutil
+import struct
 import zipfile
 import tarfile
 import argparse
@@ -356,7 +357,7 @@ class Builder(object):
         else:
             cmake_extra_defs += [
                 '-DBUILD_TBB=ON',
-                '-DBUILD_LIST=objdetect,imgproc,imgcodecs,highgui'
+                '-DBUILD_LIST=objdetect,imgproc,imgcodecs,highgui,videoio'
             ]
             if IS_WINDOWS:
                 cmake_extra_defs += ['-DBUILD_WITH_STATIC_CRT=ON']
@@ -369,6 +370,32 @@ class Builder(object):
             os.mkdir(build_dir)
         self.build_cmake_lib(opencv_extract_dir, cmake_extra_defs, ['install'], True)
 
+    def copy_opencv_data(self):
+        """
+        Copies the models libppp uses from the OpenCV install (not all of them are kept in libppp/share)
+        """
+        for data_dir, file_name in [('lbpcascades', 'lbpcascade_frontalface_improved.xml')]:
+            dst_dir = os.path.join(self._root_dir, 'libppp/share', data_dir)
+            dst_file = os.path.join(dst_dir, file_name)
+            if os.path.isfile(dst_file):
+                continue
+            for share_dir in ['share/opencv4', 'etc']:
+                src_file = os.path.join(self._third_party_install_dir, share_dir, data_dir, file_name)
+                if os.path.isfile(src_file):
+                    if not os.path.exists(dst_dir):
+                        os.makedirs(dst_dir)
+                    shutil.copyfile(src_file, dst_file)
+                    break
+            else:
+                print('Unable to find %s in the OpenCV install' % file_name)
+
+    def copy_photo_standards(self):
+        """
+        Copies the photo standards of the webapp next to the libppp configuration, which refers to them
+        """
+        shutil.copyfile(self.repo_path('webapp/src/app/data/photo-standards.json'),
+                        self.repo_path('libppp/share/photo-standards.json'))
+
     def build_dlib(self):
         # Get the file prefix for dlib
         dlib_version = self.get_third_party_lib_version(self.dlib_src_url)
@@ -710,7 +737,8 @@ class Builder(object):
                 return
             for key in node:
                 embed = node.get('embed', False)
-                if key == 'file' and not node.get('data', '') and embed:
+                # "resource" files are compiled into the library (see embed_resource.py), not inlined
+                if key == 'file' and not node.get('data', '') and embed in ['base64', 'text']:
                     file_name = node['file']
                     file_path = os.path.join(lippp_share_dir, file_name)
                     content = ''
@@ -732,6 +760,57 @@ class Builder(object):
         config_bundle_file = os.path.join(lippp_share_dir, 'config.bundle.json')
         write_json(config_bundle_file, config_data)
 
+    def bundle_config_binary(self):
+        """
+        Bundles all configuration files into a memory mappable config.bundle.bin (see ConfigBundle.h).
+        Referred files are stored raw in 64 bytes aligned sections that libppp maps in place
+        """
+        lippp_share_dir = os.path.join(self._root_dir, 'libppp/share')
+        section_name_size = 48
+        alignment = 64
+
+        sections = []
+
+        def expand_node(node, node_path):
+            if not isinstance(node, dict):
+                return
+            if node.get('file'):
+                file_path = os.path.join(lippp_share_dir, node['file'])
+                if not os.path.isfile(file_path):
+                    # Files copied from the third party installs (e.g. the LBP cascade) are missing until built
+                    print('Not bundling missing file %s, it will be loaded from disk' % file_path)
+                    return
+                section_name = '/'.join(node_path)
+                if len(section_name.encode('ascii')) > section_name_size:
+                    raise ValueError('Section name %s is too long' % section_name)
+                sections.append((section_name, read_file(file_path, 'rb')))
+                node['section'] = section_name
+                node['data'] = None
+                return
+            for key in node:
+                expand_node(node[key], node_path + [key])
+
+        config_data = read_json(os.path.join(lippp_share_dir, 'config.json'))
+        for key in config_data:
+            expand_node(config_data[key], [key])
+        sections.insert(0, ('config.json', json.dumps(config_data).encode('utf-8')))
+
+        header_size = 16 + len(sections) * (section_name_size + 16)
+        offset = header_size
+        table = b''
+        for name, content in sections:
+            offset = (offset + alignment - 1) // alignment * alignment
+            table += struct.pack('<%dsQQ' % section_name_size, name.encode('ascii'), offset, len(content))
+            offset += len(content)
+
+        config_bundle_file = os.path.join(lippp_share_dir, 'config.bundle.bin')
+        with open(config_bundle_file, 'wb') as fp:
+            fp.write(b'PPPBNDL1' + struct.pack('<II', 1, len(sections)) + table)
+            for name, content in sections:
+                fp.write(b'\0' * (-fp.tell() % alignment))
+                fp.write(content)
+        print('Configuration bundle written to %s (%d sections)' % (config_bundle_file, len(sections)))
+
     def build_cpp_code(self):
         """
         Builds the C++ libppp project from sources
@@ -856,6 +935,8 @@ class Builder(object):
         parser.add_argument('--skip_install', help='Skips installation', action="store_true")
         parser.add_argument('--gen_vs_sln', help='Generates Visual Studio solution and projects',
                             action="store_true")
+        parser.add_argument('--bundle_config', help='Bundles the configuration and its resources (JSON and binary)',
+                            action="store_true")
         parser.add_argument('--no_npm', help='Skips installing npm packages. Use only on developer workflow',
                             action="store_true")
 
@@ -873,6 +954,7 @@ class Builder(object):
         self._run_tests = args.test
         self._run_install = not args.skip_install
         self._no_npm = args.no_npm
+        self._bundle_config = args.bundle_config
         self._emsdk_backend = 'upstream' if 'upstream' in self.emsdk_version_number else 'fastcomp'
 
     def clean_all_if_needed(self):
@@ -894,7 +976,11 @@ class Builder(object):
         # Extract testing dataset
         self._shell = ShellRunner()
         self.extract_validation_data()
+        self.copy_photo_standards()
         # self.bundle_config()  # No longer needed as new we serve models with raw data.
+        if self._bundle_config:
+            self.bundle_config()
+            self.bundle_config_binary()
 
         for arch in self._arch_names:
             self._arch_name = arch
@@ -931,6 +1017,7 @@ class Builder(object):
                 self.build_dlib()
                 self.build_googletest()
                 self.build_opencv()
+                self.copy_opencv_data()
                 # Build libppp
                 self.build_cpp_code()
 
@@ -0,0 +1,739 @@
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cmath>
+#include <fstream>
+#include <iomanip>
+#include <iostream>
+#include <map>
+#include <numeric>
+#include <sstream>
+#include <thread>
+
+#include <opencv2/imgcodecs.hpp>
+#include <opencv2/imgproc/imgproc.hpp>
+#include <rapidjson/document.h>
+#include <tclap/CmdLine.h>
+
+#include "ConfigLoader.h"
+#include "FaceDetector.h"
+#include "IImageStore.h"
+#include "LandMarks.h"
+#include "LipsDetector.h"
+#include "PhotoStandard.h"
+#include "PppEngine.h"
+#include "PrintDefinition.h"
+#include "Tracer.h"
+#include "Utilities.h"
+
+#ifdef _WIN32
+// clang-format off
+#include <windows.h>
+#include <psapi.h>
+// clang-format on
+#else
+#include <sys/resource.h>
+#endif
+
+#if _MSC_VER >= 1910 // VS 2017
+#include <filesystem>
+namespace fs = std::experimental::filesystem;
+#else
+#include <boost/filesystem.hpp>
+namespace fs = boost::filesystem;
+#endif
+
+using namespace std;
+using namespace ppp;
+
+using Clock = chrono::steady_clock;
+
+struct WorkItem final
+{
+    string imageName;
+    double scale;
+    vector<BYTE> encodedImage;
+};
+
+struct Sample final
+{
+    bool success = false;
+    double totalMs = 0;
+    map<string, double> stageMs; ///<- Time spent in each traced stage (summed when a stage runs several times)
+};
+
+string resolvePath(const string & relPath)
+{
+    auto baseDir = fs::current_path();
+    while (baseDir.has_parent_path())
+    {
+        auto combinePath = baseDir / relPath;
+        if (exists(combinePath))
+        {
+            return combinePath.string();
+        }
+        baseDir = baseDir.parent_path();
+    }
+    return relPath;
+}
+
+vector<double> parseList(const string & values)
+{
+    vector<double> result;
+    stringstream ss(values);
+    string item;
+    while (getline(ss, item, ','))
+    {
+        result.push_back(stod(item));
+    }
+    return result;
+}
+
+vector<WorkItem> loadWorkload(const vector<string> & imageDirs, const vector<double> & scales, const size_t maxImages)
+{
+    const vector<string> supportedExtensions = { ".jpg", ".jpeg", ".png", ".bmp" };
+    vector<string> imageFiles;
+    for (const auto & imageDir : imageDirs)
+    {
+        const auto dirPath = fs::path(resolvePath(imageDir));
+        if (!is_directory(dirPath))
+        {
+            cerr << "Skipping missing image directory " << imageDir << endl;
+            continue;
+        }
+        vector<string> dirImageFiles;
+        for (fs::directory_iterator it(dirPath), end; it != end; ++it)
+        {
+            auto ext = it->path().extension().string();
+            transform(ext.begin(), ext.end(), ext.begin(), ::tolower);
+            if (is_regular_file(it->status())
+                && find(supportedExtensions.begin(), supportedExtensions.end(), ext) != supportedExtensions.end())
+            {
+                dirImageFiles.push_back(it->path().string());
+            }
+        }
+        sort(dirImageFiles.begin(), dirImageFiles.end());
+        if (dirImageFiles.size() > maxImages)
+        {
+            dirImageFiles.resize(maxImages);
+        }
+        imageFiles.insert(imageFiles.end(), dirImageFiles.begin(), dirImageFiles.end());
+    }
+
+    vector<WorkItem> workload;
+    for (const auto & imageFile : imageFiles)
+    {
+        const auto image = cv::imread(imageFile, cv::IMREAD_COLOR);
+        if (image.empty())
+        {
+            continue;
+        }
+        for (const auto scale : scales)
+        {
+            cv::Mat scaledImage = image;
+            if (scale != 1.0)
+            {
+                cv::resize(image, scaledImage, cv::Size(), scale, scale, scale < 1.0 ? cv::INTER_AREA : cv::INTER_CUBIC);
+            }
+            WorkItem item { fs::path(imageFile).filename().string(), scale, {} };
+            cv::imencode(".jpg", scaledImage, item.encodedImage, { cv::IMWRITE_JPEG_QUALITY, 95 });
+            workload.emplace_back(move(item));
+        }
+    }
+    return workload;
+}
+
+void configureEngine(const string & configFilePath, PppEngine & engine)
+{
+    // Pass the path rather than the content so resources resolve relative to it and bundles get mapped
+    if (!engine.configure(configFilePath, nullptr))
+    {
+        throw runtime_error("Unable to configure the engine from " + configFilePath);
+    }
+    engine.waitUntilConfigured();
+}
+
+/*!@brief Runs the full pipeline (decode, detect, crop, tile, encode) on one image !*/
+bool processImage(const PppEngine & engine, const WorkItem & item)
+{
+    const auto & imageStore = engine.getImageStore();
+    const auto imageKey = imageStore->setImage(reinterpret_cast<const char *>(item.encodedImage.data()),
+                                               item.encodedImage.size());
+    if (!engine.detectLandMarks(imageKey))
+    {
+        return false;
+    }
+    const auto landMarks = imageStore->getLandMarks(imageKey);
+    PhotoStandard ps(2.0, 2.0, 1.1875, 0.0, 0.0, 300.0, "inch");
+    PrintDefinition pd(6.0, 4.0, 300.0, "inch");
+    auto crownPoint = landMarks->crownPoint;
+    auto chinPoint = landMarks->chinPoint;
+    const auto tiledPrint = engine.createTiledPrint(imageKey, ps, pd, crownPoint, chinPoint);
+    TRACE_SPAN("Utilities::encodeImageAsPng");
+    return !Utilities::encodeImageAsPng(tiledPrint, false, pd.resolutionDpi()).empty();
+}
+
+Sample measureImage(const PppEngine & engine, const WorkItem & item)
+{
+    Sample sample;
+    const auto start = Clock::now();
+    {
+        TRACE_REQUEST("benchmark");
+        sample.success = processImage(engine, item);
+    }
+    sample.totalMs = chrono::duration<double, milli>(Clock::now() - start).count();
+
+    auto & tracer = Tracer::instance();
+    for (const auto & e : tracer.events(Tracer::lastTraceId()))
+    {
+        if (e.name != "benchmark")
+        {
+            sample.stageMs[e.name] += e.durationUs / 1000.0;
+        }
+    }
+    tracer.clear();
+    return sample;
+}
+
+double percentile(vector<double> values, const double p)
+{
+    if (values.empty())
+    {
+        return 0.0;
+    }
+    sort(values.begin(), values.end());
+    const auto rank = static_cast<size_t>(ceil(p / 100.0 * values.size()));
+    return values[max<size_t>(rank, 1) - 1];
+}
+
+rapidjson::Value latencyStats(const vector<double> & values, rapidjson::Document::AllocatorType & alloc)
+{
+    rapidjson::Value stats(rapidjson::kObjectType);
+    const auto sum = accumulate(values.begin(), values.end(), 0.0);
+    stats.AddMember("count", static_cast<uint64_t>(values.size()), alloc);
+    stats.AddMember("mean", values.empty() ? 0.0 : sum / values.size(), alloc);
+    stats.AddMember("p50", percentile(values, 50), alloc);
+    stats.AddMember("p95", percentile(values, 95), alloc);
+    stats.AddMember("p99", percentile(values, 99), alloc);
+    stats.AddMember("max", values.empty() ? 0.0 : *max_element(values.begin(), values.end()), alloc);
+    return stats;
+}
+
+double measureThroughput(const vector<PppEngineSPtr> & engines, const vector<WorkItem> & workload, const int iterations)
+{
+    const auto numItems = workload.size() * iterations;
+    atomic<size_t> nextItem { 0 };
+    vector<thread> workers;
+
+    const auto start = Clock::now();
+    for (const auto & engine : engines)
+    {
+        workers.emplace_back([&engine, &workload, &nextItem, numItems]() {
+            for (auto i = nextItem++; i < numItems; i = nextItem++)
+            {
+                processImage(*engine, workload[i % workload.size()]);
+            }
+        });
+    }
+    for (auto & worker : workers)
+    {
+        worker.join();
+    }
+    const auto elapsedSec = chrono::duration<double>(Clock::now() - start).count();
+    return numItems / elapsedSec;
+}
+
+uint64_t peakRssKb()
+{
+#ifdef _WIN32
+    PROCESS_MEMORY_COUNTERS pmc;
+    GetProcessMemoryInfo(GetCurrentProcess(), &pmc, sizeof(pmc));
+    return pmc.PeakWorkingSetSize / 1024;
+#else
+    rusage usage {};
+    getrusage(RUSAGE_SELF, &usage);
+#ifdef __APPLE__
+    return usage.ru_maxrss / 1024;
+#else
+    return usage.ru_maxrss;
+#endif
+#endif
+}
+
+/*!@brief Cold start of a fresh engine for each configuration (e.g. config.json, config.bundle.json and
+ * config.bundle.bin): time for configure to return, then to the first tiled print (needs no detection model)
+ * and to the first detected landmarks, all measured from the start of configure !*/
+rapidjson::Value measureStartup(const vector<string> & configFiles,
+                                const int runs,
+                                const WorkItem & item,
+                                rapidjson::Document::AllocatorType & alloc)
+{
+    rapidjson::Value startup(rapidjson::kObjectType);
+    for (const auto & configFile : configFiles)
+    {
+        const auto configFilePath = resolvePath(configFile);
+        vector<double> configureMs, firstPrintMs, firstLandMarksMs;
+        for (auto i = 0; i < runs; ++i)
+        {
+            PppEngine engine;
+            const auto start = Clock::now();
+            const auto elapsedMs = [&start]() { return chrono::duration<double, milli>(Clock::now() - start).count(); };
+            if (!engine.configure(configFilePath, nullptr))
+            {
+                throw runtime_error("Unable to configure the engine from " + configFilePath);
+            }
+            configureMs.push_back(elapsedMs());
+
+            const auto & imageStore = engine.getImageStore();
+            const auto imageKey = imageStore->setImage(reinterpret_cast<const char *>(item.encodedImage.data()),
+                                                       item.encodedImage.size());
+            const auto imageSize = imageStore->getImage(imageKey).size();
+            PhotoStandard ps(2.0, 2.0, 1.1875, 0.0, 0.0, 300.0, "inch");
+            PrintDefinition pd(6.0, 4.0, 300.0, "inch");
+            cv::Point crownPoint(imageSize.width / 2, imageSize.height / 4);
+            cv::Point chinPoint(imageSize.width / 2, imageSize.height * 3 / 4);
+            engine.createTiledPrint(imageKey, ps, pd, crownPoint, chinPoint);
+            firstPrintMs.push_back(elapsedMs());
+
+            engine.detectLandMarks(imageKey);
+            firstLandMarksMs.push_back(elapsedMs());
+        }
+        rapidjson::Value configStartup(rapidjson::kObjectType);
+        configStartup.AddMember("configure", latencyStats(configureMs, alloc), alloc);
+        configStartup.AddMember("firstPrint", latencyStats(firstPrintMs, alloc), alloc);
+        configStartup.AddMember("firstLandMarks", latencyStats(firstLandMarksMs, alloc), alloc);
+        startup.AddMember(rapidjson::Value(fs::path(configFilePath).filename().string().c_str(), alloc),
+                          configStartup,
+                          alloc);
+    }
+    return startup;
+}
+
+/*!@brief Runs the face detector with each backend over the workload: latency of a detection (including the rotation
+ * retries), detection rate, and rotations tried before the face was found (3 when it was not found) !*/
+rapidjson::Value measureFaceDetectors(const string & configFilePath,
+                                      const vector<string> & backendNames,
+                                      const vector<WorkItem> & workload,
+                                      rapidjson::Document::AllocatorType & alloc)
+{
+    vector<cv::Mat> grayImages;
+    for (const auto & item : workload)
+    {
+        grayImages.push_back(cv::imdecode(item.encodedImage, cv::IMREAD_GRAYSCALE));
+    }
+
+    const vector<int> rotations = { 0, 90, -90, 180 };
+    rapidjson::Value faceDetectors(rapidjson::kObjectType);
+    for (const auto & backendName : backendNames)
+    {
+        const auto config = make_shared<ConfigLoader>(configFilePath);
+        auto & faceDetectorCfg = config->get({ "faceDetector" });
+        if (!faceDetectorCfg.HasMember("backend"))
+        {
+            throw runtime_error("The configuration " + configFilePath + " has no faceDetector.backend to override");
+        }
+        faceDetectorCfg["backend"].SetString(rapidjson::StringRef(backendName.c_str()));
+        FaceDetector faceDetector;
+        faceDetector.configure(config);
+        if (!faceDetector.isConfigured())
+        {
+            throw runtime_error("Unable to configure the face detector backend " + backendName);
+        }
+
+        vector<double> latencyMs;
+        size_t numDetected = 0;
+        double totalRotationRetries = 0;
+        for (const auto & grayImage : grayImages)
+        {
+            LandMarks landMarks;
+            const auto start = Clock::now();
+            const auto detected = faceDetector.detectLandMarks(grayImage, landMarks);
+            latencyMs.push_back(chrono::duration<double, milli>(Clock::now() - start).count());
+            if (detected)
+            {
+                numDetected++;
+                const auto rotationIt = find(rotations.begin(), rotations.end(), landMarks.imageRotation);
+                totalRotationRetries += rotationIt - rotations.begin();
+            }
+            else
+            {
+                totalRotationRetries += rotations.size() - 1;
+            }
+        }
+
+        rapidjson::Value backendReport(rapidjson::kObjectType);
+        backendReport.AddMember("latencyMs", latencyStats(latencyMs, alloc), alloc);
+        backendReport.AddMember("detectionRate", numDetected / static_cast<double>(grayImages.size()), alloc);
+        backendReport.AddMember("meanRotationRetries", totalRotationRetries / grayImages.size(), alloc);
+        faceDetectors.AddMember(rapidjson::Value(backendName.c_str(), alloc), backendReport, alloc);
+    }
+    return faceDetectors;
+}
+
+/*!@brief Times the per pixel and the vectorized lips colour transforms on a mouth sized region of each image (the
+ * region the lips detector would take for a face half as high as the image) and checks that they agree !*/
+rapidjson::Value measureLipsColorTransform(const vector<WorkItem> & workload,
+                                           const int runs,
+                                           rapidjson::Document::AllocatorType & alloc)
+{
+    LipsDetector lipsDetector;
+    vector<double> perPixelMs, vectorizedMs;
+    size_t numMismatches = 0;
+    for (const auto & item : workload)
+    {
+        const auto image = cv::imdecode(item.encodedImage, cv::IMREAD_COLOR);
+        const auto faceHeight = image.rows / 2;
+        const cv::Size mouthRoiSize(faceHeight * 45 / 100, faceHeight * 35 / 100);
+        const cv::Rect mouthRoiRect(cv::Point((image.cols - mouthRoiSize.width) / 2, image.rows * 3 / 5), mouthRoiSize);
+        const auto mouthRoiImage = image(mouthRoiRect & cv::Rect(0, 0, image.cols, image.rows));
+
+        cv::Mat expected, actual;
+        for (auto i = 0; i < runs; ++i)
+        {
+            auto start = Clock::now();
+            LipsDetector::colorTransformPerPixel(mouthRoiImage, expected);
+            perPixelMs.push_back(chrono::duration<double, milli>(Clock::now() - start).count());
+
+            start = Clock::now();
+            lipsDetector.colorTransform(mouthRoiImage, actual);
+            vectorizedMs.push_back(chrono::duration<double, milli>(Clock::now() - start).count());
+        }
+        numMismatches += cv::countNonZero(expected != actual) > 0 ? 1 : 0;
+    }
+
+    const auto mean = [](const vector<double> & values) {
+        return accumulate(values.begin(), values.end(), 0.0) / max<size_t>(values.size(), 1);
+    };
+    rapidjson::Value lipsColorTransform(rapidjson::kObjectType);
+    lipsColorTransform.AddMember("perPixelMs", latencyStats(perPixelMs, alloc), alloc);
+    lipsColorTransform.AddMember("vectorizedMs", latencyStats(vectorizedMs, alloc), alloc);
+    lipsColorTransform.AddMember("speedup", mean(perPixelMs) / max(mean(vectorizedMs), 1e-9), alloc);
+    lipsColorTransform.AddMember("numMismatches", static_cast<uint64_t>(numMismatches), alloc);
+    return lipsColorTransform;
+}
+
+/*!@brief Compares latencies (lower is better) and throughput (higher is better) against a baseline report.
+ * Returns the number of metrics that regressed by more than the tolerance !*/
+int compareWithBaseline(const rapidjson::Document & baseline, const rapidjson::Document & report, const double tolerance)
+{
+    auto numRegressions = 0;
+    const auto check =
+        [&](const string & metric, const double baseValue, const double newValue, const bool lowerIsBetter) {
+            if (baseValue <= 0)
+            {
+                return;
+            }
+            const auto change = (newValue - baseValue) / baseValue;
+            const auto regressed = lowerIsBetter ? change > tolerance : -change > tolerance;
+            cout << (regressed ? "REGRESSION " : "ok         ") << metric << ": " << baseValue << " -> " << newValue
+                 << " (" << showpos << fixed << setprecision(1) << change * 100 << "%)" << noshowpos << defaultfloat
+                 << endl;
+            numRegressions += regressed ? 1 : 0;
+        };
+
+    for (const auto & res : report["resolutions"].GetObject())
+    {
+        if (!baseline["resolutions"].HasMember(res.name))
+        {
+            continue;
+        }
+        const string resName = res.name.GetString();
+        const auto & baseRes = baseline["resolutions"][res.name];
+        for (const auto p : { "p50", "p95", "p99" })
+        {
+            check("scale " + resName + " endToEnd." + p,
+                  baseRes["endToEnd"][p].GetDouble(),
+                  res.value["endToEnd"][p].GetDouble(),
+                  true);
+        }
+        for (const auto & stage : res.value["stages"].GetObject())
+        {
+            if (baseRes["stages"].HasMember(stage.name))
+            {
+                const auto & baseStage = baseRes["stages"][stage.name];
+                for (const auto p : { "p50", "p95" })
+                {
+                    check("scale " + resName + " " + stage.name.GetString() + "." + p,
+                          baseStage[p].GetDouble(),
+                          stage.value[p].GetDouble(),
+                          true);
+                }
+            }
+        }
+    }
+    for (const auto & tp : report["throughput"].GetObject())
+    {
+        if (baseline["throughput"].HasMember(tp.name))
+        {
+            check(string("imagesPerSecond@") + tp.name.GetString() + " threads",
+                  baseline["throughput"][tp.name].GetDouble(),
+                  tp.value.GetDouble(),
+                  false);
+        }
+    }
+    return numRegressions;
+}
+
+int main(int argc, char ** argv)
+{
+    TCLAP::CmdLine cmd("End to end benchmark of the passport photo engine", ' ', "1.0");
+
+    TCLAP::ValueArg<string> configFile("c",
+                                       "config",
+                                       "Engine configuration file",
+                                       false,
+                                       "libppp/share/config.json",
+                                       "file path");
+    TCLAP::MultiArg<string> imageDirs("d",
+                                      "imageDir",
+                                      "Directory with input images (can be repeated)",
+                                      false,
+                                      "directory");
+    TCLAP::ValueArg<string> scales("s", "scales", "Comma separated input image scale factors", false, "0.5,1.0", "list");
+    TCLAP::ValueArg<int> maxImages("n",
+                                   "maxImages",
+                                   "Maximum number of images taken from each directory",
+                                   false,
+                                   50,
+                                   "count");
+    TCLAP::ValueArg<int> maxThreads("t",
+                                    "threads",
+                                    "Measure throughput from 1 up to this number of threads",
+                                    false,
+                                    static_cast<int>(max(1u, thread::hardware_concurrency())),
+                                    "count");
+    TCLAP::ValueArg<int> iterations("i",
+                                    "iterations",
+                                    "Passes over the workload when measuring throughput",
+                                    false,
+                                    1,
+                                    "count");
+    TCLAP::ValueArg<string> outputFile("o", "output", "Write the JSON report to this file", false, "", "file path");
+    TCLAP::ValueArg<string> baselineFile("b",
+                                         "baseline",
+                                         "Compare against a previously saved JSON report",
+                                         false,
+                                         "",
+                                         "file path");
+    TCLAP::ValueArg<double> tolerance("",
+                                      "tolerance",
+                                      "Relative change tolerated before flagging a regression",
+                                      false,
+                                      0.1,
+                                      "ratio");
+    TCLAP::MultiArg<string> startupConfigs("u",
+                                           "startup",
+                                           "Only measure the engine startup time with this configuration file or "
+                                           "bundle (can be repeated to compare them)",
+                                           false,
+                                           "file path");
+    TCLAP::ValueArg<int> startupRuns("r", "startupRuns", "Engine startups measured per configuration", false, 5, "count");
+    TCLAP::ValueArg<string> faceDetectors("f",
+                                          "faceDetectors",
+                                          "Only compare these face detector backends (comma separated names, e.g. "
+                                          "haarCascade,lbpCascade,dlibHog)",
+                                          false,
+                                          "",
+                                          "list");
+    TCLAP::SwitchArg lipsColorTransform("",
+                                        "lipsColorTransform",
+                                        "Only compare the per pixel and vectorized lips colour transforms, each run "
+                                        "iterations times per image",
+                                        false);
+    cmd.add(configFile);
+    cmd.add(imageDirs);
+    cmd.add(scales);
+    cmd.add(maxImages);
+    cmd.add(maxThreads);
+    cmd.add(iterations);
+    cmd.add(outputFile);
+    cmd.add(baselineFile);
+    cmd.add(tolerance);
+    cmd.add(startupConfigs);
+    cmd.add(startupRuns);
+    cmd.add(faceDetectors);
+    cmd.add(lipsColorTransform);
+
+    try
+    {
+        cmd.parse(argc, argv);
+
+        auto dirs = imageDirs.getValue();
+        if (dirs.empty())
+        {
+            dirs = { "research/faces_caltech", "research/sample_test_images" };
+        }
+        const auto scaleFactors = parseList(scales.getValue());
+        const auto workload = loadWorkload(dirs, scaleFactors, static_cast<size_t>(maxImages.getValue()));
+        if (workload.empty())
+        {
+            cerr << "No input images were found" << endl;
+            return 1;
+        }
+
+        if (!startupConfigs.getValue().empty())
+        {
+            rapidjson::Document report;
+            report.SetObject();
+            auto & alloc = report.GetAllocator();
+            const auto startup
+                = measureStartup(startupConfigs.getValue(), startupRuns.getValue(), workload.front(), alloc);
+            report.AddMember("startup", startup, alloc);
+            report.AddMember("peakRssKb", peakRssKb(), alloc);
+            cout << Utilities::serializeJson(report, true) << endl;
+            return 0;
+        }
+        if (lipsColorTransform.getValue())
+        {
+            rapidjson::Document report;
+            report.SetObject();
+            auto & alloc = report.GetAllocator();
+            auto lipsColorTransformReport = measureLipsColorTransform(workload, iterations.getValue(), alloc);
+            report.AddMember("lipsColorTransform", lipsColorTransformReport, alloc);
+            cout << Utilities::serializeJson(report, true) << endl;
+            return 0;
+        }
+        const auto configFilePath = resolvePath(configFile.getValue());
+
+        if (!faceDetectors.getValue().empty())
+        {
+            vector<string> backendNames;
+            stringstream ss(faceDetectors.getValue());
+            string backendName;
+            while (getline(ss, backendName, ','))
+            {
+                backendNames.push_back(backendName);
+            }
+            rapidjson::Document report;
+            report.SetObject();
+            auto & alloc = report.GetAllocator();
+            report.AddMember("numImages", static_cast<uint64_t>(workload.size()), alloc);
+            auto faceDetectorsReport = measureFaceDetectors(configFilePath, backendNames, workload, alloc);
+            report.AddMember("faceDetectors", faceDetectorsReport, alloc);
+            cout << Utilities::serializeJson(report, true) << endl;
+            return 0;
+        }
+
+        // Latency: single engine, one image at a time with tracing on to break down the stages
+        auto & tracer = Tracer::instance();
+        tracer.setBufferSize(1 << 16);
+        tracer.setEnabled(true);
+
+        const auto engine = make_shared<PppEngine>();
+        configureEngine(configFilePath, *engine);
+
+        map<double, vector<Sample>> samplesPerScale;
+        for (const auto & item : workload)
+        {
+            samplesPerScale[item.scale].push_back(measureImage(*engine, item));
+        }
+        tracer.setEnabled(false);
+
+        using namespace rapidjson;
+        Document report;
+        report.SetObject();
+        auto & alloc = report.GetAllocator();
+
+        Value resolutions(kObjectType);
+        for (const auto & kv : samplesPerScale)
+        {
+            vector<double> totals;
+            map<string, vector<double>> stages;
+            auto failures = 0;
+            for (const auto & sample : kv.second)
+            {
+                totals.push_back(sample.totalMs);
+                failures += sample.success ? 0 : 1;
+                for (const auto & stage : sample.stageMs)
+                {
+                    stages[stage.first].push_back(stage.second);
+                }
+            }
+            Value stagesJson(kObjectType);
+            for (const auto & stage : stages)
+            {
+                stagesJson.AddMember(Value(stage.first.c_str(), alloc), latencyStats(stage.second, alloc), alloc);
+            }
+            Value resolution(kObjectType);
+            resolution.AddMember("endToEnd", latencyStats(totals, alloc), alloc);
+            resolution.AddMember("stages", stagesJson, alloc);
+            resolution.AddMember("failures", failures, alloc);
+
+            stringstream scaleName;
+            scaleName << fixed << setprecision(2) << kv.first;
+            resolutions.AddMember(Value(scaleName.str().c_str(), alloc), resolution, alloc);
+        }
+
+        const auto storeStats = engine->getImageStore()->getStats();
+        Value imageStore(kObjectType);
+        imageStore.AddMember("numImages", static_cast<uint64_t>(storeStats.numImages), alloc);
+        imageStore.AddMember("storeSize", static_cast<uint64_t>(storeStats.storeSize), alloc);
+        imageStore.AddMember("imageBytes", static_cast<uint64_t>(storeStats.imageBytes), alloc);
+        imageStore.AddMember("inserts", storeStats.inserts, alloc);
+        imageStore.AddMember("reinserts", storeStats.reinserts, alloc);
+        imageStore.AddMember("hits", storeStats.hits, alloc);
+        imageStore.AddMember("misses", storeStats.misses, alloc);
+        imageStore.AddMember("evictions", storeStats.evictions, alloc);
+
+        // Throughput: one engine per thread, tracing off
+        Value throughput(kObjectType);
+        vector<PppEngineSPtr> engines { engine };
+        for (auto numThreads = 1; numThreads <= maxThreads.getValue(); ++numThreads)
+        {
+            while (static_cast<int>(engines.size()) < numThreads)
+            {
+                engines.push_back(make_shared<PppEngine>());
+                configureEngine(configFilePath, *engines.back());
+            }
+            const auto imagesPerSecond = measureThroughput(engines, workload, iterations.getValue());
+            throughput.AddMember(Value(to_string(numThreads).c_str(), alloc), imagesPerSecond, alloc);
+        }
+
+        Value settings(kObjectType);
+        settings.AddMember("driver", "native", alloc);
+        settings.AddMember("numImages", static_cast<uint64_t>(workload.size()), alloc);
+        settings.AddMember("scales", Value(scales.getValue().c_str(), alloc), alloc);
+        settings.AddMember("iterations", iterations.getValue(), alloc);
+
+        report.AddMember("settings", settings, alloc);
+        report.AddMember("resolutions", resolutions, alloc);
+        report.AddMember("throughput", throughput, alloc);
+        report.AddMember("peakRssKb", peakRssKb(), alloc);
+        report.AddMember("imageStore", imageStore, alloc);
+
+        const auto reportJson = Utilities::serializeJson(report, true);
+        if (outputFile.getValue().empty())
+        {
+            cout << reportJson << endl;
+        }
+        else
+        {
+            ofstream ofs(outputFile.getValue());
+            ofs << reportJson;
+        }
+
+        if (!baselineFile.getValue().empty())
+        {
+            ifstream ifs(baselineFile.getValue());
+            const string baselineJson((istreambuf_iterator<char>(ifs)), istreambuf_iterator<char>());
+            Document baseline;
+            baseline.Parse(baselineJson.c_str());
+            if (baseline.HasParseError())
+            {
+                throw runtime_error("Unable to parse baseline report " + baselineFile.getValue());
+            }
+            return compareWithBaseline(baseline, report, tolerance.getValue()) > 0 ? 2 : 0;
+        }
+    }
+    catch (TCLAP::ArgException & e)
+    {
+        cerr << "error: " << e.error() << " for arg " << e.argId() << endl;
+        return 1;
+    }
+    catch (const exception & e)
+    {
+        cerr << "error: " << e.what() << endl;
+        return 1;
+    }
+    return 0;
+}
@@ -70,10 +70,12 @@ std::unique_ptr<T> make_unique(Args &&... args)
 DEFINE_STR(IMAGE_ID, imgKey)
 DEFINE_STR(PRINT_DEFINITION, canvas)
 DEFINE_STR(PHOTO_STANDARD, standard)
+DEFINE_STR(PHOTO_STANDARD_ID, standardId)
 DEFINE_STR(CROWN_POINT, crownPoint)
 DEFINE_STR(CHIN_POINT, chinPoint)
 DEFINE_STR(EXIF_INFO, EXIFInfo)
 DEFINE_STR(AS_BASE64, asBase64)
+DEFINE_STR(PREDICTOR_PROFILE, predictorProfile)
 
 DEFINE_STR(UNITS, units)
 
@@ -97,6 +99,8 @@ DEFINE_STR(COMPLIANCE_CHECKS, complianceChecks)
 DEFINE_STR(COMPLIANCE_RESULT_SUCCESS, success)
 DEFINE_STR(COMPLIANCE_RESULT_MESSAGE, message)
 DEFINE_STR(COMPLIANCE_RESULT_CHECK_NAME, checkName)
+DEFINE_STR(IMAGE_IDS, imgKeys)
+DEFINE_STR(PHOTO_STANDARD_IDS, standardIds)
 
 DEFINE_STR(CROWN_CHIN_ESTIMATOR, crownChinEstimator)
 DEFINE_STR(CHIN_CROWN_COEFF, chinCrownCoeff)
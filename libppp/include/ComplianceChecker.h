@@ -3,8 +3,12 @@
 #include "IComplianceChecker.h"
 
 #include <opencv2/core/core.hpp>
+#include <unordered_map>
 
 DEFINE_STR(CHECK_INPUT_RESOLUTION, inpuResolution)
+DEFINE_STR(CHECK_BACKGROUND_UNIFORMITY, backgroundUniformity)
+DEFINE_STR(CHECK_EXPOSURE, exposure)
+DEFINE_STR(CHECK_SHARPNESS, sharpness)
 
 namespace ppp
 {
@@ -24,11 +28,42 @@ public:
                                                       const cv::Point & chinPoint,
                                                       const std::vector<std::string> & complianceCheckNames) override;
 
+    std::vector<ComplianceResultSPtr> checkCompliance(
+        const ComplianceInputs & inputs,
+        const PhotoStandard & photoStandard,
+        const std::vector<std::string> & complianceCheckNames) const override;
+
+    bool needsImageStatistics(const std::vector<std::string> & complianceCheckNames) const override;
+
 private:
-    ComplianceResultSPtr checkInputResolution(const std::string & imgKey,
-                                              const PhotoStandardSPtr & photoStandard,
-                                              const cv::Point & crownPoint,
-                                              const cv::Point & chinPoint) const;
+    using Check = ComplianceResultSPtr (ComplianceChecker::*)(const ComplianceInputs & inputs,
+                                                              const PhotoStandard & photoStandard) const;
+
+    struct CheckEntry final
+    {
+        Check check;
+        bool needsStatistics; ///<- Whether the check reads the image statistics of its inputs
+    };
+
+    /*!@brief The checks by name !*/
+    static const std::unordered_map<std::string, CheckEntry> & checks();
+
+    ComplianceResultSPtr checkInputResolution(const ComplianceInputs & inputs,
+                                              const PhotoStandard & photoStandard) const;
+
+    // The checks below only read the image statistics of the inputs
+    ComplianceResultSPtr checkBackgroundUniformity(const ComplianceInputs & inputs,
+                                                   const PhotoStandard & photoStandard) const;
+
+    ComplianceResultSPtr checkExposure(const ComplianceInputs & inputs, const PhotoStandard & photoStandard) const;
+
+    ComplianceResultSPtr checkSharpness(const ComplianceInputs & inputs, const PhotoStandard & photoStandard) const;
+
+    /*!@brief Returns the image statistics of the inputs, throws if there are none or the face wasn't detected and
+     * faceRequired is true !*/
+    static const ImageStatistics & statisticsOf(const ComplianceInputs & inputs,
+                                                const std::string & checkName,
+                                                bool faceRequired);
 
     ComplianceResultSPtr checkBlurriness(const std::string & imgKey,
                                          const PhotoStandardSPtr & photoStandard,
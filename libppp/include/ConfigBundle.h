@@ -0,0 +1,52 @@
+#pragma once
+
+#include "CommonHelpers.h"
+
+#include <cstdint>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+namespace ppp
+{
+FWD_DECL(ConfigBundle)
+
+/*!@brief Read only view of a binary configuration bundle (config.bundle.bin as produced by build.py).
+ *
+ * Layout, all integers little endian:
+ *  - Header: 8 bytes magic "PPPBNDL1", uint32 version, uint32 number of sections
+ *  - Section table: one entry per section, 48 bytes zero padded name, uint64 offset, uint64 size
+ *  - Section blobs, each starting at a 64 bytes aligned offset
+ *
+ * The section named "config.json" holds the configuration document. Resource nodes of that
+ * document refer to their blob by name with a "section" field instead of carrying base64 "data".
+ * The file is memory mapped so sections are served in place without decoding nor copying. !*/
+class ConfigBundle final : NonCopyable
+{
+public:
+    static constexpr const char * CONFIG_SECTION = "config.json";
+    static constexpr size_t SECTION_NAME_SIZE = 48;
+
+    /*!@brief Tells whether the file starts with the bundle magic !*/
+    static bool isBundle(const std::string & filePath);
+
+    explicit ConfigBundle(const std::string & filePath);
+    ~ConfigBundle();
+
+    /*!@brief Returns true and sets data and size when the section exists !*/
+    bool getSection(const std::string & name, const char *& data, size_t & size) const;
+
+private:
+    const char * m_data = nullptr;
+    size_t m_size = 0;
+#ifdef _WIN32
+    void * m_fileHandle = nullptr;
+    void * m_mappingHandle = nullptr;
+#endif
+    std::vector<char> m_content; ///<- Used instead of a mapping where mmap is not available
+    std::unordered_map<std::string, std::pair<const char *, size_t>> m_sections;
+
+    void unmap();
+    void parseSectionTable(const std::string & filePath);
+};
+} // namespace ppp
@@ -8,6 +8,8 @@
 
 #include <rapidjson/document.h>
 
+#include "ConfigBundle.h"
+
 struct emscripten_fetch_t;
 
 using PathMapper = std::function<std::string(const std::string &)>;
@@ -27,9 +29,15 @@ public:
 
     void loadResource(const std::vector<std::string> & nodePath, const ResourceLoadResult & callback);
 
+    /*!@brief Identifies the content loadResource would return for this node without reading it: bundle section,
+     * hash of the inline data or path, size and modification time of the file !*/
+    std::string getResourceFingerprint(const std::vector<std::string> & nodePath);
+
 private:
     std::string _currentDir;
     rapidjson::Document m_config;
+    ConfigBundleUPtr m_bundle; ///<- Set when configured from a binary bundle, resources are served from it
+    std::string m_bundleFingerprint;
     ResourceLoaded _loadedCallback;
 
     std::unordered_map<emscripten_fetch_t *, ResourceLoadResult> _callbacks;
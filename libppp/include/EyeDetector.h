@@ -25,6 +25,8 @@ private: // Configuration
     bool m_useHaarCascades = false;
     cv::CascadeClassifierSPtr m_leftEyeCascadeClassifier;
     cv::CascadeClassifierSPtr m_rightEyeCascadeClassifier;
+    std::shared_ptr<const std::string> m_leftEyeCascadeXml; ///<- Kept so that other engines reuse the decoded XML
+    std::shared_ptr<const std::string> m_rightEyeCascadeXml; ///<- Kept so that other engines reuse the decoded XML
 
     // Definition of the search areas to locate pupils expressed as the ratios of the face rectangle
     static constexpr double m_topFaceRatio = 0.28; ///<- Distance from the top of the face
@@ -1,32 +1,63 @@
 #pragma once
 
 #include "IDetector.h"
-#include <dlib/image_processing/frontal_face_detector.h>
+
+#include <functional>
+#include <string>
+#include <vector>
 
 namespace ppp
 {
 FWD_DECL(LandMarks)
 FWD_DECL(FaceDetector)
+FWD_DECL(IFaceDetectorBackend)
+
+/*!@brief Algorithm the FaceDetector uses to find faces in an upright gray image !*/
+class IFaceDetectorBackend : NonCopyable
+{
+public:
+    /*!@brief Loads the model from the "faceDetector" configuration node and calls onReady once it can detect, which
+     * happens later when resources are loaded asynchronously. Throws if the model can't be loaded !*/
+    virtual void configure(const ConfigLoaderSPtr & config, const std::function<void()> & onReady) = 0;
+
+    /*!@brief Returns the faces found with a size between minFaceSize and maxFaceSize, biggest first !*/
+    virtual std::vector<cv::Rect> detect(const cv::Mat & grayImage,
+                                         const cv::Size & minFaceSize,
+                                         const cv::Size & maxFaceSize) = 0;
+
+    virtual ~IFaceDetectorBackend() = default;
+};
 
+/*!@brief Finds the face, trying the image rotations one after the other until one is found.
+ *
+ * The search itself is done by a backend selected with "faceDetector.backend" in the configuration. The built-in
+ * backends, all CPU only, are "haarCascade" (Viola-Jones, the default), "lbpCascade" (local binary patterns, faster
+ * and less accurate) and "dlibHog" (dlib's HOG frontal face detector). Other backends can be registered by name. !*/
 class FaceDetector final : public IDetector
 {
     void configureInternal(const ConfigLoaderSPtr & config) override;
 
 public:
+    using BackendFactory = std::function<IFaceDetectorBackendUPtr()>;
+
     bool detectLandMarks(const cv::Mat & inputImage, LandMarks & landmarks) override;
 
-private:
-    cv::CascadeClassifierSPtr m_pFaceCascadeClassifier;
+    /*!@brief Name of the backend in use, empty until configured !*/
+    const std::string & backendName() const;
 
-    bool m_useDlibFaceDetection { false };
+    /*!@brief Makes a backend available to the configuration, replacing the one registered with the same name !*/
+    static void registerBackend(const std::string & name, const BackendFactory & factory);
+
+    static std::vector<std::string> backendNames();
+
+private:
+    IFaceDetectorBackendUPtr m_backend;
+    std::string m_backendName;
 
     void calculateScaleSearch(const cv::Size & inputImageSize,
                               double minFaceRatio,
                               double maxFaceRatio,
                               cv::Size & minFaceSize,
                               cv::Size & maxFaceSize) const;
-
-private:
-    std::shared_ptr<dlib::frontal_face_detector> m_frontalFaceDetector;
 };
 } // namespace ppp
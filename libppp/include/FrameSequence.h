@@ -0,0 +1,76 @@
+#pragma once
+
+#include "CommonHelpers.h"
+#include "LandMarks.h"
+
+#include <cstdint>
+#include <functional>
+#include <string>
+
+#include <opencv2/core/core.hpp>
+
+namespace ppp
+{
+FWD_DECL(FrameSequence)
+
+class PppEngine;
+
+/*!@brief Landmarks detected on one frame of a sequence !*/
+struct FrameResult final
+{
+    bool detected = false; ///<- Whether a face was found in the frame
+    bool fullDetection = false; ///<- Whether the face was searched in the whole frame instead of being tracked
+    double latencyMs = 0.0; ///<- Time spent processing the frame
+    LandMarks landMarks;
+};
+
+/*!@brief Counters describing the frames processed since the sequence started !*/
+struct FrameSequenceStats final
+{
+    uint64_t numFrames = 0; ///<- Frames processed
+    uint64_t numDetected = 0; ///<- Frames where a face was found
+    uint64_t numFullDetections = 0; ///<- Frames where the face was searched in the whole frame
+    uint64_t numTrackingLosses = 0; ///<- Tracked frames where the face was not found around its previous position
+    double totalLatencyMs = 0.0; ///<- Time spent processing all the frames
+    double maxLatencyMs = 0.0; ///<- Time spent processing the slowest frame
+};
+
+/*!@brief Detects landmarks on consecutive frames of a camera or video, tracking the face between frames.
+ *
+ * A still image goes through the full detection: the face cascade over the whole image for up to four rotations,
+ * then the shape predictor. Between consecutive frames the face barely moves, so the full detection only runs on
+ * keyframes (every keyframeInterval frames) or when the face is lost. Other frames search the face, upright, in a
+ * window around the face of the previous frame and the shape predictor starts from the face found there. !*/
+class FrameSequence final : NonCopyable
+{
+public:
+    /*!@brief The search window is the previous face rectangle scaled by searchWindowScale around its center !*/
+    explicit FrameSequence(const PppEngine & engine, size_t keyframeInterval = 30, double searchWindowScale = 2.0);
+
+    /*!@brief Detects the landmarks of the next frame of the sequence (8 bits BGR or gray) !*/
+    FrameResult processFrame(const cv::Mat & frame);
+
+    /*!@brief Processes every frame of a video file, onFrame is called with the result of each one.
+     * Returns the number of frames processed, throws if the video can't be opened !*/
+    size_t processVideo(const std::string & videoFilePath, const std::function<void(const FrameResult &)> & onFrame);
+
+    void setTracking(size_t keyframeInterval, double searchWindowScale);
+
+    /*!@brief Forgets the tracked face so that the next frame gets a full detection, and clears the counters !*/
+    void reset();
+
+    FrameSequenceStats getStats() const;
+
+private:
+    const PppEngine & m_engine;
+    size_t m_keyframeInterval;
+    double m_searchWindowScale;
+
+    cv::Rect m_previousFaceRect; ///<- Face found in the previous frame, empty when the face was not found
+    size_t m_framesSinceKeyframe = 0;
+
+    FrameSequenceStats m_stats;
+
+    cv::Rect searchWindow() const;
+};
+} // namespace ppp
@@ -8,6 +8,33 @@ namespace ppp
 FWD_DECL(IComplianceChecker)
 FWD_DECL(PhotoStandard)
 FWD_DECL(ComplianceResult)
+FWD_DECL(ImageStatistics)
+
+/*!@brief What the checks need to know about one image. It is computed once per image, then shared by the checks of
+ * every standard the image is checked against !*/
+struct ComplianceInputs final
+{
+    cv::Point crownPoint;
+    cv::Point chinPoint;
+    double crownChinDistance = 0.0; ///<- Distance between the crown and chin points [pixel]
+    cv::Size faceSize; ///<- Size of the detected face [pixel], empty when the face was not detected
+    cv::Size imageSize; ///<- Size of the input image [pixel], empty when unknown
+    ImageStatisticsSPtr statistics; ///<- Pixel statistics of the face and background, checks never read pixels
+
+    ComplianceInputs(const cv::Point & crownPoint,
+                     const cv::Point & chinPoint,
+                     const cv::Size & faceSize = cv::Size(),
+                     const cv::Size & imageSize = cv::Size(),
+                     ImageStatisticsSPtr statistics = nullptr)
+    : crownPoint(crownPoint)
+    , chinPoint(chinPoint)
+    , crownChinDistance(cv::norm(crownPoint - chinPoint))
+    , faceSize(faceSize)
+    , imageSize(imageSize)
+    , statistics(std::move(statistics))
+    {
+    }
+};
 
 class IComplianceChecker : NonCopyable
 {
@@ -23,5 +50,16 @@ public:
                                                               const cv::Point & chinPoint,
                                                               const std::vector<std::string> & complianceCheckNames)
         = 0;
+
+    /*!@brief Runs the named checks of one standard on an image described by its inputs, unknown names are skipped.
+     * Safe to call from several threads !*/
+    virtual std::vector<ComplianceResultSPtr> checkCompliance(
+        const ComplianceInputs & inputs,
+        const PhotoStandard & photoStandard,
+        const std::vector<std::string> & complianceCheckNames) const = 0;
+
+    /*!@brief Tells whether one of the named checks reads the image statistics of its inputs, the inputs of the other
+     * checks can do without them !*/
+    virtual bool needsImageStatistics(const std::vector<std::string> & complianceCheckNames) const = 0;
 };
 } // namespace ppp
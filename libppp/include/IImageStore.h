@@ -3,6 +3,9 @@
 #include "CommonHelpers.h"
 #include "IConfigurable.h"
 
+#include <cstdint>
+#include <functional>
+
 namespace cv
 {
 class Mat;
@@ -17,12 +20,34 @@ namespace ppp
 {
 FWD_DECL(IImageStore)
 FWD_DECL(LandMarks);
+FWD_DECL(ImageStatistics);
+
+/*!@brief Counters describing how the image store has been used so far !*/
+struct ImageStoreStats final
+{
+    size_t numImages = 0; ///<- Images currently in the store
+    size_t storeSize = 0; ///<- Maximum number of images kept in the store
+    size_t imageBytes = 0; ///<- Memory used by the decoded images currently in the working set
+    size_t encodedBytes = 0; ///<- Memory used by the encoded images kept for every key and their previews
+    uint64_t inserts = 0; ///<- Images added to the store
+    uint64_t reinserts = 0; ///<- Images set again while they were still in the store
+    uint64_t hits = 0; ///<- Lookups of images found in the store
+    uint64_t misses = 0; ///<- Lookups of images not (or no longer) in the store
+    uint64_t evictions = 0; ///<- Images removed to keep the store within its size
+    uint64_t previewHits = 0; ///<- Previews served from the cache
+    uint64_t previewMisses = 0; ///<- Previews that had to be resized and encoded
+    uint64_t decodedHits = 0; ///<- Images retrieved from the decoded working set
+    uint64_t decodedMisses = 0; ///<- Images that had to be decoded again to be retrieved
+    double decodeOnMissMs = 0.0; ///<- Total time spent decoding images on working set misses
+};
 
 /*!@brief Caches input images that are going to be processed.
  * Only a certain amount of images are kept at any point in time. */
 class IImageStore : NonCopyable, public IConfigurable
 {
 public:
+    using EvictionListener = std::function<void(const std::string & imageKey)>;
+
     /*!@brief Loads an image from file and returns the imageKey for later retrieval !*/
     virtual std::string setImage(const std::string & imageFilePath) = 0;
 
@@ -32,11 +57,20 @@ public:
     /*!@brief Gets a copy the image from the store !*/
     virtual cv::Mat getImage(const std::string & imageKey) = 0;
 
+    /*!@brief Returns the image downscaled to fit in maxDimension x maxDimension (full size if maxDimension is 0)
+     * and encoded as "png", "jpeg" or "webp". Previews are cached with the image until it is evicted !*/
+    virtual std::string getImagePreview(const std::string & imageKey, int maxDimension, const std::string & format) = 0;
+
     /*!@brief Gets the image EXIF info if available !*/
     virtual easyexif::EXIFInfoSPtr getExifInfo(const std::string & imageKey) = 0;
 
     virtual LandMarksSPtr getLandMarks(const std::string & imageKey) = 0;
 
+    /*!@brief Returns the pixel statistics of the face of the image landmarks and of the background. They are computed
+     * on first use and kept with the image until it is evicted or its face is detected again. Throws if the image is
+     * not in the store !*/
+    virtual ImageStatisticsSPtr getImageStatistics(const std::string & imageKey) = 0;
+
     /*!@brief Returns whether an image with the specified key is in the store !*/
     virtual bool containsImage(const std::string & imageKey) = 0;
 
@@ -45,6 +79,13 @@ public:
      * the oldest images are removed from the store !*/
     virtual void setStoreSize(size_t storeSize) = 0;
 
+    /*!@brief Returns a snapshot of the store usage counters !*/
+    virtual ImageStoreStats getStats() const = 0;
+
+    /*!@brief Registers a function called with the key of every image evicted from the store, so that data derived
+     * from the image can be dropped with it. Listeners are called without the store lock held !*/
+    virtual void addEvictionListener(const EvictionListener & listener) = 0;
+
     virtual ~IImageStore() = default;
 };
 } // namespace ppp
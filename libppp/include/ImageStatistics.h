@@ -0,0 +1,44 @@
+#pragma once
+
+#include "CommonHelpers.h"
+
+#include <vector>
+
+#include <opencv2/core/core.hpp>
+
+namespace ppp
+{
+FWD_DECL(ImageStatistics)
+
+/*!@brief Statistics of the pixels of one region of an image, empty (numPixels is 0) when the region is !*/
+struct RegionStatistics final
+{
+    size_t numPixels = 0;
+    cv::Scalar mean; ///<- Mean of each BGR channel
+    cv::Scalar stdDev; ///<- Standard deviation of each BGR channel
+    double grayMean = 0.0; ///<- Mean brightness
+    double grayStdDev = 0.0; ///<- Standard deviation of the brightness, low for uniform regions
+    double laplacianVariance = 0.0; ///<- Variance of the Laplacian of the brightness, low for blurred regions
+    std::vector<uint32_t> grayHistogram; ///<- Number of pixels of each brightness (256 bins)
+
+    /*!@brief Fraction of the pixels with a brightness lower than low or higher than high !*/
+    double outsideFraction(int low, int high) const;
+};
+
+/*!@brief Pixel statistics compliance checks are computed from, so that checks don't go through the pixels.
+ *
+ * They are computed with OpenCV's vectorized primitives over the face and the background regions of the image: the
+ * face is the detected face rectangle and the background is a band along the top, left and right borders of the
+ * image (the bottom border usually shows the shoulders). !*/
+struct ImageStatistics final
+{
+    cv::Size imageSize;
+    cv::Rect faceRect; ///<- Face region the statistics were computed for, empty when no face was detected
+    RegionStatistics face;
+    RegionStatistics background;
+
+    /*!@brief Computes the statistics of an 8 bits BGR image, the background band width is borderRatio times the
+     * smallest dimension of the image !*/
+    static ImageStatisticsSPtr compute(const cv::Mat & bgrImage, const cv::Rect & faceRect, double borderRatio = 0.05);
+};
+} // namespace ppp
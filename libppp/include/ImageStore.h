@@ -5,6 +5,7 @@
 #include <list>
 #include <mutex>
 #include <unordered_map>
+#include <vector>
 
 #include <opencv2/core/core.hpp>
 
@@ -14,12 +15,23 @@ namespace ppp
 FWD_DECL(ImageStore)
 struct ImageData final
 {
-    cv::Mat image;
+    std::shared_ptr<const std::vector<BYTE>> encodedImage; ///<- Image file content as uploaded, always kept
+    cv::Mat image; ///<- Decoded image, empty when not in the decoded working set
     easyexif::EXIFInfoSPtr exifInfo;
     LandMarksSPtr landMarks;
+    ImageStatisticsSPtr statistics; ///<- Pixel statistics, computed on first use
     std::list<std::string>::iterator storeListOrder; ///<- Where in the image store order it is located
+    std::list<std::string>::iterator decodedListOrder; ///<- Where in the decoded working set order it is located
+    std::unordered_map<std::string, std::string> previews; ///<- Encoded previews by format and maximum dimension
 };
 
+/*!@brief Image store keeping images compressed at rest.
+ *
+ * Every image keeps the encoded bytes it was uploaded with, which are a fraction of the decoded size. Decoded images
+ * are only kept for a small working set, bounded in bytes and evicted least recently used first; getImage decodes
+ * the image again when it is not in the working set. Landmarks, EXIF info and previews stay with the encoded
+ * image. !*/
+
 class ImageStore final : public IImageStore
 {
 public:
@@ -31,12 +43,23 @@ public:
 
     void setStoreSize(size_t storeSize) override;
 
+    /*!@brief Sets the maximum memory used by decoded images. The last image used is always kept decoded !*/
+    void setDecodedBytesLimit(size_t decodedBytesLimit);
+
     cv::Mat getImage(const std::string & imageKey) override;
 
+    std::string getImagePreview(const std::string & imageKey, int maxDimension, const std::string & format) override;
+
     LandMarksSPtr getLandMarks(const std::string & imageKey) override;
 
+    ImageStatisticsSPtr getImageStatistics(const std::string & imageKey) override;
+
     easyexif::EXIFInfoSPtr getExifInfo(const std::string & imageKey) override;
 
+    ImageStoreStats getStats() const override;
+
+    void addEvictionListener(const EvictionListener & listener) override;
+
 protected:
     void configureInternal(const ConfigLoaderSPtr & config) override;
 
@@ -51,6 +74,15 @@ private:
     ///<- oldest images are to be deleted
     size_t m_storeSize = 1;
 
+    ///<- Decoded images, least recently used first, and the memory they use
+    std::list<std::string> m_decodedKeyOrder;
+    size_t m_decodedBytes = 0;
+    size_t m_decodedBytesLimit = 256 * 1024 * 1024;
+
+    ImageStoreStats m_stats;
+
+    std::vector<EvictionListener> m_evictionListeners;
+
     mutable std::mutex m_mutex;
 
 private:
@@ -59,7 +91,16 @@ private:
 
     void boostImageToTopCache(const std::string & imageKey);
 
-    std::string storeImageData(const cv::Mat & image, const easyexif::EXIFInfoSPtr & exifInfo = nullptr);
+    std::string storeImageData(const cv::Mat & image,
+                               std::vector<BYTE> && encodedImage,
+                               const easyexif::EXIFInfoSPtr & exifInfo = nullptr);
+
+    ///<- Adds a decoded image to the working set, releasing the least recently used ones beyond the limit
+    void addToDecodedSet(const std::string & imageKey, ImageData & imageData, const cv::Mat & image);
+
+    void removeFromDecodedSet(ImageData & imageData);
+
+    void handleDecodedSetSize();
 
     static easyexif::EXIFInfoSPtr decodeExifInfo(const BYTE * bufferData, const size_t bufferLength);
 };
@@ -2,6 +2,8 @@
 
 #include "IDetector.h"
 
+#include <vector>
+
 namespace ppp
 {
 
@@ -12,10 +14,25 @@ class LipsDetector final : public IDetector
 public:
     bool detectLandMarks(const cv::Mat & inputImage, LandMarks & landmarks) override;
 
+    /*!@brief Computes the 8 bits lips colour transform (r / (r + g))^4 of a BGR image, where the lips are bright.
+     * Uses whole matrix operations on buffers kept between calls !*/
+    void colorTransform(const cv::Mat & bgrImage, cv::Mat & transformImage);
+
+    /*!@brief Reference implementation of colorTransform computed pixel by pixel !*/
+    static void colorTransformPerPixel(const cv::Mat & bgrImage, cv::Mat & transformImage);
+
 private:
     bool getBeardMask(cv::Mat & mouthAreaImage) const;
 
+    cv::Mat m_bgrImage; ///<- Image being transformed, as floats
+    std::vector<cv::Mat> m_channels; ///<- B, G and R planes of m_bgrImage
+    cv::Mat m_channelsSum;
+    cv::Mat m_red;
+    cv::Mat m_green;
+    cv::Mat m_redGreenSum;
+
     cv::CascadeClassifierSPtr m_pMouthCascadeClassifier;
+    std::shared_ptr<const std::string> m_mouthCascadeXml; ///<- Kept so that other engines reuse the decoded XML
 
     bool m_useHaarCascades { true };
     bool m_useColorSegmentationAlgorithm { false };
@@ -0,0 +1,141 @@
+#pragma once
+
+#include "CommonHelpers.h"
+
+#include <atomic>
+#include <condition_variable>
+#include <cstdint>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <vector>
+
+namespace ppp
+{
+FWD_DECL(ConfigLoader)
+
+enum class LogLevel
+{
+    Trace = 0,
+    Debug,
+    Info,
+    Warning,
+    Error,
+    Off
+};
+
+/*!@brief A log record copied out of the ring buffer !*/
+struct LogRecord final
+{
+    uint64_t sequence; ///<- Monotonic record number, gaps mean records were overwritten before being read
+    LogLevel level;
+    int64_t timestampUs; ///<- Microseconds since epoch
+    uint64_t threadId;
+    std::string message;
+};
+
+/*!@brief Leveled logger writing into a fixed size in-memory ring buffer.
+ * Writers never take a lock: they claim a slot with an atomic increment, the oldest records get overwritten when
+ * the buffer is full. Records can be drained for debugging and optionally appended to a file by a background thread.
+ !*/
+class Logger final : NonCopyable
+{
+public:
+    static constexpr size_t MAX_MESSAGE_LENGTH = 255;
+
+    static Logger & instance();
+
+    ~Logger();
+
+    /*!@brief Reads the optional "logging" section of the configuration !*/
+    void configure(const ConfigLoaderSPtr & config);
+
+    void setLevel(LogLevel level);
+
+    LogLevel level() const
+    {
+        return static_cast<LogLevel>(m_level.load(std::memory_order_relaxed));
+    }
+
+    bool shouldLog(const LogLevel level) const
+    {
+        return static_cast<int>(level) >= m_level.load(std::memory_order_relaxed);
+    }
+
+    /*!@brief Resizes the ring buffer (rounded up to a power of two), buffered records are discarded.
+     * Not safe to call while other threads are logging, it is meant to be used at configuration time !*/
+    void setBufferSize(size_t bufferSize);
+
+    /*!@brief Starts (or stops when the path is empty) the background thread appending records to a file !*/
+    void setOutputFile(const std::string & outputFilePath, int flushIntervalMs = 200);
+
+    void log(LogLevel level, const std::string & message);
+
+    /*!@brief Returns the records not drained yet and advances the read cursor !*/
+    std::vector<LogRecord> drain(size_t maxRecords = SIZE_MAX);
+
+    /*!@brief Drains as many records as fit in maxBytes and serializes them as a JSON array !*/
+    std::string drainJson(size_t maxBytes);
+
+    static const char * toString(LogLevel level);
+
+    static LogLevel fromString(const std::string & levelName);
+
+private:
+    Logger();
+
+    struct Slot
+    {
+        std::atomic<uint64_t> sequence { 0 }; ///<- Write position + 1 of the record stored in the slot, 0 if empty
+        std::atomic_flag busy = ATOMIC_FLAG_INIT; ///<- Only contended when writers wrap around the buffer
+        LogLevel level = LogLevel::Off;
+        int64_t timestampUs = 0;
+        uint64_t threadId = 0;
+        size_t messageLength = 0;
+        char message[MAX_MESSAGE_LENGTH + 1] = {};
+    };
+
+    std::atomic<int> m_level { static_cast<int>(LogLevel::Warning) };
+
+    std::unique_ptr<Slot[]> m_slots;
+    size_t m_capacityMask = 0;
+    std::atomic<uint64_t> m_writeIndex { 0 };
+
+    uint64_t m_drainIndex = 0;
+    std::mutex m_drainMutex;
+
+    std::string m_outputFilePath;
+    int m_flushIntervalMs = 200;
+    uint64_t m_sinkIndex = 0;
+    bool m_stopSink = false;
+    std::thread m_sinkThread;
+    std::mutex m_sinkMutex;
+    std::condition_variable m_sinkCondition;
+
+    bool readSlot(uint64_t position, LogRecord & record) const;
+
+    std::vector<LogRecord> readFrom(uint64_t & cursor, size_t maxRecords) const;
+
+    void startSink();
+
+    void stopSink();
+
+    void runSink();
+};
+} // namespace ppp
+
+#define PPP_LOG(level, message)                                                                                        \
+    do                                                                                                                 \
+    {                                                                                                                  \
+        auto & pppLogger = ppp::Logger::instance();                                                                    \
+        if (pppLogger.shouldLog(level))                                                                                \
+        {                                                                                                              \
+            pppLogger.log(level, message);                                                                             \
+        }                                                                                                              \
+    } while (false)
+
+#define LOG_TRACE(message) PPP_LOG(ppp::LogLevel::Trace, message)
+#define LOG_DEBUG(message) PPP_LOG(ppp::LogLevel::Debug, message)
+#define LOG_INFO(message) PPP_LOG(ppp::LogLevel::Info, message)
+#define LOG_WARNING(message) PPP_LOG(ppp::LogLevel::Warning, message)
+#define LOG_ERROR(message) PPP_LOG(ppp::LogLevel::Error, message)
@@ -0,0 +1,92 @@
+#pragma once
+
+#include "CommonHelpers.h"
+
+#include <atomic>
+#include <mutex>
+#include <string>
+#include <typeinfo>
+#include <unordered_map>
+
+namespace ppp
+{
+/*!@brief Process wide cache of the read only models (shape predictor, cascade definitions) loaded by the engines.
+ *
+ * Models are keyed by the type and the fingerprint of the resource they were loaded from (see
+ * ConfigLoader::getResourceFingerprint) so every engine configured from the same resources shares one immutable
+ * instance. The registry only holds weak references: a model is released once no engine uses it anymore. !*/
+class ModelRegistry final : NonCopyable
+{
+public:
+    static ModelRegistry & instance();
+
+    /*!@brief Returns the model registered for the fingerprint or calls load to create it. Concurrent callers asking
+     * for the same model wait for a single load. When load returns nullptr nothing is registered !*/
+    template <typename T, typename Loader>
+    std::shared_ptr<const T> get(const std::string & fingerprint, const Loader & load)
+    {
+        const auto entry = getEntry(std::string(typeid(T).name()) + "|" + fingerprint);
+        std::lock_guard<std::mutex> lock(entry->mutex);
+        if (const auto model = std::static_pointer_cast<const T>(entry->model.lock()))
+        {
+            ++m_numHits;
+            return model;
+        }
+        std::shared_ptr<const T> model = load();
+        if (model)
+        {
+            entry->model = model;
+            ++m_numLoads;
+        }
+        return model;
+    }
+
+    /*!@brief Returns the model registered for the fingerprint, nullptr if there is none. Lets callers skip reading
+     * and decoding the resource of a model that is already loaded !*/
+    template <typename T>
+    std::shared_ptr<const T> find(const std::string & fingerprint)
+    {
+        const auto entry = getEntry(std::string(typeid(T).name()) + "|" + fingerprint);
+        std::lock_guard<std::mutex> lock(entry->mutex);
+        auto model = std::static_pointer_cast<const T>(entry->model.lock());
+        if (model)
+        {
+            ++m_numHits;
+        }
+        return model;
+    }
+
+    /*!@brief Number of registered models that are still in use !*/
+    size_t numLiveModels() const;
+
+    /*!@brief Number of models actually loaded, and number of requests served with an already loaded model !*/
+    uint64_t numLoads() const
+    {
+        return m_numLoads;
+    }
+
+    uint64_t numHits() const
+    {
+        return m_numHits;
+    }
+
+    /*!@brief Forgets all the registered models, engines keep the instances they already hold !*/
+    void clear();
+
+private:
+    struct Entry final
+    {
+        std::mutex mutex;
+        std::weak_ptr<const void> model;
+    };
+
+    ModelRegistry() = default;
+
+    mutable std::mutex m_mutex;
+    std::unordered_map<std::string, std::shared_ptr<Entry>> m_entries;
+    std::atomic<uint64_t> m_numLoads { 0 };
+    std::atomic<uint64_t> m_numHits { 0 };
+
+    std::shared_ptr<Entry> getEntry(const std::string & key);
+};
+} // namespace ppp
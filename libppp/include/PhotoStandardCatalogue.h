@@ -0,0 +1,61 @@
+#pragma once
+
+#include "CommonHelpers.h"
+#include "IConfigurable.h"
+#include "PhotoStandard.h"
+
+#include <istream>
+#include <map>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+namespace ppp
+{
+FWD_DECL(PhotoStandardCatalogue)
+
+/*!@brief In memory index of the predefined photo standards (photo-standards.json).
+ *
+ * The catalogue is parsed once when the engine is configured, requests then refer to a standard by its id
+ * (e.g. "us_passport_photo") instead of carrying the full definition. Standards are indexed by id, country and
+ * document type, and the PhotoStandard instances are cached per (id, resolution) so the same pixel dimensions are
+ * served to every request asking for that print resolution. !*/
+class PhotoStandardCatalogue final : NonCopyable, public IConfigurable
+{
+public:
+    /*!@brief Replaces the catalogue with the standards of a photo-standards.json array !*/
+    void load(const rapidjson::Value & standards);
+
+    void load(std::istream & stream);
+
+    size_t size() const;
+
+    bool contains(const std::string & standardId) const;
+
+    /*!@brief Returns the standard with its resolution raised to minDpi when the native one is lower, which is what
+     * the print maker would do. Instances are shared and must not be modified (e.g. by overrideResolution).
+     * Throws if the standard id is unknown !*/
+    PhotoStandardSPtr get(const std::string & standardId, double minDpi = 0.0) const;
+
+    /*!@brief Ids of the standards of a country, optionally restricted to a document type (e.g. "Passport") !*/
+    std::vector<std::string> find(const std::string & country, const std::string & docType = "") const;
+
+protected:
+    void configureInternal(const ConfigLoaderSPtr & config) override;
+
+private:
+    struct Entry final
+    {
+        std::string country;
+        std::string docType;
+        PhotoStandardSPtr standard; ///<- At the resolution required by the standard
+    };
+
+    std::unordered_map<std::string, Entry> m_entries;
+    std::unordered_map<std::string, std::vector<std::string>> m_idsByCountry; ///<- In catalogue order
+
+    mutable std::mutex m_cacheMutex;
+    mutable std::map<std::pair<std::string, double>, PhotoStandardSPtr> m_standardsByDpi;
+};
+} // namespace ppp
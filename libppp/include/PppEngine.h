@@ -2,8 +2,11 @@
 
 #include "CommonHelpers.h"
 #include "PhotoStandard.h"
+#include <future>
 #include <opencv2/core/core.hpp>
+#include <rapidjson/document.h>
 #include <unordered_map>
+#include <vector>
 
 namespace dlib
 {
@@ -20,10 +23,13 @@ FWD_DECL(IImageStore)
 FWD_DECL(IPhotoPrintMaker)
 FWD_DECL(IComplianceChecker)
 FWD_DECL(ConfigLoader)
+FWD_DECL(PhotoStandardCatalogue)
+FWD_DECL(RenderCache)
 
 
 class PrintDefinition;
 class PhotoStandard;
+struct ComplianceInputs;
 
 FWD_DECL(PppEngine)
 
@@ -60,11 +66,57 @@ public:
                        const IImageStoreSPtr & pImageStore = nullptr,
                        const IComplianceCheckerSPtr & pComplianceChecker = nullptr);
 
+    ~PppEngine();
+
     bool isConfigured() const;
+
+    /*!@brief Tells whether one component finished loading without blocking. Components are "shapePredictor",
+     * "faceDetector", "eyesDetector", "lipsDetector", "crownChinEstimator", "photoPrintMaker", "imageStore" and
+     * "photoStandards". The models of the other shape predictor profiles are "shapePredictor.<profile>" !*/
+    bool isConfigured(const std::string & componentName) const;
+
+    /*!@brief Blocks until all the components are loaded, throws if one of them failed to load !*/
+    void waitUntilConfigured() const;
+
     // Native interface
+    /*!@brief Loads the configuration. Unless "resourceLoading.async" is false, the detection models load on
+     * background threads and configure returns right away; each call then only waits for the components it uses !*/
     bool configure(const std::string & configFilePathOrString, void * callback);
 
-    bool detectLandMarks(const std::string & imageKey) const;
+    /*!@brief Detects the landmarks with a shape predictor profile: "accurate" (the "shapePredictor" model, used when
+     * empty) or one of the "shapePredictorProfiles" of the configuration. The shipped configuration declares none, a
+     * reduced model trained with 'trainer --reduced' is added as, for instance:
+     *     "shapePredictorProfiles": {
+     *         "fast": {
+     *             "keptPoints": [ 9, 34, 37, 38, 39, 41, 42, 44, 45, 46, 47, 48, 49, 55 ],
+     *             "file": "sp_model_fast.dat"
+     *         }
+     *     } !*/
+    bool detectLandMarks(const std::string & imageKey, const std::string & predictorProfile = "") const;
+
+    /*!@brief Detects the landmarks of an image that is not in the store (e.g. a video frame). When a search window
+     * is given the face is only searched there, upright, which is how faces are tracked across frames !*/
+    bool detectLandMarks(const cv::Mat & inputImage,
+                         LandMarks & landMarks,
+                         const cv::Rect & faceSearchWindow = cv::Rect(),
+                         const std::string & predictorProfile = "") const;
+
+    /*!@brief Sets the number of threads OpenCV may use inside each call (resize, warpAffine, cvtColor, the face
+     * cascades). 1 runs every call on the calling thread, which suits deployments with one engine per worker process
+     * and one worker per core; 0 or less restores the default of one thread per core. The setting is process wide
+     * and is also read from "threading.numThreads" by configure. The engine has no thread pool of its own !*/
+    static void setNumThreads(int numThreads);
+
+    static int getNumThreads();
+
+    /*!@brief Names of the shape predictor profiles declared in the configuration !*/
+    std::vector<std::string> getPredictorProfileNames() const;
+
+    /*!@brief Maps the landmarks the engine reads to their index among the points a model predicts. The model was
+     * trained without the points listed in "missingPoints" of its configuration node, or with only those listed in
+     * "keptPoints" (1 based indices of the 68 points annotation) !*/
+    static std::unordered_map<LandMarkType, std::vector<int>, EnumClassHash> createLandmarkIndexMapping(
+        const rapidjson::Value & spConfig);
 
     cv::Mat createTiledPrint(const std::string & imageKey,
                              PhotoStandard & ps,
@@ -73,12 +125,29 @@ public:
                              cv::Point & chinMark) const;
 
     IImageStoreSPtr getImageStore() const;
+
+    /*!@brief Predefined photo standards requests can refer to by id !*/
+    PhotoStandardCatalogueSPtr getPhotoStandardCatalogue() const;
+
+    /*!@brief Encoded print outputs, entries are dropped when their image is evicted from the image store !*/
+    RenderCacheSPtr getRenderCache() const;
+
     std::string checkCompliance(const std::string & imageId,
                                 const PhotoStandardSPtr & photoStandard,
                                 const cv::Point & crownPoint,
                                 const cv::Point & chinPoint,
                                 const std::vector<std::string> & complianceCheckNames) const;
 
+    /*!@brief Checks every image against every catalogue standard and returns a JSON table with "columns"
+     * (imgKey, standardId, check, passed, value) and one row per image, standard and check, in that order. Faces
+     * are detected first for the images without landmarks, then the inputs of the checks, including the image
+     * statistics when a check reads them, are computed once per image and the images are checked in parallel on the
+     * OpenCV threads. The images and the standards that can't be checked are listed with the reason in "errors", under
+     * "imgKeys" and "standardIds" !*/
+    std::string checkComplianceBatch(const std::vector<std::string> & imageIds,
+                                     const std::vector<std::string> & standardIds,
+                                     const std::vector<std::string> & complianceCheckNames) const;
+
 private:
     IDetectorSPtr m_pFaceDetector;
     IDetectorSPtr m_pEyesDetector;
@@ -88,14 +157,42 @@ private:
 
     IPhotoPrintMakerSPtr m_pPhotoPrintMaker;
     IImageStoreSPtr m_pImageStore;
+    PhotoStandardCatalogueSPtr m_photoStandardCatalogue;
+    RenderCacheSPtr m_renderCache;
+
+    /*!@brief Shape predictor model and where the landmarks the engine reads are among the points it predicts !*/
+    struct PredictorProfile final
+    {
+        std::shared_ptr<const dlib::shape_predictor> model;
+        std::unordered_map<LandMarkType, std::vector<int>, EnumClassHash> landmarkIndexMapping;
+    };
 
     ConfigLoaderSPtr m_configLoader;
-    std::shared_ptr<dlib::shape_predictor> m_shapePredictor;
+    std::unordered_map<std::string, PredictorProfile> m_predictorProfiles; ///<- By profile name
 
-    std::unordered_map<LandMarkType, std::vector<int>, EnumClassHash> m_landmarkIndexMapping;
+    bool m_asyncLoading = false;
+    std::unordered_map<std::string, std::shared_future<void>> m_pendingLoads; ///<- Loads started by configure
+    std::shared_future<void> m_configuredNotification; ///<- Invokes the configure callback once loads complete
 
     void verifyImageExists(const std::string & imageKey) const;
 
-    cv::Point getLandMark(const std::vector<cv::Point> & landmarks, LandMarkType type) const;
+    /*!@brief Blocks until a component started loading by configure is ready, rethrows its loading error !*/
+    void waitForComponent(const std::string & componentName) const;
+
+    void waitForPendingLoads() const;
+
+    /*!@brief Inputs of the compliance checks of an image, with the pixel statistics of the stored image if
+     * withStatistics is true !*/
+    ComplianceInputs getComplianceInputs(const std::string & imageId,
+                                         const cv::Point & crownPoint,
+                                         const cv::Point & chinPoint,
+                                         bool withStatistics) const;
+
+    /*!@brief Waits for the profile's model to be loaded, throws if the profile is unknown or failed to load !*/
+    const PredictorProfile & getPredictorProfile(const std::string & profileName) const;
+
+    static cv::Point getLandMark(const PredictorProfile & profile,
+                                 const std::vector<cv::Point> & landmarks,
+                                 LandMarkType type);
 };
 } // namespace ppp
@@ -0,0 +1,97 @@
+#pragma once
+
+#include "CommonHelpers.h"
+#include "IConfigurable.h"
+
+#include <chrono>
+#include <cstdint>
+#include <list>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+
+#include <opencv2/core/core.hpp>
+
+namespace ppp
+{
+FWD_DECL(RenderCache)
+
+class PhotoStandard;
+class PrintDefinition;
+
+/*!@brief Counters describing how the render cache has been used so far !*/
+struct RenderCacheStats final
+{
+    size_t numEntries = 0; ///<- Outputs currently in the cache
+    size_t bytes = 0; ///<- Size of the outputs currently in the cache
+    size_t maxBytes = 0; ///<- Byte budget of the cache, zero when the cache is disabled
+    uint64_t hits = 0; ///<- Requests served from the cache
+    uint64_t misses = 0; ///<- Requests that had to be rendered
+    uint64_t evictions = 0; ///<- Outputs removed to keep the cache within its budget
+    uint64_t expirations = 0; ///<- Outputs removed because they were older than the time to live
+    uint64_t invalidations = 0; ///<- Outputs removed because their image left the image store
+};
+
+/*!@brief LRU cache of encoded print outputs.
+ *
+ * Users switch between layouts and back, and retries resubmit identical requests, so the same print is often
+ * rendered more than once. Outputs are keyed by the image key and the normalized request (the parsed standard and
+ * canvas, the crown and chin points and the output options), which makes requests that only differ in units or
+ * JSON formatting share an entry. The cache is kept within a byte budget and entries expire after a time to live.
+ * Entries of an image are dropped when the image is evicted from the image store. !*/
+class RenderCache final : NonCopyable, public IConfigurable
+{
+public:
+    /*!@brief Builds the cache key of a print request !*/
+    static std::string makeKey(const std::string & imageKey,
+                               const PhotoStandard & ps,
+                               const PrintDefinition & canvas,
+                               const cv::Point & crownPoint,
+                               const cv::Point & chinPoint,
+                               const std::string & options);
+
+    /*!@brief Copies the cached output to output and returns true when the key is in the cache and not expired !*/
+    bool get(const std::string & key, std::string & output);
+
+    /*!@brief Adds an output rendered from the image imageKey, evicting the least recently used ones as needed !*/
+    void put(const std::string & imageKey, const std::string & key, const std::string & output);
+
+    /*!@brief Drops all the outputs rendered from an image !*/
+    void invalidateImage(const std::string & imageKey);
+
+    /*!@brief Sets the byte budget (zero disables the cache) and the time to live of the entries !*/
+    void setLimits(size_t maxBytes, std::chrono::milliseconds timeToLive);
+
+    void clear();
+
+    RenderCacheStats getStats() const;
+
+protected:
+    void configureInternal(const ConfigLoaderSPtr & config) override;
+
+private:
+    using Clock = std::chrono::steady_clock;
+
+    struct Entry final
+    {
+        std::string imageKey;
+        std::string output;
+        Clock::time_point insertedAt;
+        std::list<std::string>::iterator lruPosition; ///<- Where in the usage order the key is located
+    };
+
+    std::unordered_map<std::string, Entry> m_entries;
+    std::list<std::string> m_lruKeys; ///<- Least recently used first
+
+    size_t m_maxBytes = 64 * 1024 * 1024;
+    std::chrono::milliseconds m_timeToLive { std::chrono::minutes(10) };
+
+    RenderCacheStats m_stats;
+
+    mutable std::mutex m_mutex;
+
+    void erase(std::unordered_map<std::string, Entry>::iterator it);
+
+    void shrinkToBudget();
+};
+} // namespace ppp
@@ -0,0 +1,130 @@
+#pragma once
+
+#include "CommonHelpers.h"
+
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <deque>
+#include <fstream>
+#include <mutex>
+#include <string>
+#include <vector>
+
+namespace ppp
+{
+FWD_DECL(ConfigLoader)
+
+/*!@brief A completed span as recorded in the trace buffer (Chrome "X" event) !*/
+struct TraceEvent final
+{
+    std::string name; ///<- Name of the span (e.g. "FaceDetector::rotation")
+    std::string category; ///<- Chrome trace category, the top level request name
+    uint64_t traceId; ///<- Identifier of the public request that produced this span
+    int64_t startUs; ///<- Start time in microseconds since the tracer was created
+    int64_t durationUs; ///<- Duration of the span in microseconds
+    uint64_t threadId; ///<- Hashed id of the thread where the span was recorded
+    std::string args; ///<- Optional free text annotation (e.g. the rotation angle)
+};
+
+/*!@brief Records nested spans for individual requests and exports them as Chrome Trace Event JSON.
+ * Tracing is disabled by default, in which case a span only costs an atomic load. !*/
+class Tracer final : NonCopyable
+{
+public:
+    static Tracer & instance();
+
+    /*!@brief Reads the optional "tracing" section of the configuration !*/
+    void configure(const ConfigLoaderSPtr & config);
+
+    void setEnabled(bool enabled);
+
+    bool isEnabled() const
+    {
+        return m_enabled.load(std::memory_order_relaxed);
+    }
+
+    /*!@brief Sets the maximum number of events kept in the ring buffer !*/
+    void setBufferSize(size_t bufferSize);
+
+    /*!@brief When not empty, the file is truncated and the events recorded from then on are appended to it each time a
+     * request completes. It stays valid Chrome Trace Event JSON between requests !*/
+    void setOutputFile(const std::string & outputFilePath);
+
+    /*!@brief Starts a new trace on the calling thread and returns its id !*/
+    uint64_t beginTrace(const std::string & requestName);
+
+    /*!@brief Finishes the trace active on the calling thread !*/
+    void endTrace();
+
+    /*!@brief Id of the trace active on the calling thread (0 when none) !*/
+    static uint64_t currentTraceId();
+
+    /*!@brief Id of the last trace started on the calling thread (0 when none) !*/
+    static uint64_t lastTraceId();
+
+    void record(TraceEvent && event);
+
+    /*!@brief Returns a copy of the buffered events, optionally only those of one trace !*/
+    std::vector<TraceEvent> events(uint64_t traceId = 0) const;
+
+    void clear();
+
+    /*!@brief Serializes the buffered events (all of them when traceId is 0) as Chrome Trace Event JSON !*/
+    std::string toJson(uint64_t traceId = 0) const;
+
+    int64_t nowUs() const;
+
+private:
+    Tracer();
+
+    std::atomic<bool> m_enabled { false };
+    std::atomic<uint64_t> m_nextTraceId { 1 };
+
+    const std::chrono::steady_clock::time_point m_origin;
+
+    size_t m_bufferSize = 4096;
+    std::deque<TraceEvent> m_events;
+    std::deque<TraceEvent> m_unwrittenEvents; ///<- Recorded since the last append to the output file
+    mutable std::mutex m_mutex;
+
+    std::string m_outputFilePath;
+    std::fstream m_outputStream;
+    size_t m_numWrittenEvents = 0;
+    std::mutex m_outputMutex; ///<- Taken before m_mutex when both are needed
+
+    /*!@brief Appends the unwritten events to the output file, the events are serialized without holding m_mutex !*/
+    void appendToOutputFile();
+};
+
+/*!@brief RAII span, records the time between its construction and destruction when tracing is enabled !*/
+class TraceSpan final : NonCopyable
+{
+public:
+    explicit TraceSpan(const char * name, std::string args = std::string());
+    ~TraceSpan();
+
+private:
+    const char * m_name;
+    std::string m_args;
+    int64_t m_startUs = -1;
+};
+
+/*!@brief RAII root span for a public request, starts a new trace id unless one is already active !*/
+class TraceRequest final : NonCopyable
+{
+public:
+    explicit TraceRequest(const char * requestName);
+    ~TraceRequest();
+
+private:
+    bool m_ownsTrace = false;
+    std::unique_ptr<TraceSpan> m_rootSpan;
+};
+} // namespace ppp
+
+#define PPP_TRACE_CONCAT_INNER(a, b) a##b
+#define PPP_TRACE_CONCAT(a, b) PPP_TRACE_CONCAT_INNER(a, b)
+
+#define TRACE_SPAN(...) const ppp::TraceSpan PPP_TRACE_CONCAT(traceSpan_, __LINE__)(__VA_ARGS__)
+#define TRACE_REQUEST(name) const ppp::TraceRequest PPP_TRACE_CONCAT(traceRequest_, __LINE__)(name)
@@ -58,6 +58,9 @@ public:
 
     static std::shared_ptr<cv::CascadeClassifier> loadClassifierFromBase64(const char * haarCascadeData);
 
+    /*!@brief Returns the XML definition of a cascade given as XML or as base64 encoded XML !*/
+    static std::string decodeClassifierDefinition(const char * haarCascadeData);
+
     /*!@brief Calculates CRC value for a buffer of specified length !*/
     static uint32_t crc32(uint32_t crc, const uint8_t * begin, const uint8_t * end);
 
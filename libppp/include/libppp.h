@@ -14,9 +14,33 @@
 #include <string>
 #include <vector>
 
+extern "C"
+{
+    struct ppp_point
+    {
+        int x;
+        int y;
+    };
+
+    /*!@brief Named landmarks in a fixed binary layout, points that were not detected are (0, 0) !*/
+    struct ppp_landmarks
+    {
+        ppp_point crownPoint;
+        ppp_point chinPoint;
+        ppp_point eyeLeftPupil;
+        ppp_point eyeRightPupil;
+        ppp_point lipLeftCorner;
+        ppp_point lipRightCorner;
+        ppp_point noseTip;
+        ppp_point eyeLeftCorner;
+        ppp_point eyeRightCorner;
+    };
+}
+
 namespace ppp
 {
 class PppEngine;
+class FrameSequence;
 
 /*!@brief Wrapper class for this lib.
 The purpose of this library is to decouple boost and opencv from the node add-on !*/
@@ -36,6 +60,11 @@ public:
 
     bool isConfigured() const;
 
+    /*!@brief Tells whether one engine component finished loading (see PppEngine::isConfigured) !*/
+    bool isConfigured(const std::string & componentName) const;
+
+    void waitUntilConfigured() const;
+
     /*!@brief Stores the image for processing
     *  param[in] bufferData Pointer to the image data
     *  param[in] bufferLength Length of the image data (if 0 or negative we assume it is base64 string)
@@ -50,7 +79,20 @@ public:
      */
     std::string getImage(const std::string & imageKey) const;
 
-    std::string detectLandmarks(const std::string & imageId) const;
+    /*!@brief Retrieves the image downscaled to fit in maxDimension (0 keeps the full size) and encoded as "png",
+    *  "jpeg" or "webp". Previews are cached with the image so repeated views don't encode it again
+    !*/
+    std::string getImagePreview(const std::string & imageKey, int maxDimension, const std::string & format) const;
+
+    /*!@brief Detects the landmarks with a shape predictor profile ("accurate" when empty, or e.g. "fast") and returns
+    *  them as a JSON object, empty if the image is unknown
+    !*/
+    std::string detectLandmarks(const std::string & imageId, const std::string & predictorProfile = "") const;
+
+    /*!@brief Detects the landmarks without serializing them: points receives the x, y coordinates of all the shape
+    *  predictor points. Returns false if the image is unknown or no face was detected
+    !*/
+    bool detectLandmarks(const std::string & imageId, std::vector<int> & points, ppp_landmarks & namedLandmarks) const;
 
     /*!@brief Creates a tiled print from input image, crown/chin points and passport/canvas definition
     *  Output definition is passed as a JSON string with the following format:
@@ -70,6 +112,7 @@ public:
     .       "faceHeight": 34,
     .       "units": "mm"
     .    },
+    .    "standardId": "us_passport_photo", // Instead of "standard", refers to the photo standard catalogue
     .    "crownPoint": {
     .       "x": 500,
     .       "y": 10
@@ -83,10 +126,69 @@ public:
     !*/
     std::string createTiledPrint(const std::string & imageId, const std::string & request) const;
 
+    /*!@brief Creates the tiled print without encoding it: the pixels (rows x cols x channels, 8 bits BGR as OpenCV)
+    *  are copied into the buffer when it is big enough and shape receives the dimensions.
+    *  returns The size of the image in bytes
+    !*/
+    size_t createTiledPrint(const std::string & imageId,
+                            const std::string & request,
+                            unsigned char * pixels,
+                            size_t pixelsSize,
+                            int shape[3]) const;
+
+    /*!@brief Runs the whole pipeline in one call: decodes and stores the image, detects the landmarks, then creates
+    *  the tiled print. The request has the same format as createTiledPrint's, crownPoint and chinPoint are optional
+    *  manual corrections (the detection is skipped when both are given) and predictorProfile optionally selects the
+    *  shape predictor profile used by the detection.
+    *  param[out] metadata JSON object with the imgKey, the detected landmarks and the time spent on each step
+    *  returns The tiled print encoded as PNG
+    !*/
+    std::string processPhoto(const char * bufferData,
+                             size_t bufferLength,
+                             const std::string & request,
+                             std::string & metadata) const;
+
     std::string checkCompliance(const std::string & request) const;
 
+    /*!@brief Checks many images against many standards of the catalogue in one call.
+    *  param[in] request JSON object with the "imgKeys", the catalogue "standardIds" and the "complianceChecks" names
+    *  returns JSON object with the "columns" and "rows" of the results table and the "errors" of the images and of
+    *  the standards that could not be checked, by "imgKeys" and "standardIds". Throws if a field is missing
+    !*/
+    std::string checkComplianceBatch(const std::string & request) const;
+
+    /*!@brief Returns the image store usage counters as a JSON object !*/
+    std::string getImageStoreStats() const;
+
+    /*!@brief Returns the usage counters of the cache of createTiledPrint outputs as a JSON object !*/
+    std::string getRenderCacheStats() const;
+
+    /*!@brief Starts a new sequence of frames (camera or video). The face is searched in the whole frame every
+    *  keyframeInterval frames or when it is lost, other frames only search it in a window searchWindowScale times the
+    *  size of the previous face
+    !*/
+    void startFrameSequence(int keyframeInterval, double searchWindowScale) const;
+
+    /*!@brief Detects the landmarks of the next frame of the sequence, the frame is not added to the image store
+    *  param[in] bufferData Pointer to the encoded frame (e.g. JPEG)
+    *  returns JSON object with "detected", "fullDetection", "latencyMs" and the "landmarks" when detected
+    !*/
+    std::string processFrame(const char * bufferData, size_t bufferLength) const;
+
+    /*!@brief Same as above for a frame given as pixels (rows x cols x channels, 8 bits BGR, BGRA or gray) !*/
+    std::string processFrame(const unsigned char * pixels, int rows, int cols, int channels) const;
+
+    /*!@brief Processes the frames of a video file as a new sequence.
+    *  returns JSON object with the sequence "stats" and the results of the "frames" (crown and chin points only)
+    !*/
+    std::string processVideo(const std::string & videoFilePath) const;
+
+    /*!@brief Returns the frame sequence counters, including the fraction of frames that needed a full detection !*/
+    std::string getFrameSequenceStats() const;
+
 private:
     PppEngine * m_pPppEngine;
+    FrameSequence * m_pFrameSequence;
 };
 } // namespace ppp
 
@@ -96,11 +198,91 @@ extern "C"
 
     int get_image(const char * img_id, char * out_buf);
 
+    /*!@brief Copies the stored image downscaled to fit in max_dimension (0 keeps its size) and encoded in format to
+     * out_buf. Returns the size of the encoded image, minus the required buffer size if out_buf is too small, 0 on
+     * failure !*/
+    int get_image_preview(const char * img_id, int max_dimension, const char * format, char * out_buf, int out_buf_size);
+
     bool configure(const char * config_json, int callback);
 
     bool is_configured();
 
+    /*!@brief Tells whether one component (e.g. "shapePredictor", "faceDetector", "photoPrintMaker") finished
+     * loading. Models load in the background after configure returns !*/
+    bool is_component_configured(const char * component_name);
+
+    /*!@brief Blocks until all the components are loaded, returns false if one of them failed to load !*/
+    bool wait_until_configured();
+
     bool detect_landmarks(const char * img_id, char * landmarks);
 
+    bool detect_landmarks_with_profile(const char * img_id, const char * predictor_profile, char * landmarks);
+
     int create_tiled_print(const char * img_id, const char * request, char * out_buf);
+
+    /*!@brief Detects the landmarks and copies up to max_points (x, y) pairs to points and the named ones to
+     * named_landmarks. Returns the number of points detected, -1 on failure !*/
+    int detect_landmarks_array(const char * img_id, int * points, int max_points, ppp_landmarks * named_landmarks);
+
+    /*!@brief Copies the raw BGR pixels of the tiled print to pixels and its (rows, cols, channels) to shape.
+     * Returns the number of bytes written, minus the required buffer size if pixels is too small, 0 on failure !*/
+    int create_tiled_print_array(const char * img_id,
+                                 const char * request,
+                                 unsigned char * pixels,
+                                 int pixels_size,
+                                 int * shape);
+
+    /*!@brief Creates the tiled print of an image in one call (see PublicPppEngine::processPhoto). metadata_size holds
+     * the size of the metadata buffer and is set to the size the metadata JSON string needs. Returns the size of the
+     * PNG written to out_buf, minus the required out_buf size if out_buf or metadata is too small, 0 on failure !*/
+    int process_photo(const char * img_buf,
+                      int img_buf_size,
+                      const char * request,
+                      char * out_buf,
+                      int out_buf_size,
+                      char * metadata,
+                      int * metadata_size);
+
+    /*!@brief Checks images against catalogue standards (see PublicPppEngine::checkComplianceBatch) and copies the
+     * results JSON to out_buf. Returns the length of the JSON string, or minus the required buffer size if out_buf is
+     * too small, 0 on failure !*/
+    int check_compliance_batch(const char * request, char * out_buf, int out_buf_size);
+
+    bool get_image_store_stats(char * stats_json);
+
+    bool get_render_cache_stats(char * stats_json);
+
+    bool start_frame_sequence(int keyframe_interval, double search_window_scale);
+
+    bool process_frame(const char * img_buf, int img_buf_size, char * result_json);
+
+    bool process_frame_pixels(const unsigned char * pixels, int rows, int cols, int channels, char * result_json);
+
+    /*!@brief Processes a video file as a new frame sequence and copies the results JSON to out_buf.
+     * Returns the length of the JSON string, or minus the required buffer size if out_buf is too small !*/
+    int process_video(const char * video_path, char * out_buf, int out_buf_size);
+
+    bool get_frame_sequence_stats(char * stats_json);
+
+    void set_tracing_enabled(bool enabled);
+
+    /*!@brief Returns the trace id of the last public call made on the calling thread (0 if tracing is disabled) !*/
+    unsigned long long get_last_trace_id();
+
+    /*!@brief Copies the Chrome Trace Event JSON of one trace (all buffered traces when trace_id is 0) to out_buf.
+     * Returns the length of the JSON string, or minus the required buffer size if out_buf is too small !*/
+    int get_trace(unsigned long long trace_id, char * out_buf, int out_buf_size);
+
+    /*!@brief Sets the minimum level of the records kept by the logger (trace, debug, info, warning, error or off) !*/
+    bool set_log_level(const char * level);
+
+    /*!@brief Drains the oldest buffered log records that fit in out_buf as a JSON array.
+     * Returns the length of the JSON string, "[]" means there is nothing left to read !*/
+    int get_log_records(char * out_buf, int out_buf_size);
+
+    /*!@brief Sets the number of threads OpenCV may use inside each call, for the whole process. 1 runs every call on
+     * the calling thread, 0 or less restores the default of one thread per core !*/
+    bool set_num_threads(int num_threads);
+
+    int get_num_threads();
 }
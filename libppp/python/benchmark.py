@@ -0,0 +1,461 @@
+"""
+End to end benchmark of libppp driven through libpppwrapper.
+
+Produces the same JSON report as the native ppp_benchmark executable so
+reports from both drivers can be compared against a saved baseline.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    import libpppwrapper as ppp
+except (OSError, AttributeError):
+    # Comparing saved reports does not need the native library
+    ppp = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+TILED_PRINT_REQUEST = {
+    'canvas': {
+        'height': 4.0,
+        'width': 6.0,
+        'resolution': 300,
+        'units': 'inch'
+    },
+    'standard': {
+        'pictureWidth': 2.0,
+        'pictureHeight': 2.0,
+        'faceHeight': 1.1875,
+        'units': 'inch'
+    }
+}
+
+
+def load_workload(image_dirs, scales, max_images):
+    """
+    Reads the images from each directory and re-encodes them at every scale.
+    Returns a list of (image_name, scale, encoded_bytes)
+    """
+    if cv2 is None and any(s != 1.0 for s in scales):
+        print('OpenCV for python is not available, only benchmarking scale 1.0', file=sys.stderr)
+        scales = [1.0]
+
+    workload = []
+    for image_dir in image_dirs:
+        image_dir = ppp.resolve_filepath(image_dir) if not os.path.isdir(image_dir) else image_dir
+        if not image_dir or not os.path.isdir(image_dir):
+            print('Skipping missing image directory %s' % image_dir, file=sys.stderr)
+            continue
+        image_files = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for image_file in image_files[:max_images]:
+            image_path = os.path.join(image_dir, image_file)
+            if cv2 is None:
+                with open(image_path, 'rb') as fp:
+                    workload.append((image_file, 1.0, fp.read()))
+                continue
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            for scale in scales:
+                scaled = image
+                if scale != 1.0:
+                    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                    scaled = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+                _, encoded = cv2.imencode('.jpg', scaled, [cv2.IMWRITE_JPEG_QUALITY, 95])
+                workload.append((image_file, scale, encoded.tobytes()))
+    return workload
+
+
+def collect_stages(trace_ids):
+    """
+    Returns the duration of the spans (in ms) of the traced calls, summed by span name
+    """
+    stages = {}
+    for trace_id in trace_ids:
+        trace = json.loads(ppp.get_trace(trace_id))
+        for event in trace['traceEvents']:
+            # The root span of each call is named after the call itself
+            if event['name'] == event['cat']:
+                continue
+            stages[event['name']] = stages.get(event['name'], 0.0) + event['dur'] / 1000.0
+    return stages
+
+
+def process_image(encoded_image, trace_ids=None):
+    """
+    Runs the full pipeline (decode, detect, crop, tile, encode) on one image. The ids
+    of the traces of the calls are appended to trace_ids, reading the traces is left
+    to the caller so that it isn't timed
+    """
+    img_key = ppp.set_image(encoded_image)
+    if trace_ids is not None:
+        trace_ids.append(ppp.last_trace_id())
+    if not img_key:
+        return False
+
+    landmarks = ppp.detect_landmarks(img_key)
+    if trace_ids is not None:
+        trace_ids.append(ppp.last_trace_id())
+    if not landmarks:
+        return False
+
+    lm = json.loads(landmarks)
+    request = dict(TILED_PRINT_REQUEST, crownPoint=lm['crownPoint'], chinPoint=lm['chinPoint'])
+    png_content = ppp.create_tiled_print(img_key, request)
+    if trace_ids is not None:
+        trace_ids.append(ppp.last_trace_id())
+    return len(png_content) > 0
+
+
+def percentile(values, p):
+    """
+    Nearest rank percentile
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = int(math.ceil(p / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def latency_stats(values):
+    """
+    """
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else 0.0
+    }
+
+
+def measure_latency(workload):
+    """
+    Processes the images one at a time with tracing enabled and returns the
+    per scale end to end and per stage latencies
+    """
+    samples = {}
+    ppp.enable_tracing()
+    for _, scale, encoded_image in workload:
+        trace_ids = []
+        start = time.perf_counter()
+        success = process_image(encoded_image, trace_ids)
+        total_ms = (time.perf_counter() - start) * 1000.0
+        # Read before the next image pushes these traces out of the ring buffer
+        samples.setdefault(scale, []).append((success, total_ms, collect_stages(trace_ids)))
+    ppp.disable_tracing()
+
+    resolutions = {}
+    for scale, scale_samples in sorted(samples.items()):
+        stages = {}
+        for _, _, sample_stages in scale_samples:
+            for name, duration in sample_stages.items():
+                stages.setdefault(name, []).append(duration)
+        resolutions['%.2f' % scale] = {
+            'endToEnd': latency_stats([s[1] for s in scale_samples]),
+            'stages': {name: latency_stats(durations) for name, durations in sorted(stages.items())},
+            'failures': sum(1 for s in scale_samples if not s[0])
+        }
+    return resolutions
+
+
+def _init_worker(config_file, barrier, num_threads):
+    if not ppp.configure(config_file) or not ppp.wait_until_configured():
+        raise RuntimeError('Unable to configure libppp from %s' % config_file)
+    if num_threads is not None:
+        ppp.set_num_threads(num_threads)
+    barrier.wait()
+
+
+def _process_worker_image(encoded_image):
+    return process_image(encoded_image)
+
+
+def measure_throughput(config_file, workload, num_processes, iterations, num_threads=None):
+    """
+    Images per second processed by num_processes worker processes, each with its own engine
+    using num_threads OpenCV threads (OpenCV's default of one per core if None)
+    """
+    images = [item[2] for item in workload] * iterations
+    with multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(num_processes + 1)
+        with multiprocessing.Pool(num_processes, _init_worker, (config_file, barrier, num_threads)) as pool:
+            # Start the clock once every worker has loaded the models of its engine
+            barrier.wait()
+            start = time.perf_counter()
+            pool.map(_process_worker_image, images, chunksize=1)
+            elapsed = time.perf_counter() - start
+    return len(images) / elapsed
+
+
+def thread_splits(num_cores):
+    """
+    The ways of sharing num_cores between worker processes and OpenCV threads per worker
+    as (workers, threads) pairs, from one worker using every core to one thread per worker
+    """
+    return [(workers, num_cores // workers) for workers in range(1, num_cores + 1) if num_cores % workers == 0]
+
+
+def measure_thread_splits(config_file, workload, num_cores, iterations):
+    """
+    Images per second for every split of num_cores between workers and threads. Each split
+    is also measured with the workers keeping OpenCV's default thread count, where the
+    workers together run up to num_cores threads each and oversubscribe the cores
+    """
+    result = {}
+    for workers, threads in thread_splits(num_cores):
+        result['%dx%d' % (workers, threads)] = measure_throughput(config_file, workload, workers, iterations,
+                                                                  threads)
+        result['%dxdefault' % workers] = measure_throughput(config_file, workload, workers, iterations)
+        print('%3d workers: %.2f images/s with %d threads each, %.2f images/s with the default'
+              % (workers, result['%dx%d' % (workers, threads)], threads, result['%dxdefault' % workers]),
+              file=sys.stderr)
+    return result
+
+
+def memory_usage_kb():
+    """
+    Resident (rss), proportional (pss) and unique (uss) set sizes of this process in KB.
+    PSS splits shared pages between the processes mapping them, it is what each worker
+    really costs. Only available on Linux, returns None elsewhere
+    """
+    usage = {'rss': 0, 'pss': 0, 'uss': 0}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as fp:
+            for line in fp:
+                fields = line.split()
+                if fields[0] == 'Rss:':
+                    usage['rss'] = int(fields[1])
+                elif fields[0] == 'Pss:':
+                    usage['pss'] = int(fields[1])
+                elif fields[0] in ('Private_Clean:', 'Private_Dirty:'):
+                    usage['uss'] += int(fields[1])
+    except (IOError, OSError):
+        return None
+    return usage
+
+
+def _configure_worker(config_file):
+    if not ppp.configure(config_file) or not ppp.wait_until_configured():
+        raise RuntimeError('Unable to configure libppp from %s' % config_file)
+
+
+def _worker_memory(args):
+    encoded_image, barrier = args
+    # Touch the models like a real request would, then wait until every worker did the same
+    process_image(encoded_image)
+    barrier.wait()
+    return memory_usage_kb()
+
+
+def measure_memory(config_file, workload, num_processes):
+    """
+    Memory used per worker process when each worker loads its own models, and when the
+    models are loaded once then shared by forking (libpppwrapper.warm_then_fork)
+    """
+    encoded_image = workload[0][2]
+
+    def independent_pool():
+        return multiprocessing.get_context('spawn').Pool(num_processes, _configure_worker, (config_file,))
+
+    pools = {'independent': independent_pool}
+    if hasattr(os, 'fork'):
+        pools['warmThenFork'] = lambda: ppp.warm_then_fork(config_file, num_processes)
+
+    result = {}
+    with multiprocessing.Manager() as manager:
+        for name, create_pool in pools.items():
+            barrier = manager.Barrier(num_processes)
+            with create_pool() as pool:
+                # Each task blocks on the barrier, so every worker reports exactly once
+                usages = pool.map(_worker_memory, [(encoded_image, barrier)] * num_processes, chunksize=1)
+            if any(u is None for u in usages):
+                print('Memory usage per process is not available on this platform', file=sys.stderr)
+                return {}
+            result[name] = {
+                'workers': num_processes,
+                'totalPssKb': sum(u['pss'] for u in usages),
+                'pssKbPerWorker': sum(u['pss'] for u in usages) // num_processes,
+                'ussKbPerWorker': sum(u['uss'] for u in usages) // num_processes,
+                'rssKbPerWorker': sum(u['rss'] for u in usages) // num_processes
+            }
+    return result
+
+
+def peak_rss_kb():
+    """
+    Peak resident set size of this process and its (finished) worker processes
+    """
+    if resource is None:
+        return 0
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def compare_reports(baseline, report, tolerance):
+    """
+    Compares latencies (lower is better) and throughput (higher is better) of
+    two reports. Returns the list of metrics that regressed by more than tolerance
+    """
+    regressions = []
+
+    def check(metric, base_value, new_value, lower_is_better):
+        if base_value <= 0:
+            return
+        change = (new_value - base_value) / base_value
+        regressed = change > tolerance if lower_is_better else -change > tolerance
+        print('%s %s: %.3f -> %.3f (%+.1f%%)' % ('REGRESSION' if regressed else 'ok        ',
+                                                   metric, base_value, new_value, change * 100))
+        if regressed:
+            regressions.append(metric)
+
+    for scale, res in report['resolutions'].items():
+        base_res = baseline['resolutions'].get(scale)
+        if not base_res:
+            continue
+        for p in ('p50', 'p95', 'p99'):
+            check('scale %s endToEnd.%s' % (scale, p), base_res['endToEnd'][p], res['endToEnd'][p], True)
+        for stage, stats in res['stages'].items():
+            base_stage = base_res['stages'].get(stage)
+            if base_stage:
+                for p in ('p50', 'p95'):
+                    check('scale %s %s.%s' % (scale, stage, p), base_stage[p], stats[p], True)
+
+    for num_threads, images_per_second in report['throughput'].items():
+        if num_threads in baseline['throughput']:
+            check('imagesPerSecond@%s threads' % num_threads, baseline['throughput'][num_threads],
+                  images_per_second, False)
+
+    for split, images_per_second in report.get('threadSplits', {}).items():
+        if split in baseline.get('threadSplits', {}):
+            check('imagesPerSecond@%s workers x threads' % split, baseline['threadSplits'][split],
+                  images_per_second, False)
+    return regressions
+
+
+def run(args):
+    """
+    Runs the benchmark and returns the report
+    """
+    config_file = ppp.resolve_filepath(args.config) if not os.path.isfile(args.config) else args.config
+    scales = [float(s) for s in args.scales.split(',')]
+    workload = load_workload(args.image_dir or ['research/faces_caltech', 'research/sample_test_images'],
+                             scales, args.max_images)
+    if not workload:
+        raise RuntimeError('No input images were found')
+
+    if not ppp.configure(config_file) or not ppp.wait_until_configured():
+        raise RuntimeError('Unable to configure libppp from %s' % config_file)
+
+    resolutions = measure_latency(workload)
+    image_store = ppp.get_image_store_stats()
+
+    throughput = {}
+    for num_processes in range(1, args.threads + 1):
+        throughput[str(num_processes)] = measure_throughput(config_file, workload, num_processes, args.iterations)
+
+    return {
+        'settings': {
+            'driver': 'libpppwrapper',
+            'numImages': len(workload),
+            'scales': args.scales,
+            'iterations': args.iterations
+        },
+        'resolutions': resolutions,
+        'throughput': throughput,
+        'peakRssKb': peak_rss_kb(),
+        'imageStore': image_store
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-c', '--config', default='config.json', help='Engine configuration file')
+    parser.add_argument('-d', '--image-dir', action='append', help='Directory with input images (can be repeated)')
+    parser.add_argument('-s', '--scales', default='0.5,1.0', help='Comma separated input image scale factors')
+    parser.add_argument('-n', '--max-images', type=int, default=50,
+                        help='Maximum number of images taken from each directory')
+    parser.add_argument('-t', '--threads', type=int,
+                        default=ppp.available_cores() if ppp else multiprocessing.cpu_count(),
+                        help='Measure throughput from 1 up to this number of worker processes')
+    parser.add_argument('-i', '--iterations', type=int, default=1,
+                        help='Passes over the workload when measuring throughput')
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file')
+    parser.add_argument('-b', '--baseline', help='Compare against a previously saved JSON report')
+    parser.add_argument('--compare', help='Compare this saved report against --baseline instead of running')
+    parser.add_argument('--memory', type=int, metavar='N',
+                        help='Only measure the memory used per worker with N worker processes, '
+                             'loading the models in each worker and sharing them through warm_then_fork')
+    parser.add_argument('--thread-splits', type=int, metavar='CORES',
+                        help='Only measure throughput for every split of CORES between worker processes '
+                             'and OpenCV threads per worker')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Relative change tolerated before flagging a regression')
+    args = parser.parse_args()
+
+    if args.memory:
+        config_file = ppp.resolve_filepath(args.config) if not os.path.isfile(args.config) else args.config
+        workload = load_workload(args.image_dir or ['research/sample_test_images'], [1.0], 1)
+        if not workload:
+            print('No input images were found', file=sys.stderr)
+            return 1
+        print(json.dumps({'memory': measure_memory(config_file, workload, args.memory)}, indent=4))
+        return 0
+
+    if args.thread_splits:
+        config_file = ppp.resolve_filepath(args.config) if not os.path.isfile(args.config) else args.config
+        workload = load_workload(args.image_dir or ['research/faces_caltech', 'research/sample_test_images'],
+                                 [float(s) for s in args.scales.split(',')], args.max_images)
+        if not workload:
+            print('No input images were found', file=sys.stderr)
+            return 1
+        splits = measure_thread_splits(config_file, workload, args.thread_splits, args.iterations)
+        print(json.dumps({'threadSplits': splits}, indent=4))
+        return 0
+
+    if args.compare:
+        report = read_report(args.compare)
+    else:
+        report = run(args)
+        report_json = json.dumps(report, indent=4)
+        if args.output:
+            with open(args.output, 'w') as fp:
+                fp.write(report_json)
+        else:
+            print(report_json)
+
+    if args.baseline:
+        regressions = compare_reports(read_report(args.baseline), report, args.tolerance)
+        return 2 if regressions else 0
+    return 0
+
+
+def read_report(report_file):
+    """
+    """
+    with open(report_file, 'r') as fp:
+        return json.load(fp)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
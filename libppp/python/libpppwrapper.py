@@ -1,8 +1,15 @@
 import os
 import sys
 import json
+import multiprocessing
+import concurrent.futures
 from ctypes import *
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Only needed by the *_array functions
+
 if sys.platform == "linux" or sys.platform == "linux2":
     libfile = 'liblibppp.so'
 elif sys.platform == "darwin":
@@ -32,15 +39,95 @@ libppp = cdll.LoadLibrary(libfilepath)
 libppp.configure.restype = bool
 libppp.configure.argtypes = [c_char_p]
 
+libppp.is_configured.restype = bool
+libppp.is_configured.argtypes = []
+
+libppp.is_component_configured.restype = bool
+libppp.is_component_configured.argtypes = [c_char_p]
+
+libppp.wait_until_configured.restype = bool
+libppp.wait_until_configured.argtypes = []
+
 libppp.set_image.restype = bool
 libppp.set_image.argtypes = [c_char_p, c_int, c_char_p]
 
+libppp.get_image_preview.restype = int
+libppp.get_image_preview.argtypes = [c_char_p, c_int, c_char_p, c_char_p, c_int]
+
 libppp.detect_landmarks.restype = bool
 libppp.detect_landmarks.argtypes = [c_char_p, c_char_p]
 
+libppp.detect_landmarks_with_profile.restype = bool
+libppp.detect_landmarks_with_profile.argtypes = [c_char_p, c_char_p, c_char_p]
+
 libppp.create_tiled_print.restype = int
 libppp.create_tiled_print.argtypes = [c_char_p, c_char_p, c_char_p]
 
+libppp.process_photo.restype = int
+libppp.process_photo.argtypes = [c_char_p, c_int, c_char_p, c_char_p, c_int, c_char_p, POINTER(c_int)]
+
+NAMED_LANDMARKS = ['crownPoint', 'chinPoint', 'eyeLeftPupil', 'eyeRightPupil', 'lipLeftCorner', 'lipRightCorner',
+                   'noseTip', 'eyeLeftCorner', 'eyeRightCorner']
+
+
+class PppLandmarks(Structure):
+    """
+    Mirrors ppp_landmarks, the (x, y) of each named landmark
+    """
+    _fields_ = [(name, c_int * 2) for name in NAMED_LANDMARKS]
+
+
+libppp.detect_landmarks_array.restype = int
+libppp.detect_landmarks_array.argtypes = [c_char_p, POINTER(c_int), c_int, POINTER(PppLandmarks)]
+
+libppp.create_tiled_print_array.restype = int
+libppp.create_tiled_print_array.argtypes = [c_char_p, c_char_p, c_void_p, c_int, POINTER(c_int)]
+
+libppp.check_compliance_batch.restype = int
+libppp.check_compliance_batch.argtypes = [c_char_p, c_char_p, c_int]
+
+libppp.get_image_store_stats.restype = bool
+libppp.get_image_store_stats.argtypes = [c_char_p]
+
+libppp.get_render_cache_stats.restype = bool
+libppp.get_render_cache_stats.argtypes = [c_char_p]
+
+libppp.start_frame_sequence.restype = bool
+libppp.start_frame_sequence.argtypes = [c_int, c_double]
+
+libppp.process_frame.restype = bool
+libppp.process_frame.argtypes = [c_char_p, c_int, c_char_p]
+
+libppp.process_frame_pixels.restype = bool
+libppp.process_frame_pixels.argtypes = [c_void_p, c_int, c_int, c_int, c_char_p]
+
+libppp.process_video.restype = c_int
+libppp.process_video.argtypes = [c_char_p, c_char_p, c_int]
+
+libppp.get_frame_sequence_stats.restype = bool
+libppp.get_frame_sequence_stats.argtypes = [c_char_p]
+
+libppp.set_tracing_enabled.restype = None
+libppp.set_tracing_enabled.argtypes = [c_bool]
+
+libppp.get_last_trace_id.restype = c_ulonglong
+libppp.get_last_trace_id.argtypes = []
+
+libppp.get_trace.restype = int
+libppp.get_trace.argtypes = [c_ulonglong, c_char_p, c_int]
+
+libppp.set_log_level.restype = bool
+libppp.set_log_level.argtypes = [c_char_p]
+
+libppp.get_log_records.restype = int
+libppp.get_log_records.argtypes = [c_char_p, c_int]
+
+libppp.set_num_threads.restype = bool
+libppp.set_num_threads.argtypes = [c_int]
+
+libppp.get_num_threads.restype = c_int
+libppp.get_num_threads.argtypes = []
+
 def str2bytes(string):
     return bytes(string, 'ascii')
 
@@ -49,9 +136,98 @@ def configure(config_file):
     """
     with open(config_file, 'rb') as fp:
         cfg = fp.read()
+    if cfg.startswith(b'PPPBNDL1'):
+        # Binary bundles are memory mapped by libppp from their path
+        return libppp.configure(str2bytes(os.path.abspath(config_file)))
     return libppp.configure(cfg)
 
 
+def is_configured(component=None):
+    """
+    Tells whether libppp finished loading all its components, or only the given one
+    (e.g. 'shapePredictor', 'faceDetector', 'photoPrintMaker'). Models load in the
+    background after configure returns, calls wait for the components they need
+    """
+    if component is None:
+        return libppp.is_configured()
+    return libppp.is_component_configured(str2bytes(component))
+
+
+def wait_until_configured():
+    """
+    Blocks until all the components are loaded, returns False if one of them failed to load
+    """
+    return libppp.wait_until_configured()
+
+
+def set_num_threads(num_threads):
+    """
+    Sets the number of threads OpenCV may use inside each libppp call, for the whole process.
+    1 runs every call on the calling thread, 0 restores the default of one thread per core
+    """
+    return libppp.set_num_threads(num_threads)
+
+
+def get_num_threads():
+    """
+    """
+    return libppp.get_num_threads()
+
+
+def available_cores():
+    """
+    Number of cores this process may run on. Unlike cpu_count, it honours the CPU affinity
+    and the cpuset of the container where available
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+def threads_per_worker(num_workers):
+    """
+    Share of the cores each of num_workers worker processes gets, so that their OpenCV
+    threads together do not outnumber the cores
+    """
+    return max(1, available_cores() // max(1, num_workers))
+
+
+def _init_forked_worker(num_threads, initializer, initargs):
+    set_num_threads(num_threads)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def warm_then_fork(config_file, num_workers, initializer=None, initargs=(), num_threads=None):
+    """
+    Configures libppp in this process, then forks a pool of num_workers processes that
+    inherit the loaded models. The model pages are shared copy-on-write by all workers
+    instead of being loaded and held once per worker. Workers must not call configure again.
+    Each worker uses num_threads OpenCV threads, by default its share of the cores.
+    Requires fork (Linux, macOS) and should be called before this process starts any thread
+    """
+    # Fork once every model is loaded so the workers don't each load their own
+    if not configure(config_file) or not wait_until_configured():
+        raise RuntimeError('Unable to configure libppp from %s' % config_file)
+    if num_threads is None:
+        num_threads = threads_per_worker(num_workers)
+    context = multiprocessing.get_context('fork')
+    return context.Pool(num_workers, _init_forked_worker, (num_threads, initializer, initargs))
+
+
+def fork_executor(num_workers, initializer=None, initargs=(), num_threads=None):
+    """
+    Forks a concurrent.futures.ProcessPoolExecutor of num_workers processes from this process,
+    which must be configured already (see warm_then_fork). Unlike a multiprocessing pool, the
+    executor fails the pending tasks with BrokenProcessPool when a worker dies, instead of
+    waiting for them forever, and a new executor can be forked without configuring again
+    """
+    if num_threads is None:
+        num_threads = threads_per_worker(num_workers)
+    return concurrent.futures.ProcessPoolExecutor(num_workers, multiprocessing.get_context('fork'),
+                                                  _init_forked_worker, (num_threads, initializer, initargs))
+
+
 def set_image(img_content):
     """
     """
@@ -63,20 +239,43 @@ def set_image(img_content):
         pass
 
     img_content_len = len(img_content)
-    img_key = create_string_buffer(16)
-    success = libppp.set_image(img_content, img_content_len, img_key)
+    img_metadata = create_string_buffer(65535)
+    success = libppp.set_image(img_content, img_content_len, img_metadata)
     if success:
-        return img_key.value
+        return json.loads(img_metadata.value)['imgKey']
     return None
 
 
-def detect_landmarks(img_key):
+def get_image_preview(img_key, max_dimension=1024, img_format='jpeg'):
     """
+    Returns the stored image downscaled to fit in max_dimension and encoded as 'png', 'jpeg'
+    or 'webp', None if the image is not in the store
+    """
+    buf_size = 4*1024*1024
+    while True:
+        preview = create_string_buffer(buf_size)
+        num_bytes = libppp.get_image_preview(str2bytes(img_key), max_dimension, str2bytes(img_format), preview,
+                                             buf_size)
+        if num_bytes > 0:
+            return preview.raw[0:num_bytes]
+        if num_bytes == 0:
+            return None
+        # The encoded image is bigger than the buffer, the preview is cached so encoding it again is cheap
+        buf_size = -num_bytes
+
+
+def detect_landmarks(img_key, predictor_profile=None):
+    """
+    Detects the landmarks, optionally with a shape predictor profile declared in the
+    configuration (e.g. 'fast'), and returns them as JSON. Returns None on failure
     """
     assert img_key and isinstance(img_key, str), 'Invalid image key'
 
     landmarks = create_string_buffer(65535)
-    success = libppp.detect_landmarks(str2bytes(img_key), landmarks)
+    if predictor_profile:
+        success = libppp.detect_landmarks_with_profile(str2bytes(img_key), str2bytes(predictor_profile), landmarks)
+    else:
+        success = libppp.detect_landmarks(str2bytes(img_key), landmarks)
     if success:
         return landmarks.value
     return None
@@ -95,6 +294,224 @@ def create_tiled_print(img_key, request):
     return png_d
 
 
+def detect_landmarks_array(img_key, max_points=128):
+    """
+    Detects the landmarks and returns them as NumPy arrays: all the points as an (N, 2) int32
+    array and the named landmarks as an int32 record with one (x, y) field per NAMED_LANDMARKS
+    entry. Returns (None, None) if no face was detected
+    """
+    points = np.empty((max_points, 2), dtype=np.int32)
+    named = PppLandmarks()
+    num_points = libppp.detect_landmarks_array(str2bytes(img_key), points.ctypes.data_as(POINTER(c_int)),
+                                               max_points, byref(named))
+    if num_points < 0:
+        return None, None
+    if num_points > max_points:
+        return detect_landmarks_array(img_key, num_points)
+    named_dtype = np.dtype([(name, np.int32, (2,)) for name in NAMED_LANDMARKS])
+    return points[:num_points], np.frombuffer(bytearray(named), dtype=named_dtype)[0]
+
+
+def create_tiled_print_array(img_key, request, buffer_size=32*1024*1024):
+    """
+    Creates the tiled print and returns its pixels as a HxWx3 uint8 array (BGR, as OpenCV),
+    without encoding it. Returns None on failure
+    """
+    if not isinstance(request, str):
+        request = json.dumps(request)
+
+    pixels = np.empty(buffer_size, dtype=np.uint8)
+    shape = (c_int * 3)()
+    num_bytes = libppp.create_tiled_print_array(str2bytes(img_key), str2bytes(request), pixels.ctypes.data,
+                                                buffer_size, shape)
+    if num_bytes < 0:
+        # The print is bigger than expected, render it again in a buffer of the right size
+        return create_tiled_print_array(img_key, request, -num_bytes)
+    if num_bytes == 0:
+        return None
+    return pixels[:num_bytes].reshape(shape[0], shape[1], shape[2])
+
+
+def process_photo(img_content, request):
+    """
+    Creates the tiled print of an image (file path or encoded bytes) in a single call.
+    The request holds the 'canvas', the 'standard' or a catalogue 'standardId', and optionally
+    'crownPoint'/'chinPoint' to correct the detection. Returns the PNG content and a dictionary
+    with the 'imgKey', the detected 'landmarks' and the 'timings' of each step, or (None, None)
+    """
+    if not isinstance(img_content, bytes) and os.path.isfile(img_content):
+        with open(img_content, 'rb') as fp:
+            img_content = fp.read()
+    if not isinstance(request, str):
+        request = json.dumps(request)
+
+    buf_size = 8*1024*1024
+    metadata_size = c_int(65535)
+    while True:
+        png_content = create_string_buffer(buf_size)
+        metadata = create_string_buffer(metadata_size.value)
+        num_bytes = libppp.process_photo(img_content, len(img_content), str2bytes(request), png_content, buf_size,
+                                         metadata, byref(metadata_size))
+        if num_bytes > 0:
+            return png_content.raw[0:num_bytes], json.loads(metadata.value)
+        if num_bytes == 0:
+            return None, None
+        # A buffer was too small, process the photo again with buffers of the required sizes
+        buf_size = max(buf_size, -num_bytes)
+
+
+def check_compliance_batch(img_keys, standard_ids, check_names):
+    """
+    Checks every image against every standard of the catalogue with the named checks. Returns a
+    dictionary with the 'columns' (imgKey, standardId, check, passed, value) and 'rows' of the
+    results table, and the 'errors' of the 'imgKeys' and 'standardIds' that could not be checked.
+    None on failure
+    """
+    request = json.dumps({'imgKeys': list(img_keys), 'standardIds': list(standard_ids),
+                          'complianceChecks': list(check_names)})
+    buf_size = 1024*1024
+    while True:
+        results = create_string_buffer(buf_size)
+        num_bytes = libppp.check_compliance_batch(str2bytes(request), results, buf_size)
+        if num_bytes > 0:
+            return json.loads(results.value)
+        if num_bytes == 0:
+            return None
+        buf_size = -num_bytes
+
+
+def get_image_store_stats():
+    """
+    Returns the image store usage counters as a dictionary
+    """
+    stats = create_string_buffer(4096)
+    if libppp.get_image_store_stats(stats):
+        return json.loads(stats.value)
+    return None
+
+
+def get_render_cache_stats():
+    """
+    Returns the usage counters of the cache of tiled print outputs as a dictionary
+    """
+    stats = create_string_buffer(4096)
+    if libppp.get_render_cache_stats(stats):
+        return json.loads(stats.value)
+    return None
+
+
+def start_frame_sequence(keyframe_interval=30, search_window_scale=2.0):
+    """
+    Starts a new sequence of camera or video frames. The face is searched in the whole frame every
+    keyframe_interval frames or when it is lost, otherwise around its position in the previous frame
+    """
+    return libppp.start_frame_sequence(keyframe_interval, search_window_scale)
+
+
+def process_frame(frame):
+    """
+    Detects the landmarks of the next frame of the sequence, given as encoded bytes or as a HxW(xC)
+    uint8 array (BGR, BGRA or gray). Returns a dictionary with 'detected', 'fullDetection',
+    'latencyMs' and the 'landmarks' when detected, None on failure
+    """
+    result = create_string_buffer(65535)
+    if isinstance(frame, bytes):
+        success = libppp.process_frame(frame, len(frame), result)
+    else:
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        success = libppp.process_frame_pixels(frame.ctypes.data, frame.shape[0], frame.shape[1], channels, result)
+    if success:
+        return json.loads(result.value)
+    return None
+
+
+def process_video(video_path):
+    """
+    Processes the frames of a video file as a new sequence. Returns a dictionary with the sequence
+    'stats' and the result of every frame in 'frames', None on failure
+    """
+    buf_size = 4*1024*1024
+    while True:
+        results = create_string_buffer(buf_size)
+        num_bytes = libppp.process_video(str2bytes(video_path), results, buf_size)
+        if num_bytes > 0:
+            return json.loads(results.value)
+        if num_bytes == 0:
+            return None
+        # Processed again with a buffer large enough for the results
+        buf_size = -num_bytes
+
+
+def get_frame_sequence_stats():
+    """
+    Returns the counters of the current frame sequence as a dictionary, including the
+    'fullDetectionRatio' and the per frame latency
+    """
+    stats = create_string_buffer(4096)
+    if libppp.get_frame_sequence_stats(stats):
+        return json.loads(stats.value)
+    return None
+
+
+def enable_tracing():
+    """
+    Starts recording a trace for every call made through this module
+    """
+    libppp.set_tracing_enabled(True)
+
+
+def disable_tracing():
+    """
+    """
+    libppp.set_tracing_enabled(False)
+
+
+def last_trace_id():
+    """
+    Returns the trace id of the last call made from the current thread (0 when tracing is disabled)
+    """
+    return libppp.get_last_trace_id()
+
+
+def get_trace(trace_id=None):
+    """
+    Returns the Chrome Trace Event JSON for the given trace id (all buffered traces if None).
+    The result can be saved to a file and opened in chrome://tracing or Perfetto
+    """
+    if trace_id is None:
+        trace_id = 0
+    buf_size = 65536
+    while True:
+        trace_json = create_string_buffer(buf_size)
+        num_bytes = libppp.get_trace(trace_id, trace_json, buf_size)
+        if num_bytes >= 0:
+            return trace_json.value
+        buf_size = -num_bytes
+
+
+def set_log_level(level):
+    """
+    Sets the minimum level of the records kept by libppp: trace, debug, info, warning, error or off
+    """
+    return libppp.set_log_level(str2bytes(level))
+
+
+def get_log_records():
+    """
+    Drains the log records buffered by libppp, returns a list of dictionaries
+    with the keys seq, level, ts, tid and message
+    """
+    records = []
+    log_buf = create_string_buffer(65536)
+    while True:
+        libppp.get_log_records(log_buf, len(log_buf))
+        batch = json.loads(log_buf.value)
+        if not batch:
+            return records
+        records.extend(batch)
+
+
 def main():
     # Let's check that it works
     lib_cfg = resolve_filepath('config.json')
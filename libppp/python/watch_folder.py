@@ -0,0 +1,508 @@
+"""
+Long running daemon creating the tiled print of every photo dropped in a spool directory.
+
+The engine is configured once, then shared by a pool of worker processes
+(libpppwrapper.fork_executor). New files are picked up through inotify on Linux,
+or by polling the directory elsewhere. Each print is written to a temporary file
+then renamed into the output directory, so readers never see partial outputs.
+Finished files are appended to a journal: after a restart, photos already
+processed are skipped and the others are processed again. Files that failed for a
+transient reason (e.g. a worker died or the output could not be written) are tried
+again later. Queue depth and throughput are logged and optionally written to a JSON
+stats file.
+"""
+import argparse
+import collections
+import ctypes
+import ctypes.util
+import functools
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import libpppwrapper as ppp
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+TILED_PRINT_REQUEST = {
+    'canvas': {
+        'height': 4.0,
+        'width': 6.0,
+        'resolution': 300,
+        'units': 'inch'
+    },
+    'standard': {
+        'pictureWidth': 2.0,
+        'pictureHeight': 2.0,
+        'faceHeight': 1.1875,
+        'units': 'inch'
+    }
+}
+
+# From sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+INOTIFY_EVENT_HEADER = struct.Struct('iIII')
+
+WORKER_DIED = 'A worker process died while processing it'
+
+
+def write_atomically(path, content):
+    """
+    Writes content (bytes) to a temporary file next to path, then renames it to path
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Journal(object):
+    """
+    Append only record of the processed files, one JSON object per line. A file is identified by
+    its name, size and modification time, so a photo replaced under the same name is processed again.
+    The status of a file is 'done', 'failed' when no print can be created from it, or 'error' when
+    processing it failed for a reason that may go away (it is then tried again)
+    """
+
+    def __init__(self, path):
+        self._entries = {}
+        if os.path.isfile(path):
+            with open(path, 'r') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line may be truncated if the daemon was killed while writing it
+                        continue
+                    self._entries[entry['file']] = entry
+        self._fp = open(path, 'a')
+
+    @staticmethod
+    def file_id(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, file_name, file_id):
+        """
+        Returns the last entry of this version of the file, None if it was not processed yet
+        """
+        entry = self._entries.get(file_name)
+        if entry is not None and (entry['size'], entry['mtimeNs']) == file_id:
+            return entry
+        return None
+
+    def record(self, file_name, file_id, status, output=None, error=None):
+        previous = self.get(file_name, file_id)
+        entry = {'file': file_name, 'size': file_id[0], 'mtimeNs': file_id[1], 'status': status,
+                 'output': output, 'error': error, 'time': time.time(),
+                 'attempts': previous.get('attempts', 1) + 1 if previous else 1}
+        self._fp.write(json.dumps(entry) + '\n')
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._entries[file_name] = entry
+
+    def close(self):
+        self._fp.close()
+
+
+class PollingWatcher(object):
+    """
+    Lists the input directory every interval. A file is ready once its size and modification
+    time did not change between two listings, so files still being copied are left alone
+    """
+
+    def __init__(self, input_dir, interval):
+        self._input_dir = input_dir
+        self._interval = interval
+        self._previous = {}
+
+    def wait(self, stop_event):
+        """
+        Returns the names of the files that became ready
+        """
+        stop_event.wait(self._interval)
+        return self.ready_files()
+
+    def ready_files(self):
+        """
+        Returns the names of the files that did not change since the previous call
+        """
+        current = {}
+        for file_name in list_images(self._input_dir):
+            try:
+                current[file_name] = Journal.file_id(os.path.join(self._input_dir, file_name))
+            except OSError:
+                continue
+        ready = [f for f, file_id in current.items() if self._previous.get(f) == file_id]
+        self._previous = current
+        return ready
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    Reports the files closed after writing or moved into the input directory (Linux only)
+    """
+
+    def __init__(self, input_dir, interval):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self._fd, input_dir.encode(), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for %s' % input_dir)
+        self._interval = interval
+
+    def wait(self, stop_event):
+        readable, _, _ = select.select([self._fd], [], [], self._interval)
+        if not readable:
+            return []
+        ready = []
+        buffer = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, name_len = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            if mask & IN_Q_OVERFLOW:
+                print('inotify events were lost, the files they reported are found by the next rescan',
+                      file=sys.stderr)
+            file_name = buffer[offset:offset + name_len].rstrip(b'\0').decode()
+            offset += name_len
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                ready.append(file_name)
+        return ready
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher(input_dir, interval, use_polling):
+    """
+    Watches with inotify when available, otherwise falls back to polling
+    """
+    if not use_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(input_dir, interval)
+        except (OSError, AttributeError) as e:
+            print('inotify is not available (%s), polling %s instead' % (e, input_dir), file=sys.stderr)
+    return PollingWatcher(input_dir, interval)
+
+
+def list_images(directory):
+    """
+    """
+    return sorted(f for f in os.listdir(directory)
+                  if f.lower().endswith(IMAGE_EXTENSIONS) and not f.startswith('.'))
+
+
+def output_path(output_dir, file_name):
+    return os.path.join(output_dir, os.path.splitext(file_name)[0] + '.png')
+
+
+def _process_file(input_path, out_path, request):
+    """
+    Runs in a worker process, returns (output_path, error). The error is set when no print can
+    be created from the photo, exceptions are raised for the failures that may go away
+    """
+    png_content, _ = ppp.process_photo(input_path, request)
+    if png_content is None:
+        return None, 'No print could be created (no face detected or invalid image)'
+    write_atomically(out_path, png_content)
+    return out_path, None
+
+
+class Daemon(object):
+    """
+    Dispatches the ready files to the worker processes and keeps the journal and the counters.
+    Only one file per worker is handed to the pool, the others wait in line, so that a dying worker
+    only takes down files that were being processed. Which of them killed it is not known: they are
+    processed again one at a time by a worker of their own, and only a file that kills that worker
+    is failed
+    """
+
+    def __init__(self, args, request):
+        self._args = args
+        self._request = request
+        self._journal = Journal(args.journal or os.path.join(args.output_dir, '.ppp_journal'))
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._in_flight = set()
+        self._pending = collections.deque()  # (file name, file id) of the files waiting for a worker
+        self._running = set()  # Files handed to the workers, at most one per worker
+        self._suspects = collections.deque()  # (file name, file id) of the files lost when a worker died
+        self._suspect_in_flight = None
+        self._dispatch_event = threading.Event()  # Set when a file is ready or a worker is free
+        self._broken_executors = []
+        self._started_at = time.time()
+        self._num_processed = 0
+        self._num_failed = 0
+        self._recent = []  # Completion times within the throughput window
+        # Workers are forked from this process once the models are loaded. They ignore Ctrl+C, the daemon stops
+        # them once they finished their files
+        if not ppp.configure(args.config) or not ppp.wait_until_configured():
+            raise RuntimeError('Unable to configure libppp from %s' % args.config)
+        self._executor = self._fork_executor(args.workers)
+        self._isolation_executor = None
+
+    def _fork_executor(self, num_workers):
+        return ppp.fork_executor(num_workers, signal.signal, (signal.SIGINT, signal.SIG_IGN),
+                                 num_threads=self._args.threads)
+
+    def stop(self, *_):
+        self._stop_event.set()
+        self._dispatch_event.set()
+
+    def stats(self):
+        """
+        Counters of the daemon. The queue holds the files submitted to the workers and not finished yet
+        """
+        with self._lock:
+            now = time.time()
+            self._recent = [t for t in self._recent if now - t <= self._args.stats_interval]
+            uptime = now - self._started_at
+            return {
+                'queueDepth': len(self._in_flight),
+                'processed': self._num_processed,
+                'failed': self._num_failed,
+                'imagesPerSecond': len(self._recent) / self._args.stats_interval,
+                'meanImagesPerSecond': (self._num_processed + self._num_failed) / uptime if uptime > 0 else 0.0,
+                'uptimeSeconds': uptime,
+                'workers': self._args.workers
+            }
+
+    def _needs_processing(self, file_name, file_id):
+        entry = self._journal.get(file_name, file_id)
+        if entry is None:
+            return True
+        # Transient errors are retried a few times, after a delay so that the cause has a chance to go away
+        return (entry['status'] == 'error' and entry.get('attempts', 1) < self._args.max_attempts
+                and time.time() - entry['time'] >= self._args.retry_interval)
+
+    def submit(self, file_name):
+        input_path = os.path.join(self._args.input_dir, file_name)
+        try:
+            file_id = Journal.file_id(input_path)
+        except OSError:
+            return
+        with self._lock:
+            if file_name in self._in_flight or not self._needs_processing(file_name, file_id):
+                return
+            self._in_flight.add(file_name)
+            entry = self._journal.get(file_name, file_id)
+            # Don't let a file that killed a worker before take other files down with it
+            died_before = entry is not None and entry['error'] == WORKER_DIED
+            (self._suspects if died_before else self._pending).append((file_name, file_id))
+        self._dispatch_event.set()
+
+    def _submit_to(self, executor, file_name, file_id):
+        input_path = os.path.join(self._args.input_dir, file_name)
+        try:
+            future = executor.submit(_process_file, input_path, output_path(self._args.output_dir, file_name),
+                                     self._request)
+        except BrokenProcessPool:
+            # The file never reached a worker, it waits for the replacement workers
+            with self._lock:
+                if executor not in self._broken_executors:
+                    self._broken_executors.append(executor)
+                if executor is self._isolation_executor:
+                    self._suspect_in_flight = None
+                    self._suspects.appendleft((file_name, file_id))
+                else:
+                    self._running.discard(file_name)
+                    self._pending.appendleft((file_name, file_id))
+            self._dispatch_event.set()
+            return
+        future.add_done_callback(functools.partial(self._on_done, file_name, file_id, executor))
+
+    def _on_done(self, file_name, file_id, executor, future):
+        try:
+            out_path, error = future.result()
+        except BrokenProcessPool:
+            self._on_worker_died(file_name, file_id, executor)
+            return
+        except Exception as e:
+            self._finish(file_name, file_id, 'error', None, str(e))
+            return
+        self._finish(file_name, file_id, 'failed' if error else 'done', out_path, error)
+
+    def _on_worker_died(self, file_name, file_id, executor):
+        with self._lock:
+            if executor not in self._broken_executors:
+                self._broken_executors.append(executor)
+            if executor is not self._isolation_executor:
+                self._running.discard(file_name)
+                self._suspects.append((file_name, file_id))
+                isolated = False
+            else:
+                isolated = True
+        if isolated:
+            # The file was processed alone, it killed the worker
+            self._finish(file_name, file_id, 'error', None, WORKER_DIED)
+        else:
+            self._dispatch_event.set()
+
+    def _dispatch_loop(self):
+        """
+        Dispatches the files whenever one is ready or a worker is free, until stopped
+        """
+        while not self._stop_event.is_set():
+            self._dispatch_event.wait()
+            self._dispatch_event.clear()
+            if not self._stop_event.is_set():
+                self._dispatch()
+
+    def _dispatch(self):
+        """
+        Replaces the executors a worker of which died, hands the waiting files to the free workers, and
+        submits the next suspect file to the isolation executor once the previous one is finished
+        """
+        with self._lock:
+            broken_executors, self._broken_executors = self._broken_executors, []
+        if self._executor in broken_executors:
+            print('A worker process died, restarting the workers', file=sys.stderr)
+            self._executor.shutdown(wait=False)
+            self._executor = self._fork_executor(self._args.workers)
+        if self._isolation_executor in broken_executors:
+            self._isolation_executor.shutdown(wait=False)
+            self._isolation_executor = None
+        while True:
+            with self._lock:
+                if len(self._running) >= self._args.workers or not self._pending:
+                    break
+                file_name, file_id = self._pending.popleft()
+                self._running.add(file_name)
+            self._submit_to(self._executor, file_name, file_id)
+        with self._lock:
+            if self._suspect_in_flight is not None or not self._suspects:
+                return
+            file_name, file_id = self._suspects.popleft()
+            self._suspect_in_flight = file_name
+        if self._isolation_executor is None:
+            self._isolation_executor = self._fork_executor(1)
+        self._submit_to(self._isolation_executor, file_name, file_id)
+
+    def _finish(self, file_name, file_id, status, out_path, error):
+        with self._lock:
+            self._journal.record(file_name, file_id, status, out_path, error)
+            self._in_flight.discard(file_name)
+            self._running.discard(file_name)
+            if self._suspect_in_flight == file_name:
+                self._suspect_in_flight = None
+            self._recent.append(time.time())
+            if error:
+                self._num_failed += 1
+                print('%s failed: %s' % (file_name, error), file=sys.stderr)
+            else:
+                self._num_processed += 1
+        self._dispatch_event.set()
+
+    def report_stats(self):
+        stats = self.stats()
+        print('queue=%(queueDepth)d processed=%(processed)d failed=%(failed)d %(imagesPerSecond).2f images/s' % stats,
+              file=sys.stderr)
+        if self._args.stats_file:
+            write_atomically(self._args.stats_file, json.dumps(stats, indent=4).encode())
+
+    def run(self):
+        """
+        Processes the files already spooled, then the new ones until stopped
+        """
+        watcher = create_watcher(self._args.input_dir, self._args.poll_interval, self._args.poll)
+        # inotify misses the files dropped while its event queue overflowed, and retries need a listing, so the
+        # directory is also listed every rescan interval. Polling lists it anyway
+        rescanner = PollingWatcher(self._args.input_dir, 0) if isinstance(watcher, InotifyWatcher) else None
+        dispatcher = threading.Thread(target=self._dispatch_loop)
+        dispatcher.start()
+        try:
+            # Files dropped while the daemon was down, or not journaled when it stopped
+            for file_name in list_images(self._args.input_dir):
+                self.submit(file_name)
+            last_report = last_rescan = time.time()
+            while not self._stop_event.is_set():
+                for file_name in watcher.wait(self._stop_event):
+                    self.submit(file_name)
+                if rescanner and time.time() - last_rescan >= self._args.rescan_interval:
+                    for file_name in rescanner.ready_files():
+                        self.submit(file_name)
+                    last_rescan = time.time()
+                if time.time() - last_report >= self._args.stats_interval:
+                    self.report_stats()
+                    last_report = time.time()
+        finally:
+            watcher.close()
+            self.stop()
+            dispatcher.join()
+            # Let the workers finish the files they started so that they are journaled. The waiting files and the
+            # suspects left are processed again after a restart
+            self._executor.shutdown(wait=True)
+            if self._isolation_executor is not None:
+                self._isolation_executor.shutdown(wait=True)
+            self.report_stats()
+            self._journal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_dir', help='Directory where the photos are dropped')
+    parser.add_argument('output_dir', help='Directory where the prints are written, as <photo name>.png')
+    parser.add_argument('-c', '--config', default='config.json', help='Engine configuration file')
+    parser.add_argument('-r', '--request', help='JSON file with the print request (canvas and standard or '
+                                                'standardId), a 2x2 inch photo on a 6x4 inch canvas by default')
+    parser.add_argument('-w', '--workers', type=int, default=ppp.available_cores(), help='Worker processes')
+    parser.add_argument('-t', '--threads', type=int,
+                        help='OpenCV threads per worker, by default the cores are shared between the workers')
+    parser.add_argument('-j', '--journal', help='Journal of the processed files, <output_dir>/.ppp_journal by default')
+    parser.add_argument('--poll', action='store_true', help='Poll the input directory instead of using inotify')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between two listings of the input directory when polling')
+    parser.add_argument('--rescan-interval', type=float, default=60.0,
+                        help='Seconds between two listings of the input directory when using inotify')
+    parser.add_argument('--retry-interval', type=float, default=60.0,
+                        help='Seconds before a file that failed for a transient reason is tried again')
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help='Times a file that keeps failing for a transient reason is tried')
+    parser.add_argument('--stats-interval', type=float, default=10.0, help='Seconds between two stats reports')
+    parser.add_argument('--stats-file', help='Write the queue depth and throughput to this JSON file')
+    args = parser.parse_args()
+
+    args.config = ppp.resolve_filepath(args.config) if not os.path.isfile(args.config) else args.config
+    if not args.config:
+        print('The engine configuration file was not found', file=sys.stderr)
+        return 1
+    request = TILED_PRINT_REQUEST
+    if args.request:
+        with open(args.request, 'r') as fp:
+            request = json.load(fp)
+    if not os.path.isdir(args.input_dir):
+        print('The input directory %s does not exist' % args.input_dir, file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    daemon = Daemon(args, request)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,12 @@
 
 #include "ComplianceChecker.h"
 #include "ComplianceResult.h"
+#include "ImageStatistics.h"
 #include "PhotoStandard.h"
 #include "Utilities.h"
 
+#include <algorithm>
+
 namespace ppp
 {
 
@@ -18,38 +21,57 @@ std::vector<ComplianceResultSPtr> ComplianceChecker::checkCompliance(
     const cv::Point & chinPoint,
     const std::vector<std::string> & complianceCheckNames)
 {
-    std::vector<ComplianceResultSPtr> results;
-    using namespace std;
-    using namespace rapidjson;
-
-    // Get access to some data we need
-
-    // m_imageStore
+    return checkCompliance(ComplianceInputs(crownPoint, chinPoint), *photoStandard, complianceCheckNames);
+}
 
+std::vector<ComplianceResultSPtr> ComplianceChecker::checkCompliance(
+    const ComplianceInputs & inputs,
+    const PhotoStandard & photoStandard,
+    const std::vector<std::string> & complianceCheckNames) const
+{
+    std::vector<ComplianceResultSPtr> results;
+    const auto & allChecks = checks();
     for (const auto & checkName : complianceCheckNames)
     {
-        if (checkName == CHECK_INPUT_RESOLUTION)
+        const auto it = allChecks.find(checkName);
+        if (it != allChecks.end())
         {
-            const auto result = checkInputResolution(imgKey, photoStandard, crownPoint, chinPoint);
-            results.push_back(result);
+            results.push_back((this->*it->second.check)(inputs, photoStandard));
         }
     }
-
     return results;
 }
 
-ComplianceResultSPtr ComplianceChecker::checkInputResolution(const std::string & imgKey,
-                                                             const PhotoStandardSPtr & photoStandard,
-                                                             const cv::Point & crownPoint,
-                                                             const cv::Point & chinPoint) const
+bool ComplianceChecker::needsImageStatistics(const std::vector<std::string> & complianceCheckNames) const
+{
+    const auto & allChecks = checks();
+    return std::any_of(complianceCheckNames.begin(), complianceCheckNames.end(), [&](const std::string & checkName) {
+        const auto it = allChecks.find(checkName);
+        return it != allChecks.end() && it->second.needsStatistics;
+    });
+}
+
+const std::unordered_map<std::string, ComplianceChecker::CheckEntry> & ComplianceChecker::checks()
+{
+    static const std::unordered_map<std::string, CheckEntry> allChecks = {
+        { CHECK_INPUT_RESOLUTION, { &ComplianceChecker::checkInputResolution, false } },
+        { CHECK_BACKGROUND_UNIFORMITY, { &ComplianceChecker::checkBackgroundUniformity, true } },
+        { CHECK_EXPOSURE, { &ComplianceChecker::checkExposure, true } },
+        { CHECK_SHARPNESS, { &ComplianceChecker::checkSharpness, true } },
+    };
+    return allChecks;
+}
+
+ComplianceResultSPtr ComplianceChecker::checkInputResolution(const ComplianceInputs & inputs,
+                                                             const PhotoStandard & photoStandard) const
 {
     using namespace std;
-    const auto distPix = norm(crownPoint - chinPoint);
-    const auto distInch = photoStandard->faceHeight("inch");
+    const auto distPix = inputs.crownChinDistance;
+    const auto distInch = photoStandard.faceHeight("inch");
     const auto inputDpi = distPix / distInch;
 
     const auto minDpiFromPhotoStandard = 1.25; // input
-    const auto success = inputDpi > minDpiFromPhotoStandard * photoStandard->resolutionDpi();
+    const auto success = inputDpi > minDpiFromPhotoStandard * photoStandard.resolutionDpi();
     string message;
     if (success)
     {
@@ -64,4 +86,73 @@ ComplianceResultSPtr ComplianceChecker::checkInputResolution(const std::string &
     return result;
 }
 
+ComplianceResultSPtr ComplianceChecker::checkBackgroundUniformity(const ComplianceInputs & inputs,
+                                                                  const PhotoStandard &) const
+{
+    const auto & background = statisticsOf(inputs, CHECK_BACKGROUND_UNIFORMITY, false).background;
+    // Plain backgrounds of sample photos vary by less than this, textured ones by 40 and more
+    const auto maxBrightnessStdDev = 25.0;
+    const auto success = background.grayStdDev <= maxBrightnessStdDev;
+    const auto message = success ? "The background is uniform."
+                                 : "The background is not uniform. Take the photo in front of a plain wall or screen.";
+    const auto result = std::make_shared<ComplianceResult>(CHECK_BACKGROUND_UNIFORMITY, success, message);
+    result->setParam(CHECK_BACKGROUND_UNIFORMITY, background.grayStdDev);
+    return result;
+}
+
+ComplianceResultSPtr ComplianceChecker::checkExposure(const ComplianceInputs & inputs, const PhotoStandard &) const
+{
+    const auto & face = statisticsOf(inputs, CHECK_EXPOSURE, true).face;
+    const auto minBrightness = 60.0;
+    const auto maxBrightness = 210.0;
+    // Pixels this dark or bright have lost their details
+    const auto clippedFraction = face.outsideFraction(5, 250);
+    const auto maxClippedFraction = 0.05;
+
+    std::string message = "The face is well exposed.";
+    auto success = true;
+    if (face.grayMean < minBrightness)
+    {
+        message = "The face is too dark. Take the photo with more light on the face.";
+        success = false;
+    }
+    else if (face.grayMean > maxBrightness || clippedFraction > maxClippedFraction)
+    {
+        message = "The face is overexposed. Avoid direct flash and strong lights on the face.";
+        success = false;
+    }
+    const auto result = std::make_shared<ComplianceResult>(CHECK_EXPOSURE, success, message);
+    result->setParam(CHECK_EXPOSURE, face.grayMean);
+    result->setParam("clippedFraction", clippedFraction);
+    return result;
+}
+
+ComplianceResultSPtr ComplianceChecker::checkSharpness(const ComplianceInputs & inputs, const PhotoStandard &) const
+{
+    const auto & face = statisticsOf(inputs, CHECK_SHARPNESS, true).face;
+    // Faces of sharp sample photos are above 30, the same faces slightly blurred are below 10
+    const auto minLaplacianVariance = 15.0;
+    const auto success = face.laplacianVariance >= minLaplacianVariance;
+    const auto message = success ? "The face is sharp."
+                                 : "The face is blurred. Hold the camera still and focus on the face.";
+    const auto result = std::make_shared<ComplianceResult>(CHECK_SHARPNESS, success, message);
+    result->setParam(CHECK_SHARPNESS, face.laplacianVariance);
+    return result;
+}
+
+const ImageStatistics & ComplianceChecker::statisticsOf(const ComplianceInputs & inputs,
+                                                        const std::string & checkName,
+                                                        const bool faceRequired)
+{
+    if (!inputs.statistics)
+    {
+        throw std::runtime_error("The '" + checkName + "' check requires the image statistics");
+    }
+    if (faceRequired && inputs.statistics->face.numPixels == 0)
+    {
+        throw std::runtime_error("The '" + checkName + "' check requires the face to be detected");
+    }
+    return *inputs.statistics;
+}
+
 } // namespace ppp
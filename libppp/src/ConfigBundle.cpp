@@ -0,0 +1,183 @@
+#include "ConfigBundle.h"
+
+#include <cstring>
+#include <fstream>
+#include <stdexcept>
+
+#ifdef EMSCRIPTEN
+// No memory mapping, the bundle is read into memory
+#elif defined(_WIN32)
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+using namespace std;
+
+namespace ppp
+{
+namespace
+{
+const char BUNDLE_MAGIC[8] = { 'P', 'P', 'P', 'B', 'N', 'D', 'L', '1' };
+constexpr uint32_t BUNDLE_VERSION = 1;
+constexpr size_t HEADER_SIZE = 16;
+constexpr size_t SECTION_ENTRY_SIZE = ConfigBundle::SECTION_NAME_SIZE + 16;
+
+template <typename T>
+T readLittleEndian(const char * p)
+{
+    T value = 0;
+    for (size_t i = 0; i < sizeof(T); ++i)
+    {
+        value |= static_cast<T>(static_cast<uint8_t>(p[i])) << (8 * i);
+    }
+    return value;
+}
+} // namespace
+
+bool ConfigBundle::isBundle(const std::string & filePath)
+{
+    ifstream ifs(filePath, ios::binary);
+    char magic[sizeof(BUNDLE_MAGIC)] = {};
+    return ifs.read(magic, sizeof(magic)) && memcmp(magic, BUNDLE_MAGIC, sizeof(magic)) == 0;
+}
+
+ConfigBundle::ConfigBundle(const std::string & filePath)
+{
+#ifdef EMSCRIPTEN
+    ifstream ifs(filePath, ios::binary);
+    m_content.assign(istreambuf_iterator<char>(ifs), istreambuf_iterator<char>());
+    m_data = m_content.data();
+    m_size = m_content.size();
+#elif defined(_WIN32)
+    const auto fileHandle = CreateFileA(filePath.c_str(),
+                                        GENERIC_READ,
+                                        FILE_SHARE_READ,
+                                        nullptr,
+                                        OPEN_EXISTING,
+                                        FILE_ATTRIBUTE_NORMAL,
+                                        nullptr);
+    if (fileHandle == INVALID_HANDLE_VALUE)
+    {
+        throw runtime_error("Unable to open configuration bundle " + filePath);
+    }
+    LARGE_INTEGER fileSize;
+    GetFileSizeEx(fileHandle, &fileSize);
+    m_fileHandle = fileHandle;
+    m_mappingHandle = CreateFileMappingA(fileHandle, nullptr, PAGE_READONLY, 0, 0, nullptr);
+    m_data = m_mappingHandle ? static_cast<const char *>(MapViewOfFile(m_mappingHandle, FILE_MAP_READ, 0, 0, 0))
+                             : nullptr;
+    if (m_data == nullptr)
+    {
+        unmap();
+        throw runtime_error("Unable to map configuration bundle " + filePath);
+    }
+    m_size = static_cast<size_t>(fileSize.QuadPart);
+#else
+    const auto fd = open(filePath.c_str(), O_RDONLY);
+    if (fd < 0)
+    {
+        throw runtime_error("Unable to open configuration bundle " + filePath);
+    }
+    struct stat st {};
+    fstat(fd, &st);
+    m_size = static_cast<size_t>(st.st_size);
+    const auto address = mmap(nullptr, m_size, PROT_READ, MAP_SHARED, fd, 0);
+    // The mapping stays valid once the descriptor is closed
+    close(fd);
+    if (address == MAP_FAILED)
+    {
+        throw runtime_error("Unable to map configuration bundle " + filePath);
+    }
+    m_data = static_cast<const char *>(address);
+#endif
+
+    try
+    {
+        parseSectionTable(filePath);
+    }
+    catch (...)
+    {
+        unmap();
+        throw;
+    }
+}
+
+ConfigBundle::~ConfigBundle()
+{
+    unmap();
+}
+
+void ConfigBundle::unmap()
+{
+#ifdef EMSCRIPTEN
+    m_content.clear();
+#elif defined(_WIN32)
+    if (m_data)
+    {
+        UnmapViewOfFile(m_data);
+    }
+    if (m_mappingHandle)
+    {
+        CloseHandle(m_mappingHandle);
+    }
+    if (m_fileHandle)
+    {
+        CloseHandle(m_fileHandle);
+    }
+    m_mappingHandle = m_fileHandle = nullptr;
+#else
+    if (m_data)
+    {
+        munmap(const_cast<char *>(m_data), m_size);
+    }
+#endif
+    m_data = nullptr;
+}
+
+bool ConfigBundle::getSection(const std::string & name, const char *& data, size_t & size) const
+{
+    const auto it = m_sections.find(name);
+    if (it == m_sections.end())
+    {
+        return false;
+    }
+    data = it->second.first;
+    size = it->second.second;
+    return true;
+}
+
+void ConfigBundle::parseSectionTable(const std::string & filePath)
+{
+    if (m_size < HEADER_SIZE || memcmp(m_data, BUNDLE_MAGIC, sizeof(BUNDLE_MAGIC)) != 0)
+    {
+        throw runtime_error(filePath + " is not a configuration bundle");
+    }
+    const auto version = readLittleEndian<uint32_t>(m_data + 8);
+    if (version != BUNDLE_VERSION)
+    {
+        throw runtime_error("Unsupported configuration bundle version " + to_string(version));
+    }
+    const auto numSections = readLittleEndian<uint32_t>(m_data + 12);
+    if (HEADER_SIZE + numSections * SECTION_ENTRY_SIZE > m_size)
+    {
+        throw runtime_error("Truncated section table in " + filePath);
+    }
+
+    for (uint32_t i = 0; i < numSections; ++i)
+    {
+        const auto entry = m_data + HEADER_SIZE + i * SECTION_ENTRY_SIZE;
+        const string name(entry, strnlen(entry, SECTION_NAME_SIZE));
+        const auto offset = readLittleEndian<uint64_t>(entry + SECTION_NAME_SIZE);
+        const auto size = readLittleEndian<uint64_t>(entry + SECTION_NAME_SIZE + 8);
+        if (offset > m_size || size > m_size - offset)
+        {
+            throw runtime_error("Section " + name + " lies outside of " + filePath);
+        }
+        m_sections[name] = { m_data + offset, static_cast<size_t>(size) };
+    }
+}
+} // namespace ppp
@@ -2,6 +2,16 @@
 #include "ConfigLoader.h"
 #include "Utilities.h"
 
+#include <string_view>
+#include <sys/stat.h>
+#include <tuple>
+
+#if __has_include("EmbeddedContent.h")
+// Generated by research/scripts/embed_resource.py
+#include "EmbeddedContent.h"
+#define PPP_EMBEDDED_CONTENT
+#endif
+
 #ifdef EMSCRIPTEN
 #include <emscripten/fetch.h>
 #include <iostream>
@@ -32,6 +42,52 @@ struct Imemstream : virtual Membuf, std::istream
     }
 };
 
+namespace
+{
+std::string fileFingerprint(const std::string & filePath)
+{
+    struct stat st {};
+    if (stat(filePath.c_str(), &st) != 0)
+    {
+        return filePath;
+    }
+    return filePath + ":" + std::to_string(st.st_size) + ":" + std::to_string(st.st_mtime);
+}
+
+/*!@brief Finds the content compiled into the library for nodes with "embed": "resource". Returns false when the node
+ * is not embedded or the library was built without it, the resource is then loaded from its file !*/
+bool getEmbeddedResource(const rapidjson::Value & v, std::string & name, const char *& data, size_t & size)
+{
+    static const std::string AS_RESOURCE = "resource";
+    if (!v.HasMember("embed") || v["embed"].GetType() != rapidjson::kStringType || AS_RESOURCE != v["embed"].GetString())
+    {
+        return false;
+    }
+    if (v.HasMember("resource"))
+    {
+        name = v["resource"].GetString();
+    }
+    else
+    {
+        const std::string filePath = v["file"].GetString();
+        name = filePath.substr(filePath.find_last_of("/\\") + 1);
+    }
+#ifdef PPP_EMBEDDED_CONTENT
+    try
+    {
+        std::tie(data, size) = res::getFileContent(name);
+        return true;
+    }
+    catch (const std::out_of_range &)
+    {
+        return false;
+    }
+#else
+    return false;
+#endif
+}
+} // namespace
+
 ConfigLoader::ConfigLoader(std::string filePathOrContent, ResourceLoaded completeCallback)
 : _loadedCallback(std::move(completeCallback))
 {
@@ -39,6 +95,22 @@ ConfigLoader::ConfigLoader(std::string filePathOrContent, ResourceLoaded complet
     {
         filePathOrContent = "config.json";
     }
+    if (ConfigBundle::isBundle(filePathOrContent))
+    {
+        const auto found = filePathOrContent.find_last_of("/\\");
+        _currentDir = found != std::string::npos ? filePathOrContent.substr(0, found) : "";
+        m_bundle = std::make_unique<ConfigBundle>(filePathOrContent);
+        m_bundleFingerprint = fileFingerprint(filePathOrContent);
+        const char * configData = nullptr;
+        size_t configSize = 0;
+        if (!m_bundle->getSection(ConfigBundle::CONFIG_SECTION, configData, configSize))
+        {
+            throw std::runtime_error("No configuration section in bundle " + filePathOrContent);
+        }
+        m_config.Parse(configData, configSize);
+        return;
+    }
+
     std::ifstream ifs(filePathOrContent, std::ios_base::in);
     if (ifs.good())
     {
@@ -69,15 +141,75 @@ rapidjson::Value & ConfigLoader::get(const std::vector<std::string> & nodePath)
     return *v;
 }
 
+std::string ConfigLoader::getResourceFingerprint(const std::vector<std::string> & nodePath)
+{
+    const auto & v = get(nodePath);
+    if (m_bundle && v.HasMember("section") && v["section"].GetType() == rapidjson::kStringType)
+    {
+        return "bundle:" + m_bundleFingerprint + "#" + v["section"].GetString();
+    }
+    std::string resourceName;
+    const char * resourceData = nullptr;
+    size_t resourceSize = 0;
+    if (getEmbeddedResource(v, resourceName, resourceData, resourceSize))
+    {
+        return "embedded:" + resourceName + ":" + std::to_string(resourceSize);
+    }
+    if (v.HasMember("data") && v["data"].GetType() == rapidjson::kStringType)
+    {
+        const std::string_view data(v["data"].GetString(), v["data"].GetStringLength());
+        return "data:" + std::to_string(std::hash<std::string_view>()(data)) + ":" + std::to_string(data.size());
+    }
+    if (!v.HasMember("file"))
+        throw std::runtime_error("No 'file' or 'data' field when trying to load resource");
+
+    const std::string resourcePath = v["file"].GetString();
+    return "file:" + fileFingerprint(_currentDir.empty() ? resourcePath : _currentDir + "/" + resourcePath);
+}
+
 void ConfigLoader::loadResource(const std::vector<std::string> & nodePath, const ResourceLoadResult & callback)
 {
     const auto & v = get(nodePath);
+    if (m_bundle && v.HasMember("section") && v["section"].GetType() == rapidjson::kStringType)
+    {
+        // Served in place from the mapped bundle, no decoding nor copy
+        const char * sectionData = nullptr;
+        size_t sectionSize = 0;
+        const std::string sectionName = v["section"].GetString();
+        if (!m_bundle->getSection(sectionName, sectionData, sectionSize))
+        {
+            throw std::runtime_error("Section " + sectionName + " was not found in the configuration bundle");
+        }
+        Imemstream stream(sectionData, sectionSize);
+        callback(true, stream);
+        if (_loadedCallback)
+        {
+            _loadedCallback();
+        }
+        return;
+    }
+
+    std::string resourceName;
+    const char * resourceData = nullptr;
+    size_t resourceSize = 0;
+    if (getEmbeddedResource(v, resourceName, resourceData, resourceSize))
+    {
+        // Compiled into the library, served in place
+        Imemstream stream(resourceData, resourceSize);
+        callback(true, stream);
+        if (_loadedCallback)
+        {
+            _loadedCallback();
+        }
+        return;
+    }
+
     if (v.HasMember("data") && v["data"].GetType() == rapidjson::kStringType)
     {
         const auto & item = v["data"];
         const auto fileContent = item.GetString();
         const auto fileContentLen = item.GetStringLength();
-        static const std::string AS_BASE64 = "base64 ";
+        static const std::string AS_BASE64 = "base64";
 
         if (v.HasMember("embed") && v["embed"].GetType() == rapidjson::kStringType
             && AS_BASE64 == v["embed"].GetString())
@@ -91,6 +223,12 @@ void ConfigLoader::loadResource(const std::vector<std::string> & nodePath, const
             Imemstream stream(fileContent, fileContentLen);
             callback(true, stream);
         }
+        if (_loadedCallback)
+        {
+            _loadedCallback();
+        }
+        // The embedded data replaces the file, don't load the resource twice
+        return;
     }
 
     if (!v.HasMember("file"))
@@ -5,6 +5,8 @@
 #include <queue>
 
 #include "ConfigLoader.h"
+#include "ModelRegistry.h"
+#include "Tracer.h"
 #include "Utilities.h"
 
 using namespace std;
@@ -21,19 +23,26 @@ void EyeDetector::configureInternal(const ConfigLoaderSPtr & cfg)
 
     if (m_useHaarCascades)
     {
-        const auto loadCascade = [&edCfg](const string & eyeName) {
-            auto & haarCascade = edCfg[(string("haarCascade") + eyeName).c_str()];
-            const auto xmlBase64Data(haarCascade["data"].GetString());
-            return Utilities::loadClassifierFromBase64(xmlBase64Data);
+        // OpenCV cascades keep per detection buffers so each detector builds its own, the decoded definition is shared
+        const auto loadCascadeXml = [&cfg](const string & eyeName) {
+            const vector<string> cascadeNode = { "eyesDetector", "haarCascade" + eyeName };
+            const auto decodeXml = [&cfg, &cascadeNode]() {
+                return make_shared<string>(
+                    Utilities::decodeClassifierDefinition(cfg->get(cascadeNode)["data"].GetString()));
+            };
+            return ModelRegistry::instance().get<string>(cfg->getResourceFingerprint(cascadeNode), decodeXml);
         };
-        m_leftEyeCascadeClassifier = loadCascade("Left");
-        m_rightEyeCascadeClassifier = loadCascade("Right");
+        m_leftEyeCascadeXml = loadCascadeXml("Left");
+        m_rightEyeCascadeXml = loadCascadeXml("Right");
+        m_leftEyeCascadeClassifier = Utilities::createHaarClassifier(*m_leftEyeCascadeXml);
+        m_rightEyeCascadeClassifier = Utilities::createHaarClassifier(*m_rightEyeCascadeXml);
     }
     m_isConfigured = true;
 }
 
 bool EyeDetector::detectLandMarks(const cv::Mat & grayImage, LandMarks & landMarks)
 {
+    TRACE_SPAN("EyeDetector::detectLandMarks");
     const auto & faceRect = landMarks.vjFaceRect;
 
     if (faceRect.width <= 10 && faceRect.height <= 10)
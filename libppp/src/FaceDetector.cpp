@@ -1,10 +1,16 @@
 #include "FaceDetector.h"
 #include "ConfigLoader.h"
 #include "LandMarks.h"
+#include "ModelRegistry.h"
+#include "Tracer.h"
 #include "Utilities.h"
 
+#include <algorithm>
+#include <map>
+#include <mutex>
 #include <vector>
 
+#include <dlib/image_processing/frontal_face_detector.h>
 #include <dlib/opencv/cv_image.h>
 #include <opencv2/core/mat.hpp>
 #include <opencv2/imgproc/imgproc.hpp>
@@ -15,46 +21,126 @@ using namespace cv;
 
 namespace ppp
 {
+namespace
+{
+/*!@brief Viola-Jones detector, Haar or LBP features depending on the cascade it's given !*/
+class CascadeBackend final : public IFaceDetectorBackend
+{
+public:
+    explicit CascadeBackend(string cascadeNodeName)
+    : m_cascadeNodeName(std::move(cascadeNodeName))
+    {
+    }
 
-bool FaceDetector::detectLandMarks(const Mat & inputImage, LandMarks & landmarks)
+    void configure(const ConfigLoaderSPtr & config, const function<void()> & onReady) override
+    {
+        // OpenCV cascades keep per detection buffers so each detector builds its own, only the definition is shared
+        const vector<string> cascadeNode = { "faceDetector", m_cascadeNodeName };
+        const auto fingerprint = config->getResourceFingerprint(cascadeNode);
+        m_cascadeXml = ModelRegistry::instance().find<string>(fingerprint);
+        if (m_cascadeXml)
+        {
+            m_pCascadeClassifier = Utilities::createHaarClassifier(*m_cascadeXml);
+            onReady();
+            return;
+        }
+        config->loadResource(cascadeNode, [this, fingerprint, onReady](const bool success, std::istream & stream) {
+            if (success)
+            {
+                const auto readXml = [&stream]() {
+                    return make_shared<string>(istreambuf_iterator<char>(stream), istreambuf_iterator<char>());
+                };
+                m_cascadeXml = ModelRegistry::instance().get<string>(fingerprint, readXml);
+                m_pCascadeClassifier = Utilities::createHaarClassifier(*m_cascadeXml);
+                onReady();
+            }
+        });
+    }
+
+    vector<Rect> detect(const Mat & grayImage, const Size & minFaceSize, const Size & maxFaceSize) override
+    {
+        vector<Rect> facesRects;
+        m_pCascadeClassifier->detectMultiScale(grayImage,
+                                               facesRects,
+                                               1.05,
+                                               3,
+                                               CASCADE_SCALE_IMAGE | CASCADE_FIND_BIGGEST_OBJECT,
+                                               minFaceSize,
+                                               maxFaceSize);
+        return facesRects;
+    }
+
+private:
+    const string m_cascadeNodeName;
+    CascadeClassifierSPtr m_pCascadeClassifier;
+    shared_ptr<const string> m_cascadeXml; ///<- Kept so that other engines reuse the XML definition
+};
+
+/*!@brief dlib's HOG and linear SVM frontal face detector, the model is built into dlib !*/
+class DlibHogBackend final : public IFaceDetectorBackend
+{
+public:
+    void configure(const ConfigLoaderSPtr &, const function<void()> & onReady) override
+    {
+        onReady();
+    }
+
+    vector<Rect> detect(const Mat & grayImage, const Size & minFaceSize, const Size & maxFaceSize) override
+    {
+        // The detector window is 80x80 pixels, faces smaller than the minimum size don't need to be found, so the
+        // image is downscaled to make the smallest face fit the window
+        const auto scale = std::min(1.0, 80.0 / std::max(minFaceSize.width, 1));
+        Mat scaledImage = grayImage;
+        if (scale < 1.0)
+        {
+            resize(grayImage, scaledImage, Size(), scale, scale, INTER_AREA);
+        }
+
+        const auto dets = m_detector(dlib::cv_image<unsigned char>(scaledImage));
+
+        vector<Rect> facesRects;
+        for (const auto & det : dets)
+        {
+            const Rect faceRect(static_cast<int>(det.left() / scale),
+                                static_cast<int>(det.top() / scale),
+                                static_cast<int>(det.width() / scale),
+                                static_cast<int>(det.height() / scale));
+            if (faceRect.width <= maxFaceSize.width && faceRect.height <= maxFaceSize.height)
+            {
+                facesRects.push_back(faceRect);
+            }
+        }
+        sort(facesRects.begin(), facesRects.end(), [](const Rect & r1, const Rect & r2) {
+            return r1.area() > r2.area();
+        });
+        return facesRects;
+    }
+
+private:
+    dlib::frontal_face_detector m_detector = dlib::get_frontal_face_detector();
+};
+
+mutex g_backendsMutex;
+
+map<string, FaceDetector::BackendFactory> & backendFactories()
 {
-    // if (m_useDlibFaceDetection)
-    //{
-    //    using namespace dlib;
-    //    array2d<uint8_t> dlibImage;
-    //    assign_image(dlibImage, cv_image<uint8_t>(inputImage));
-
-    //    auto dets = (*m_frontalFaceDetector)(dlibImage);
-
-    //    if (dets.empty())
-    //    {
-    //        return false; // No face was found
-    //    }
-
-    //    auto & faceRect = dets.front();
-    //    if (dets.size() > 1)
-    //    {
-    //        const auto biggestFacePtr = std::max_element(dets.begin(),
-    //                                                     dets.end(),
-    //                                                     [](const dlib::rectangle & r1, const dlib::rectangle & r2) {
-    //                                                         return r1.area() < r2.area();
-    //                                                     });
-    //        faceRect = *biggestFacePtr;
-    //    }
-
-    //    landmarks.vjFaceRect = Rect2d(faceRect.left(), faceRect.top(), faceRect.width(), faceRect.height());
-    //    landmarks.imageRotation = 0; // TODO: Add rotation search to this one as well
-    //    return true;
-    //}
+    static map<string, FaceDetector::BackendFactory> s_factories = {
+        { "haarCascade", []() { return make_unique<CascadeBackend>("haarCascade"); } },
+        { "lbpCascade", []() { return make_unique<CascadeBackend>("lbpCascade"); } },
+        { "dlibHog", []() { return make_unique<DlibHogBackend>(); } },
+    };
+    return s_factories;
+}
+} // namespace
 
+bool FaceDetector::detectLandMarks(const Mat & inputImage, LandMarks & landmarks)
+{
     // Configuration
     const auto minFaceRatio = 0.15;
     const auto maxFaceRatio = 0.85;
 
     // Calculate search domain on the image
     const auto imgSize = inputImage.size();
-    const auto h = imgSize.height;
-    const auto w = imgSize.width;
 
     auto grayImage = inputImage;
     if (inputImage.channels() != 1)
@@ -64,22 +150,13 @@ bool FaceDetector::detectLandMarks(const Mat & inputImage, LandMarks & landmarks
 
     for (const auto angle : { 0, 90, -90, 180 })
     {
+        TRACE_SPAN("FaceDetector::rotation", "angle=" + to_string(angle));
         // Let's rotate the image to see if we can find a face in it
         auto rotatedImage = Utilities::rotateImage(grayImage, angle);
         Size minFaceSize, maxFaceSize;
         calculateScaleSearch(imgSize, minFaceRatio, maxFaceRatio, minFaceSize, maxFaceSize);
 
-        vector<Rect> facesRects;
-        vector<int> rejectLevels;
-        vector<double> levelWeights;
-        m_pFaceCascadeClassifier->detectMultiScale(rotatedImage,
-                                                   facesRects,
-                                                   1.05,
-                                                   3,
-                                                   CASCADE_SCALE_IMAGE | CASCADE_FIND_BIGGEST_OBJECT,
-                                                   minFaceSize,
-                                                   maxFaceSize);
-
+        const auto facesRects = m_backend->detect(rotatedImage, minFaceSize, maxFaceSize);
         if (!facesRects.empty())
         {
             landmarks.vjFaceRect = facesRects.front();
@@ -90,6 +167,28 @@ bool FaceDetector::detectLandMarks(const Mat & inputImage, LandMarks & landmarks
     return false;
 }
 
+const std::string & FaceDetector::backendName() const
+{
+    return m_backendName;
+}
+
+void FaceDetector::registerBackend(const std::string & name, const BackendFactory & factory)
+{
+    lock_guard<mutex> lock(g_backendsMutex);
+    backendFactories()[name] = factory;
+}
+
+vector<string> FaceDetector::backendNames()
+{
+    lock_guard<mutex> lock(g_backendsMutex);
+    vector<string> names;
+    for (const auto & factory : backendFactories())
+    {
+        names.push_back(factory.first);
+    }
+    return names;
+}
+
 void FaceDetector::calculateScaleSearch(const Size & inputImageSize,
                                         const double minFaceRatio,
                                         const double maxFaceRatio,
@@ -107,19 +206,32 @@ void FaceDetector::configureInternal(const ConfigLoaderSPtr & config)
 {
     m_isConfigured = false;
 
-    config->loadResource({ "faceDetector", "haarCascade" }, [this](const bool success, std::istream & stream) {
-        if (success)
+    const auto & root = config->get({});
+    const auto & faceDetectorCfg = root["faceDetector"];
+    string backendName = "haarCascade";
+    if (faceDetectorCfg.HasMember("backend"))
+    {
+        backendName = faceDetectorCfg["backend"].GetString();
+    }
+    else if (root.HasMember("useDlibFaceDetection") && root["useDlibFaceDetection"].GetBool())
+    {
+        // Legacy switch of the configurations written before the backends could be selected by name
+        backendName = "dlibHog";
+    }
+
+    BackendFactory factory;
+    {
+        lock_guard<mutex> lock(g_backendsMutex);
+        const auto it = backendFactories().find(backendName);
+        if (it == backendFactories().end())
         {
-            m_pFaceCascadeClassifier = Utilities::loadClassifierFromStream(stream);
-            m_isConfigured = true;
+            throw runtime_error("Unknown face detector backend '" + backendName + "'");
         }
-    });
-
-    m_useDlibFaceDetection = config->get({ "useDlibFaceDetection" }).GetBool();
+        factory = it->second;
+    }
 
-    /*if (m_useDlibFaceDetection)
-    {
-        m_frontalFaceDetector = std::make_shared<dlib::frontal_face_detector>(dlib::get_frontal_face_detector());
-    }*/
+    m_backend = factory();
+    m_backendName = backendName;
+    m_backend->configure(config, [this]() { m_isConfigured = true; });
 }
 } // namespace ppp
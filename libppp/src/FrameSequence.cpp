@@ -0,0 +1,125 @@
+#include "FrameSequence.h"
+#include "PppEngine.h"
+#include "Tracer.h"
+
+#include <algorithm>
+#include <chrono>
+#include <stdexcept>
+
+#include <opencv2/imgproc/imgproc.hpp>
+
+#if __has_include(<opencv2/videoio.hpp>)
+#include <opencv2/videoio.hpp>
+#define PPP_HAS_VIDEOIO
+#endif
+
+using namespace std;
+
+namespace ppp
+{
+FrameSequence::FrameSequence(const PppEngine & engine, const size_t keyframeInterval, const double searchWindowScale)
+: m_engine(engine)
+, m_keyframeInterval(std::max<size_t>(keyframeInterval, 1))
+, m_searchWindowScale(std::max(searchWindowScale, 1.0))
+{
+}
+
+FrameResult FrameSequence::processFrame(const cv::Mat & frame)
+{
+    TRACE_SPAN("FrameSequence::processFrame");
+    const auto start = chrono::steady_clock::now();
+
+    cv::Mat bgrFrame = frame;
+    if (frame.channels() == 1)
+    {
+        cvtColor(frame, bgrFrame, cv::COLOR_GRAY2BGR);
+    }
+    else if (frame.channels() == 4)
+    {
+        cvtColor(frame, bgrFrame, cv::COLOR_BGRA2BGR);
+    }
+
+    FrameResult result;
+    if (m_previousFaceRect.area() > 0 && m_framesSinceKeyframe + 1 < m_keyframeInterval)
+    {
+        result.detected = m_engine.detectLandMarks(bgrFrame, result.landMarks, searchWindow());
+        if (result.detected)
+        {
+            m_framesSinceKeyframe++;
+        }
+        else
+        {
+            m_stats.numTrackingLosses++;
+        }
+    }
+    if (!result.detected)
+    {
+        result.fullDetection = true;
+        result.detected = m_engine.detectLandMarks(bgrFrame, result.landMarks);
+        m_framesSinceKeyframe = 0;
+        m_stats.numFullDetections++;
+    }
+    m_previousFaceRect = result.detected ? result.landMarks.vjFaceRect : cv::Rect();
+
+    result.latencyMs = chrono::duration<double, milli>(chrono::steady_clock::now() - start).count();
+    m_stats.numFrames++;
+    m_stats.numDetected += result.detected ? 1 : 0;
+    m_stats.totalLatencyMs += result.latencyMs;
+    m_stats.maxLatencyMs = std::max(m_stats.maxLatencyMs, result.latencyMs);
+    return result;
+}
+
+size_t FrameSequence::processVideo(const std::string & videoFilePath,
+                                   const std::function<void(const FrameResult &)> & onFrame)
+{
+#ifdef PPP_HAS_VIDEOIO
+    cv::VideoCapture capture(videoFilePath);
+    if (!capture.isOpened())
+    {
+        throw runtime_error("Unable to open the video file '" + videoFilePath + "'");
+    }
+
+    size_t numFrames = 0;
+    cv::Mat frame;
+    while (capture.read(frame))
+    {
+        const auto result = processFrame(frame);
+        if (onFrame)
+        {
+            onFrame(result);
+        }
+        numFrames++;
+    }
+    return numFrames;
+#else
+    (void)onFrame;
+    throw runtime_error("Video files are not supported by this build, '" + videoFilePath + "' can't be processed");
+#endif
+}
+
+void FrameSequence::setTracking(const size_t keyframeInterval, const double searchWindowScale)
+{
+    m_keyframeInterval = std::max<size_t>(keyframeInterval, 1);
+    m_searchWindowScale = std::max(searchWindowScale, 1.0);
+}
+
+void FrameSequence::reset()
+{
+    m_previousFaceRect = cv::Rect();
+    m_framesSinceKeyframe = 0;
+    m_stats = FrameSequenceStats();
+}
+
+FrameSequenceStats FrameSequence::getStats() const
+{
+    return m_stats;
+}
+
+cv::Rect FrameSequence::searchWindow() const
+{
+    const auto & r = m_previousFaceRect;
+    const auto width = static_cast<int>(r.width * m_searchWindowScale);
+    const auto height = static_cast<int>(r.height * m_searchWindowScale);
+    return cv::Rect(r.x + (r.width - width) / 2, r.y + (r.height - height) / 2, width, height);
+}
+} // namespace ppp
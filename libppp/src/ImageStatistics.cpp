@@ -0,0 +1,143 @@
+#include "ImageStatistics.h"
+#include "Tracer.h"
+
+#include <algorithm>
+#include <cmath>
+#include <numeric>
+
+#include <opencv2/imgproc/imgproc.hpp>
+
+using namespace std;
+
+namespace ppp
+{
+namespace
+{
+/*!@brief Sums over the pixels of a region, possibly made of several rectangles. Each rectangle's moments and
+ * histogram are computed by OpenCV, the accumulator only combines them !*/
+class RegionAccumulator final
+{
+public:
+    RegionAccumulator()
+    : m_grayHistogram(256, 0)
+    {
+    }
+
+    void add(const cv::Mat & bgrImage, const cv::Rect & rect)
+    {
+        if (rect.area() == 0)
+        {
+            return;
+        }
+        // The Laplacian of the rectangle's border pixels reads their neighbours in the image
+        const auto neighbourhood = cv::Rect(rect.x - 1, rect.y - 1, rect.width + 2, rect.height + 2)
+            & cv::Rect(cv::Point(), bgrImage.size());
+        cv::cvtColor(bgrImage(neighbourhood), m_gray, cv::COLOR_BGR2GRAY);
+        cv::Laplacian(m_gray, m_laplacian, CV_32F);
+        const auto rectInNeighbourhood = cv::Rect(rect.tl() - neighbourhood.tl(), rect.size());
+        const auto n = static_cast<double>(rect.area());
+
+        cv::Scalar mean, stdDev;
+        cv::meanStdDev(bgrImage(rect), mean, stdDev);
+        for (auto c = 0; c < 3; ++c)
+        {
+            m_sum[c] += mean[c] * n;
+            m_sumSquares[c] += (stdDev[c] * stdDev[c] + mean[c] * mean[c]) * n;
+        }
+        cv::meanStdDev(m_laplacian(rectInNeighbourhood), mean, stdDev);
+        m_laplacianSum += mean[0] * n;
+        m_laplacianSumSquares += (stdDev[0] * stdDev[0] + mean[0] * mean[0]) * n;
+
+        const cv::Mat gray = m_gray(rectInNeighbourhood);
+        const int channels[] = { 0 };
+        const int histSize[] = { 256 };
+        const float range[] = { 0, 256 };
+        const float * ranges[] = { range };
+        cv::calcHist(&gray, 1, channels, cv::Mat(), m_histogram, 1, histSize, ranges);
+        for (auto level = 0; level < 256; ++level)
+        {
+            m_grayHistogram[level] += static_cast<uint32_t>(cvRound(m_histogram.at<float>(level)));
+        }
+        m_numPixels += static_cast<size_t>(rect.area());
+    }
+
+    RegionStatistics statistics() const
+    {
+        RegionStatistics stats;
+        stats.numPixels = m_numPixels;
+        stats.grayHistogram.assign(m_grayHistogram.begin(), m_grayHistogram.end());
+        if (m_numPixels == 0)
+        {
+            return stats;
+        }
+        const auto n = static_cast<double>(m_numPixels);
+        for (auto c = 0; c < 3; ++c)
+        {
+            stats.mean[c] = m_sum[c] / n;
+            stats.stdDev[c] = sqrt(max(m_sumSquares[c] / n - stats.mean[c] * stats.mean[c], 0.0));
+        }
+        // Brightness moments come from the histogram
+        double graySum = 0.0;
+        double graySumSquares = 0.0;
+        for (auto level = 0; level < 256; ++level)
+        {
+            graySum += static_cast<double>(level) * m_grayHistogram[level];
+            graySumSquares += static_cast<double>(level) * level * m_grayHistogram[level];
+        }
+        stats.grayMean = graySum / n;
+        stats.grayStdDev = sqrt(max(graySumSquares / n - stats.grayMean * stats.grayMean, 0.0));
+        const auto laplacianMean = m_laplacianSum / n;
+        stats.laplacianVariance = max(m_laplacianSumSquares / n - laplacianMean * laplacianMean, 0.0);
+        return stats;
+    }
+
+private:
+    size_t m_numPixels = 0;
+    cv::Vec3d m_sum;
+    cv::Vec3d m_sumSquares;
+    std::vector<uint32_t> m_grayHistogram;
+    double m_laplacianSum = 0.0;
+    double m_laplacianSumSquares = 0.0;
+
+    cv::Mat m_gray; ///<- Brightness around the rectangle being added
+    cv::Mat m_laplacian; ///<- Laplacian of the brightness around the rectangle being added
+    cv::Mat m_histogram; ///<- Brightness histogram of the rectangle being added
+};
+} // namespace
+
+double RegionStatistics::outsideFraction(const int low, const int high) const
+{
+    if (numPixels == 0)
+    {
+        return 0.0;
+    }
+    const auto begin = grayHistogram.begin();
+    const auto numBelow = accumulate(begin, begin + max(low, 0), uint64_t(0));
+    const auto numAbove = accumulate(begin + min(high + 1, 256), grayHistogram.end(), uint64_t(0));
+    return static_cast<double>(numBelow + numAbove) / numPixels;
+}
+
+ImageStatisticsSPtr ImageStatistics::compute(const cv::Mat & bgrImage,
+                                             const cv::Rect & faceRect,
+                                             const double borderRatio)
+{
+    TRACE_SPAN("ImageStatistics::compute");
+    const auto imageRect = cv::Rect(cv::Point(), bgrImage.size());
+    auto stats = make_shared<ImageStatistics>();
+    stats->imageSize = bgrImage.size();
+    stats->faceRect = faceRect & imageRect;
+
+    RegionAccumulator face;
+    face.add(bgrImage, stats->faceRect);
+    stats->face = face.statistics();
+
+    // Top band, then the left and right bands below it, so that no pixel is counted twice
+    const auto border = max(1, static_cast<int>(min(bgrImage.cols, bgrImage.rows) * borderRatio));
+    RegionAccumulator background;
+    background.add(bgrImage, cv::Rect(0, 0, bgrImage.cols, border) & imageRect);
+    background.add(bgrImage, cv::Rect(0, border, border, bgrImage.rows - border) & imageRect);
+    background.add(bgrImage, cv::Rect(bgrImage.cols - border, border, border, bgrImage.rows - border) & imageRect);
+    stats->background = background.statistics();
+    return stats;
+}
+} // namespace ppp
@@ -1,17 +1,25 @@
 
+#include <algorithm>
+#include <chrono>
 #include <iomanip>
 #include <opencv2/imgcodecs.hpp>
+#include <opencv2/imgproc/imgproc.hpp>
 #include <regex>
 
 #include "EasyExif.h"
 #include "ConfigLoader.h"
+#include "ImageStatistics.h"
 #include "ImageStore.h"
 #include "LandMarks.h"
+#include "Logger.h"
+#include "Tracer.h"
 #include "Utilities.h"
 
 namespace ppp
 {
-std::string ImageStore::storeImageData(const cv::Mat & image, const easyexif::EXIFInfoSPtr & exifInfo)
+std::string ImageStore::storeImageData(const cv::Mat & image,
+                                       std::vector<BYTE> && encodedImage,
+                                       const easyexif::EXIFInfoSPtr & exifInfo)
 {
     const auto crc32val = Utilities::crc32(0, image.datastart, image.dataend);
     std::stringstream s;
@@ -20,8 +28,22 @@ std::string ImageStore::storeImageData(const cv::Mat & image, const easyexif::EX
 
     {
         std::lock_guard<std::mutex> lg(m_mutex);
+        if (m_imageCollection.find(imageKey) != m_imageCollection.end())
+        {
+            // Same pixels already stored, keep the existing entry (and its landmarks)
+            m_stats.reinserts++;
+            boostImageToTopCache(imageKey);
+            return imageKey;
+        }
         const auto it = m_imageKeyOrder.insert(m_imageKeyOrder.end(), imageKey);
-        m_imageCollection[imageKey] = ImageData { image, exifInfo, std::make_shared<LandMarks>(), it };
+        auto & imageData = m_imageCollection[imageKey];
+        imageData.encodedImage = std::make_shared<const std::vector<BYTE>>(std::move(encodedImage));
+        imageData.exifInfo = exifInfo;
+        imageData.landMarks = std::make_shared<LandMarks>();
+        imageData.storeListOrder = it;
+        // Just uploaded images are about to be processed
+        addToDecodedSet(imageKey, imageData, image);
+        m_stats.inserts++;
     }
 
     handleStoreSize();
@@ -50,6 +72,7 @@ std::string ImageStore::setImage(const char * bufferData, const size_t bufferLen
 {
     cv::Mat inputImage;
     easyexif::EXIFInfoSPtr exifInfo;
+    std::vector<BYTE> encodedImage;
 
     if (bufferLength <= 0)
     {
@@ -68,30 +91,142 @@ std::string ImageStore::setImage(const char * bufferData, const size_t bufferLen
         auto decodedBytes = Utilities::base64Decode(bufferData + offset, dataLen);
         const auto decodedBytesSize = static_cast<int>(decodedBytes.size());
         const cv::_InputArray inputArray(decodedBytes.data(), decodedBytesSize);
+        TRACE_SPAN("ImageStore::decode", "base64");
         inputImage = imdecode(inputArray, cv::IMREAD_COLOR);
         exifInfo = decodeExifInfo(decodedBytes.data(), decodedBytesSize);
+        encodedImage = std::move(decodedBytes);
     }
     else
     {
         const cv::_InputArray inputArray(bufferData, static_cast<int>(bufferLength));
+        TRACE_SPAN("ImageStore::decode");
         inputImage = imdecode(inputArray, cv::IMREAD_COLOR);
         exifInfo = decodeExifInfo(reinterpret_cast<const unsigned char *>(bufferData), bufferLength);
+        encodedImage.assign(bufferData, bufferData + bufferLength);
     }
-    return storeImageData(inputImage, exifInfo);
+    return storeImageData(inputImage, std::move(encodedImage), exifInfo);
 }
 
 bool ImageStore::containsImage(const std::string & imageKey)
 {
     std::lock_guard<std::mutex> lg(m_mutex);
     boostImageToTopCache(imageKey);
-    return m_imageCollection.find(imageKey) != m_imageCollection.end();
+    const auto found = m_imageCollection.find(imageKey) != m_imageCollection.end();
+    if (found)
+    {
+        m_stats.hits++;
+    }
+    else
+    {
+        m_stats.misses++;
+    }
+    return found;
 }
 
 cv::Mat ImageStore::getImage(const std::string & imageKey)
 {
+    std::shared_ptr<const std::vector<BYTE>> encodedImage;
+    {
+        std::lock_guard<std::mutex> lg(m_mutex);
+        const auto it = m_imageCollection.find(imageKey);
+        if (it == m_imageCollection.end() || !it->second.encodedImage)
+        {
+            return cv::Mat();
+        }
+        boostImageToTopCache(imageKey);
+        auto & imageData = it->second;
+        if (!imageData.image.empty())
+        {
+            m_decodedKeyOrder.splice(m_decodedKeyOrder.end(), m_decodedKeyOrder, imageData.decodedListOrder);
+            m_stats.decodedHits++;
+            return imageData.image;
+        }
+        m_stats.decodedMisses++;
+        encodedImage = imageData.encodedImage;
+    }
+
+    // Decode without holding the lock, the encoded bytes are never modified
+    const auto start = std::chrono::steady_clock::now();
+    cv::Mat image;
+    {
+        TRACE_SPAN("ImageStore::decode", "miss");
+        const cv::_InputArray inputArray(encodedImage->data(), static_cast<int>(encodedImage->size()));
+        image = imdecode(inputArray, cv::IMREAD_COLOR);
+    }
+    const auto decodeMs = std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - start).count();
+
     std::lock_guard<std::mutex> lg(m_mutex);
-    boostImageToTopCache(imageKey);
-    return m_imageCollection[imageKey].image;
+    m_stats.decodeOnMissMs += decodeMs;
+    const auto it = m_imageCollection.find(imageKey);
+    if (it != m_imageCollection.end())
+    {
+        if (!it->second.image.empty())
+        {
+            // Decoded by another thread meanwhile
+            return it->second.image;
+        }
+        addToDecodedSet(imageKey, it->second, image);
+    }
+    return image;
+}
+
+std::string ImageStore::getImagePreview(const std::string & imageKey, const int maxDimension, const std::string & format)
+{
+    static const std::unordered_map<std::string, std::string> extensions = {
+        { "png", ".png" }, { "jpeg", ".jpg" }, { "jpg", ".jpg" }, { "webp", ".webp" }
+    };
+    const auto extension = extensions.find(format);
+    if (extension == extensions.end())
+    {
+        throw std::runtime_error("Unsupported preview format '" + format + "'");
+    }
+    const auto previewKey = extension->second + ":" + std::to_string(std::max(maxDimension, 0));
+
+    {
+        std::lock_guard<std::mutex> lg(m_mutex);
+        const auto it = m_imageCollection.find(imageKey);
+        if (it == m_imageCollection.end())
+        {
+            throw std::runtime_error("Image with key='" + imageKey + "' not found!");
+        }
+        boostImageToTopCache(imageKey);
+        const auto preview = it->second.previews.find(previewKey);
+        if (preview != it->second.previews.end())
+        {
+            m_stats.previewHits++;
+            return preview->second;
+        }
+        m_stats.previewMisses++;
+    }
+
+    const auto image = getImage(imageKey);
+    if (image.empty())
+    {
+        throw std::runtime_error("Image with key='" + imageKey + "' not found!");
+    }
+
+    // Resize and encode without holding the lock, the image pixels are never modified
+    cv::Mat previewImage = image;
+    const auto scale = maxDimension > 0 ? double(maxDimension) / std::max(image.cols, image.rows) : 1.0;
+    if (scale < 1.0)
+    {
+        TRACE_SPAN("ImageStore::resizePreview");
+        resize(image, previewImage, cv::Size(), scale, scale, cv::INTER_AREA);
+    }
+    std::vector<BYTE> encodedPreview;
+    {
+        TRACE_SPAN("ImageStore::encodePreview", format);
+        imencode(extension->second, previewImage, encodedPreview);
+    }
+    std::string preview(encodedPreview.begin(), encodedPreview.end());
+
+    std::lock_guard<std::mutex> lg(m_mutex);
+    const auto it = m_imageCollection.find(imageKey);
+    if (it != m_imageCollection.end())
+    {
+        it->second.previews[previewKey] = preview;
+    }
+    return preview;
 }
 
 LandMarksSPtr ImageStore::getLandMarks(const std::string & imageKey)
@@ -101,6 +236,43 @@ LandMarksSPtr ImageStore::getLandMarks(const std::string & imageKey)
     return m_imageCollection[imageKey].landMarks;
 }
 
+ImageStatisticsSPtr ImageStore::getImageStatistics(const std::string & imageKey)
+{
+    cv::Rect faceRect;
+    {
+        std::lock_guard<std::mutex> lg(m_mutex);
+        const auto it = m_imageCollection.find(imageKey);
+        if (it == m_imageCollection.end())
+        {
+            throw std::runtime_error("Image with key='" + imageKey + "' not found!");
+        }
+        boostImageToTopCache(imageKey);
+        faceRect = it->second.landMarks->vjFaceRect;
+        const auto & statistics = it->second.statistics;
+        // Statistics computed before the face was detected (or for another face) describe other regions
+        if (statistics && statistics->faceRect == (faceRect & cv::Rect(cv::Point(), statistics->imageSize)))
+        {
+            return statistics;
+        }
+    }
+
+    // Computed without holding the lock, like previews
+    const auto image = getImage(imageKey);
+    if (image.empty())
+    {
+        throw std::runtime_error("Image with key='" + imageKey + "' not found!");
+    }
+    const auto statistics = ImageStatistics::compute(image, faceRect);
+
+    std::lock_guard<std::mutex> lg(m_mutex);
+    const auto it = m_imageCollection.find(imageKey);
+    if (it != m_imageCollection.end())
+    {
+        it->second.statistics = statistics;
+    }
+    return statistics;
+}
+
 easyexif::EXIFInfoSPtr ImageStore::getExifInfo(const std::string & imageKey)
 {
     std::lock_guard<std::mutex> lg(m_mutex);
@@ -108,11 +280,34 @@ easyexif::EXIFInfoSPtr ImageStore::getExifInfo(const std::string & imageKey)
     return m_imageCollection[imageKey].exifInfo;
 }
 
+ImageStoreStats ImageStore::getStats() const
+{
+    std::lock_guard<std::mutex> lg(m_mutex);
+    auto stats = m_stats;
+    stats.numImages = m_imageCollection.size();
+    stats.storeSize = m_storeSize;
+    stats.imageBytes = m_decodedBytes;
+    stats.encodedBytes = 0;
+    for (const auto & kv : m_imageCollection)
+    {
+        stats.encodedBytes += kv.second.encodedImage ? kv.second.encodedImage->size() : 0;
+        for (const auto & preview : kv.second.previews)
+        {
+            stats.encodedBytes += preview.second.size();
+        }
+    }
+    return stats;
+}
+
 void ImageStore::configureInternal(const ConfigLoaderSPtr & config)
 {
     auto & imageStoreCfg = config->get({ "imageStore" });
     const size_t imageStoreSize = imageStoreCfg["size"].GetInt();
     setStoreSize(imageStoreSize);
+    if (imageStoreCfg.HasMember("decodedBytesLimit"))
+    {
+        setDecodedBytesLimit(imageStoreCfg["decodedBytesLimit"].GetUint64());
+    }
 }
 
 void ImageStore::setStoreSize(const size_t storeSize)
@@ -125,14 +320,44 @@ void ImageStore::setStoreSize(const size_t storeSize)
     handleStoreSize();
 }
 
-void ImageStore::handleStoreSize()
+void ImageStore::setDecodedBytesLimit(const size_t decodedBytesLimit)
+{
+    std::lock_guard<std::mutex> lg(m_mutex);
+    m_decodedBytesLimit = decodedBytesLimit;
+    handleDecodedSetSize();
+}
+
+void ImageStore::addEvictionListener(const EvictionListener & listener)
 {
     std::lock_guard<std::mutex> lg(m_mutex);
-    while (m_imageKeyOrder.size() > m_storeSize)
+    m_evictionListeners.push_back(listener);
+}
+
+void ImageStore::handleStoreSize()
+{
+    std::vector<std::string> evictedImageKeys;
+    std::vector<EvictionListener> evictionListeners;
+    {
+        std::lock_guard<std::mutex> lg(m_mutex);
+        while (m_imageKeyOrder.size() > m_storeSize)
+        {
+            const auto & imageKey = m_imageKeyOrder.front();
+            LOG_DEBUG("Evicting image '" + imageKey + "' from the image store");
+            removeFromDecodedSet(m_imageCollection[imageKey]);
+            m_imageCollection.erase(imageKey);
+            evictedImageKeys.push_back(imageKey);
+            m_imageKeyOrder.pop_front();
+            m_stats.evictions++;
+        }
+        evictionListeners = m_evictionListeners;
+    }
+
+    for (const auto & imageKey : evictedImageKeys)
     {
-        const auto & imageKey = m_imageKeyOrder.front();
-        m_imageCollection.erase(imageKey);
-        m_imageKeyOrder.pop_front();
+        for (const auto & listener : evictionListeners)
+        {
+            listener(imageKey);
+        }
     }
 }
 
@@ -147,4 +372,32 @@ void ImageStore::boostImageToTopCache(const std::string & imageKey)
         it->second.storeListOrder = newOrderIt;
     }
 }
+
+void ImageStore::addToDecodedSet(const std::string & imageKey, ImageData & imageData, const cv::Mat & image)
+{
+    imageData.image = image;
+    imageData.decodedListOrder = m_decodedKeyOrder.insert(m_decodedKeyOrder.end(), imageKey);
+    m_decodedBytes += image.total() * image.elemSize();
+    handleDecodedSetSize();
+}
+
+void ImageStore::removeFromDecodedSet(ImageData & imageData)
+{
+    if (imageData.image.empty())
+    {
+        return;
+    }
+    // Callers still holding the image keep their copy, the store only drops its reference
+    m_decodedBytes -= imageData.image.total() * imageData.image.elemSize();
+    m_decodedKeyOrder.erase(imageData.decodedListOrder);
+    imageData.image = cv::Mat();
+}
+
+void ImageStore::handleDecodedSetSize()
+{
+    while (m_decodedBytes > m_decodedBytesLimit && m_decodedKeyOrder.size() > 1)
+    {
+        removeFromDecodedSet(m_imageCollection.at(m_decodedKeyOrder.front()));
+    }
+}
 } // namespace ppp
@@ -3,6 +3,7 @@
 #include "Utilities.h"
 
 #include "ConfigLoader.h"
+#include "ModelRegistry.h"
 #include <algorithm>
 #include <opencv2/imgproc/imgproc.hpp>
 #include <opencv2/objdetect/objdetect.hpp>
@@ -21,8 +22,15 @@ void LipsDetector::configureInternal(const ConfigLoaderSPtr & config)
 
     if (m_useHaarCascades)
     {
-        const auto haarClassifierBase64 = lipsDetectorCfg["haarCascade"]["data"].GetString();
-        m_pMouthCascadeClassifier = Utilities::loadClassifierFromBase64(haarClassifierBase64);
+        // OpenCV cascades keep per detection buffers so each detector builds its own, the decoded definition is shared
+        const vector<string> cascadeNode = { "lipsDetector", "haarCascade" };
+        const auto decodeXml = [&lipsDetectorCfg]() {
+            return make_shared<string>(
+                Utilities::decodeClassifierDefinition(lipsDetectorCfg["haarCascade"]["data"].GetString()));
+        };
+        const auto fingerprint = config->getResourceFingerprint(cascadeNode);
+        m_mouthCascadeXml = ModelRegistry::instance().get<string>(fingerprint, decodeXml);
+        m_pMouthCascadeClassifier = Utilities::createHaarClassifier(*m_mouthCascadeXml);
     }
     m_isConfigured = true;
 }
@@ -74,22 +82,8 @@ bool LipsDetector::detectLandMarks(const Mat & inputImage, LandMarks & landmarks
 
     if (m_useColorSegmentationAlgorithm)
     {
-        Mat colorTformImage(mouthRoiHeight, mouthRoiWidth, CV_32F);
-
-        auto dstBeg = colorTformImage.begin<float>();
-        auto srcBeg = mouthRoiImage.begin<Vec3b>();
-        auto srcEnd = mouthRoiImage.end<Vec3b>();
-
-        std::transform(srcBeg, srcEnd, dstBeg, [](const Vec3b & pixel) {
-            const auto rgbSum = static_cast<float>(pixel[0]) + pixel[1] + pixel[2];
-            const auto r = pixel[2] / rgbSum;
-            const auto g = pixel[1] / rgbSum;
-            const auto v = r / (r + g) * (1 - g / (r + g));
-            return v * v * 255;
-        });
-
         Mat u, u2, v, binaryImg;
-        colorTformImage.convertTo(u, CV_8UC1);
+        colorTransform(mouthRoiImage, u);
         blur(u, u2, Size(9, 3));
 
         threshold(u, v, 0, 255, THRESH_OTSU);
@@ -185,6 +179,49 @@ bool LipsDetector::detectLandMarks(const Mat & inputImage, LandMarks & landmarks
     return true;
 }
 
+void LipsDetector::colorTransform(const Mat & bgrImage, Mat & transformImage)
+{
+    // Same operations in the same order as colorTransformPerPixel so that the results are identical
+    bgrImage.convertTo(m_bgrImage, CV_32F);
+    split(m_bgrImage, m_channels);
+    const auto & b = m_channels[0];
+    const auto & g = m_channels[1];
+    const auto & r = m_channels[2];
+    add(b, g, m_channelsSum);
+    add(m_channelsSum, r, m_channelsSum);
+
+    // Normalized red and green, then v = r / (r + g) * (1 - g / (r + g))
+    divide(r, m_channelsSum, m_red);
+    divide(g, m_channelsSum, m_green);
+    add(m_red, m_green, m_redGreenSum);
+    divide(m_red, m_redGreenSum, m_red);
+    divide(m_green, m_redGreenSum, m_green);
+    subtract(Scalar(1), m_green, m_green);
+    multiply(m_red, m_green, m_red);
+
+    multiply(m_red, m_red, m_red);
+    m_red.convertTo(transformImage, CV_8U, 255);
+}
+
+void LipsDetector::colorTransformPerPixel(const Mat & bgrImage, Mat & transformImage)
+{
+    Mat colorTformImage(bgrImage.rows, bgrImage.cols, CV_32F);
+
+    auto dstBeg = colorTformImage.begin<float>();
+    auto srcBeg = bgrImage.begin<Vec3b>();
+    auto srcEnd = bgrImage.end<Vec3b>();
+
+    std::transform(srcBeg, srcEnd, dstBeg, [](const Vec3b & pixel) {
+        const auto rgbSum = static_cast<float>(pixel[0]) + pixel[1] + pixel[2];
+        const auto r = pixel[2] / rgbSum;
+        const auto g = pixel[1] / rgbSum;
+        const auto v = r / (r + g) * (1 - g / (r + g));
+        return v * v * 255;
+    });
+
+    colorTformImage.convertTo(transformImage, CV_8UC1);
+}
+
 bool LipsDetector::getBeardMask(Mat & mouthAreaImage) const
 {
     // mouthAreaImage
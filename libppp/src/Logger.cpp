@@ -0,0 +1,314 @@
+#include "Logger.h"
+#include "ConfigLoader.h"
+
+#include <algorithm>
+#include <chrono>
+#include <cstring>
+#include <fstream>
+#include <functional>
+
+#include <rapidjson/stringbuffer.h>
+#include <rapidjson/writer.h>
+
+using namespace std;
+
+namespace ppp
+{
+namespace
+{
+uint64_t currentThreadId()
+{
+    return static_cast<uint64_t>(hash<thread::id>()(this_thread::get_id()) & 0xFFFFFFFF);
+}
+
+void writeRecord(rapidjson::Writer<rapidjson::StringBuffer> & writer, const LogRecord & record)
+{
+    writer.StartObject();
+    writer.Key("seq");
+    writer.Uint64(record.sequence);
+    writer.Key("level");
+    writer.String(Logger::toString(record.level));
+    writer.Key("ts");
+    writer.Int64(record.timestampUs);
+    writer.Key("tid");
+    writer.Uint64(record.threadId);
+    writer.Key("message");
+    writer.String(record.message.c_str(), static_cast<rapidjson::SizeType>(record.message.size()));
+    writer.EndObject();
+}
+} // namespace
+
+Logger & Logger::instance()
+{
+    static Logger logger;
+    return logger;
+}
+
+Logger::Logger()
+{
+    setBufferSize(1024);
+}
+
+Logger::~Logger()
+{
+    stopSink();
+}
+
+void Logger::configure(const ConfigLoaderSPtr & config)
+{
+    const auto & root = config->get({});
+    if (!root.HasMember("logging"))
+    {
+        return;
+    }
+    const auto & loggingCfg = root["logging"];
+    if (loggingCfg.HasMember("level"))
+    {
+        setLevel(fromString(loggingCfg["level"].GetString()));
+    }
+    if (loggingCfg.HasMember("bufferSize"))
+    {
+        const size_t bufferSize = loggingCfg["bufferSize"].GetUint();
+        if (bufferSize != m_capacityMask + 1)
+        {
+            setBufferSize(bufferSize);
+        }
+    }
+    if (loggingCfg.HasMember("file") && loggingCfg["file"].IsString())
+    {
+        const auto flushIntervalMs = loggingCfg.HasMember("flushIntervalMs") ? loggingCfg["flushIntervalMs"].GetInt()
+                                                                             : 200;
+        setOutputFile(loggingCfg["file"].GetString(), flushIntervalMs);
+    }
+}
+
+void Logger::setLevel(const LogLevel level)
+{
+    m_level.store(static_cast<int>(level), memory_order_relaxed);
+}
+
+void Logger::setBufferSize(const size_t bufferSize)
+{
+    size_t capacity = 1;
+    while (capacity < bufferSize)
+    {
+        capacity <<= 1;
+    }
+    const auto restartSink = m_sinkThread.joinable();
+    stopSink();
+    {
+        lock_guard<mutex> lock(m_drainMutex);
+        m_slots = make_unique<Slot[]>(capacity);
+        m_capacityMask = capacity - 1;
+        m_drainIndex = m_writeIndex.load();
+    }
+    if (restartSink)
+    {
+        startSink();
+    }
+}
+
+void Logger::setOutputFile(const string & outputFilePath, const int flushIntervalMs)
+{
+    stopSink();
+    m_outputFilePath = outputFilePath;
+    m_flushIntervalMs = max(flushIntervalMs, 1);
+    if (!m_outputFilePath.empty())
+    {
+        startSink();
+    }
+}
+
+void Logger::log(const LogLevel level, const string & message)
+{
+    const auto position = m_writeIndex.fetch_add(1, memory_order_relaxed);
+    auto & slot = m_slots[position & m_capacityMask];
+
+    while (slot.busy.test_and_set(memory_order_acquire))
+    {
+        this_thread::yield();
+    }
+    // A writer that lapped us already filled this slot with a newer record
+    if (slot.sequence.load(memory_order_relaxed) <= position)
+    {
+        slot.level = level;
+        slot.timestampUs
+            = chrono::duration_cast<chrono::microseconds>(chrono::system_clock::now().time_since_epoch()).count();
+        slot.threadId = currentThreadId();
+        slot.messageLength = min(message.size(), MAX_MESSAGE_LENGTH);
+        memcpy(slot.message, message.data(), slot.messageLength);
+        slot.sequence.store(position + 1, memory_order_release);
+    }
+    slot.busy.clear(memory_order_release);
+
+    if (level >= LogLevel::Error && m_sinkThread.joinable())
+    {
+        m_sinkCondition.notify_one();
+    }
+}
+
+bool Logger::readSlot(const uint64_t position, LogRecord & record) const
+{
+    auto & slot = m_slots[position & m_capacityMask];
+    if (slot.sequence.load(memory_order_acquire) != position + 1)
+    {
+        return false;
+    }
+    while (slot.busy.test_and_set(memory_order_acquire))
+    {
+        this_thread::yield();
+    }
+    const auto valid = slot.sequence.load(memory_order_relaxed) == position + 1;
+    if (valid)
+    {
+        record.sequence = position;
+        record.level = slot.level;
+        record.timestampUs = slot.timestampUs;
+        record.threadId = slot.threadId;
+        record.message.assign(slot.message, slot.messageLength);
+    }
+    slot.busy.clear(memory_order_release);
+    return valid;
+}
+
+vector<LogRecord> Logger::readFrom(uint64_t & cursor, const size_t maxRecords) const
+{
+    vector<LogRecord> records;
+    const auto writeIndex = m_writeIndex.load(memory_order_acquire);
+    const auto capacity = m_capacityMask + 1;
+    if (writeIndex - cursor > capacity)
+    {
+        // The oldest records were overwritten before being read
+        cursor = writeIndex - capacity;
+    }
+    while (cursor < writeIndex && records.size() < maxRecords)
+    {
+        LogRecord record;
+        if (readSlot(cursor, record))
+        {
+            records.emplace_back(move(record));
+        }
+        else if (m_slots[cursor & m_capacityMask].sequence.load(memory_order_acquire) <= cursor)
+        {
+            // Still being written, pick it up on the next read
+            break;
+        }
+        ++cursor;
+    }
+    return records;
+}
+
+vector<LogRecord> Logger::drain(const size_t maxRecords)
+{
+    lock_guard<mutex> lock(m_drainMutex);
+    return readFrom(m_drainIndex, maxRecords);
+}
+
+string Logger::drainJson(const size_t maxBytes)
+{
+    lock_guard<mutex> lock(m_drainMutex);
+
+    string result = "[";
+    auto cursor = m_drainIndex;
+    while (true)
+    {
+        auto records = readFrom(cursor, 1);
+        if (records.empty())
+        {
+            break;
+        }
+        rapidjson::StringBuffer buffer;
+        rapidjson::Writer<rapidjson::StringBuffer> writer(buffer);
+        writeRecord(writer, records.front());
+
+        // Leave room for the separator, the closing bracket and the null terminator
+        if (result.size() + buffer.GetSize() + 3 > maxBytes)
+        {
+            break;
+        }
+        if (result.size() > 1)
+        {
+            result += ',';
+        }
+        result.append(buffer.GetString(), buffer.GetSize());
+        m_drainIndex = cursor;
+    }
+    result += ']';
+    return result;
+}
+
+const char * Logger::toString(const LogLevel level)
+{
+    switch (level)
+    {
+        case LogLevel::Trace:
+            return "trace";
+        case LogLevel::Debug:
+            return "debug";
+        case LogLevel::Info:
+            return "info";
+        case LogLevel::Warning:
+            return "warning";
+        case LogLevel::Error:
+            return "error";
+        default:
+            return "off";
+    }
+}
+
+LogLevel Logger::fromString(const string & levelName)
+{
+    for (const auto level :
+         { LogLevel::Trace, LogLevel::Debug, LogLevel::Info, LogLevel::Warning, LogLevel::Error, LogLevel::Off })
+    {
+        if (levelName == toString(level))
+        {
+            return level;
+        }
+    }
+    throw runtime_error("Unknown log level '" + levelName + "'");
+}
+
+void Logger::startSink()
+{
+#ifndef EMSCRIPTEN
+    m_stopSink = false;
+    m_sinkIndex = m_writeIndex.load();
+    m_sinkThread = thread(&Logger::runSink, this);
+#endif
+}
+
+void Logger::stopSink()
+{
+    if (!m_sinkThread.joinable())
+    {
+        return;
+    }
+    {
+        lock_guard<mutex> lock(m_sinkMutex);
+        m_stopSink = true;
+    }
+    m_sinkCondition.notify_one();
+    m_sinkThread.join();
+}
+
+void Logger::runSink()
+{
+    ofstream ofs(m_outputFilePath, ios_base::out | ios_base::app);
+    auto stopping = false;
+    while (!stopping)
+    {
+        {
+            unique_lock<mutex> lock(m_sinkMutex);
+            m_sinkCondition.wait_for(lock, chrono::milliseconds(m_flushIntervalMs), [this] { return m_stopSink; });
+            stopping = m_stopSink;
+        }
+        for (const auto & record : readFrom(m_sinkIndex, SIZE_MAX))
+        {
+            ofs << record.timestampUs << ' ' << toString(record.level) << " [" << record.threadId << "] "
+                << record.message << '\n';
+        }
+        ofs.flush();
+    }
+}
+} // namespace ppp
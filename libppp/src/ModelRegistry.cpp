@@ -0,0 +1,43 @@
+#include "ModelRegistry.h"
+
+using namespace std;
+
+namespace ppp
+{
+ModelRegistry & ModelRegistry::instance()
+{
+    static ModelRegistry registry;
+    return registry;
+}
+
+shared_ptr<ModelRegistry::Entry> ModelRegistry::getEntry(const std::string & key)
+{
+    lock_guard<mutex> lock(m_mutex);
+    auto & entry = m_entries[key];
+    if (!entry)
+    {
+        entry = make_shared<Entry>();
+    }
+    return entry;
+}
+
+size_t ModelRegistry::numLiveModels() const
+{
+    lock_guard<mutex> lock(m_mutex);
+    size_t numLiveModels = 0;
+    for (const auto & kv : m_entries)
+    {
+        lock_guard<std::mutex> entryLock(kv.second->mutex);
+        numLiveModels += kv.second->model.expired() ? 0 : 1;
+    }
+    return numLiveModels;
+}
+
+void ModelRegistry::clear()
+{
+    lock_guard<mutex> lock(m_mutex);
+    m_entries.clear();
+    m_numLoads = 0;
+    m_numHits = 0;
+}
+} // namespace ppp
@@ -0,0 +1,131 @@
+#include "PhotoStandardCatalogue.h"
+#include "ConfigLoader.h"
+#include "Logger.h"
+#include "Utilities.h"
+
+#include <iterator>
+
+using namespace std;
+
+namespace ppp
+{
+void PhotoStandardCatalogue::load(const rapidjson::Value & standards)
+{
+    if (!standards.IsArray())
+    {
+        throw runtime_error("The photo standard catalogue must be an array of standards");
+    }
+
+    unordered_map<string, Entry> entries;
+    unordered_map<string, vector<string>> idsByCountry;
+    for (const auto & standard : standards.GetArray())
+    {
+        const string standardId = standard["id"].GetString();
+        Entry entry;
+        entry.country = Utilities::getField(standard, "country", string());
+        entry.docType = Utilities::getField(standard, "docType", string());
+        entry.standard = PhotoStandard::fromJson(standard["dimensions"]);
+        idsByCountry[entry.country].push_back(standardId);
+        if (!entries.emplace(standardId, std::move(entry)).second)
+        {
+            throw runtime_error("Photo standard '" + standardId + "' is defined more than once");
+        }
+    }
+
+    lock_guard<mutex> lock(m_cacheMutex);
+    m_entries = std::move(entries);
+    m_idsByCountry = std::move(idsByCountry);
+    m_standardsByDpi.clear();
+}
+
+void PhotoStandardCatalogue::load(std::istream & stream)
+{
+    const string content((istreambuf_iterator<char>(stream)), istreambuf_iterator<char>());
+    rapidjson::Document d;
+    d.Parse(content.c_str());
+    if (d.HasParseError())
+    {
+        throw runtime_error("The photo standard catalogue is not a valid JSON document");
+    }
+    load(d);
+}
+
+size_t PhotoStandardCatalogue::size() const
+{
+    return m_entries.size();
+}
+
+bool PhotoStandardCatalogue::contains(const std::string & standardId) const
+{
+    return m_entries.find(standardId) != m_entries.end();
+}
+
+PhotoStandardSPtr PhotoStandardCatalogue::get(const std::string & standardId, const double minDpi) const
+{
+    const auto it = m_entries.find(standardId);
+    if (it == m_entries.end())
+    {
+        throw runtime_error("Photo standard '" + standardId + "' was not found in the catalogue");
+    }
+
+    const auto & standard = it->second.standard;
+    if (minDpi <= standard->resolutionDpi())
+    {
+        return standard;
+    }
+
+    lock_guard<mutex> lock(m_cacheMutex);
+    auto & standardAtDpi = m_standardsByDpi[{ standardId, minDpi }];
+    if (!standardAtDpi)
+    {
+        standardAtDpi = make_shared<PhotoStandard>(*standard);
+        standardAtDpi->overrideResolution(minDpi);
+    }
+    return standardAtDpi;
+}
+
+vector<string> PhotoStandardCatalogue::find(const std::string & country, const std::string & docType) const
+{
+    const auto it = m_idsByCountry.find(country);
+    if (it == m_idsByCountry.end())
+    {
+        return {};
+    }
+    if (docType.empty())
+    {
+        return it->second;
+    }
+
+    vector<string> standardIds;
+    for (const auto & standardId : it->second)
+    {
+        if (m_entries.at(standardId).docType == docType)
+        {
+            standardIds.push_back(standardId);
+        }
+    }
+    return standardIds;
+}
+
+void PhotoStandardCatalogue::configureInternal(const ConfigLoaderSPtr & config)
+{
+    if (!config->get({}).HasMember("photoStandards"))
+    {
+        // Requests then have to carry the full standard definition
+        m_isConfigured = true;
+        return;
+    }
+
+    config->loadResource({ "photoStandards" }, [this](const bool success, std::istream & stream) {
+        if (success)
+        {
+            load(stream);
+            m_isConfigured = true;
+        }
+        else
+        {
+            LOG_WARNING("The photo standard catalogue could not be loaded, requests must provide the standard");
+        }
+    });
+}
+} // namespace ppp
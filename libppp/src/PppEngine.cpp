@@ -1,4 +1,7 @@
 
+#include <algorithm>
+#include <functional>
+#include <future>
 #include <istream>
 #include <streambuf>
 
@@ -7,14 +10,20 @@
 #include "CrownChinEstimator.h"
 #include "EyeDetector.h"
 #include "FaceDetector.h"
+#include "ImageStatistics.h"
 #include "ConfigLoader.h"
 #include "ImageStore.h"
 #include "LandMarks.h"
 #include "LipsDetector.h"
+#include "Logger.h"
+#include "ModelRegistry.h"
 #include "PhotoPrintMaker.h"
 #include "PhotoStandard.h"
+#include "PhotoStandardCatalogue.h"
 #include "PppEngine.h"
 #include "PrintDefinition.h"
+#include "RenderCache.h"
+#include "Tracer.h"
 #include "Utilities.h"
 
 #include <dlib/image_processing/shape_predictor.h>
@@ -26,6 +35,16 @@ using namespace std;
 
 namespace ppp
 {
+namespace
+{
+const string ACCURATE_PREDICTOR_PROFILE = "accurate";
+
+/*!@brief Name under which configure loads the model of a profile !*/
+string predictorComponentName(const string & profileName)
+{
+    return profileName == ACCURATE_PREDICTOR_PROFILE ? "shapePredictor" : "shapePredictor." + profileName;
+}
+} // namespace
 
 PppEngine::PppEngine(const IDetectorSPtr & pFaceDetector,
                      const IDetectorSPtr & pEyesDetector,
@@ -41,69 +60,221 @@ PppEngine::PppEngine(const IDetectorSPtr & pFaceDetector,
 , m_complianceChecker(pComplianceChecker ? pComplianceChecker : make_shared<ComplianceChecker>())
 , m_pPhotoPrintMaker(pPhotoPrintMaker ? pPhotoPrintMaker : make_shared<PhotoPrintMaker>())
 , m_pImageStore(pImageStore ? pImageStore : make_shared<ImageStore>())
+, m_photoStandardCatalogue(make_shared<PhotoStandardCatalogue>())
+, m_renderCache(make_shared<RenderCache>())
 {
+    m_pImageStore->addEvictionListener(
+        [renderCache = m_renderCache](const string & imageKey) { renderCache->invalidateImage(imageKey); });
+}
+
+PppEngine::~PppEngine()
+{
+    // Background loads and the configured notification refer to this engine
+    waitForPendingLoads();
 }
 
 bool PppEngine::isConfigured() const
 {
-    return m_shapePredictor != nullptr && m_pFaceDetector->isConfigured() && m_pEyesDetector->isConfigured()
-        && m_pLipsDetector->isConfigured();
+    return isConfigured("shapePredictor") && isConfigured("faceDetector") && isConfigured("eyesDetector")
+        && isConfigured("lipsDetector");
+}
+
+bool PppEngine::isConfigured(const std::string & componentName) const
+{
+    const auto it = m_pendingLoads.find(componentName);
+    if (it != m_pendingLoads.end() && it->second.wait_for(chrono::seconds(0)) != future_status::ready)
+    {
+        return false;
+    }
+
+    if (componentName == "shapePredictor" || componentName.rfind("shapePredictor.", 0) == 0)
+    {
+        const auto profileName = componentName == "shapePredictor" ? ACCURATE_PREDICTOR_PROFILE
+                                                                   : componentName.substr(componentName.find('.') + 1);
+        const auto profileIt = m_predictorProfiles.find(profileName);
+        return profileIt != m_predictorProfiles.end() && profileIt->second.model != nullptr;
+    }
+    if (componentName == "faceDetector")
+        return m_pFaceDetector->isConfigured();
+    if (componentName == "eyesDetector")
+        return m_pEyesDetector->isConfigured();
+    if (componentName == "lipsDetector")
+        return m_pLipsDetector->isConfigured();
+    if (componentName == "crownChinEstimator" || componentName == "photoPrintMaker" || componentName == "imageStore")
+        return m_configLoader != nullptr;
+    if (componentName == "photoStandards")
+        return m_photoStandardCatalogue->isConfigured();
+    throw runtime_error("Unknown engine component '" + componentName + "'");
+}
+
+void PppEngine::waitUntilConfigured() const
+{
+    for (const auto & kv : m_pendingLoads)
+    {
+        kv.second.get();
+    }
+    if (!isConfigured())
+    {
+        throw runtime_error("Some engine components could not be loaded");
+    }
+}
+
+void PppEngine::waitForComponent(const std::string & componentName) const
+{
+    const auto it = m_pendingLoads.find(componentName);
+    if (it != m_pendingLoads.end())
+    {
+        it->second.get();
+    }
+}
+
+void PppEngine::setNumThreads(const int numThreads)
+{
+    // OpenCV restores its default pool size for negative values, 0 would mean 1 thread
+    cv::setNumThreads(numThreads > 0 ? numThreads : -1);
+    LOG_INFO("Intra-op thread count set to " + to_string(cv::getNumThreads()));
+}
+
+int PppEngine::getNumThreads()
+{
+    return cv::getNumThreads();
+}
+
+void PppEngine::waitForPendingLoads() const
+{
+    for (const auto & kv : m_pendingLoads)
+    {
+        kv.second.wait();
+    }
+    if (m_configuredNotification.valid())
+    {
+        m_configuredNotification.wait();
+    }
 }
 
 bool PppEngine::configure(const std::string & configFilePathOrContent, void * callback)
 {
+    typedef void VoidFn();
+    waitForPendingLoads();
+    m_pendingLoads.clear();
+    m_configLoader = nullptr;
+
     const auto configLoader = std::make_shared<ConfigLoader>(configFilePathOrContent, [callback, this]() {
-        typedef void VoidFn();
-        if (isConfigured() && callback != nullptr)
+        // With asynchronous loading the callback is invoked once, after all the loads completed
+        if (!m_asyncLoading && isConfigured() && callback != nullptr)
             reinterpret_cast<VoidFn *>(callback)();
     });
 
-    configLoader->loadResource({ "shapePredictor" }, [this](const bool success, std::istream & stream) {
-        const auto shapePredictorObj = std::make_shared<dlib::shape_predictor>();
-        if (stream.good())
+#ifdef EMSCRIPTEN
+    m_asyncLoading = false;
+#else
+    const auto & root = configLoader->get({});
+    m_asyncLoading = true;
+    if (root.HasMember("resourceLoading") && root["resourceLoading"].HasMember("async"))
+    {
+        m_asyncLoading = root["resourceLoading"]["async"].GetBool();
+    }
+#endif
+    // Only a positive count overrides the thread budget, which may have been set before configuring
+    const auto & threadingRoot = configLoader->get({});
+    if (threadingRoot.HasMember("threading") && threadingRoot["threading"].HasMember("numThreads"))
+    {
+        const auto numThreads = threadingRoot["threading"]["numThreads"].GetInt();
+        if (numThreads > 0)
         {
-            deserialize(*shapePredictorObj, stream);
-            m_shapePredictor = shapePredictorObj;
+            setNumThreads(numThreads);
         }
-    });
-
-    m_pFaceDetector->configure(configLoader);
-    m_pEyesDetector->configure(configLoader);
-    m_pLipsDetector->configure(configLoader);
-    m_pCrownChinEstimator->configure(configLoader);
-    m_pImageStore->configure(configLoader);
+    }
 
-    m_pPhotoPrintMaker->configure(configLoader);
+    // Before the loads start: resizing the log buffer is not safe while the loading threads log
+    Logger::instance().configure(configLoader);
+    Tracer::instance().configure(configLoader);
 
-    const auto & spConfig = configLoader->get({ "shapePredictor" });
+    const auto startLoad = [this](const std::string & componentName, const std::function<void()> & load) {
+        if (m_asyncLoading)
+        {
+            m_pendingLoads[componentName] = std::async(std::launch::async, load).share();
+        }
+        else
+        {
+            load();
+        }
+    };
 
-    // Prepare landmark mapping
-    set<int> missingLandMarks;
-    const auto & array = spConfig["missingPoints"].GetArray();
-    for (rapidjson::SizeType i = 0; i < array.Size(); i++)
+    // The "accurate" profile is the "shapePredictor" node, others are declared in "shapePredictorProfiles". All the
+    // profiles are created before the loads start so that each load only sets the model of its own profile
+    m_predictorProfiles.clear();
+    vector<pair<string, vector<string>>> profileNodes = { { ACCURATE_PREDICTOR_PROFILE, { "shapePredictor" } } };
+    const auto & configRoot = configLoader->get({});
+    if (configRoot.HasMember("shapePredictorProfiles"))
+    {
+        for (const auto & profileNode : configRoot["shapePredictorProfiles"].GetObject())
+        {
+            const string profileName = profileNode.name.GetString();
+            profileNodes.push_back({ profileName, { "shapePredictorProfiles", profileName } });
+        }
+    }
+    for (const auto & profileNode : profileNodes)
     {
-        missingLandMarks.insert(array[i].GetInt());
+        const auto & spConfig = configLoader->get(profileNode.second);
+        m_predictorProfiles[profileNode.first].landmarkIndexMapping = createLandmarkIndexMapping(spConfig);
     }
-    m_landmarkIndexMapping = { { LandMarkType::EYE_PUPIL_CENTER_LEFT, std::vector<int> { 38, 39, 41, 42 } },
-                               { LandMarkType::EYE_PUPIL_CENTER_RIGHT, std::vector<int> { 44, 45, 47, 48 } },
-                               { LandMarkType::MOUTH_CORNER_LEFT, std::vector<int> { 49 } },
-                               { LandMarkType::MOUTH_CORNER_RIGHT, std::vector<int> { 55 } },
-                               { LandMarkType::CHIN_LOWEST_POINT, std::vector<int> { 9 } },
-                               { LandMarkType::NOSE_TIP_POINT, std::vector<int> { 34 } },
-                               { LandMarkType::EYE_OUTER_CORNER_LEFT, std::vector<int> { 37 } },
-                               { LandMarkType::EYE_OUTER_CORNER_RIGHT, std::vector<int> { 46 } } };
 
-    for (auto & kv : m_landmarkIndexMapping)
+    // Engines configured from the same model share a single read only instance
+    for (const auto & profileNode : profileNodes)
     {
-        for (auto & idx : kv.second)
-        {
-            const auto offset = std::distance(missingLandMarks.begin(), missingLandMarks.upper_bound(idx));
-            idx -= offset + 1;
-        }
+        auto & profile = m_predictorProfiles.at(profileNode.first);
+        const auto & nodePath = profileNode.second;
+        startLoad(predictorComponentName(profileNode.first), [&profile, nodePath, configLoader]() {
+            const auto spFingerprint = configLoader->getResourceFingerprint(nodePath);
+            // Looked up before loading the resource, which may have to be read or base64 decoded first
+            profile.model = ModelRegistry::instance().find<dlib::shape_predictor>(spFingerprint);
+            if (profile.model)
+            {
+                return;
+            }
+            configLoader->loadResource(nodePath, [&profile, spFingerprint](bool, std::istream & stream) {
+                const auto loadShapePredictor = [&stream]() {
+                    std::shared_ptr<dlib::shape_predictor> shapePredictorObj;
+                    if (stream.good())
+                    {
+                        shapePredictorObj = std::make_shared<dlib::shape_predictor>();
+                        deserialize(*shapePredictorObj, stream);
+                    }
+                    return shapePredictorObj;
+                };
+                profile.model = ModelRegistry::instance().get<dlib::shape_predictor>(spFingerprint, loadShapePredictor);
+            });
+        });
     }
+    startLoad("faceDetector", [this, configLoader]() { m_pFaceDetector->configure(configLoader); });
+    startLoad("eyesDetector", [this, configLoader]() { m_pEyesDetector->configure(configLoader); });
+    startLoad("lipsDetector", [this, configLoader]() { m_pLipsDetector->configure(configLoader); });
+
+    // Cheap to configure and needed by requests that don't detect anything (e.g. createTiledPrint)
+    m_pCrownChinEstimator->configure(configLoader);
+    m_pImageStore->configure(configLoader);
+
+    m_pPhotoPrintMaker->configure(configLoader);
+    m_photoStandardCatalogue->configure(configLoader);
+    m_renderCache->configure(configLoader);
 
     m_configLoader = configLoader;
 
+    if (m_asyncLoading && callback != nullptr)
+    {
+        const auto notifyWhenLoaded = [this, callback]() {
+            for (const auto & kv : m_pendingLoads)
+            {
+                kv.second.wait();
+            }
+            if (isConfigured())
+                reinterpret_cast<VoidFn *>(callback)();
+        };
+        m_configuredNotification = std::async(std::launch::async, notifyWhenLoaded).share();
+    }
+
+    LOG_INFO(m_asyncLoading ? "Engine configured, models are loading in the background" : "Engine configured");
     return true;
 }
 
@@ -115,61 +286,165 @@ void PppEngine::verifyImageExists(const string & imageKey) const
     }
 }
 
-bool PppEngine::detectLandMarks(const string & imageKey) const
+bool PppEngine::detectLandMarks(const string & imageKey, const std::string & predictorProfile) const
 {
     verifyImageExists(imageKey);
-    // Convert the image to gray scale as needed by some algorithms
-
     const auto & inputImage = m_pImageStore->getImage(imageKey);
     const auto & landMarks = m_pImageStore->getLandMarks(imageKey);
+    return detectLandMarks(inputImage, *landMarks, cv::Rect(), predictorProfile);
+}
+
+bool PppEngine::detectLandMarks(const cv::Mat & inputImage,
+                                LandMarks & landMarks,
+                                const cv::Rect & faceSearchWindow,
+                                const std::string & predictorProfile) const
+{
+    // Convert the image to gray scale as needed by some algorithms
     cv::Mat grayImage;
     cvtColor(inputImage, grayImage, cv::COLOR_BGR2GRAY);
 
     // Detect the face
-    if (!m_pFaceDetector->detectLandMarks(grayImage, *landMarks))
     {
-        return false;
+        TRACE_SPAN("FaceDetector::detectLandMarks");
+        waitForComponent("faceDetector");
+        if (faceSearchWindow.area() > 0)
+        {
+            // Only upright faces are tracked, a rotated one means the face was lost
+            const auto window = faceSearchWindow & cv::Rect(0, 0, grayImage.cols, grayImage.rows);
+            LandMarks windowLandMarks;
+            if (window.area() == 0 || !m_pFaceDetector->detectLandMarks(grayImage(window), windowLandMarks)
+                || windowLandMarks.imageRotation != 0)
+            {
+                return false;
+            }
+            landMarks.vjFaceRect = windowLandMarks.vjFaceRect + window.tl();
+            landMarks.imageRotation = 0;
+        }
+        else if (!m_pFaceDetector->detectLandMarks(grayImage, landMarks))
+        {
+            return false;
+        }
     }
 
     using namespace dlib;
-    // Detect the face
-    if (!m_pFaceDetector->detectLandMarks(grayImage, *landMarks))
+    full_object_detection shape;
+    const auto & profile = getPredictorProfile(predictorProfile);
     {
-        return false;
-    }
-    array2d<bgr_pixel> dlibImage;
-    assign_image(dlibImage, cv_image<bgr_pixel>(inputImage));
+        TRACE_SPAN("ShapePredictor::predict");
+        array2d<bgr_pixel> dlibImage;
+        assign_image(dlibImage, cv_image<bgr_pixel>(inputImage));
 
-    const auto & r = landMarks->vjFaceRect;
-    const auto faceRect = rectangle(r.x, r.y, r.x + r.width, r.y + r.height);
-    auto shape = (*m_shapePredictor)(dlibImage, faceRect);
+        const auto & r = landMarks.vjFaceRect;
+        const auto faceRect = rectangle(r.x, r.y, r.x + r.width, r.y + r.height);
+        shape = (*profile.model)(dlibImage, faceRect);
+    }
 
     const auto numParts = shape.num_parts();
-    landMarks->allLandmarks.clear();
-    landMarks->allLandmarks.reserve(numParts);
+    landMarks.allLandmarks.clear();
+    landMarks.allLandmarks.reserve(numParts);
     for (size_t i = 0; i < numParts; ++i)
     {
         auto & part = shape.part(i);
-        landMarks->allLandmarks.emplace_back(part.x(), part.y());
+        landMarks.allLandmarks.emplace_back(part.x(), part.y());
     }
 
-    const auto & lms = landMarks->allLandmarks;
-    landMarks->lipLeftCorner = getLandMark(lms, LandMarkType::MOUTH_CORNER_LEFT);
-    landMarks->lipRightCorner = getLandMark(lms, LandMarkType::MOUTH_CORNER_RIGHT);
-    landMarks->eyeLeftPupil = getLandMark(lms, LandMarkType::EYE_PUPIL_CENTER_LEFT);
-    landMarks->eyeRightPupil = getLandMark(lms, LandMarkType::EYE_PUPIL_CENTER_RIGHT);
-    landMarks->chinPoint = getLandMark(lms, LandMarkType::CHIN_LOWEST_POINT);
-    landMarks->noseTip = getLandMark(lms, LandMarkType::NOSE_TIP_POINT);
-    landMarks->eyeLeftCorner = getLandMark(lms, LandMarkType::EYE_OUTER_CORNER_LEFT);
-    landMarks->eyeRightCorner = getLandMark(lms, LandMarkType::EYE_OUTER_CORNER_RIGHT);
+    const auto & lms = landMarks.allLandmarks;
+    landMarks.lipLeftCorner = getLandMark(profile, lms, LandMarkType::MOUTH_CORNER_LEFT);
+    landMarks.lipRightCorner = getLandMark(profile, lms, LandMarkType::MOUTH_CORNER_RIGHT);
+    landMarks.eyeLeftPupil = getLandMark(profile, lms, LandMarkType::EYE_PUPIL_CENTER_LEFT);
+    landMarks.eyeRightPupil = getLandMark(profile, lms, LandMarkType::EYE_PUPIL_CENTER_RIGHT);
+    landMarks.chinPoint = getLandMark(profile, lms, LandMarkType::CHIN_LOWEST_POINT);
+    landMarks.noseTip = getLandMark(profile, lms, LandMarkType::NOSE_TIP_POINT);
+    landMarks.eyeLeftCorner = getLandMark(profile, lms, LandMarkType::EYE_OUTER_CORNER_LEFT);
+    landMarks.eyeRightCorner = getLandMark(profile, lms, LandMarkType::EYE_OUTER_CORNER_RIGHT);
 
     // Estimate chin and crown point (maths from existing landmarks)
-    return m_pCrownChinEstimator->estimateCrownChin(*landMarks);
+    TRACE_SPAN("CrownChinEstimator::estimateCrownChin");
+    return m_pCrownChinEstimator->estimateCrownChin(landMarks);
 }
 
-cv::Point PppEngine::getLandMark(const std::vector<cv::Point> & landmarks, const LandMarkType type) const
+unordered_map<LandMarkType, vector<int>, EnumClassHash> PppEngine::createLandmarkIndexMapping(
+    const rapidjson::Value & spConfig)
 {
-    const auto & indices = m_landmarkIndexMapping.at(type);
+    set<int> missingLandMarks;
+    if (spConfig.HasMember("keptPoints"))
+    {
+        set<int> keptLandMarks;
+        for (const auto & point : spConfig["keptPoints"].GetArray())
+        {
+            keptLandMarks.insert(point.GetInt());
+        }
+        for (auto i = 1; i <= 68; ++i)
+        {
+            if (keptLandMarks.count(i) == 0)
+            {
+                missingLandMarks.insert(i);
+            }
+        }
+    }
+    else
+    {
+        const auto & array = spConfig["missingPoints"].GetArray();
+        for (rapidjson::SizeType i = 0; i < array.Size(); i++)
+        {
+            missingLandMarks.insert(array[i].GetInt());
+        }
+    }
+
+    unordered_map<LandMarkType, vector<int>, EnumClassHash> landmarkIndexMapping = {
+        { LandMarkType::EYE_PUPIL_CENTER_LEFT, std::vector<int> { 38, 39, 41, 42 } },
+        { LandMarkType::EYE_PUPIL_CENTER_RIGHT, std::vector<int> { 44, 45, 47, 48 } },
+        { LandMarkType::MOUTH_CORNER_LEFT, std::vector<int> { 49 } },
+        { LandMarkType::MOUTH_CORNER_RIGHT, std::vector<int> { 55 } },
+        { LandMarkType::CHIN_LOWEST_POINT, std::vector<int> { 9 } },
+        { LandMarkType::NOSE_TIP_POINT, std::vector<int> { 34 } },
+        { LandMarkType::EYE_OUTER_CORNER_LEFT, std::vector<int> { 37 } },
+        { LandMarkType::EYE_OUTER_CORNER_RIGHT, std::vector<int> { 46 } }
+    };
+
+    for (auto & kv : landmarkIndexMapping)
+    {
+        for (auto & idx : kv.second)
+        {
+            const auto offset = std::distance(missingLandMarks.begin(), missingLandMarks.upper_bound(idx));
+            idx -= offset + 1;
+        }
+    }
+    return landmarkIndexMapping;
+}
+
+std::vector<std::string> PppEngine::getPredictorProfileNames() const
+{
+    std::vector<std::string> profileNames;
+    for (const auto & kv : m_predictorProfiles)
+    {
+        profileNames.push_back(kv.first);
+    }
+    sort(profileNames.begin(), profileNames.end());
+    return profileNames;
+}
+
+const PppEngine::PredictorProfile & PppEngine::getPredictorProfile(const std::string & profileName) const
+{
+    const auto & name = profileName.empty() ? ACCURATE_PREDICTOR_PROFILE : profileName;
+    const auto it = m_predictorProfiles.find(name);
+    if (it == m_predictorProfiles.end())
+    {
+        throw runtime_error("Unknown shape predictor profile '" + name + "'");
+    }
+    waitForComponent(predictorComponentName(name));
+    if (!it->second.model)
+    {
+        throw runtime_error("The model of the shape predictor profile '" + name + "' could not be loaded");
+    }
+    return it->second;
+}
+
+cv::Point PppEngine::getLandMark(const PredictorProfile & profile,
+                                 const std::vector<cv::Point> & landmarks,
+                                 const LandMarkType type)
+{
+    const auto & indices = profile.landmarkIndexMapping.at(type);
     if (indices.size() == 1)
     {
         return landmarks[indices.front()];
@@ -192,7 +467,12 @@ cv::Mat PppEngine::createTiledPrint(const string & imageKey,
 {
     verifyImageExists(imageKey);
     const auto & inputImage = m_pImageStore->getImage(imageKey);
-    const auto croppedImage = m_pPhotoPrintMaker->cropPicture(inputImage, crownMark, chinMark, ps);
+    cv::Mat croppedImage;
+    {
+        TRACE_SPAN("PhotoPrintMaker::cropPicture");
+        croppedImage = m_pPhotoPrintMaker->cropPicture(inputImage, crownMark, chinMark, ps);
+    }
+    TRACE_SPAN("PhotoPrintMaker::tileCroppedPhoto");
     auto tiledPrintPhoto = m_pPhotoPrintMaker->tileCroppedPhoto(pd, ps, croppedImage);
     return tiledPrintPhoto;
 }
@@ -202,15 +482,27 @@ IImageStoreSPtr PppEngine::getImageStore() const
     return m_pImageStore;
 }
 
+PhotoStandardCatalogueSPtr PppEngine::getPhotoStandardCatalogue() const
+{
+    return m_photoStandardCatalogue;
+}
+
+RenderCacheSPtr PppEngine::getRenderCache() const
+{
+    return m_renderCache;
+}
+
 std::string PppEngine::checkCompliance(const std::string & imageId,
                                        const PhotoStandardSPtr & photoStandard,
                                        const cv::Point & crownPoint,
                                        const cv::Point & chinPoint,
                                        const std::vector<std::string> & complianceCheckNames) const
 {
-
-    const auto results
-        = m_complianceChecker->checkCompliance(imageId, photoStandard, crownPoint, chinPoint, complianceCheckNames);
+    const auto inputs = getComplianceInputs(imageId,
+                                            crownPoint,
+                                            chinPoint,
+                                            m_complianceChecker->needsImageStatistics(complianceCheckNames));
+    const auto results = m_complianceChecker->checkCompliance(inputs, *photoStandard, complianceCheckNames);
     rapidjson::Document d;
     d.SetArray();
     auto & alloc = d.GetAllocator();
@@ -220,4 +512,145 @@ std::string PppEngine::checkCompliance(const std::string & imageId,
     }
     return Utilities::serializeJson(d, false);
 }
+
+ComplianceInputs PppEngine::getComplianceInputs(const std::string & imageId,
+                                                const cv::Point & crownPoint,
+                                                const cv::Point & chinPoint,
+                                                const bool withStatistics) const
+{
+    if (!withStatistics)
+    {
+        // Checks of the crown and chin points don't read the image, which may not even be in the store
+        return ComplianceInputs(crownPoint, chinPoint);
+    }
+    // Statistics are cached by the image store, every check and standard reads the same ones
+    const auto statistics = m_pImageStore->getImageStatistics(imageId);
+    return ComplianceInputs(crownPoint, chinPoint, statistics->faceRect.size(), statistics->imageSize, statistics);
+}
+
+std::string PppEngine::checkComplianceBatch(const std::vector<std::string> & imageIds,
+                                            const std::vector<std::string> & standardIds,
+                                            const std::vector<std::string> & complianceCheckNames) const
+{
+    TRACE_SPAN("PppEngine::checkComplianceBatch");
+    // Each standard is looked up once for the whole batch, an unknown one doesn't prevent checking the others
+    vector<pair<string, PhotoStandardSPtr>> photoStandards;
+    vector<pair<string, string>> standardErrors;
+    for (const auto & standardId : standardIds)
+    {
+        try
+        {
+            photoStandards.emplace_back(standardId, m_photoStandardCatalogue->get(standardId));
+        }
+        catch (const std::exception & e)
+        {
+            standardErrors.emplace_back(standardId, e.what());
+        }
+    }
+
+    const auto withStatistics = m_complianceChecker->needsImageStatistics(complianceCheckNames);
+    // Detectors keep working buffers, so detections run one after the other before the checks
+    vector<string> imageErrors(imageIds.size());
+    for (size_t i = 0; i < imageIds.size(); ++i)
+    {
+        try
+        {
+            verifyImageExists(imageIds[i]);
+            const auto & landMarks = m_pImageStore->getLandMarks(imageIds[i]);
+            if (landMarks->vjFaceRect.area() == 0 && !detectLandMarks(imageIds[i]))
+            {
+                imageErrors[i] = "No face was detected in the image";
+            }
+        }
+        catch (const std::exception & e)
+        {
+            imageErrors[i] = e.what();
+        }
+    }
+
+    // Results of image i against standard j are in results[i][j]
+    vector<vector<vector<ComplianceResultSPtr>>> results(imageIds.size());
+    cv::parallel_for_(cv::Range(0, static_cast<int>(imageIds.size())), [&](const cv::Range & range) {
+        for (auto i = range.start; i < range.end; ++i)
+        {
+            if (!imageErrors[i].empty())
+            {
+                continue;
+            }
+            try
+            {
+                const auto & landMarks = m_pImageStore->getLandMarks(imageIds[i]);
+                const auto inputs
+                    = getComplianceInputs(imageIds[i], landMarks->crownPoint, landMarks->chinPoint, withStatistics);
+                for (const auto & photoStandard : photoStandards)
+                {
+                    results[i].push_back(
+                        m_complianceChecker->checkCompliance(inputs, *photoStandard.second, complianceCheckNames));
+                }
+            }
+            catch (const std::exception & e)
+            {
+                imageErrors[i] = e.what();
+                results[i].clear();
+            }
+        }
+    });
+
+    rapidjson::Document d;
+    d.SetObject();
+    auto & alloc = d.GetAllocator();
+    rapidjson::Value columns(rapidjson::kArrayType);
+    for (const auto column : { "imgKey", "standardId", "check", "passed", "value" })
+    {
+        columns.PushBack(rapidjson::StringRef(column), alloc);
+    }
+    rapidjson::Value rows(rapidjson::kArrayType);
+    rapidjson::Value imageErrorsJson(rapidjson::kObjectType);
+    rapidjson::Value photoStandardErrors(rapidjson::kObjectType);
+    for (const auto & standardError : standardErrors)
+    {
+        photoStandardErrors.AddMember(rapidjson::Value(standardError.first, alloc),
+                                      rapidjson::Value(standardError.second, alloc),
+                                      alloc);
+    }
+    for (size_t i = 0; i < imageIds.size(); ++i)
+    {
+        if (!imageErrors[i].empty())
+        {
+            imageErrorsJson.AddMember(rapidjson::Value(imageIds[i], alloc),
+                                      rapidjson::Value(imageErrors[i], alloc),
+                                      alloc);
+            continue;
+        }
+        for (size_t j = 0; j < photoStandards.size(); ++j)
+        {
+            for (const auto & result : results[i][j])
+            {
+                rapidjson::Value row(rapidjson::kArrayType);
+                row.PushBack(rapidjson::Value(imageIds[i], alloc), alloc);
+                row.PushBack(rapidjson::Value(photoStandards[j].first, alloc), alloc);
+                row.PushBack(rapidjson::Value(result->getCheckName(), alloc), alloc);
+                row.PushBack(result->getPassed(), alloc);
+                // Checks report their measure in the parameter named after them
+                double value;
+                if (result->getParam(result->getCheckName(), value))
+                {
+                    row.PushBack(value, alloc);
+                }
+                else
+                {
+                    row.PushBack(rapidjson::Value(), alloc);
+                }
+                rows.PushBack(row, alloc);
+            }
+        }
+    }
+    d.AddMember("columns", columns, alloc);
+    d.AddMember("rows", rows, alloc);
+    rapidjson::Value errors(rapidjson::kObjectType);
+    errors.AddMember(rapidjson::StringRef(IMAGE_IDS), imageErrorsJson, alloc);
+    errors.AddMember(rapidjson::StringRef(PHOTO_STANDARD_IDS), photoStandardErrors, alloc);
+    d.AddMember("errors", errors, alloc);
+    return Utilities::serializeJson(d, false);
+}
 } // namespace ppp
@@ -0,0 +1,145 @@
+#include "RenderCache.h"
+#include "ConfigLoader.h"
+#include "PhotoStandard.h"
+#include "PrintDefinition.h"
+
+#include <iomanip>
+#include <sstream>
+
+using namespace std;
+
+namespace ppp
+{
+string RenderCache::makeKey(const std::string & imageKey,
+                            const PhotoStandard & ps,
+                            const PrintDefinition & canvas,
+                            const cv::Point & crownPoint,
+                            const cv::Point & chinPoint,
+                            const std::string & options)
+{
+    // Dimensions in pixels are what the output depends on, whatever units the request used
+    ostringstream key;
+    key << imageKey << setprecision(10) << "|ps:" << ps.photoWidth() << 'x' << ps.photoHeight() << ','
+        << ps.faceHeight() << ',' << ps.crownTop() << '@' << ps.resolutionDpi() << "|canvas:" << canvas.width() << 'x'
+        << canvas.height() << ',' << canvas.gutter() << ',' << canvas.padding() << '@' << canvas.resolutionDpi()
+        << "|points:" << crownPoint.x << ',' << crownPoint.y << ',' << chinPoint.x << ',' << chinPoint.y << '|'
+        << options;
+    return key.str();
+}
+
+bool RenderCache::get(const std::string & key, std::string & output)
+{
+    lock_guard<mutex> lock(m_mutex);
+    const auto it = m_entries.find(key);
+    if (it == m_entries.end())
+    {
+        m_stats.misses++;
+        return false;
+    }
+    if (Clock::now() - it->second.insertedAt > m_timeToLive)
+    {
+        erase(it);
+        m_stats.expirations++;
+        m_stats.misses++;
+        return false;
+    }
+    m_lruKeys.splice(m_lruKeys.end(), m_lruKeys, it->second.lruPosition);
+    m_stats.hits++;
+    output = it->second.output;
+    return true;
+}
+
+void RenderCache::put(const std::string & imageKey, const std::string & key, const std::string & output)
+{
+    lock_guard<mutex> lock(m_mutex);
+    if (output.size() > m_maxBytes)
+    {
+        return;
+    }
+    const auto it = m_entries.find(key);
+    if (it != m_entries.end())
+    {
+        erase(it);
+    }
+    const auto lruPosition = m_lruKeys.insert(m_lruKeys.end(), key);
+    m_entries[key] = Entry { imageKey, output, Clock::now(), lruPosition };
+    m_stats.bytes += output.size();
+    shrinkToBudget();
+}
+
+void RenderCache::invalidateImage(const std::string & imageKey)
+{
+    lock_guard<mutex> lock(m_mutex);
+    for (auto it = m_entries.begin(); it != m_entries.end();)
+    {
+        const auto current = it++;
+        if (current->second.imageKey == imageKey)
+        {
+            erase(current);
+            m_stats.invalidations++;
+        }
+    }
+}
+
+void RenderCache::setLimits(const size_t maxBytes, const std::chrono::milliseconds timeToLive)
+{
+    lock_guard<mutex> lock(m_mutex);
+    m_maxBytes = maxBytes;
+    m_timeToLive = timeToLive;
+    shrinkToBudget();
+}
+
+void RenderCache::clear()
+{
+    lock_guard<mutex> lock(m_mutex);
+    m_entries.clear();
+    m_lruKeys.clear();
+    m_stats = RenderCacheStats();
+}
+
+RenderCacheStats RenderCache::getStats() const
+{
+    lock_guard<mutex> lock(m_mutex);
+    auto stats = m_stats;
+    stats.numEntries = m_entries.size();
+    stats.maxBytes = m_maxBytes;
+    return stats;
+}
+
+void RenderCache::configureInternal(const ConfigLoaderSPtr & config)
+{
+    const auto & root = config->get({});
+    if (root.HasMember("renderCache"))
+    {
+        const auto & renderCacheCfg = root["renderCache"];
+        auto maxBytes = m_maxBytes;
+        auto timeToLive = m_timeToLive;
+        if (renderCacheCfg.HasMember("maxBytes"))
+        {
+            maxBytes = renderCacheCfg["maxBytes"].GetUint64();
+        }
+        if (renderCacheCfg.HasMember("ttlSeconds"))
+        {
+            timeToLive = chrono::milliseconds(static_cast<int64_t>(renderCacheCfg["ttlSeconds"].GetDouble() * 1000));
+        }
+        setLimits(maxBytes, timeToLive);
+    }
+    m_isConfigured = true;
+}
+
+void RenderCache::erase(const std::unordered_map<std::string, Entry>::iterator it)
+{
+    m_stats.bytes -= it->second.output.size();
+    m_lruKeys.erase(it->second.lruPosition);
+    m_entries.erase(it);
+}
+
+void RenderCache::shrinkToBudget()
+{
+    while (m_stats.bytes > m_maxBytes && !m_lruKeys.empty())
+    {
+        erase(m_entries.find(m_lruKeys.front()));
+        m_stats.evictions++;
+    }
+}
+} // namespace ppp
@@ -0,0 +1,311 @@
+#include "Tracer.h"
+#include "ConfigLoader.h"
+
+#include <fstream>
+#include <functional>
+#include <thread>
+
+#include <rapidjson/stringbuffer.h>
+#include <rapidjson/writer.h>
+
+using namespace std;
+
+namespace ppp
+{
+namespace
+{
+thread_local uint64_t t_currentTraceId = 0;
+thread_local uint64_t t_lastTraceId = 0;
+thread_local string t_currentRequestName;
+
+const string OUTPUT_FILE_HEADER = R"({"displayTimeUnit":"ms","traceEvents":[)";
+const string OUTPUT_FILE_FOOTER = "]}";
+
+uint64_t currentThreadId()
+{
+    return static_cast<uint64_t>(hash<thread::id>()(this_thread::get_id()) & 0xFFFFFFFF);
+}
+
+void writeEvent(rapidjson::Writer<rapidjson::StringBuffer> & writer, const TraceEvent & e)
+{
+    writer.StartObject();
+    writer.Key("name");
+    writer.String(e.name.c_str());
+    writer.Key("cat");
+    writer.String(e.category.c_str());
+    writer.Key("ph");
+    writer.String("X");
+    writer.Key("ts");
+    writer.Int64(e.startUs);
+    writer.Key("dur");
+    writer.Int64(e.durationUs);
+    writer.Key("pid");
+    writer.Int(1);
+    writer.Key("tid");
+    writer.Uint64(e.threadId);
+    writer.Key("args");
+    writer.StartObject();
+    writer.Key("traceId");
+    writer.Uint64(e.traceId);
+    if (!e.args.empty())
+    {
+        writer.Key("detail");
+        writer.String(e.args.c_str());
+    }
+    writer.EndObject();
+    writer.EndObject();
+}
+} // namespace
+
+Tracer & Tracer::instance()
+{
+    static Tracer tracer;
+    return tracer;
+}
+
+Tracer::Tracer()
+: m_origin(chrono::steady_clock::now())
+{
+}
+
+void Tracer::configure(const ConfigLoaderSPtr & config)
+{
+    const auto & root = config->get({});
+    if (!root.HasMember("tracing"))
+    {
+        return;
+    }
+    const auto & tracingCfg = root["tracing"];
+    if (tracingCfg.HasMember("bufferSize"))
+    {
+        setBufferSize(tracingCfg["bufferSize"].GetUint());
+    }
+    if (tracingCfg.HasMember("outputFile") && tracingCfg["outputFile"].IsString())
+    {
+        setOutputFile(tracingCfg["outputFile"].GetString());
+    }
+    // Tracing can also be switched on at runtime, the configuration never turns it off
+    if (tracingCfg.HasMember("enabled") && tracingCfg["enabled"].GetBool())
+    {
+        setEnabled(true);
+    }
+}
+
+void Tracer::setEnabled(const bool enabled)
+{
+    m_enabled.store(enabled, memory_order_relaxed);
+}
+
+void Tracer::setBufferSize(const size_t bufferSize)
+{
+    lock_guard<mutex> lock(m_mutex);
+    m_bufferSize = bufferSize > 0 ? bufferSize : 1;
+    while (m_events.size() > m_bufferSize)
+    {
+        m_events.pop_front();
+    }
+}
+
+void Tracer::setOutputFile(const string & outputFilePath)
+{
+    lock_guard<mutex> outputLock(m_outputMutex);
+    if (m_outputStream.is_open())
+    {
+        m_outputStream.close();
+    }
+    m_numWrittenEvents = 0;
+    if (!outputFilePath.empty())
+    {
+        m_outputStream.open(outputFilePath, ios_base::in | ios_base::out | ios_base::trunc);
+        m_outputStream << OUTPUT_FILE_HEADER << OUTPUT_FILE_FOOTER << flush;
+    }
+
+    lock_guard<mutex> lock(m_mutex);
+    m_outputFilePath = outputFilePath;
+    m_unwrittenEvents.clear();
+}
+
+uint64_t Tracer::beginTrace(const string & requestName)
+{
+    const auto traceId = m_nextTraceId.fetch_add(1);
+    t_lastTraceId = traceId;
+    t_currentTraceId = traceId;
+    t_currentRequestName = requestName;
+    return traceId;
+}
+
+void Tracer::endTrace()
+{
+    t_currentTraceId = 0;
+    t_currentRequestName.clear();
+    appendToOutputFile();
+}
+
+uint64_t Tracer::currentTraceId()
+{
+    return t_currentTraceId;
+}
+
+uint64_t Tracer::lastTraceId()
+{
+    return t_lastTraceId;
+}
+
+void Tracer::record(TraceEvent && event)
+{
+    if (event.category.empty())
+    {
+        event.category = t_currentRequestName.empty() ? "ppp" : t_currentRequestName;
+    }
+    lock_guard<mutex> lock(m_mutex);
+    if (!m_outputFilePath.empty())
+    {
+        // Bounded like the ring buffer in case no request completes to write them
+        if (m_unwrittenEvents.size() >= m_bufferSize)
+        {
+            m_unwrittenEvents.pop_front();
+        }
+        m_unwrittenEvents.push_back(event);
+    }
+    if (m_events.size() >= m_bufferSize)
+    {
+        m_events.pop_front();
+    }
+    m_events.emplace_back(move(event));
+}
+
+vector<TraceEvent> Tracer::events(const uint64_t traceId) const
+{
+    lock_guard<mutex> lock(m_mutex);
+    vector<TraceEvent> result;
+    for (const auto & e : m_events)
+    {
+        if (traceId == 0 || e.traceId == traceId)
+        {
+            result.push_back(e);
+        }
+    }
+    return result;
+}
+
+void Tracer::clear()
+{
+    lock_guard<mutex> lock(m_mutex);
+    m_events.clear();
+}
+
+string Tracer::toJson(const uint64_t traceId) const
+{
+    const auto selectedEvents = events(traceId);
+
+    using namespace rapidjson;
+    Document d;
+    d.SetObject();
+    auto & alloc = d.GetAllocator();
+
+    Value traceEvents(kArrayType);
+    for (const auto & e : selectedEvents)
+    {
+        Value args(kObjectType);
+        args.AddMember("traceId", e.traceId, alloc);
+        if (!e.args.empty())
+        {
+            args.AddMember("detail", Value(e.args.c_str(), alloc), alloc);
+        }
+
+        Value ev(kObjectType);
+        ev.AddMember("name", Value(e.name.c_str(), alloc), alloc);
+        ev.AddMember("cat", Value(e.category.c_str(), alloc), alloc);
+        ev.AddMember("ph", "X", alloc);
+        ev.AddMember("ts", e.startUs, alloc);
+        ev.AddMember("dur", e.durationUs, alloc);
+        ev.AddMember("pid", 1, alloc);
+        ev.AddMember("tid", e.threadId, alloc);
+        ev.AddMember("args", args, alloc);
+        traceEvents.PushBack(ev, alloc);
+    }
+    d.AddMember("traceEvents", traceEvents, alloc);
+    d.AddMember("displayTimeUnit", "ms", alloc);
+
+    StringBuffer buffer;
+    Writer<StringBuffer> writer(buffer);
+    d.Accept(writer);
+    return buffer.GetString();
+}
+
+int64_t Tracer::nowUs() const
+{
+    return chrono::duration_cast<chrono::microseconds>(chrono::steady_clock::now() - m_origin).count();
+}
+
+void Tracer::appendToOutputFile()
+{
+    lock_guard<mutex> outputLock(m_outputMutex);
+    if (!m_outputStream.is_open())
+    {
+        return;
+    }
+    deque<TraceEvent> unwrittenEvents;
+    {
+        lock_guard<mutex> lock(m_mutex);
+        unwrittenEvents.swap(m_unwrittenEvents);
+    }
+
+    // Only the new events are written, over the footer which is written back after them
+    m_outputStream.seekp(-static_cast<streamoff>(OUTPUT_FILE_FOOTER.size()), ios_base::end);
+    rapidjson::StringBuffer buffer;
+    for (const auto & e : unwrittenEvents)
+    {
+        buffer.Clear();
+        rapidjson::Writer<rapidjson::StringBuffer> writer(buffer);
+        writeEvent(writer, e);
+        m_outputStream << (m_numWrittenEvents++ == 0 ? "" : ",") << buffer.GetString();
+    }
+    m_outputStream << OUTPUT_FILE_FOOTER << flush;
+}
+
+TraceSpan::TraceSpan(const char * name, string args)
+: m_name(name)
+{
+    auto & tracer = Tracer::instance();
+    if (tracer.isEnabled())
+    {
+        m_args = move(args);
+        m_startUs = tracer.nowUs();
+    }
+}
+
+TraceSpan::~TraceSpan()
+{
+    if (m_startUs < 0)
+    {
+        return;
+    }
+    auto & tracer = Tracer::instance();
+    const auto endUs = tracer.nowUs();
+    tracer.record(
+        { m_name, string(), Tracer::currentTraceId(), m_startUs, endUs - m_startUs, currentThreadId(), m_args });
+}
+
+TraceRequest::TraceRequest(const char * requestName)
+{
+    auto & tracer = Tracer::instance();
+    if (!tracer.isEnabled() || Tracer::currentTraceId() != 0)
+    {
+        return;
+    }
+    tracer.beginTrace(requestName);
+    m_ownsTrace = true;
+    m_rootSpan = make_unique<TraceSpan>(requestName);
+}
+
+TraceRequest::~TraceRequest()
+{
+    if (m_ownsTrace)
+    {
+        // Close the root span before the trace so it gets recorded with the right id
+        m_rootSpan.reset();
+        Tracer::instance().endTrace();
+    }
+}
+} // namespace ppp
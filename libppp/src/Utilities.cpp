@@ -173,6 +173,11 @@ cv::CascadeClassifierSPtr Utilities::createHaarClassifier(const std::string & xm
 }
 
 cv::CascadeClassifierSPtr Utilities::loadClassifierFromBase64(const char * haarCascadeData)
+{
+    return createHaarClassifier(decodeClassifierDefinition(haarCascadeData));
+}
+
+std::string Utilities::decodeClassifierDefinition(const char * haarCascadeData)
 {
     static const std::string XML_START = "<?xml";
     std::string xmlHaarCascadeStr;
@@ -185,7 +190,7 @@ cv::CascadeClassifierSPtr Utilities::loadClassifierFromBase64(const char * haarC
         auto a = base64Decode(haarCascadeData, strlen(haarCascadeData));
         xmlHaarCascadeStr.assign(a.begin(), a.end());
     }
-    return createHaarClassifier(xmlHaarCascadeStr);
+    return xmlHaarCascadeStr;
 }
 
 uint32_t Utilities::crc32(uint32_t crc, const uint8_t * begin, const uint8_t * end)
@@ -2,13 +2,19 @@
 //
 #include "libppp.h"
 #include "EasyExif.h"
+#include "FrameSequence.h"
 #include "ImageStore.h"
 #include "LandMarks.h"
+#include "Logger.h"
 #include "PhotoStandard.h"
+#include "PhotoStandardCatalogue.h"
 #include "PppEngine.h"
 #include "PrintDefinition.h"
+#include "RenderCache.h"
+#include "Tracer.h"
 #include "Utilities.h"
 
+#include <chrono>
 #include <opencv2/imgcodecs.hpp>
 #include <regex>
 
@@ -30,18 +36,99 @@ cv::Point fromJson(rapidjson::Value & v)
     return cv::Point(v["x"].GetInt(), v["y"].GetInt());
 }
 
+/*!@brief Standard referred by "standardId" in the engine catalogue, or the full "standard" definition !*/
+PhotoStandardSPtr photoStandardFromRequest(const PppEngine & engine, rapidjson::Value & request, const double minDpi)
+{
+    if (request.HasMember(PHOTO_STANDARD_ID))
+    {
+        return engine.getPhotoStandardCatalogue()->get(request[PHOTO_STANDARD_ID].GetString(), minDpi);
+    }
+    return PhotoStandard::fromJson(request[PHOTO_STANDARD]);
+}
+
+/*!@brief Parsed content of a createTiledPrint request !*/
+struct TiledPrintRequest final
+{
+    PrintDefinitionSPtr canvas;
+    PhotoStandardSPtr ps;
+    cv::Point crownPoint;
+    cv::Point chinPoint;
+};
+
+TiledPrintRequest parseTiledPrintRequest(const PppEngine & engine, rapidjson::Value & request)
+{
+    TiledPrintRequest tiledPrintRequest;
+    tiledPrintRequest.canvas = PrintDefinition::fromJson(request[PRINT_DEFINITION]);
+    // Catalogue standards are shared, ask for one at the print resolution so the print maker doesn't modify it
+    tiledPrintRequest.ps = photoStandardFromRequest(engine, request, tiledPrintRequest.canvas->resolutionDpi());
+    tiledPrintRequest.crownPoint = fromJson(request[CROWN_POINT]);
+    tiledPrintRequest.chinPoint = fromJson(request[CHIN_POINT]);
+    return tiledPrintRequest;
+}
+
+/*!@brief Crops and tiles the image as described by a createTiledPrint request !*/
+cv::Mat renderTiledPrint(const PppEngine & engine, const std::string & imageId, TiledPrintRequest & request)
+{
+    return engine.createTiledPrint(imageId, *request.ps, *request.canvas, request.crownPoint, request.chinPoint);
+}
+
+/*!@brief Serializes the result of one frame, the landmarks being restricted to the crown and chin points when
+ * withAllLandMarks is false !*/
+rapidjson::Value frameResultToJson(const FrameResult & result,
+                                   const bool withAllLandMarks,
+                                   rapidjson::Document::AllocatorType & alloc)
+{
+    using namespace rapidjson;
+    Value v(kObjectType);
+    v.AddMember("detected", result.detected, alloc);
+    v.AddMember("fullDetection", result.fullDetection, alloc);
+    v.AddMember("latencyMs", result.latencyMs, alloc);
+    if (result.detected)
+    {
+        Document landMarks(&alloc);
+        landMarks.Parse(result.landMarks.toJson(false).c_str());
+        if (!withAllLandMarks)
+        {
+            Value crownChin(kObjectType);
+            crownChin.AddMember(StringRef(CROWN_POINT), landMarks[CROWN_POINT], alloc);
+            crownChin.AddMember(StringRef(CHIN_POINT), landMarks[CHIN_POINT], alloc);
+            landMarks.Swap(crownChin);
+        }
+        v.AddMember("landmarks", landMarks, alloc);
+    }
+    return v;
+}
+
+rapidjson::Value frameSequenceStatsToJson(const FrameSequenceStats & stats, rapidjson::Document::AllocatorType & alloc)
+{
+    using namespace rapidjson;
+    const auto numFrames = static_cast<double>(std::max<uint64_t>(stats.numFrames, 1));
+    Value v(kObjectType);
+    v.AddMember("numFrames", stats.numFrames, alloc);
+    v.AddMember("numDetected", stats.numDetected, alloc);
+    v.AddMember("numFullDetections", stats.numFullDetections, alloc);
+    v.AddMember("numTrackingLosses", stats.numTrackingLosses, alloc);
+    v.AddMember("fullDetectionRatio", static_cast<double>(stats.numFullDetections) / numFrames, alloc);
+    v.AddMember("meanLatencyMs", stats.totalLatencyMs / numFrames, alloc);
+    v.AddMember("maxLatencyMs", stats.maxLatencyMs, alloc);
+    return v;
+}
+
 PublicPppEngine::PublicPppEngine()
 : m_pPppEngine(new PppEngine)
+, m_pFrameSequence(new FrameSequence(*m_pPppEngine))
 {
 }
 
 PublicPppEngine::~PublicPppEngine()
 {
+    delete m_pFrameSequence;
     delete m_pPppEngine;
 }
 
 bool PublicPppEngine::configure(const char * jsonConfig, void * callback) const
 {
+    TRACE_REQUEST("configure");
     return m_pPppEngine->configure(jsonConfig, callback);
 }
 
@@ -50,8 +137,19 @@ bool PublicPppEngine::isConfigured() const
     return m_pPppEngine->isConfigured();
 }
 
+bool PublicPppEngine::isConfigured(const std::string & componentName) const
+{
+    return m_pPppEngine->isConfigured(componentName);
+}
+
+void PublicPppEngine::waitUntilConfigured() const
+{
+    m_pPppEngine->waitUntilConfigured();
+}
+
 std::string PublicPppEngine::setImage(const char * bufferData, const size_t bufferLength) const
 {
+    TRACE_REQUEST("setImage");
     const auto & imageStore = m_pPppEngine->getImageStore();
     const auto imageKey = imageStore->setImage(bufferData, bufferLength);
 
@@ -73,36 +171,77 @@ std::string PublicPppEngine::setImage(const char * bufferData, const size_t buff
 
 std::string PublicPppEngine::getImage(const std::string & imageKey) const
 {
+    TRACE_REQUEST("getImage");
     const auto & imageStore = m_pPppEngine->getImageStore();
     if (!imageStore->containsImage(imageKey))
     {
         return "";
     }
     const auto & image = imageStore->getImage(imageKey);
+    TRACE_SPAN("Utilities::encodeImageAsPng");
     return Utilities::encodeImageAsPng(image, false);
 }
 
-std::string PublicPppEngine::detectLandmarks(const std::string & imageId) const
+std::string PublicPppEngine::getImagePreview(const std::string & imageKey,
+                                             const int maxDimension,
+                                             const std::string & format) const
 {
+    TRACE_REQUEST("getImagePreview");
+    const auto & imageStore = m_pPppEngine->getImageStore();
+    if (!imageStore->containsImage(imageKey))
+    {
+        return "";
+    }
+    return imageStore->getImagePreview(imageKey, maxDimension, format);
+}
+
+std::string PublicPppEngine::detectLandmarks(const std::string & imageId, const std::string & predictorProfile) const
+{
+    TRACE_REQUEST("detectLandmarks");
     const auto & imageStore = m_pPppEngine->getImageStore();
     if (!imageStore->containsImage(imageId))
     {
         return "";
     }
-    m_pPppEngine->detectLandMarks(imageId);
+    m_pPppEngine->detectLandMarks(imageId, predictorProfile);
     const auto & landMarks = imageStore->getLandMarks(imageId);
     return landMarks->toJson(false);
 }
 
+bool PublicPppEngine::detectLandmarks(const std::string & imageId,
+                                      std::vector<int> & points,
+                                      ppp_landmarks & namedLandmarks) const
+{
+    TRACE_REQUEST("detectLandmarksArray");
+    const auto & imageStore = m_pPppEngine->getImageStore();
+    if (!imageStore->containsImage(imageId) || !m_pPppEngine->detectLandMarks(imageId))
+    {
+        return false;
+    }
+    const auto & landMarks = imageStore->getLandMarks(imageId);
+    points.resize(2 * landMarks->allLandmarks.size());
+    for (size_t i = 0; i < landMarks->allLandmarks.size(); ++i)
+    {
+        points[2 * i] = landMarks->allLandmarks[i].x;
+        points[2 * i + 1] = landMarks->allLandmarks[i].y;
+    }
+
+    const auto toPoint = [](const cv::Point & p) { return ppp_point { p.x, p.y }; };
+    namedLandmarks = { toPoint(landMarks->crownPoint),    toPoint(landMarks->chinPoint),
+                       toPoint(landMarks->eyeLeftPupil),  toPoint(landMarks->eyeRightPupil),
+                       toPoint(landMarks->lipLeftCorner), toPoint(landMarks->lipRightCorner),
+                       toPoint(landMarks->noseTip),       toPoint(landMarks->eyeLeftCorner),
+                       toPoint(landMarks->eyeRightCorner) };
+    return true;
+}
+
 std::string PublicPppEngine::createTiledPrint(const std::string & imageId, const std::string & request) const
 {
+    TRACE_REQUEST("createTiledPrint");
     rapidjson::Document d;
     d.Parse(request.c_str());
 
-    const auto ps = PhotoStandard::fromJson(d[PHOTO_STANDARD]);
-    const auto canvas = PrintDefinition::fromJson(d[PRINT_DEFINITION]);
-    auto crownPoint = fromJson(d[CROWN_POINT]);
-    auto chinPoint = fromJson(d[CHIN_POINT]);
+    auto tiledPrintRequest = parseTiledPrintRequest(*m_pPppEngine, d);
     auto asBase64Encode = false;
 
     if (d.HasMember(AS_BASE64))
@@ -110,17 +249,123 @@ std::string PublicPppEngine::createTiledPrint(const std::string & imageId, const
         asBase64Encode = d[AS_BASE64].GetBool();
     }
 
-    const auto result = m_pPppEngine->createTiledPrint(imageId, *ps, *canvas, crownPoint, chinPoint);
-    return Utilities::encodeImageAsPng(result, asBase64Encode, canvas->resolutionDpi());
+    // Layout switches and retries resubmit identical requests, serve them without rendering again
+    const auto & renderCache = m_pPppEngine->getRenderCache();
+    const auto cacheKey = RenderCache::makeKey(imageId,
+                                               *tiledPrintRequest.ps,
+                                               *tiledPrintRequest.canvas,
+                                               tiledPrintRequest.crownPoint,
+                                               tiledPrintRequest.chinPoint,
+                                               asBase64Encode ? "png;base64" : "png");
+    std::string output;
+    if (renderCache->get(cacheKey, output))
+    {
+        return output;
+    }
+
+    const auto result = renderTiledPrint(*m_pPppEngine, imageId, tiledPrintRequest);
+    {
+        TRACE_SPAN("Utilities::encodeImageAsPng");
+        output = Utilities::encodeImageAsPng(result, asBase64Encode, tiledPrintRequest.canvas->resolutionDpi());
+    }
+    renderCache->put(imageId, cacheKey, output);
+    return output;
+}
+
+size_t PublicPppEngine::createTiledPrint(const std::string & imageId,
+                                         const std::string & request,
+                                         unsigned char * pixels,
+                                         const size_t pixelsSize,
+                                         int shape[3]) const
+{
+    TRACE_REQUEST("createTiledPrintPixels");
+    rapidjson::Document d;
+    d.Parse(request.c_str());
+
+    auto tiledPrintRequest = parseTiledPrintRequest(*m_pPppEngine, d);
+    const auto result = renderTiledPrint(*m_pPppEngine, imageId, tiledPrintRequest);
+    shape[0] = result.rows;
+    shape[1] = result.cols;
+    shape[2] = result.channels();
+    const auto requiredSize = result.total() * result.elemSize();
+    if (result.depth() == CV_8U && requiredSize <= pixelsSize)
+    {
+        // Copied straight into the caller's buffer, rows are contiguous there
+        result.copyTo(cv::Mat(result.rows, result.cols, result.type(), pixels));
+    }
+    return requiredSize;
+}
+
+std::string PublicPppEngine::processPhoto(const char * bufferData,
+                                          const size_t bufferLength,
+                                          const std::string & request,
+                                          std::string & metadata) const
+{
+    TRACE_REQUEST("processPhoto");
+    using namespace rapidjson;
+    Document d;
+    d.Parse(request.c_str());
+
+    const auto canvas = PrintDefinition::fromJson(d[PRINT_DEFINITION]);
+    const auto ps = photoStandardFromRequest(*m_pPppEngine, d, canvas->resolutionDpi());
+    const auto asBase64Encode = d.HasMember(AS_BASE64) && d[AS_BASE64].GetBool();
+
+    Document md;
+    md.SetObject();
+    auto & alloc = md.GetAllocator();
+    Value timings(kObjectType);
+    auto start = chrono::steady_clock::now();
+    const auto addTiming = [&](const char * step) {
+        const auto now = chrono::steady_clock::now();
+        timings.AddMember(StringRef(step), chrono::duration<double, std::milli>(now - start).count(), alloc);
+        start = now;
+    };
+
+    const auto & imageStore = m_pPppEngine->getImageStore();
+    const auto imageKey = imageStore->setImage(bufferData, bufferLength);
+    md.AddMember(StringRef(IMAGE_ID), imageKey, alloc);
+    addTiming("decodeMs");
+
+    // Manual corrections of both points make the detection unnecessary
+    const auto & landMarks = imageStore->getLandMarks(imageKey);
+    if (!d.HasMember(CROWN_POINT) || !d.HasMember(CHIN_POINT))
+    {
+        const auto predictorProfile = d.HasMember(PREDICTOR_PROFILE) ? d[PREDICTOR_PROFILE].GetString() : "";
+        if (!m_pPppEngine->detectLandMarks(imageKey, predictorProfile))
+        {
+            throw runtime_error("No face was detected in the image");
+        }
+        Document landMarksJson(&alloc);
+        landMarksJson.Parse(landMarks->toJson(false).c_str());
+        md.AddMember("landmarks", landMarksJson, alloc);
+        addTiming("detectMs");
+    }
+    auto crownPoint = d.HasMember(CROWN_POINT) ? fromJson(d[CROWN_POINT]) : landMarks->crownPoint;
+    auto chinPoint = d.HasMember(CHIN_POINT) ? fromJson(d[CHIN_POINT]) : landMarks->chinPoint;
+
+    const auto result = m_pPppEngine->createTiledPrint(imageKey, *ps, *canvas, crownPoint, chinPoint);
+    addTiming("renderMs");
+
+    string output;
+    {
+        TRACE_SPAN("Utilities::encodeImageAsPng");
+        output = Utilities::encodeImageAsPng(result, asBase64Encode, canvas->resolutionDpi());
+    }
+    addTiming("encodeMs");
+
+    md.AddMember("timings", timings, alloc);
+    metadata = Utilities::serializeJson(md, false);
+    return output;
 }
 
 std::string PublicPppEngine::checkCompliance(const std::string & request) const
 {
+    TRACE_REQUEST("checkCompliance");
     rapidjson::Document d;
     d.Parse(request.c_str());
 
     const std::string imageId = d[IMAGE_ID].GetString();
-    const auto ps = PhotoStandard::fromJson(d[PHOTO_STANDARD]);
+    const auto ps = photoStandardFromRequest(*m_pPppEngine, d, 0.0);
     const auto crownPoint = fromJson(d[CROWN_POINT]);
     const auto chinPoint = fromJson(d[CHIN_POINT]);
 
@@ -134,6 +379,150 @@ std::string PublicPppEngine::checkCompliance(const std::string & request) const
 
     return m_pPppEngine->checkCompliance(imageId, ps, crownPoint, chinPoint, complianceCheckNames);
 }
+
+std::string PublicPppEngine::checkComplianceBatch(const std::string & request) const
+{
+    TRACE_REQUEST("checkComplianceBatch");
+    rapidjson::Document d;
+    d.Parse(request.c_str());
+    if (d.HasParseError() || !d.IsObject())
+    {
+        throw runtime_error("The compliance batch request is not a valid JSON object");
+    }
+
+    const auto toStrings = [&d](const char * fieldName) {
+        if (!d.HasMember(fieldName) || !d[fieldName].IsArray())
+        {
+            throw runtime_error(string("The compliance batch request has no '") + fieldName + "' array");
+        }
+        vector<string> strings;
+        for (const auto & v : d[fieldName].GetArray())
+        {
+            if (!v.IsString())
+            {
+                throw runtime_error(string("The '") + fieldName + "' of the compliance batch request must be strings");
+            }
+            strings.emplace_back(v.GetString());
+        }
+        return strings;
+    };
+    return m_pPppEngine->checkComplianceBatch(toStrings(IMAGE_IDS),
+                                              toStrings(PHOTO_STANDARD_IDS),
+                                              toStrings(COMPLIANCE_CHECKS));
+}
+
+std::string PublicPppEngine::getImageStoreStats() const
+{
+    const auto stats = m_pPppEngine->getImageStore()->getStats();
+
+    using namespace rapidjson;
+    Document d;
+    d.SetObject();
+    auto & alloc = d.GetAllocator();
+    d.AddMember("numImages", static_cast<uint64_t>(stats.numImages), alloc);
+    d.AddMember("storeSize", static_cast<uint64_t>(stats.storeSize), alloc);
+    d.AddMember("imageBytes", static_cast<uint64_t>(stats.imageBytes), alloc);
+    d.AddMember("encodedBytes", static_cast<uint64_t>(stats.encodedBytes), alloc);
+    d.AddMember("inserts", stats.inserts, alloc);
+    d.AddMember("reinserts", stats.reinserts, alloc);
+    d.AddMember("hits", stats.hits, alloc);
+    d.AddMember("misses", stats.misses, alloc);
+    d.AddMember("evictions", stats.evictions, alloc);
+    d.AddMember("previewHits", stats.previewHits, alloc);
+    d.AddMember("previewMisses", stats.previewMisses, alloc);
+    d.AddMember("decodedHits", stats.decodedHits, alloc);
+    d.AddMember("decodedMisses", stats.decodedMisses, alloc);
+    d.AddMember("meanDecodeOnMissMs",
+                stats.decodedMisses > 0 ? stats.decodeOnMissMs / static_cast<double>(stats.decodedMisses) : 0.0,
+                alloc);
+    return Utilities::serializeJson(d, false);
+}
+
+void PublicPppEngine::startFrameSequence(const int keyframeInterval, const double searchWindowScale) const
+{
+    m_pFrameSequence->setTracking(static_cast<size_t>(std::max(keyframeInterval, 1)), searchWindowScale);
+    m_pFrameSequence->reset();
+}
+
+std::string PublicPppEngine::processFrame(const char * bufferData, const size_t bufferLength) const
+{
+    TRACE_REQUEST("processFrame");
+    cv::Mat frame;
+    {
+        TRACE_SPAN("FrameSequence::decode");
+        const cv::_InputArray inputArray(bufferData, static_cast<int>(bufferLength));
+        frame = imdecode(inputArray, cv::IMREAD_COLOR);
+    }
+    if (frame.empty())
+    {
+        throw runtime_error("The frame could not be decoded");
+    }
+
+    rapidjson::Document d;
+    auto & alloc = d.GetAllocator();
+    d.CopyFrom(frameResultToJson(m_pFrameSequence->processFrame(frame), true, alloc), alloc);
+    return Utilities::serializeJson(d, false);
+}
+
+std::string PublicPppEngine::processFrame(const unsigned char * pixels,
+                                          const int rows,
+                                          const int cols,
+                                          const int channels) const
+{
+    TRACE_REQUEST("processFramePixels");
+    // The caller keeps ownership of the pixels, they are only read
+    const cv::Mat frame(rows, cols, CV_8UC(channels), const_cast<unsigned char *>(pixels));
+
+    rapidjson::Document d;
+    auto & alloc = d.GetAllocator();
+    d.CopyFrom(frameResultToJson(m_pFrameSequence->processFrame(frame), true, alloc), alloc);
+    return Utilities::serializeJson(d, false);
+}
+
+std::string PublicPppEngine::processVideo(const std::string & videoFilePath) const
+{
+    TRACE_REQUEST("processVideo");
+    using namespace rapidjson;
+    Document d;
+    d.SetObject();
+    auto & alloc = d.GetAllocator();
+
+    m_pFrameSequence->reset();
+    Value frames(kArrayType);
+    m_pFrameSequence->processVideo(videoFilePath, [&frames, &alloc](const FrameResult & result) {
+        frames.PushBack(frameResultToJson(result, false, alloc), alloc);
+    });
+    d.AddMember("stats", frameSequenceStatsToJson(m_pFrameSequence->getStats(), alloc), alloc);
+    d.AddMember("frames", frames, alloc);
+    return Utilities::serializeJson(d, false);
+}
+
+std::string PublicPppEngine::getFrameSequenceStats() const
+{
+    rapidjson::Document d;
+    auto & alloc = d.GetAllocator();
+    d.CopyFrom(frameSequenceStatsToJson(m_pFrameSequence->getStats(), alloc), alloc);
+    return Utilities::serializeJson(d, false);
+}
+
+std::string PublicPppEngine::getRenderCacheStats() const
+{
+    const auto stats = m_pPppEngine->getRenderCache()->getStats();
+
+    using namespace rapidjson;
+    Document d;
+    d.SetObject();
+    auto & alloc = d.GetAllocator();
+    d.AddMember("numEntries", static_cast<uint64_t>(stats.numEntries), alloc);
+    d.AddMember("bytes", static_cast<uint64_t>(stats.bytes), alloc);
+    d.AddMember("maxBytes", static_cast<uint64_t>(stats.maxBytes), alloc);
+    d.AddMember("hits", stats.hits, alloc);
+    d.AddMember("misses", stats.misses, alloc);
+    d.AddMember("evictions", stats.evictions, alloc);
+    d.AddMember("expirations", stats.expirations, alloc);
+    d.AddMember("invalidations", stats.invalidations, alloc);
+    return Utilities::serializeJson(d, false);
+}
 } // namespace ppp
 
 #pragma region C Interface
@@ -141,12 +530,12 @@ std::string PublicPppEngine::checkCompliance(const std::string & request) const
     try                                                                                                                \
     {                                                                                                                  \
         statements;                                                                                                    \
-        std::cout << "Method '" << __FUNCTION__ << "' called successfully" << std::endl;                               \
+        LOG_DEBUG(std::string("Method '") + __FUNCTION__ + "' called successfully");                                   \
         return true;                                                                                                   \
     }                                                                                                                  \
     catch (const std::exception & ex)                                                                                  \
     {                                                                                                                  \
-        std::cout << "Method '" << __FUNCTION__ << "' failed: " << ex.what() << std::endl;                             \
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());                                  \
         g_last_error = ex.what();                                                                                      \
         return false;                                                                                                  \
     }
@@ -173,6 +562,29 @@ bool is_configured()
     return g_c_pppInstance.isConfigured();
 }
 
+EMSCRIPTEN_KEEPALIVE
+bool is_component_configured(const char * component_name)
+{
+    using namespace ppp;
+    try
+    {
+        return g_c_pppInstance.isConfigured(component_name);
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return false;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool wait_until_configured()
+{
+    using namespace ppp;
+    TRYRUN(g_c_pppInstance.waitUntilConfigured(););
+}
+
 EMSCRIPTEN_KEEPALIVE
 bool detect_landmarks(const char * img_id, char * landmarks)
 {
@@ -180,6 +592,14 @@ bool detect_landmarks(const char * img_id, char * landmarks)
     TRYRUN(auto landmarksStr = g_c_pppInstance.detectLandmarks(img_id); strcpy(landmarks, landmarksStr.c_str()););
 }
 
+EMSCRIPTEN_KEEPALIVE
+bool detect_landmarks_with_profile(const char * img_id, const char * predictor_profile, char * landmarks)
+{
+    using namespace ppp;
+    TRYRUN(auto landmarksStr = g_c_pppInstance.detectLandmarks(img_id, predictor_profile);
+           strcpy(landmarks, landmarksStr.c_str()););
+}
+
 EMSCRIPTEN_KEEPALIVE
 int create_tiled_print(const char * img_id, const char * request, char * out_buf)
 {
@@ -193,11 +613,133 @@ int create_tiled_print(const char * img_id, const char * request, char * out_buf
     }
     catch (const std::exception & ex)
     {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
         g_last_error = ex.what();
         return 0;
     }
 }
 
+EMSCRIPTEN_KEEPALIVE
+int detect_landmarks_array(const char * img_id, int * points, const int max_points, ppp_landmarks * named_landmarks)
+{
+    using namespace ppp;
+    try
+    {
+        vector<int> allPoints;
+        if (!g_c_pppInstance.detectLandmarks(img_id, allPoints, *named_landmarks))
+        {
+            return -1;
+        }
+        const auto numPoints = static_cast<int>(allPoints.size() / 2);
+        copy_n(allPoints.begin(), 2 * min(numPoints, max_points), points);
+        return numPoints;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return -1;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+int create_tiled_print_array(const char * img_id,
+                             const char * request,
+                             unsigned char * pixels,
+                             int pixels_size,
+                             int * shape)
+{
+    using namespace ppp;
+    try
+    {
+        const auto requiredSize = static_cast<int>(
+            g_c_pppInstance.createTiledPrint(img_id, request, pixels, static_cast<size_t>(pixels_size), shape));
+        // Let the caller know how big the buffer needs to be
+        return requiredSize > pixels_size ? -requiredSize : requiredSize;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return 0;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+int process_photo(const char * img_buf,
+                  const int img_buf_size,
+                  const char * request,
+                  char * out_buf,
+                  const int out_buf_size,
+                  char * metadata,
+                  int * metadata_size)
+{
+    using namespace ppp;
+    try
+    {
+        string metadataStr;
+        auto output = g_c_pppInstance.processPhoto(img_buf, img_buf_size, request, metadataStr);
+        const auto out_size = static_cast<int>(output.size());
+        const auto required_metadata_size = static_cast<int>(metadataStr.size()) + 1;
+        const auto fits = out_size <= out_buf_size && required_metadata_size <= *metadata_size;
+        // Let the caller know how big the buffers need to be
+        *metadata_size = required_metadata_size;
+        if (!fits)
+        {
+            return -out_size;
+        }
+        copy(output.begin(), output.end(), out_buf);
+        copy(metadataStr.begin(), metadataStr.end(), metadata);
+        metadata[metadataStr.size()] = '\0';
+        return out_size;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return 0;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+int check_compliance_batch(const char * request, char * out_buf, int out_buf_size)
+{
+    using namespace ppp;
+    try
+    {
+        const auto output = g_c_pppInstance.checkComplianceBatch(request);
+        const auto out_size = static_cast<int>(output.size());
+        if (out_size >= out_buf_size)
+        {
+            // Let the caller know how big the buffer needs to be
+            return -(out_size + 1);
+        }
+        copy(output.begin(), output.end(), out_buf);
+        out_buf[out_size] = '\0';
+        return out_size;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return 0;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool get_image_store_stats(char * stats_json)
+{
+    using namespace ppp;
+    TRYRUN(auto statsStr = g_c_pppInstance.getImageStoreStats(); strcpy(stats_json, statsStr.c_str()););
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool get_render_cache_stats(char * stats_json)
+{
+    using namespace ppp;
+    TRYRUN(auto statsStr = g_c_pppInstance.getRenderCacheStats(); strcpy(stats_json, statsStr.c_str()););
+}
+
 EMSCRIPTEN_KEEPALIVE
 int get_image(const char * img_id, char * out_buf)
 {
@@ -211,9 +753,170 @@ int get_image(const char * img_id, char * out_buf)
     }
     catch (const std::exception & ex)
     {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return 0;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool start_frame_sequence(const int keyframe_interval, const double search_window_scale)
+{
+    using namespace ppp;
+    TRYRUN(g_c_pppInstance.startFrameSequence(keyframe_interval, search_window_scale););
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool process_frame(const char * img_buf, const int img_buf_size, char * result_json)
+{
+    using namespace ppp;
+    TRYRUN(auto resultStr = g_c_pppInstance.processFrame(img_buf, static_cast<size_t>(img_buf_size));
+           strcpy(result_json, resultStr.c_str()););
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool process_frame_pixels(const unsigned char * pixels,
+                          const int rows,
+                          const int cols,
+                          const int channels,
+                          char * result_json)
+{
+    using namespace ppp;
+    TRYRUN(auto resultStr = g_c_pppInstance.processFrame(pixels, rows, cols, channels);
+           strcpy(result_json, resultStr.c_str()););
+}
+
+EMSCRIPTEN_KEEPALIVE
+int process_video(const char * video_path, char * out_buf, const int out_buf_size)
+{
+    using namespace ppp;
+    try
+    {
+        const auto output = g_c_pppInstance.processVideo(video_path);
+        const auto out_size = static_cast<int>(output.size());
+        if (out_size >= out_buf_size)
+        {
+            // Let the caller know how big the buffer needs to be
+            return -(out_size + 1);
+        }
+        copy(output.begin(), output.end(), out_buf);
+        out_buf[out_size] = '\0';
+        return out_size;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return 0;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool get_frame_sequence_stats(char * stats_json)
+{
+    using namespace ppp;
+    TRYRUN(auto statsStr = g_c_pppInstance.getFrameSequenceStats(); strcpy(stats_json, statsStr.c_str()););
+}
+
+EMSCRIPTEN_KEEPALIVE
+int get_image_preview(const char * img_id,
+                      const int max_dimension,
+                      const char * format,
+                      char * out_buf,
+                      const int out_buf_size)
+{
+    using namespace ppp;
+    try
+    {
+        auto output = g_c_pppInstance.getImagePreview(img_id, max_dimension, format);
+        const auto out_size = static_cast<int>(output.size());
+        if (out_size > out_buf_size)
+        {
+            // Let the caller know how big the buffer needs to be
+            return -out_size;
+        }
+        copy(output.begin(), output.end(), out_buf);
+        return out_size;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
+        g_last_error = ex.what();
+        return 0;
+    }
+}
+
+EMSCRIPTEN_KEEPALIVE
+void set_tracing_enabled(bool enabled)
+{
+    ppp::Tracer::instance().setEnabled(enabled);
+}
+
+EMSCRIPTEN_KEEPALIVE
+unsigned long long get_last_trace_id()
+{
+    return ppp::Tracer::lastTraceId();
+}
+
+EMSCRIPTEN_KEEPALIVE
+int get_trace(unsigned long long trace_id, char * out_buf, int out_buf_size)
+{
+    using namespace ppp;
+    try
+    {
+        const auto output = Tracer::instance().toJson(trace_id);
+        const auto out_size = static_cast<int>(output.size());
+        if (out_size >= out_buf_size)
+        {
+            // Let the caller know how big the buffer needs to be
+            return -(out_size + 1);
+        }
+        copy(output.begin(), output.end(), out_buf);
+        out_buf[out_size] = '\0';
+        return out_size;
+    }
+    catch (const std::exception & ex)
+    {
+        LOG_ERROR(std::string("Method '") + __FUNCTION__ + "' failed: " + ex.what());
         g_last_error = ex.what();
         return 0;
     }
 }
 
+EMSCRIPTEN_KEEPALIVE
+bool set_log_level(const char * level)
+{
+    using namespace ppp;
+    TRYRUN(Logger::instance().setLevel(Logger::fromString(level)););
+}
+
+EMSCRIPTEN_KEEPALIVE
+int get_log_records(char * out_buf, int out_buf_size)
+{
+    using namespace ppp;
+    // Room for at least an empty array
+    if (out_buf_size < 3)
+    {
+        return 0;
+    }
+    const auto output = Logger::instance().drainJson(static_cast<size_t>(out_buf_size));
+    const auto out_size = static_cast<int>(output.size());
+    copy(output.begin(), output.end(), out_buf);
+    out_buf[out_size] = '\0';
+    return out_size;
+}
+
+EMSCRIPTEN_KEEPALIVE
+bool set_num_threads(int num_threads)
+{
+    using namespace ppp;
+    TRYRUN(PppEngine::setNumThreads(num_threads););
+}
+
+EMSCRIPTEN_KEEPALIVE
+int get_num_threads()
+{
+    return ppp::PppEngine::getNumThreads();
+}
+
 #pragma endregion
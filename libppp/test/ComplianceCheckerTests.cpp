@@ -3,10 +3,13 @@
 
 #include "ComplianceChecker.h"
 #include "ComplianceResult.h"
+#include "ImageStatistics.h"
 #include "ImageStore.h"
 #include "PhotoStandard.h"
 #include "TestHelpers.h"
 
+#include <opencv2/imgproc.hpp>
+
 using namespace testing;
 
 namespace ppp
@@ -63,4 +66,77 @@ TEST_F(ComplianceCheckerTests, checkInputDpi)
     EXPECT_LT(inputDpi, highResolDpi);
 }
 
+TEST_F(ComplianceCheckerTests, checksImageInputsAgainstSeveralStandards)
+{
+    const ComplianceInputs inputs(cv::Point(941, 999), cv::Point(927, 1675), cv::Size(700, 700), cv::Size(1920, 2560));
+    EXPECT_NEAR(676.14, inputs.crownChinDistance, 0.01);
+
+    const PhotoStandard lowResolStandard(2, 2, 1.1875, 0, 0, 300, "inch");
+    const PhotoStandard highResolStandard(2, 2, 1.1875, 0, 0, 600, "inch");
+    const auto & checker = *m_subject;
+    const auto lowResolResults = checker.checkCompliance(inputs,
+                                                         lowResolStandard,
+                                                         { CHECK_INPUT_RESOLUTION, "unknownCheck" });
+    const auto highResolResults = checker.checkCompliance(inputs, highResolStandard, { CHECK_INPUT_RESOLUTION });
+
+    // Unknown checks are skipped
+    ASSERT_EQ(1, lowResolResults.size());
+    ASSERT_EQ(1, highResolResults.size());
+    EXPECT_TRUE(lowResolResults.front()->getPassed());
+    EXPECT_FALSE(highResolResults.front()->getPassed());
+
+    double inputDpi;
+    EXPECT_TRUE(highResolResults.front()->getParam(CHECK_INPUT_RESOLUTION, inputDpi));
+    EXPECT_NEAR(inputs.crownChinDistance / 1.1875, inputDpi, 1e-9);
+}
+
+TEST_F(ComplianceCheckerTests, imageStatisticsChecks)
+{
+    const PhotoStandard photoStandard(2, 2, 1.1875, 0, 0, 300, "inch");
+    const std::vector<std::string> checkNames = { CHECK_BACKGROUND_UNIFORMITY, CHECK_EXPOSURE, CHECK_SHARPNESS };
+    const cv::Rect faceRect(100, 100, 200, 200);
+    const auto checkImage = [&](const cv::Mat & image) {
+        const ComplianceInputs inputs(cv::Point(200, 100),
+                                      cv::Point(200, 300),
+                                      faceRect.size(),
+                                      image.size(),
+                                      ImageStatistics::compute(image, faceRect));
+        std::vector<bool> passed;
+        for (const auto & result : m_subject->checkCompliance(inputs, photoStandard, checkNames))
+        {
+            passed.push_back(result->getPassed());
+        }
+        return passed;
+    };
+
+    // Plain background and a textured, well exposed face
+    cv::Mat image(500, 400, CV_8UC3, cv::Scalar(230, 230, 230));
+    cv::randu(image(faceRect), cv::Scalar::all(80), cv::Scalar::all(180));
+    EXPECT_EQ(std::vector<bool>({ true, true, true }), checkImage(image));
+
+    // Blurring leaves the plain background and the exposure unchanged
+    cv::Mat blurred;
+    cv::GaussianBlur(image, blurred, cv::Size(), 4);
+    EXPECT_EQ(std::vector<bool>({ true, true, false }), checkImage(blurred));
+
+    // Textured background and a dark face
+    cv::Mat dark = image.clone();
+    cv::randu(dark, cv::Scalar::all(0), cv::Scalar::all(256));
+    dark(faceRect) /= 8;
+    EXPECT_EQ(std::vector<bool>({ false, false, true }), checkImage(dark));
+
+    // Checks reading the statistics can't run without them
+    const ComplianceInputs noStatistics(cv::Point(200, 100), cv::Point(200, 300));
+    EXPECT_THROW(m_subject->checkCompliance(noStatistics, photoStandard, { CHECK_SHARPNESS }), std::runtime_error);
+}
+
+TEST_F(ComplianceCheckerTests, tellsWhichChecksReadTheImageStatistics)
+{
+    EXPECT_FALSE(m_subject->needsImageStatistics({}));
+    EXPECT_FALSE(m_subject->needsImageStatistics({ CHECK_INPUT_RESOLUTION, "unknownCheck" }));
+    EXPECT_TRUE(m_subject->needsImageStatistics({ CHECK_INPUT_RESOLUTION, CHECK_EXPOSURE }));
+    EXPECT_TRUE(m_subject->needsImageStatistics({ CHECK_BACKGROUND_UNIFORMITY }));
+    EXPECT_TRUE(m_subject->needsImageStatistics({ CHECK_SHARPNESS }));
+}
+
 } // namespace ppp
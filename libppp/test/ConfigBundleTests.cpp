@@ -0,0 +1,109 @@
+#include <gtest/gtest.h>
+
+#include <cstdio>
+#include <fstream>
+#include <iterator>
+
+#include "ConfigLoader.h"
+
+using namespace testing;
+
+namespace ppp
+{
+class ConfigBundleTests : public Test
+{
+protected:
+    std::string m_bundleFilePath = "ConfigBundleTests.bundle.bin";
+
+    void TearDown() override
+    {
+        std::remove(m_bundleFilePath.c_str());
+    }
+
+    /*!@brief Writes a bundle the same way build.py does !*/
+    void writeBundle(const std::vector<std::pair<std::string, std::string>> & sections) const
+    {
+        const auto writeInteger = [](std::string & out, const uint64_t value, const size_t numBytes) {
+            for (size_t i = 0; i < numBytes; ++i)
+            {
+                out.push_back(static_cast<char>((value >> (8 * i)) & 0xFF));
+            }
+        };
+
+        std::string header = "PPPBNDL1";
+        writeInteger(header, 1, 4);
+        writeInteger(header, sections.size(), 4);
+        auto offset = header.size() + sections.size() * (ConfigBundle::SECTION_NAME_SIZE + 16);
+        std::string blobs;
+        for (const auto & section : sections)
+        {
+            offset = (offset + 63) / 64 * 64;
+            auto name = section.first;
+            name.resize(ConfigBundle::SECTION_NAME_SIZE, '\0');
+            header += name;
+            writeInteger(header, offset, 8);
+            writeInteger(header, section.second.size(), 8);
+            offset += section.second.size();
+        }
+        for (const auto & section : sections)
+        {
+            blobs.resize((header.size() + blobs.size() + 63) / 64 * 64 - header.size(), '\0');
+            blobs += section.second;
+        }
+        std::ofstream ofs(m_bundleFilePath, std::ios::binary);
+        ofs << header << blobs;
+    }
+};
+
+TEST_F(ConfigBundleTests, configIsReadFromTheBundle)
+{
+    writeBundle({ { ConfigBundle::CONFIG_SECTION, R"({"imageStore": {"size": 12}})" } });
+    ASSERT_TRUE(ConfigBundle::isBundle(m_bundleFilePath));
+
+    ConfigLoader configLoader(m_bundleFilePath);
+    EXPECT_EQ(12, configLoader.get({ "imageStore", "size" }).GetInt());
+}
+
+TEST_F(ConfigBundleTests, resourcesAreServedFromSections)
+{
+    const std::string modelContent("\x00\x01\x02model\xFF", 9);
+    writeBundle({ { ConfigBundle::CONFIG_SECTION,
+                    R"({"shapePredictor": {"file": "sp_model.dat", "section": "shapePredictor"},)"
+                    R"( "faceDetector": {"haarCascade": {"file": "missing.xml", "section": "missing"}}})" },
+                  { "shapePredictor", modelContent } });
+
+    ConfigLoader configLoader(m_bundleFilePath);
+    auto loaded = false;
+    configLoader.loadResource({ "shapePredictor" }, [&](const bool success, std::istream & stream) {
+        loaded = success;
+        const std::string content((std::istreambuf_iterator<char>(stream)), std::istreambuf_iterator<char>());
+        EXPECT_EQ(modelContent, content);
+    });
+    EXPECT_TRUE(loaded);
+
+    EXPECT_THROW(configLoader.loadResource({ "faceDetector", "haarCascade" }, [](bool, std::istream &) {}),
+                 std::runtime_error);
+}
+
+TEST_F(ConfigBundleTests, invalidBundlesAreRejected)
+{
+    {
+        std::ofstream ofs(m_bundleFilePath, std::ios::binary);
+        ofs << R"({"imageStore": {"size": 12}})";
+    }
+    EXPECT_FALSE(ConfigBundle::isBundle(m_bundleFilePath));
+
+    writeBundle({ { ConfigBundle::CONFIG_SECTION, "{}" } });
+    // Truncate the file in the middle of the section table
+    std::string content;
+    {
+        std::ifstream ifs(m_bundleFilePath, std::ios::binary);
+        content.assign((std::istreambuf_iterator<char>(ifs)), std::istreambuf_iterator<char>());
+    }
+    {
+        std::ofstream ofs(m_bundleFilePath, std::ios::binary | std::ios::trunc);
+        ofs << content.substr(0, 40);
+    }
+    EXPECT_THROW(ConfigBundle bundle(m_bundleFilePath), std::runtime_error);
+}
+} // namespace ppp
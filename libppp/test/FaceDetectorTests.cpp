@@ -74,4 +74,52 @@ TEST_F(FaceDetectorTests, DISABLED_DetectFaceRotation)
         EXPECT_EQ(detectedLandMarks.imageRotation, angle);
     }
 }
+
+TEST_F(FaceDetectorTests, BackendsCanBeRegisteredAndSelected)
+{
+    EXPECT_EQ(m_pFaceDetector->backendName(), "haarCascade");
+    const auto names = FaceDetector::backendNames();
+    for (const auto & name : { "haarCascade", "lbpCascade", "dlibHog" })
+    {
+        EXPECT_NE(std::find(names.begin(), names.end(), name), names.end()) << name << " is not registered";
+    }
+
+    // Finds a face only in the image rotated by -90 degrees, which is the third rotation tried
+    class TestBackend final : public IFaceDetectorBackend
+    {
+    public:
+        void configure(const ConfigLoaderSPtr &, const std::function<void()> & onReady) override
+        {
+            onReady();
+        }
+
+        std::vector<cv::Rect> detect(const cv::Mat & grayImage, const cv::Size &, const cv::Size &) override
+        {
+            if (++m_numCalls < 3)
+            {
+                return {};
+            }
+            return { cv::Rect(1, 2, grayImage.cols / 2, grayImage.rows / 2) };
+        }
+
+    private:
+        int m_numCalls = 0;
+    };
+    FaceDetector::registerBackend("test", []() { return std::make_unique<TestBackend>(); });
+
+    const auto configLoader = getConfigLoader();
+    configLoader->get({ "faceDetector", "backend" }).SetString("test");
+    FaceDetector faceDetector;
+    faceDetector.configure(configLoader);
+    ASSERT_TRUE(faceDetector.isConfigured());
+    EXPECT_EQ(faceDetector.backendName(), "test");
+
+    LandMarks landMarks;
+    ASSERT_TRUE(faceDetector.detectLandMarks(cv::Mat(200, 100, CV_8UC1, cv::Scalar(0)), landMarks));
+    EXPECT_EQ(landMarks.imageRotation, -90);
+    EXPECT_EQ(landMarks.vjFaceRect, cv::Rect(1, 2, 100, 50));
+
+    configLoader->get({ "faceDetector", "backend" }).SetString("unknown");
+    EXPECT_THROW(faceDetector.configure(configLoader), std::runtime_error);
+}
 } // namespace ppp
@@ -1,8 +1,11 @@
 ﻿#include <gtest/gtest.h>
 
 #include "EasyExif.h"
+#include "ImageStatistics.h"
 #include "ImageStore.h"
+#include "LandMarks.h"
 #include "TestHelpers.h"
+#include <numeric>
 #include <opencv2/imgcodecs.hpp>
 
 namespace ppp
@@ -86,6 +89,71 @@ TEST_F(ImageStoreTests, ImagesArePrioritizedByAccess)
     EXPECT_FALSE(m_pImageStore->containsImage(key3));
 }
 
+TEST_F(ImageStoreTests, StatsTrackStoreUsage)
+{
+    m_pImageStore->setStoreSize(2);
+
+    const auto key1 = m_pImageStore->setImage(m_data1.data(), m_data1.size());
+    m_pImageStore->setImage(m_data2.data(), m_data2.size());
+    // Setting the same image again does not add a new entry
+    m_pImageStore->setImage(m_data2.data(), m_data2.size());
+    m_pImageStore->setImage(m_data3.data(), m_data3.size());
+
+    EXPECT_FALSE(m_pImageStore->containsImage(key1));
+
+    const auto stats = m_pImageStore->getStats();
+    EXPECT_EQ(2u, stats.numImages);
+    EXPECT_EQ(2u, stats.storeSize);
+    EXPECT_EQ(2u * m_mat1.total() * m_mat1.elemSize(), stats.imageBytes);
+    EXPECT_EQ(3u, stats.inserts);
+    EXPECT_EQ(1u, stats.reinserts);
+    EXPECT_EQ(1u, stats.evictions);
+    EXPECT_EQ(0u, stats.hits);
+    EXPECT_EQ(1u, stats.misses);
+}
+
+TEST_F(ImageStoreTests, OnlyTheDecodedWorkingSetIsKeptInMemory)
+{
+    const auto imageBytes = m_mat1.total() * m_mat1.elemSize();
+    m_pImageStore->setStoreSize(3);
+    m_pImageStore->setDecodedBytesLimit(2 * imageBytes);
+
+    const auto key1 = m_pImageStore->setImage(m_data1.data(), m_data1.size());
+    const auto key2 = m_pImageStore->setImage(m_data2.data(), m_data2.size());
+    const auto key3 = m_pImageStore->setImage(m_data3.data(), m_data3.size());
+
+    auto stats = m_pImageStore->getStats();
+    EXPECT_EQ(3u, stats.numImages);
+    EXPECT_EQ(2 * imageBytes, stats.imageBytes);
+    EXPECT_EQ(m_data1.size() + m_data2.size() + m_data3.size(), stats.encodedBytes);
+
+    // Image 1 left the working set and is decoded again, pushing image 2 out
+    verifyEqualImages(m_mat1, m_pImageStore->getImage(key1));
+    verifyEqualImages(m_mat3, m_pImageStore->getImage(key3));
+    verifyEqualImages(m_mat2, m_pImageStore->getImage(key2));
+
+    stats = m_pImageStore->getStats();
+    EXPECT_EQ(1u, stats.decodedHits);
+    EXPECT_EQ(2u, stats.decodedMisses);
+    EXPECT_EQ(2 * imageBytes, stats.imageBytes);
+    EXPECT_TRUE(m_pImageStore->getLandMarks(key1) != nullptr);
+}
+
+TEST_F(ImageStoreTests, EvictionListenersAreNotified)
+{
+    std::vector<std::string> evictedKeys;
+    m_pImageStore->addEvictionListener([&evictedKeys](const std::string & key) { evictedKeys.push_back(key); });
+    m_pImageStore->setStoreSize(2);
+
+    const auto key1 = m_pImageStore->setImage(m_data1.data(), m_data1.size());
+    const auto key2 = m_pImageStore->setImage(m_data2.data(), m_data2.size());
+    EXPECT_TRUE(evictedKeys.empty());
+
+    m_pImageStore->setImage(m_data3.data(), m_data3.size());
+    m_pImageStore->setStoreSize(1);
+    EXPECT_EQ(std::vector<std::string>({ key1, key2 }), evictedKeys);
+}
+
 TEST_F(ImageStoreTests, ImageExifDataRetrieval)
 {
     m_pImageStore->setStoreSize(1);
@@ -116,4 +184,69 @@ TEST_F(ImageStoreTests, ImageExifDataRetrieval)
     EXPECT_EQ(image2.rows, 512);
     ASSERT_FALSE(imgExif2);
 }
+
+TEST_F(ImageStoreTests, PreviewsAreDownscaledAndCachedUntilEviction)
+{
+    const auto decode = [](const std::string & encoded) {
+        return cv::imdecode(std::vector<char>(encoded.begin(), encoded.end()), cv::IMREAD_COLOR);
+    };
+    m_pImageStore->setStoreSize(1);
+    const auto key1 = m_pImageStore->setImage(m_data1.data(), m_data1.size());
+
+    const auto preview = m_pImageStore->getImagePreview(key1, 5, "png");
+    const auto previewImage = decode(preview);
+    EXPECT_EQ(5, previewImage.cols);
+    EXPECT_EQ(5, previewImage.rows);
+
+    EXPECT_EQ(preview, m_pImageStore->getImagePreview(key1, 5, "png"));
+    EXPECT_EQ(1u, m_pImageStore->getStats().previewHits);
+    EXPECT_EQ(1u, m_pImageStore->getStats().previewMisses);
+
+    // Previews are never upscaled
+    EXPECT_EQ(10, decode(m_pImageStore->getImagePreview(key1, 100, "jpeg")).cols);
+    EXPECT_THROW(m_pImageStore->getImagePreview(key1, 5, "bmp"), std::runtime_error);
+
+    // Evicted with the image
+    m_pImageStore->setImage(m_data2.data(), m_data2.size());
+    EXPECT_THROW(m_pImageStore->getImagePreview(key1, 5, "png"), std::runtime_error);
+}
+TEST_F(ImageStoreTests, ImageStatisticsAreCachedUntilTheFaceChanges)
+{
+    // Uniform background around a noisy square "face"
+    cv::Mat image(100, 80, CV_8UC3, cv::Scalar(200, 180, 160));
+    const cv::Rect faceRect(20, 30, 40, 40);
+    cv::randu(image(faceRect), cv::Scalar::all(50), cv::Scalar::all(150));
+    std::vector<BYTE> pictureData;
+    cv::imencode(".png", image, pictureData);
+    const auto key = m_pImageStore->setImage(reinterpret_cast<const char *>(pictureData.data()), pictureData.size());
+
+    const auto noFaceStats = m_pImageStore->getImageStatistics(key);
+    EXPECT_EQ(image.size(), noFaceStats->imageSize);
+    EXPECT_EQ(0, noFaceStats->face.numPixels);
+    EXPECT_EQ(noFaceStats, m_pImageStore->getImageStatistics(key));
+
+    // Band of 4 pixels along the top, left and right borders
+    const auto & background = noFaceStats->background;
+    EXPECT_EQ(80 * 4 + 2 * 4 * 96, background.numPixels);
+    EXPECT_NEAR(200.0, background.mean[0], 1e-9);
+    EXPECT_NEAR(160.0, background.mean[2], 1e-9);
+    EXPECT_NEAR(0.0, background.stdDev[0], 1e-9);
+    EXPECT_NEAR(0.0, background.grayStdDev, 1e-9);
+    EXPECT_NEAR(0.0, background.laplacianVariance, 1e-9);
+
+    m_pImageStore->getLandMarks(key)->vjFaceRect = faceRect;
+    const auto faceStats = m_pImageStore->getImageStatistics(key);
+    EXPECT_NE(noFaceStats, faceStats);
+    EXPECT_EQ(faceRect, faceStats->faceRect);
+    const auto & face = faceStats->face;
+    EXPECT_EQ(faceRect.area(), face.numPixels);
+    EXPECT_EQ(face.numPixels, std::accumulate(face.grayHistogram.begin(), face.grayHistogram.end(), size_t(0)));
+    EXPECT_NEAR(100.0, face.grayMean, 3.0);
+    EXPECT_GT(face.grayStdDev, 10.0);
+    EXPECT_GT(face.laplacianVariance, 1000.0);
+    EXPECT_DOUBLE_EQ(1.0, face.outsideFraction(150, 255));
+    EXPECT_DOUBLE_EQ(0.0, face.outsideFraction(50, 150));
+
+    EXPECT_THROW(m_pImageStore->getImageStatistics("missing"), std::runtime_error);
+}
 } // namespace ppp
@@ -1,8 +1,11 @@
 #include <gtest/gtest.h>
 #include <numeric>
+#include <opencv2/imgcodecs.hpp>
+#include <opencv2/imgproc/imgproc.hpp>
 #include <vector>
 
 #include "FaceDetector.h"
+#include "FrameSequence.h"
 #include "IImageStore.h"
 #include "LandMarks.h"
 #include "PppEngine.h"
@@ -215,6 +218,39 @@ TEST_F(LandMarkDetectionTests, DevelopementTestSingleCase)
     runSingleImage(resolvePath("research/mugshot_frontal_original_all/012_frontal.jpg"));
 }
 
+TEST_F(LandMarkDetectionTests, FrameSequenceTracksTheFaceBetweenKeyframes)
+{
+    m_pPppEngine->waitUntilConfigured();
+    const auto image = imread(resolvePath("research/mugshot_frontal_original_all/001_frontal.jpg"));
+    FrameSequence frameSequence(*m_pPppEngine, 4);
+
+    FrameResult firstFrame;
+    for (auto i = 0; i < 8; ++i)
+    {
+        // The face moves a few pixels to the right on every frame
+        Mat frame;
+        const Mat translation = (Mat_<double>(2, 3) << 1, 0, 3 * i, 0, 1, 0);
+        warpAffine(image, frame, translation, image.size());
+
+        const auto result = frameSequence.processFrame(frame);
+        ASSERT_TRUE(result.detected) << "Face lost on frame " << i;
+        EXPECT_EQ(i % 4 == 0, result.fullDetection) << "Unexpected detection mode on frame " << i;
+        if (i == 0)
+        {
+            firstFrame = result;
+            continue;
+        }
+        const Point shift(3 * i, 0);
+        EXPECT_LT(norm(result.landMarks.chinPoint - shift - firstFrame.landMarks.chinPoint), 10.0);
+        EXPECT_LT(norm(result.landMarks.crownPoint - shift - firstFrame.landMarks.crownPoint), 10.0);
+    }
+
+    const auto stats = frameSequence.getStats();
+    EXPECT_EQ(8u, stats.numFrames);
+    EXPECT_EQ(2u, stats.numFullDetections);
+    EXPECT_EQ(0u, stats.numTrackingLosses);
+}
+
 TEST_F(LandMarkDetectionTests, DISABLED_babyTest)
 {
     runSingleImage(resolvePath("research/my_database/20191021_155155.jpg"));
@@ -0,0 +1,35 @@
+#include <gtest/gtest.h>
+#include <rapidjson/document.h>
+#include <vector>
+
+#include "libppp.h"
+
+namespace ppp
+{
+TEST(LibpppTests, ComplianceBatchTellsTheBufferSizeItNeeds)
+{
+    const auto request = R"({"imgKeys": ["notStored"], "standardIds": ["xx_unknown_photo"],
+        "complianceChecks": ["inpuResolution"]})";
+    std::vector<char> buffer(8);
+    const auto requiredSize = check_compliance_batch(request, buffer.data(), static_cast<int>(buffer.size()));
+    ASSERT_LT(requiredSize, 0);
+
+    buffer.resize(-requiredSize);
+    const auto length = check_compliance_batch(request, buffer.data(), static_cast<int>(buffer.size()));
+    EXPECT_EQ(-requiredSize - 1, length);
+
+    rapidjson::Document d;
+    d.Parse(buffer.data());
+    ASSERT_TRUE(d.IsObject());
+    EXPECT_EQ(0u, d["rows"].Size());
+    EXPECT_TRUE(d["errors"]["imgKeys"].HasMember("notStored"));
+    EXPECT_TRUE(d["errors"]["standardIds"].HasMember("xx_unknown_photo"));
+
+    // Requests missing a field or with a field of the wrong type fail
+    EXPECT_EQ(0, check_compliance_batch(R"({"imgKeys": []})", buffer.data(), static_cast<int>(buffer.size())));
+    EXPECT_EQ(0,
+              check_compliance_batch(R"({"imgKeys": [1], "standardIds": [], "complianceChecks": []})",
+                                     buffer.data(),
+                                     static_cast<int>(buffer.size())));
+}
+} // namespace ppp
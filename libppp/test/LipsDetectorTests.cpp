@@ -0,0 +1,41 @@
+#include <gtest/gtest.h>
+
+#include "LipsDetector.h"
+#include "TestHelpers.h"
+
+#include <opencv2/imgcodecs.hpp>
+
+namespace ppp
+{
+class LipsDetectorTests : public testing::Test
+{
+protected:
+    LipsDetector m_lipsDetector;
+
+    void verifySameColorTransform(const cv::Mat & bgrImage)
+    {
+        cv::Mat expected, actual;
+        LipsDetector::colorTransformPerPixel(bgrImage, expected);
+        m_lipsDetector.colorTransform(bgrImage, actual);
+        ASSERT_EQ(CV_8UC1, actual.type());
+        verifyEqualImages(expected, actual);
+    }
+};
+
+TEST_F(LipsDetectorTests, ColorTransformMatchesThePerPixelImplementation)
+{
+    cv::Mat randomImage(120, 160, CV_8UC3);
+    cv::randu(randomImage, cv::Scalar::all(0), cv::Scalar::all(256));
+    // Black pixels and pixels without red nor green divide by zero
+    randomImage(cv::Rect(0, 0, 10, 10)).setTo(cv::Scalar(0, 0, 0));
+    randomImage(cv::Rect(10, 0, 10, 10)).setTo(cv::Scalar(200, 0, 0));
+    verifySameColorTransform(randomImage);
+
+    // Buffers are reused by the next calls, including on regions of a bigger image
+    const auto image = cv::imread(resolvePath("research/sample_test_images/000.jpg"));
+    ASSERT_FALSE(image.empty());
+    verifySameColorTransform(image);
+    verifySameColorTransform(image(cv::Rect(image.cols / 4, image.rows / 2, image.cols / 2, image.rows / 4)));
+    verifySameColorTransform(randomImage);
+}
+} // namespace ppp
@@ -0,0 +1,125 @@
+#include <gtest/gtest.h>
+
+#include <rapidjson/document.h>
+#include <set>
+#include <thread>
+
+#include "Logger.h"
+
+using namespace testing;
+
+namespace ppp
+{
+class LoggerTests : public Test
+{
+protected:
+    Logger & m_logger = Logger::instance();
+
+public:
+    void SetUp() override
+    {
+        m_logger.setBufferSize(16);
+        m_logger.setLevel(LogLevel::Debug);
+    }
+
+    void TearDown() override
+    {
+        m_logger.setLevel(LogLevel::Warning);
+        m_logger.setBufferSize(1024);
+    }
+};
+
+TEST_F(LoggerTests, recordsBelowLevelAreDiscarded)
+{
+    m_logger.setLevel(LogLevel::Warning);
+    LOG_DEBUG("Method 'detect_landmarks' called successfully");
+    LOG_ERROR("Method 'detect_landmarks' failed");
+
+    const auto records = m_logger.drain();
+    ASSERT_EQ(1u, records.size());
+    EXPECT_EQ(LogLevel::Error, records.front().level);
+    EXPECT_EQ("Method 'detect_landmarks' failed", records.front().message);
+    EXPECT_TRUE(m_logger.drain().empty());
+}
+
+TEST_F(LoggerTests, oldestRecordsAreOverwritten)
+{
+    for (auto i = 0; i < 20; ++i)
+    {
+        LOG_INFO("record " + std::to_string(i));
+    }
+    const auto records = m_logger.drain();
+    ASSERT_EQ(16u, records.size());
+    EXPECT_EQ("record 4", records.front().message);
+    EXPECT_EQ("record 19", records.back().message);
+}
+
+TEST_F(LoggerTests, longMessagesAreTruncated)
+{
+    LOG_INFO(std::string(1000, 'x'));
+    const auto records = m_logger.drain();
+    ASSERT_EQ(1u, records.size());
+    EXPECT_EQ(Logger::MAX_MESSAGE_LENGTH, records.front().message.size());
+}
+
+TEST_F(LoggerTests, drainJsonOnlyReturnsWhatFits)
+{
+    for (auto i = 0; i < 3; ++i)
+    {
+        LOG_INFO("record " + std::to_string(i));
+    }
+
+    // Large enough for a single record
+    const auto firstBatch = m_logger.drainJson(120);
+    rapidjson::Document d;
+    d.Parse(firstBatch.c_str());
+    ASSERT_TRUE(d.IsArray());
+    ASSERT_EQ(1u, d.Size());
+    EXPECT_STREQ("record 0", d[0]["message"].GetString());
+    EXPECT_STREQ("info", d[0]["level"].GetString());
+
+    d.Parse(m_logger.drainJson(4096).c_str());
+    ASSERT_EQ(2u, d.Size());
+    EXPECT_STREQ("record 2", d[1]["message"].GetString());
+
+    EXPECT_EQ("[]", m_logger.drainJson(4096));
+}
+
+TEST_F(LoggerTests, concurrentWritersDoNotCorruptRecords)
+{
+    m_logger.setBufferSize(4096);
+    const auto numThreads = 4;
+    const auto recordsPerThread = 500;
+
+    std::vector<std::thread> threads;
+    for (auto t = 0; t < numThreads; ++t)
+    {
+        threads.emplace_back([t]() {
+            for (auto i = 0; i < recordsPerThread; ++i)
+            {
+                LOG_INFO("thread " + std::to_string(t) + " record " + std::to_string(i));
+            }
+        });
+    }
+    for (auto & thread : threads)
+    {
+        thread.join();
+    }
+
+    const auto records = m_logger.drain();
+    ASSERT_EQ(static_cast<size_t>(numThreads * recordsPerThread), records.size());
+    std::set<std::string> messages;
+    for (const auto & record : records)
+    {
+        messages.insert(record.message);
+    }
+    EXPECT_EQ(records.size(), messages.size());
+}
+
+TEST_F(LoggerTests, parsesLevelNames)
+{
+    EXPECT_EQ(LogLevel::Warning, Logger::fromString("warning"));
+    EXPECT_EQ(LogLevel::Off, Logger::fromString("off"));
+    EXPECT_THROW(Logger::fromString("verbose"), std::runtime_error);
+}
+} // namespace ppp
@@ -10,12 +10,16 @@ class MockImageStore final : public IImageStore
 {
 public:
     MOCK_METHOD1(getImage, cv::Mat(const std::string &));
+    MOCK_METHOD3(getImagePreview, std::string(const std::string &, int, const std::string &));
     MOCK_METHOD1(getExifInfo, easyexif::EXIFInfoSPtr(const std::string &));
     MOCK_METHOD1(getLandMarks, LandMarksSPtr(const std::string &));
+    MOCK_METHOD1(getImageStatistics, ImageStatisticsSPtr(const std::string &));
 
     MOCK_METHOD1(unlockImage, void(const std::string &));
     MOCK_METHOD1(containsImage, bool(const std::string &));
     MOCK_METHOD1(setStoreSize, void(size_t));
+    MOCK_CONST_METHOD0(getStats, ImageStoreStats());
+    MOCK_METHOD1(addEvictionListener, void(const EvictionListener &));
 
     MOCK_METHOD1(setImage, std::string(const std::string &));
     MOCK_METHOD2(setImage, std::string(const char *, size_t));
@@ -0,0 +1,108 @@
+#include <gtest/gtest.h>
+
+#include <atomic>
+#include <thread>
+
+#include "ModelRegistry.h"
+
+using namespace testing;
+
+namespace ppp
+{
+class ModelRegistryTests : public Test
+{
+protected:
+    ModelRegistry & m_registry = ModelRegistry::instance();
+
+public:
+    void SetUp() override
+    {
+        m_registry.clear();
+    }
+
+    void TearDown() override
+    {
+        m_registry.clear();
+    }
+};
+
+TEST_F(ModelRegistryTests, sameFingerprintSharesOneInstance)
+{
+    auto numLoads = 0;
+    const auto load = [&numLoads]() {
+        ++numLoads;
+        return std::make_shared<std::string>("model");
+    };
+    const auto first = m_registry.get<std::string>("file:sp_model.dat:10:1", load);
+    const auto second = m_registry.get<std::string>("file:sp_model.dat:10:1", load);
+    const auto other = m_registry.get<std::string>("file:sp_model.dat:10:2", load);
+
+    EXPECT_EQ(first.get(), second.get());
+    EXPECT_NE(first.get(), other.get());
+    EXPECT_EQ(2, numLoads);
+    EXPECT_EQ(2u, m_registry.numLoads());
+    EXPECT_EQ(1u, m_registry.numHits());
+    EXPECT_EQ(2u, m_registry.numLiveModels());
+}
+
+TEST_F(ModelRegistryTests, unusedModelsAreReleased)
+{
+    const auto load = []() { return std::make_shared<int>(42); };
+    auto model = m_registry.get<int>("data:1234:4", load);
+    ASSERT_EQ(42, *model);
+    EXPECT_EQ(1u, m_registry.numLiveModels());
+
+    model.reset();
+    EXPECT_EQ(0u, m_registry.numLiveModels());
+
+    m_registry.get<int>("data:1234:4", load);
+    EXPECT_EQ(2u, m_registry.numLoads());
+}
+
+TEST_F(ModelRegistryTests, findReturnsLoadedModelsWithoutLoading)
+{
+    EXPECT_EQ(nullptr, m_registry.find<std::string>("data:5678:100"));
+
+    const auto model = m_registry.get<std::string>("data:5678:100",
+                                                   []() { return std::make_shared<std::string>("xml"); });
+    EXPECT_EQ(model.get(), m_registry.find<std::string>("data:5678:100").get());
+    // Models are registered per type
+    EXPECT_EQ(nullptr, m_registry.find<int>("data:5678:100"));
+    EXPECT_EQ(1u, m_registry.numLoads());
+    EXPECT_EQ(1u, m_registry.numHits());
+}
+
+TEST_F(ModelRegistryTests, failedLoadsAreNotRegistered)
+{
+    const auto model = m_registry.get<int>("file:missing.dat", []() { return std::shared_ptr<int>(); });
+    EXPECT_EQ(nullptr, model);
+    EXPECT_EQ(0u, m_registry.numLoads());
+    EXPECT_EQ(0u, m_registry.numLiveModels());
+}
+
+TEST_F(ModelRegistryTests, concurrentCallersWaitForASingleLoad)
+{
+    std::atomic<int> numLoads { 0 };
+    std::vector<std::shared_ptr<const int>> models(8);
+    std::vector<std::thread> threads;
+    for (auto & model : models)
+    {
+        threads.emplace_back([this, &numLoads, &model]() {
+            model = m_registry.get<int>("bundle:config.bundle.bin#shapePredictor", [&numLoads]() {
+                ++numLoads;
+                std::this_thread::sleep_for(std::chrono::milliseconds(20));
+                return std::make_shared<int>(7);
+            });
+        });
+    }
+    for (auto & thread : threads)
+    {
+        thread.join();
+    }
+    EXPECT_EQ(1, numLoads);
+    for (const auto & model : models)
+    {
+        EXPECT_EQ(models.front().get(), model.get());
+    }
+}
+} // namespace ppp
@@ -1,8 +1,12 @@
 #include "PhotoStandard.h"
+#include "PhotoStandardCatalogue.h"
 
 #include "TestHelpers.h"
 #include <gtest/gtest.h>
 
+#include <algorithm>
+#include <fstream>
+
 namespace ppp
 {
 
@@ -27,4 +31,33 @@ TEST(PhotoStandardTests, canLoadAllPredefinedPhotoStandardsFromJson)
         }
     }
 }
+
+TEST(PhotoStandardTests, catalogueIndexesPredefinedPhotoStandards)
+{
+    std::ifstream ifs(resolvePath("webapp/src/app/data/photo-standards.json"));
+    PhotoStandardCatalogue catalogue;
+    catalogue.load(ifs);
+
+    ASSERT_TRUE(catalogue.contains("us_passport_photo"));
+    EXPECT_THROW(catalogue.get("xx_unknown_photo"), std::runtime_error);
+
+    const auto usPassport = catalogue.get("us_passport_photo");
+    EXPECT_EQ(usPassport.get(), catalogue.get("us_passport_photo").get());
+    EXPECT_DOUBLE_EQ(2.0, usPassport->photoWidth("inch"));
+
+    // Standards asked at a higher print resolution are cached per resolution, the original one is left untouched
+    const auto nativeDpi = usPassport->resolutionDpi();
+    const auto usPassportHighRes = catalogue.get("us_passport_photo", 2 * nativeDpi);
+    EXPECT_EQ(usPassportHighRes.get(), catalogue.get("us_passport_photo", 2 * nativeDpi).get());
+    EXPECT_DOUBLE_EQ(2 * usPassport->photoWidth(), usPassportHighRes->photoWidth());
+    EXPECT_DOUBLE_EQ(nativeDpi, usPassport->resolutionDpi());
+
+    const auto usStandards = catalogue.find("United States");
+    EXPECT_NE(usStandards.end(), std::find(usStandards.begin(), usStandards.end(), "us_passport_photo"));
+    for (const auto & standardId : catalogue.find("United States", "Passport"))
+    {
+        EXPECT_NE(usStandards.end(), std::find(usStandards.begin(), usStandards.end(), standardId));
+    }
+    EXPECT_TRUE(catalogue.find("Atlantis").empty());
+}
 } // namespace ppp
@@ -1,9 +1,14 @@
+#include <fstream>
 #include <gtest/gtest.h>
 #include <memory>
+#include <rapidjson/document.h>
 
+#include "ComplianceChecker.h"
 #include "LandMarks.h"
 #include "PhotoStandard.h"
+#include "PhotoStandardCatalogue.h"
 #include "PrintDefinition.h"
+#include "TestHelpers.h"
 
 #include "MockCrownChinEstimator.h"
 #include "MockDetector.h"
@@ -78,4 +83,169 @@ TEST_F(PppEngineTests, DISABLED_LandMarkDetectionWorkflowHappyPath)
     // Act
     EXPECT_EQ(true, m_pppEngine->detectLandMarks(imgKey));
 }
+
+TEST_F(PppEngineTests, ComponentsReportTheirReadinessOnceLoaded)
+{
+    const std::string config = R"({"shapePredictor": {"file": "missing_sp_model.dat", "missingPoints": [1]}})";
+    ASSERT_TRUE(m_pppEngine->configure(config, nullptr));
+
+    // Printing needs no detection model and is available as soon as configure returns
+    EXPECT_TRUE(m_pppEngine->isConfigured("photoPrintMaker"));
+
+    EXPECT_THROW(m_pppEngine->waitUntilConfigured(), std::runtime_error);
+    EXPECT_TRUE(m_pppEngine->isConfigured("faceDetector"));
+    EXPECT_TRUE(m_pppEngine->isConfigured("eyesDetector"));
+    EXPECT_FALSE(m_pppEngine->isConfigured("shapePredictor"));
+    EXPECT_FALSE(m_pppEngine->isConfigured());
+    EXPECT_THROW(m_pppEngine->isConfigured("printer"), std::runtime_error);
+}
+
+TEST_F(PppEngineTests, ShapePredictorProfilesAreSelectedByName)
+{
+    const std::string config = R"({"shapePredictor": {"file": "missing_sp_model.dat", "missingPoints": [1]},
+        "shapePredictorProfiles": {"fast": {"file": "missing_sp_model_fast.dat", "keptPoints": [9, 49, 55]}}})";
+    ASSERT_TRUE(m_pppEngine->configure(config, nullptr));
+    EXPECT_THROW(m_pppEngine->waitUntilConfigured(), std::runtime_error);
+
+    EXPECT_EQ(m_pppEngine->getPredictorProfileNames(), std::vector<std::string>({ "accurate", "fast" }));
+    EXPECT_FALSE(m_pppEngine->isConfigured("shapePredictor.fast"));
+
+    EXPECT_CALL(*m_pFaceDetector, detectLandMarks(_, _)).WillRepeatedly(Return(true));
+    const cv::Mat image(100, 100, CV_8UC3, cv::Scalar(128, 128, 128));
+    LandMarks landMarks;
+    EXPECT_THROW(m_pppEngine->detectLandMarks(image, landMarks, cv::Rect(), "unknown"), std::runtime_error);
+    EXPECT_THROW(m_pppEngine->detectLandMarks(image, landMarks, cv::Rect(), "fast"), std::runtime_error);
+}
+
+TEST_F(PppEngineTests, LandmarksAreMappedToTheIndicesOfTheKeptPoints)
+{
+    rapidjson::Document reduced;
+    reduced.Parse(R"({"keptPoints": [9, 34, 37, 38, 39, 41, 42, 44, 45, 46, 47, 48, 49, 55]})");
+    auto mapping = PppEngine::createLandmarkIndexMapping(reduced);
+    EXPECT_EQ(std::vector<int>({ 0 }), mapping[LandMarkType::CHIN_LOWEST_POINT]);
+    EXPECT_EQ(std::vector<int>({ 1 }), mapping[LandMarkType::NOSE_TIP_POINT]);
+    EXPECT_EQ(std::vector<int>({ 2 }), mapping[LandMarkType::EYE_OUTER_CORNER_LEFT]);
+    EXPECT_EQ(std::vector<int>({ 3, 4, 5, 6 }), mapping[LandMarkType::EYE_PUPIL_CENTER_LEFT]);
+    EXPECT_EQ(std::vector<int>({ 7, 8, 10, 11 }), mapping[LandMarkType::EYE_PUPIL_CENTER_RIGHT]);
+    EXPECT_EQ(std::vector<int>({ 9 }), mapping[LandMarkType::EYE_OUTER_CORNER_RIGHT]);
+    EXPECT_EQ(std::vector<int>({ 12 }), mapping[LandMarkType::MOUTH_CORNER_LEFT]);
+    EXPECT_EQ(std::vector<int>({ 13 }), mapping[LandMarkType::MOUTH_CORNER_RIGHT]);
+
+    // Points missing before a landmark shift its index down
+    rapidjson::Document missing;
+    missing.Parse(R"({"missingPoints": [1, 2, 3, 40]})");
+    mapping = PppEngine::createLandmarkIndexMapping(missing);
+    EXPECT_EQ(std::vector<int>({ 5 }), mapping[LandMarkType::CHIN_LOWEST_POINT]);
+    EXPECT_EQ(std::vector<int>({ 34, 35, 36, 37 }), mapping[LandMarkType::EYE_PUPIL_CENTER_LEFT]);
+    EXPECT_EQ(std::vector<int>({ 50 }), mapping[LandMarkType::MOUTH_CORNER_RIGHT]);
+
+    rapidjson::Document complete;
+    complete.Parse(R"({"missingPoints": []})");
+    mapping = PppEngine::createLandmarkIndexMapping(complete);
+    EXPECT_EQ(std::vector<int>({ 8 }), mapping[LandMarkType::CHIN_LOWEST_POINT]);
+    EXPECT_EQ(std::vector<int>({ 43, 44, 46, 47 }), mapping[LandMarkType::EYE_PUPIL_CENTER_RIGHT]);
+}
+
+TEST_F(PppEngineTests, ThreadBudgetIsReadFromTheConfiguration)
+{
+    const auto defaultNumThreads = PppEngine::getNumThreads();
+    const std::string config = R"({"shapePredictor": {"file": "missing_sp_model.dat", "missingPoints": [1]},
+        "threading": {"numThreads": 2}})";
+    ASSERT_TRUE(m_pppEngine->configure(config, nullptr));
+    EXPECT_EQ(2, PppEngine::getNumThreads());
+
+    // Without a positive count the budget set beforehand is kept
+    PppEngine::setNumThreads(1);
+    const std::string defaultConfig = R"({"shapePredictor": {"file": "missing_sp_model.dat", "missingPoints": [1]},
+        "threading": {"numThreads": 0}})";
+    ASSERT_TRUE(m_pppEngine->configure(defaultConfig, nullptr));
+    EXPECT_EQ(1, PppEngine::getNumThreads());
+
+    PppEngine::setNumThreads(0);
+    EXPECT_EQ(defaultNumThreads, PppEngine::getNumThreads());
+}
+
+TEST_F(PppEngineTests, ImageStatisticsAreOnlyComputedForTheChecksReadingThem)
+{
+    const auto photoStandard = std::make_shared<PhotoStandard>(2, 2, 1.1875, 0, 0, 300, "inch");
+    const cv::Point crownPoint(941, 999);
+    const cv::Point chinPoint(927, 1675);
+
+    // The resolution check works from the crown and chin points, the image doesn't have to be in the store
+    EXPECT_CALL(*m_pImageStore, getImageStatistics(_)).Times(0);
+    const auto resultsJson
+        = m_pppEngine->checkCompliance("notStored", photoStandard, crownPoint, chinPoint, { CHECK_INPUT_RESOLUTION });
+    rapidjson::Document results;
+    results.Parse(resultsJson.c_str());
+    ASSERT_TRUE(results.IsArray());
+    ASSERT_EQ(1u, results.Size());
+    EXPECT_TRUE(results[0]["Passed"].GetBool());
+    Mock::VerifyAndClearExpectations(m_pImageStore.get());
+
+    EXPECT_CALL(*m_pImageStore, getImageStatistics("notStored"))
+        .WillOnce(Throw(std::runtime_error("Image with key='notStored' not found!")));
+    EXPECT_THROW(m_pppEngine->checkCompliance("notStored",
+                                              photoStandard,
+                                              crownPoint,
+                                              chinPoint,
+                                              { CHECK_INPUT_RESOLUTION, CHECK_SHARPNESS }),
+                 std::runtime_error);
+}
+
+TEST_F(PppEngineTests, ChecksImagesAgainstCatalogueStandardsInOneTable)
+{
+    std::ifstream ifs(resolvePath("webapp/src/app/data/photo-standards.json"));
+    const auto catalogue = m_pppEngine->getPhotoStandardCatalogue();
+    catalogue->load(ifs);
+
+    // Landmarks were detected for img1, no face is found in img2 and img3 is not in the store
+    const auto landMarks = LandMarks::create();
+    landMarks->vjFaceRect = cv::Rect(800, 900, 300, 300);
+    landMarks->crownPoint = cv::Point(941, 999);
+    landMarks->chinPoint = cv::Point(927, 1675);
+    EXPECT_CALL(*m_pImageStore, containsImage("img1")).WillRepeatedly(Return(true));
+    EXPECT_CALL(*m_pImageStore, containsImage("img2")).WillRepeatedly(Return(true));
+    EXPECT_CALL(*m_pImageStore, containsImage("img3")).WillRepeatedly(Return(false));
+    EXPECT_CALL(*m_pImageStore, getLandMarks("img1")).WillRepeatedly(Return(landMarks));
+    EXPECT_CALL(*m_pImageStore, getLandMarks("img2")).WillRepeatedly(Return(LandMarks::create()));
+    EXPECT_CALL(*m_pImageStore, getImage("img2")).WillOnce(Return(cv::Mat(20, 20, CV_8UC3, cv::Scalar::all(128))));
+    EXPECT_CALL(*m_pFaceDetector, detectLandMarks(_, _)).WillOnce(Return(false));
+    EXPECT_CALL(*m_pImageStore, getImageStatistics(_)).Times(0);
+
+    const std::vector<std::string> standardIds = { "us_passport_photo", "xx_unknown_photo", "af_passport_5x5_photo" };
+    const auto resultsJson = m_pppEngine->checkComplianceBatch({ "img1", "img2", "img3" },
+                                                               standardIds,
+                                                               { CHECK_INPUT_RESOLUTION });
+    rapidjson::Document d;
+    d.Parse(resultsJson.c_str());
+    ASSERT_TRUE(d.IsObject());
+
+    const auto & columns = d["columns"];
+    ASSERT_EQ(5u, columns.Size());
+    EXPECT_STREQ("imgKey", columns[0].GetString());
+    EXPECT_STREQ("value", columns[4].GetString());
+
+    // One row per image and known standard, in the request order
+    const auto & rows = d["rows"];
+    ASSERT_EQ(2u, rows.Size());
+    const auto crownChinDistance = cv::norm(landMarks->crownPoint - landMarks->chinPoint);
+    for (const auto & [row, standardId] : { std::make_pair(0u, standardIds[0]), std::make_pair(1u, standardIds[2]) })
+    {
+        const auto photoStandard = catalogue->get(standardId);
+        const auto inputDpi = crownChinDistance / photoStandard->faceHeight("inch");
+        EXPECT_STREQ("img1", rows[row][0].GetString());
+        EXPECT_EQ(standardId, rows[row][1].GetString());
+        EXPECT_STREQ(CHECK_INPUT_RESOLUTION, rows[row][2].GetString());
+        EXPECT_EQ(inputDpi > 1.25 * photoStandard->resolutionDpi(), rows[row][3].GetBool());
+        EXPECT_NEAR(inputDpi, rows[row][4].GetDouble(), 1e-6);
+    }
+
+    const auto & imageErrors = d["errors"]["imgKeys"];
+    EXPECT_EQ(2u, imageErrors.MemberCount());
+    EXPECT_STREQ("No face was detected in the image", imageErrors["img2"].GetString());
+    EXPECT_TRUE(imageErrors.HasMember("img3"));
+    const auto & standardErrors = d["errors"]["standardIds"];
+    EXPECT_EQ(1u, standardErrors.MemberCount());
+    EXPECT_TRUE(standardErrors.HasMember("xx_unknown_photo"));
+}
 } // namespace ppp
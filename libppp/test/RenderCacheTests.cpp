@@ -0,0 +1,81 @@
+#include <gtest/gtest.h>
+
+#include <thread>
+
+#include "PhotoStandard.h"
+#include "PrintDefinition.h"
+#include "RenderCache.h"
+
+namespace ppp
+{
+class RenderCacheTests : public testing::Test
+{
+protected:
+    RenderCache m_cache;
+};
+
+TEST_F(RenderCacheTests, keyDependsOnTheNormalizedRequest)
+{
+    const PhotoStandard ps(35, 45, 34, 0, 0, 300, "mm");
+    const PrintDefinition canvasMm(152.4, 101.6, 300, "mm");
+    const PrintDefinition canvasInch(6, 4, 300, "inch");
+    const PrintDefinition canvasHighRes(6, 4, 600, "inch");
+    const cv::Point crown(100, 50);
+    const cv::Point chin(110, 400);
+
+    const auto key = RenderCache::makeKey("abcd", ps, canvasMm, crown, chin, "png");
+    EXPECT_EQ(key, RenderCache::makeKey("abcd", ps, canvasInch, crown, chin, "png"));
+    EXPECT_NE(key, RenderCache::makeKey("abce", ps, canvasInch, crown, chin, "png"));
+    EXPECT_NE(key, RenderCache::makeKey("abcd", ps, canvasHighRes, crown, chin, "png"));
+    EXPECT_NE(key, RenderCache::makeKey("abcd", ps, canvasInch, crown, cv::Point(110, 401), "png"));
+    EXPECT_NE(key, RenderCache::makeKey("abcd", ps, canvasInch, crown, chin, "png;base64"));
+}
+
+TEST_F(RenderCacheTests, leastRecentlyUsedOutputsAreEvictedWithinBudget)
+{
+    m_cache.setLimits(10, std::chrono::minutes(1));
+    m_cache.put("image1", "key1", "1234");
+    m_cache.put("image1", "key2", "5678");
+
+    std::string output;
+    ASSERT_TRUE(m_cache.get("key1", output));
+    EXPECT_EQ("1234", output);
+
+    m_cache.put("image2", "key3", "9012");
+    EXPECT_FALSE(m_cache.get("key2", output));
+    EXPECT_TRUE(m_cache.get("key1", output));
+    EXPECT_TRUE(m_cache.get("key3", output));
+
+    // Larger than the whole budget, never cached
+    m_cache.put("image2", "key4", "12345678901");
+    EXPECT_FALSE(m_cache.get("key4", output));
+
+    const auto stats = m_cache.getStats();
+    EXPECT_EQ(2u, stats.numEntries);
+    EXPECT_EQ(8u, stats.bytes);
+    EXPECT_EQ(3u, stats.hits);
+    EXPECT_EQ(2u, stats.misses);
+    EXPECT_EQ(1u, stats.evictions);
+}
+
+TEST_F(RenderCacheTests, outputsExpireAndAreInvalidatedWithTheirImage)
+{
+    m_cache.setLimits(1024, std::chrono::milliseconds(20));
+    m_cache.put("image1", "key1", "1234");
+    std::this_thread::sleep_for(std::chrono::milliseconds(40));
+    std::string output;
+    EXPECT_FALSE(m_cache.get("key1", output));
+    EXPECT_EQ(1u, m_cache.getStats().expirations);
+
+    m_cache.setLimits(1024, std::chrono::minutes(1));
+    m_cache.put("image1", "key1", "1234");
+    m_cache.put("image1", "key2", "5678");
+    m_cache.put("image2", "key3", "9012");
+    m_cache.invalidateImage("image1");
+    EXPECT_FALSE(m_cache.get("key1", output));
+    EXPECT_FALSE(m_cache.get("key2", output));
+    EXPECT_TRUE(m_cache.get("key3", output));
+    EXPECT_EQ(2u, m_cache.getStats().invalidations);
+    EXPECT_EQ(4u, m_cache.getStats().bytes);
+}
+} // namespace ppp
@@ -0,0 +1,165 @@
+#include <cstdio>
+#include <fstream>
+#include <gtest/gtest.h>
+#include <iterator>
+
+#include <rapidjson/document.h>
+
+#include "Tracer.h"
+
+using namespace testing;
+
+namespace ppp
+{
+class TracerTests : public Test
+{
+protected:
+    Tracer & m_tracer = Tracer::instance();
+
+public:
+    void SetUp() override
+    {
+        m_tracer.clear();
+        m_tracer.setBufferSize(4096);
+        m_tracer.setEnabled(true);
+    }
+
+    void TearDown() override
+    {
+        m_tracer.setEnabled(false);
+        m_tracer.clear();
+    }
+};
+
+TEST_F(TracerTests, disabledTracerRecordsNothing)
+{
+    m_tracer.setEnabled(false);
+    {
+        TRACE_REQUEST("detectLandmarks");
+        TRACE_SPAN("FaceDetector::rotation");
+    }
+    EXPECT_TRUE(m_tracer.events().empty());
+}
+
+TEST_F(TracerTests, nestedSpansShareTheRequestTraceId)
+{
+    {
+        TRACE_REQUEST("detectLandmarks");
+        TRACE_SPAN("FaceDetector::rotation", "angle=90");
+        {
+            // Public calls made from within a request do not start a new trace
+            TRACE_REQUEST("setImage");
+            TRACE_SPAN("ImageStore::decode");
+        }
+    }
+    const auto traceId = Tracer::lastTraceId();
+    ASSERT_NE(0u, traceId);
+
+    const auto events = m_tracer.events(traceId);
+    ASSERT_EQ(3u, events.size());
+    for (const auto & e : events)
+    {
+        EXPECT_EQ(traceId, e.traceId);
+        EXPECT_EQ("detectLandmarks", e.category);
+    }
+    // Spans are recorded when they complete, so the root span comes last
+    EXPECT_EQ("ImageStore::decode", events[0].name);
+    EXPECT_EQ("FaceDetector::rotation", events[1].name);
+    EXPECT_EQ("angle=90", events[1].args);
+    EXPECT_EQ("detectLandmarks", events[2].name);
+    EXPECT_LE(events[2].startUs, events[1].startUs);
+    EXPECT_GE(events[2].durationUs, events[1].durationUs);
+}
+
+TEST_F(TracerTests, eachRequestGetsItsOwnTraceId)
+{
+    {
+        TRACE_REQUEST("setImage");
+    }
+    const auto firstTraceId = Tracer::lastTraceId();
+    {
+        TRACE_REQUEST("detectLandmarks");
+    }
+    const auto secondTraceId = Tracer::lastTraceId();
+
+    EXPECT_NE(firstTraceId, secondTraceId);
+    EXPECT_EQ(1u, m_tracer.events(firstTraceId).size());
+    EXPECT_EQ(1u, m_tracer.events(secondTraceId).size());
+    EXPECT_EQ(2u, m_tracer.events().size());
+}
+
+TEST_F(TracerTests, ringBufferKeepsMostRecentEvents)
+{
+    m_tracer.setBufferSize(2);
+    for (auto i = 0; i < 5; ++i)
+    {
+        TRACE_REQUEST("setImage");
+    }
+    EXPECT_EQ(2u, m_tracer.events().size());
+    EXPECT_EQ(1u, m_tracer.events(Tracer::lastTraceId()).size());
+}
+
+TEST_F(TracerTests, exportsChromeTraceEventJson)
+{
+    {
+        TRACE_REQUEST("createTiledPrint");
+        TRACE_SPAN("PhotoPrintMaker::cropPicture");
+    }
+    const auto traceId = Tracer::lastTraceId();
+
+    rapidjson::Document d;
+    d.Parse(m_tracer.toJson(traceId).c_str());
+    ASSERT_FALSE(d.HasParseError());
+    ASSERT_TRUE(d.HasMember("traceEvents"));
+
+    const auto & traceEvents = d["traceEvents"];
+    ASSERT_EQ(2u, traceEvents.Size());
+    for (const auto & e : traceEvents.GetArray())
+    {
+        EXPECT_STREQ("X", e["ph"].GetString());
+        EXPECT_TRUE(e.HasMember("ts"));
+        EXPECT_TRUE(e.HasMember("dur"));
+        EXPECT_TRUE(e.HasMember("tid"));
+        EXPECT_EQ(traceId, e["args"]["traceId"].GetUint64());
+    }
+}
+
+TEST_F(TracerTests, completedRequestsAreAppendedToTheOutputFile)
+{
+    const std::string outputFilePath = "tracer_tests_output.json";
+    const auto readOutputFile = [&outputFilePath]() {
+        std::ifstream ifs(outputFilePath);
+        const std::string content((std::istreambuf_iterator<char>(ifs)), std::istreambuf_iterator<char>());
+        rapidjson::Document d;
+        d.Parse(content.c_str());
+        EXPECT_FALSE(d.HasParseError());
+        return d["traceEvents"].Size();
+    };
+
+    {
+        TRACE_REQUEST("setImage");
+    }
+    m_tracer.setOutputFile(outputFilePath);
+    EXPECT_EQ(0u, readOutputFile());
+
+    {
+        TRACE_REQUEST("detectLandmarks");
+        TRACE_SPAN("FaceDetector::rotation");
+    }
+    EXPECT_EQ(2u, readOutputFile());
+
+    {
+        TRACE_REQUEST("createTiledPrint");
+    }
+    // Only the events of the new request were added, the earlier ones are still in the buffer
+    EXPECT_EQ(3u, readOutputFile());
+    EXPECT_EQ(4u, m_tracer.events().size());
+
+    m_tracer.setOutputFile("");
+    {
+        TRACE_REQUEST("setImage");
+    }
+    EXPECT_EQ(3u, readOutputFile());
+    std::remove(outputFilePath.c_str());
+}
+} // namespace ppp
@@ -16,12 +16,21 @@
     landmarking task.
 */
 
+#include <algorithm>
+#include <chrono>
+#include <fstream>
+#include <iomanip>
 #include <iostream>
-#include <unordered_set>
+#include <set>
+#include <numeric>
+#include <sstream>
 
 #include <dlib/data_io.h>
+#include <dlib/dir_nav.h>
 #include <dlib/image_processing.h>
+#include <dlib/threads.h>
 #include <rapidjson/document.h>
+#include <tclap/CmdLine.h>
 
 using namespace dlib;
 using namespace std;
@@ -41,25 +50,204 @@ std::vector<std::vector<double>> get_interocular_distances(
 
 std::set<int> g_removedLandmarksIndices;
 
-void remove_landmarks(std::vector<std::vector<full_object_detection>> & facesTrain)
+// The 68 points numbering (1 based) of the points PppEngine reads through m_landmarkIndexMapping: eye pupils (averaged
+// from the eyelids points), outer eye corners, mouth corners, chin and nose tip. Reduced models only predict these.
+const std::set<int> g_engineLandmarksIndices = { 9, 34, 37, 38, 39, 41, 42, 44, 45, 46, 47, 48, 49, 55 };
+
+using ImageSet = dlib::array<array2d<unsigned char>>;
+using FaceSet = std::vector<std::vector<full_object_detection>>;
+
+std::vector<std::pair<string, double>> g_phaseSeconds; ///<- Time spent in each phase, in the order they ran
+
+/*!@brief Runs one phase of the training session and records how long it took !*/
+template <typename Phase>
+void run_phase(const string & name, Phase && phase)
 {
-    unordered_set<int> ignoredLandmarks(g_removedLandmarksIndices.begin(), g_removedLandmarksIndices.end());
-    auto selectedParts = std::vector<full_object_detection>();
+    const auto start = chrono::steady_clock::now();
+    phase();
+    const auto seconds = chrono::duration<double>(chrono::steady_clock::now() - start).count();
+    g_phaseSeconds.emplace_back(name, seconds);
+    cout << fixed << setprecision(1) << ">> " << name << ": " << seconds << " s" << endl;
+}
 
-    for (auto & input : facesTrain)
+/*!@brief Loads a dataset listed in an imglab XML file as dlib's load_image_dataset does, but decodes the images on
+ * several threads and builds the faces with the kept landmarks only, instead of rebuilding them afterwards !*/
+void load_dataset(const string & xmlFilePath, const unsigned long numThreads, ImageSet & images, FaceSet & faces)
+{
+    image_dataset_metadata::dataset metadata;
+    image_dataset_metadata::load_image_dataset_metadata(metadata, xmlFilePath);
+
+    // Like dlib, parts are indexed in the order of their names ("00" to "67" in the iBUG 300-W annotations)
+    std::set<string> partNames;
+    for (const auto & image : metadata.images)
     {
-        for (auto & p : input)
+        for (const auto & box : image.boxes)
+        {
+            for (const auto & part : box.parts)
+            {
+                partNames.insert(part.first);
+            }
+        }
+    }
+    std::vector<string> keptPartNames;
+    auto partIdx68 = 0;
+    for (const auto & partName : partNames)
+    {
+        if (g_removedLandmarksIndices.count(++partIdx68) == 0)
+        {
+            keptPartNames.push_back(partName);
+        }
+    }
+
+    // Image paths are relative to the XML file
+    const auto datasetDir = get_parent_directory(file(xmlFilePath)).full_name();
+    images.resize(metadata.images.size());
+    faces.assign(metadata.images.size(), {});
+    parallel_for(numThreads, 0, metadata.images.size(), [&](const long i) {
+        const auto & image = metadata.images[i];
+        const auto isAbsolute = !image.filename.empty()
+            && (image.filename[0] == '/' || image.filename.find(':') != string::npos);
+        load_image(images[i], isAbsolute ? image.filename : datasetDir + "/" + image.filename);
+        for (const auto & box : image.boxes)
         {
-            const auto n = static_cast<int>(p.num_parts());
+            if (box.ignore)
+            {
+                continue;
+            }
             std::vector<point> parts;
-            for (auto j = 0; j < n; ++j)
+            for (const auto & partName : keptPartNames)
+            {
+                const auto it = box.parts.find(partName);
+                parts.push_back(it != box.parts.end() ? it->second : OBJECT_PART_NOT_PRESENT);
+            }
+            faces[i].emplace_back(box.rect, parts);
+        }
+    });
+}
+
+/*!@brief Reads the datasets saved by save_cached_datasets, returns false when the cache is missing or was built from
+ * another dataset or with other landmarks. Images are kept decoded as 8 bits gray, as the trainer uses them !*/
+bool load_cached_datasets(const string & cacheFilePath,
+                          const string & cacheKey,
+                          ImageSet & imagesTrain,
+                          FaceSet & facesTrain,
+                          ImageSet & imagesTest,
+                          FaceSet & facesTest)
+{
+    std::ifstream in(cacheFilePath, ios::binary);
+    if (!in.good())
+    {
+        return false;
+    }
+    string cachedKey;
+    deserialize(cachedKey, in);
+    if (cachedKey != cacheKey)
+    {
+        cout << "The dataset cache " << cacheFilePath << " was built for another input, ignoring it" << endl;
+        return false;
+    }
+    deserialize(imagesTrain, in);
+    deserialize(facesTrain, in);
+    deserialize(imagesTest, in);
+    deserialize(facesTest, in);
+    return true;
+}
+
+void save_cached_datasets(const string & cacheFilePath,
+                          const string & cacheKey,
+                          const ImageSet & imagesTrain,
+                          const FaceSet & facesTrain,
+                          const ImageSet & imagesTest,
+                          const FaceSet & facesTest)
+{
+    std::ofstream out(cacheFilePath, ios::binary);
+    serialize(cacheKey, out);
+    serialize(imagesTrain, out);
+    serialize(facesTrain, out);
+    serialize(imagesTest, out);
+    serialize(facesTest, out);
+}
+
+/*!@brief Same as dlib's test_shape_predictor, with the faces of different images predicted on several threads.
+ * The distances are summed per image then in order, so the result doesn't depend on the number of threads !*/
+double parallel_test_shape_predictor(const shape_predictor & sp,
+                                     const ImageSet & images,
+                                     const FaceSet & faces,
+                                     const std::vector<std::vector<double>> & scales,
+                                     const unsigned long numThreads)
+{
+    std::vector<double> imageSums(images.size(), 0.0);
+    std::vector<size_t> imageCounts(images.size(), 0);
+    parallel_for(numThreads, 0, images.size(), [&](const long i) {
+        for (unsigned long j = 0; j < faces[i].size(); ++j)
+        {
+            const auto & truth = faces[i][j];
+            const auto det = sp(images[i], truth.get_rect());
+            for (unsigned long k = 0; k < det.num_parts(); ++k)
             {
-                if (ignoredLandmarks.count(j + 1) > 0) // skip this landmark
-                    continue;
-                parts.push_back(p.part(j));
+                if (truth.part(k) != OBJECT_PART_NOT_PRESENT)
+                {
+                    imageSums[i] += length(det.part(k) - truth.part(k)) / scales[i][j];
+                    imageCounts[i]++;
+                }
             }
-            p = full_object_detection { p.get_rect(), parts };
         }
+    });
+    const auto count = accumulate(imageCounts.begin(), imageCounts.end(), size_t(0));
+    return count > 0 ? accumulate(imageSums.begin(), imageSums.end(), 0.0) / count : 0.0;
+}
+
+std::vector<unsigned long> parse_list(const string & values)
+{
+    std::vector<unsigned long> result;
+    stringstream ss(values);
+    string item;
+    while (getline(ss, item, ','))
+    {
+        result.push_back(stoul(item));
+    }
+    return result;
+}
+
+struct TrainingResult final
+{
+    unsigned long cascadeDepth;
+    unsigned long treeDepth;
+    unsigned long numTrees;
+    double trainingError;
+    double testingError;
+    double predictionUs; ///<- Mean time to predict the shape of one face
+    size_t modelBytes;
+    string modelFilePath;
+};
+
+double mean_prediction_us(const shape_predictor & sp, const ImageSet & images, const FaceSet & faces)
+{
+    size_t numFaces = 0;
+    const auto start = chrono::steady_clock::now();
+    for (unsigned long i = 0; i < images.size(); ++i)
+    {
+        for (const auto & face : faces[i])
+        {
+            sp(images[i], face.get_rect());
+            numFaces++;
+        }
+    }
+    const auto elapsedUs = chrono::duration<double, micro>(chrono::steady_clock::now() - start).count();
+    return numFaces > 0 ? elapsedUs / numFaces : 0.0;
+}
+
+void print_results_table(const std::vector<TrainingResult> & results)
+{
+    cout << endl
+         << "| cascadeDepth | treeDepth | numTrees | trainingError | testingError | predictionUs | modelKB | model |"
+         << endl
+         << "|---|---|---|---|---|---|---|---|" << endl;
+    for (const auto & r : results)
+    {
+        cout << fixed << setprecision(4) << "| " << r.cascadeDepth << " | " << r.treeDepth << " | " << r.numTrees
+             << " | " << r.trainingError << " | " << r.testingError << " | " << setprecision(1) << r.predictionUs
+             << " | " << r.modelBytes / 1024 << " | " << r.modelFilePath << " |" << endl;
     }
 }
 
@@ -72,139 +260,255 @@ int main(int argc, char ** argv)
         auto found = thisCppFile.rfind('/');
         const auto thisDir = thisCppFile.substr(0, found);
 
-        string facesDirectory, configJsonFilePath, outModelFilePath;
-        if (argc == 1)
-        {
-            facesDirectory = "E:/Data/ibug_300W_large_face_landmark_dataset";
-            configJsonFilePath = thisDir + "/config.json";
-            outModelFilePath = thisDir + "/sp_model_new.dat";
-        }
-        else if (argc == 4)
-        {
-            cout << "Usage: trainer <dataset_dir> <config_json> <output_model>" << endl;
-            facesDirectory = std::string(argv[1]);
-            configJsonFilePath = std::string(argv[2]);
-            outModelFilePath = std::string(argv[3]);
-        }
-        else
-        {
-            cout << "Usage: trainer <dataset_dir> <config_json> <output_model>" << endl;
-            return 1;
-        }
+        TCLAP::CmdLine cmd("Trains the shape predictor model used to detect the face landmarks", ' ', "1.0");
+        TCLAP::UnlabeledValueArg<string> facesDirectoryArg("dataset_dir",
+                                                           "Directory of the iBUG 300-W dataset",
+                                                           false,
+                                                           "E:/Data/ibug_300W_large_face_landmark_dataset",
+                                                           "directory");
+        TCLAP::UnlabeledValueArg<string> configJsonArg("config_json",
+                                                       "Configuration listing the shapePredictor.missingPoints",
+                                                       false,
+                                                       thisDir + "/config.json",
+                                                       "file path");
+        TCLAP::UnlabeledValueArg<string> outModelArg("output_model",
+                                                     "Trained model, suffixed with the parameters when sweeping",
+                                                     false,
+                                                     thisDir + "/sp_model_new.dat",
+                                                     "file path");
+        TCLAP::SwitchArg reducedArg("",
+                                    "reduced",
+                                    "Only keep the landmarks the engine reads instead of the config's missingPoints",
+                                    false);
+        TCLAP::ValueArg<string> cascadeDepthsArg("c",
+                                                 "cascadeDepths",
+                                                 "Comma separated cascade depths to train with",
+                                                 false,
+                                                 "10",
+                                                 "list");
+        TCLAP::ValueArg<string> treeDepthsArg("d",
+                                              "treeDepths",
+                                              "Comma separated tree depths to train with",
+                                              false,
+                                              "4",
+                                              "list");
+        TCLAP::ValueArg<string> numTreesArg("n",
+                                            "numTrees",
+                                            "Comma separated numbers of trees per cascade level to train with",
+                                            false,
+                                            "500",
+                                            "list");
+        TCLAP::ValueArg<unsigned long> numThreadsArg("t",
+                                                     "threads",
+                                                     "Threads used to load the images, train and evaluate",
+                                                     false,
+                                                     8,
+                                                     "count");
+        TCLAP::ValueArg<string> cacheArg("",
+                                         "cache",
+                                         "Keeps the decoded datasets in this file so that the next runs skip loading",
+                                         false,
+                                         "",
+                                         "file path");
+        cmd.add(facesDirectoryArg);
+        cmd.add(configJsonArg);
+        cmd.add(outModelArg);
+        cmd.add(reducedArg);
+        cmd.add(cascadeDepthsArg);
+        cmd.add(treeDepthsArg);
+        cmd.add(numTreesArg);
+        cmd.add(numThreadsArg);
+        cmd.add(cacheArg);
+        cmd.parse(argc, argv);
+
+        const auto facesDirectory = facesDirectoryArg.getValue();
+        const auto configJsonFilePath = configJsonArg.getValue();
+        const auto outModelFilePath = outModelArg.getValue();
+        const auto numThreads = numThreadsArg.getValue();
 
         cout << "Running model trainer using the following input:" << endl;
         cout << "   facesDirectory: " << facesDirectory << endl;
         cout << "   configJsonFilePath: " << configJsonFilePath << endl;
         cout << "   outModelFilePath: " << outModelFilePath << endl;
-        rapidjson::Document config;
 
+        g_removedLandmarksIndices.clear();
+        if (reducedArg.getValue())
         {
-            std::ifstream fs(configJsonFilePath, std::ios_base::in);
-            const std::string configString((std::istreambuf_iterator<char>(fs)), std::istreambuf_iterator<char>());
-            config.Parse(configString.c_str());
+            for (auto i = 1; i <= 68; ++i)
+            {
+                if (g_engineLandmarksIndices.count(i) == 0)
+                {
+                    g_removedLandmarksIndices.insert(i);
+                }
+            }
+            cout << "Training a reduced model, declare it as a profile in the configuration, e.g.:" << endl
+                 << "    \"shapePredictorProfiles\": {" << endl
+                 << "        \"fast\": {" << endl
+                 << "            \"keptPoints\": [ ";
+            for (auto it = g_engineLandmarksIndices.begin(); it != g_engineLandmarksIndices.end(); ++it)
+            {
+                cout << (it == g_engineLandmarksIndices.begin() ? "" : ", ") << *it;
+            }
+            cout << " ]," << endl
+                 << "            \"file\": \"" << outModelFilePath << "\"" << endl
+                 << "        }" << endl
+                 << "    }" << endl;
         }
-
-        auto array = config["shapePredictor"]["missingPoints"].GetArray();
-        g_removedLandmarksIndices.clear();
-        for (rapidjson::SizeType i = 0; i < array.Size(); i++)
+        else
         {
-            g_removedLandmarksIndices.insert(array[i].GetInt());
+            rapidjson::Document config;
+            {
+                std::ifstream fs(configJsonFilePath, std::ios_base::in);
+                const std::string configString((std::istreambuf_iterator<char>(fs)), std::istreambuf_iterator<char>());
+                config.Parse(configString.c_str());
+            }
+
+            auto array = config["shapePredictor"]["missingPoints"].GetArray();
+            for (rapidjson::SizeType i = 0; i < array.Size(); i++)
+            {
+                g_removedLandmarksIndices.insert(array[i].GetInt());
+            }
         }
 
         cout << "Discarding " << g_removedLandmarksIndices.size() << " out of the 68 annotated landmarks" << endl;
 
         // The faces directory contains a training dataset and a separate
-        // testing dataset.  The training data consists of 4 images, each
-        // annotated with rectangles that bound each human face along with 68
-        // face landmarks on each face.  The idea is to use this training data
-        // to learn to identify the position of landmarks on human faces in new
-        // images.
+        // testing dataset.  The training data consists of images annotated
+        // with rectangles that bound each human face along with 68 face
+        // landmarks on each face.  Once a shape_predictor is trained it is
+        // tested on the testing images, which it wasn't trained on.
         //
-        // Once you have trained a shape_predictor it is always important to
-        // test it on data it wasn't trained on.  Therefore, we will also load
-        // a separate testing set of 5 images.  Once we have a shape_predictor
-        // created from the training data we will see how well it works by
-        // running it on the testing images.
-        //
-        // So here we create the variables that will hold our dataset.
-        // images_train will hold the 4 training images and faces_train holds
-        // the locations and poses of each face in the training images.  So for
-        // example, the image images_train[0] has the faces given by the
-        // full_object_detections in faces_train[0].
-        dlib::array<array2d<unsigned char>> imagesTrain, imagesTest;
-        std::vector<std::vector<full_object_detection>> facesTrain, facesTest;
-
-        // Now we load the data.  These XML files list the images in each
-        // dataset and also contain the positions of the face boxes and
-        // landmarks (called parts in the XML file).  Obviously you can use any
-        // kind of input format you like so long as you store the data into
-        // images_train and faces_train.  But for convenience dlib comes with
-        // tools for creating and loading XML image dataset files.  Here you see
-        // how to load the data.  To create the XML files you can use the imglab
-        // tool which can be found in the tools/imglab folder.  It is a simple
-        // graphical tool for labeling objects in images.  To see how to use it
-        // read the tools/imglab/README.txt file.
-
-        cout << "Loading training dataset ... please wait ..." << endl;
-        load_image_dataset(imagesTrain, facesTrain, facesDirectory + "/labels_ibug_300W_train.orig.xml");
-        // load_image_dataset(imagesTrain, facesTrain, facesDirectory + "/a.xml"); // testing
-        remove_landmarks(facesTrain);
-
-        cout << "Loading testing dataset ... please wait ..." << endl;
-        load_image_dataset(imagesTest, facesTest, facesDirectory + "/labels_ibug_300W_test.orig.xml");
-        remove_landmarks(facesTest);
-
-        cout << "Dataset loaded. Starting to train the model ... please wait ..." << endl;
-
-        // Now make the object responsible for training the model.
-        shape_predictor_trainer trainer;
-        // This algorithm has a bunch of parameters you can mess with.  The
-        // documentation for the shape_predictor_trainer explains all of them.
-        // You should also read Kazemi's paper which explains all the parameters
-        // in great detail.  However, here I'm just setting three of them
-        // differently than their default values.  I'm doing this because we
-        // have a very small dataset.  In particular, setting the oversampling
-        // to a high amount (300) effectively boosts the training set size, so
-        // that helps this example.
-        // trainer.set_oversampling_amount(300);
-        // I'm also reducing the capacity of the model by explicitly increasing
-        // the regularization (making nu smaller) and by using trees with
-        // smaller depths.
-        // trainer.set_nu(0.05);
-        // trainer.set_tree_depth(2);
-
-        // some parts of training process can be parallelized.
-        // Trainer will use this count of threads when possible
-        trainer.set_num_threads(8);
-
-        // Tell the trainer to print status messages to the console so we can
-        // see how long the training will take.
-        trainer.be_verbose();
-
-        // Now finally generate the shape model
-        auto sp = trainer.train(imagesTrain, facesTrain);
-
-        // Now that we have a model we can test it.  This function measures the
-        // average distance between a face landmark output by the
-        // shape_predictor and where it should be according to the truth data.
-        // Note that there is an optional 4th argument that lets us rescale the
-        // distances.  Here we are causing the output to scale each face's
-        // distances by the interocular distance, as is customary when
-        // evaluating face landmarking systems.
-        cout << ">> Mean training error: "
-             << test_shape_predictor(sp, imagesTrain, facesTrain, get_interocular_distances(facesTrain)) << endl;
-
-        // The real test is to see how well it does on data it wasn't trained
-        // on.  We trained it on a very small dataset so the accuracy is not
-        // extremely high, but it's still doing quite good.  Moreover, if you
-        // train it on one of the large face landmarking datasets you will
-        // obtain state-of-the-art results, as shown in the Kazemi paper.
-        cout << ">> Mean testing error:  "
-             << test_shape_predictor(sp, imagesTest, facesTest, get_interocular_distances(facesTest)) << endl;
-
-        // Finally, we save the model to disk so we can use it later.
-        serialize(outModelFilePath) << sp;
-        cout << "Model output written to " << outModelFilePath << ". DONE!" << endl;
+        // images_train[0] has the faces given by the full_object_detections in
+        // faces_train[0].  The XML files list the images in each dataset and
+        // also contain the positions of the face boxes and landmarks (called
+        // parts in the XML file).
+        ImageSet imagesTrain, imagesTest;
+        FaceSet facesTrain, facesTest;
+
+        ostringstream cacheKey;
+        cacheKey << facesDirectory << "|removed:";
+        for (const auto removedIdx : g_removedLandmarksIndices)
+        {
+            cacheKey << removedIdx << ',';
+        }
+        const auto & cacheFilePath = cacheArg.getValue();
+        auto isCached = false;
+        if (!cacheFilePath.empty())
+        {
+            run_phase("Loading the cached datasets", [&]() {
+                isCached = load_cached_datasets(cacheFilePath,
+                                                cacheKey.str(),
+                                                imagesTrain,
+                                                facesTrain,
+                                                imagesTest,
+                                                facesTest);
+            });
+        }
+        if (!isCached)
+        {
+            run_phase("Loading the training dataset", [&]() {
+                load_dataset(facesDirectory + "/labels_ibug_300W_train.orig.xml", numThreads, imagesTrain, facesTrain);
+            });
+            run_phase("Loading the testing dataset", [&]() {
+                load_dataset(facesDirectory + "/labels_ibug_300W_test.orig.xml", numThreads, imagesTest, facesTest);
+            });
+            if (!cacheFilePath.empty())
+            {
+                run_phase("Caching the datasets", [&]() {
+                    save_cached_datasets(cacheFilePath, cacheKey.str(), imagesTrain, facesTrain, imagesTest, facesTest);
+                });
+            }
+        }
+
+        cout << "Dataset loaded: " << imagesTrain.size() << " training and " << imagesTest.size() << " testing images."
+             << endl;
+        const auto trainDistances = get_interocular_distances(facesTrain);
+        const auto testDistances = get_interocular_distances(facesTest);
+
+        // Deeper cascades, deeper trees and more trees are more accurate but slower to evaluate and bigger, the
+        // sweep trains every combination of the given values to pick a speed/accuracy trade off (see Kazemi's paper)
+        const auto cascadeDepths = parse_list(cascadeDepthsArg.getValue());
+        const auto treeDepths = parse_list(treeDepthsArg.getValue());
+        const auto numTreesValues = parse_list(numTreesArg.getValue());
+        const auto isSweep = cascadeDepths.size() * treeDepths.size() * numTreesValues.size() > 1;
+
+        std::vector<TrainingResult> results;
+        for (const auto cascadeDepth : cascadeDepths)
+        {
+            for (const auto treeDepth : treeDepths)
+            {
+                for (const auto numTrees : numTreesValues)
+                {
+                    cout << "Training the model with cascadeDepth=" << cascadeDepth << ", treeDepth=" << treeDepth
+                         << ", numTrees=" << numTrees << " ... please wait ..." << endl;
+
+                    ostringstream phaseSuffix;
+                    phaseSuffix << " (c" << cascadeDepth << " t" << treeDepth << " n" << numTrees << ")";
+
+                    shape_predictor_trainer trainer;
+                    trainer.set_cascade_depth(cascadeDepth);
+                    trainer.set_tree_depth(treeDepth);
+                    trainer.set_num_trees_per_cascade_level(numTrees);
+                    // some parts of training process can be parallelized.
+                    // Trainer will use this count of threads when possible
+                    trainer.set_num_threads(numThreads);
+                    // Tell the trainer to print status messages to the console so we can
+                    // see how long the training will take.
+                    trainer.be_verbose();
+
+                    shape_predictor sp;
+                    run_phase("Training" + phaseSuffix.str(), [&]() { sp = trainer.train(imagesTrain, facesTrain); });
+
+                    // The errors are the average distances between the predicted landmarks and where they should
+                    // be, divided by the interocular distance as is customary when evaluating face landmarking
+                    TrainingResult result { cascadeDepth, treeDepth, numTrees, 0, 0, 0, 0, outModelFilePath };
+                    run_phase("Evaluating" + phaseSuffix.str(), [&]() {
+                        result.trainingError
+                            = parallel_test_shape_predictor(sp, imagesTrain, facesTrain, trainDistances, numThreads);
+                        result.testingError
+                            = parallel_test_shape_predictor(sp, imagesTest, facesTest, testDistances, numThreads);
+                    });
+                    // Measured on a single thread, this is the latency of a detection in the engine
+                    run_phase("Timing predictions" + phaseSuffix.str(),
+                              [&]() { result.predictionUs = mean_prediction_us(sp, imagesTest, facesTest); });
+                    cout << ">> Mean training error: " << result.trainingError << endl;
+                    cout << ">> Mean testing error:  " << result.testingError << endl;
+
+                    if (isSweep)
+                    {
+                        const auto extPos = outModelFilePath.rfind('.');
+                        ostringstream suffix;
+                        suffix << "_c" << cascadeDepth << "_t" << treeDepth << "_n" << numTrees;
+                        result.modelFilePath = extPos == string::npos
+                            ? outModelFilePath + suffix.str()
+                            : outModelFilePath.substr(0, extPos) + suffix.str() + outModelFilePath.substr(extPos);
+                    }
+
+                    // Finally, we save the model to disk so we can use it later.
+                    ostringstream modelStream;
+                    serialize(sp, modelStream);
+                    result.modelBytes = modelStream.str().size();
+                    std::ofstream(result.modelFilePath, ios::binary) << modelStream.str();
+                    cout << "Model output written to " << result.modelFilePath << endl;
+
+                    results.push_back(result);
+                }
+            }
+        }
+
+        print_results_table(results);
+
+        cout << endl << "| phase | seconds |" << endl << "|---|---|" << endl;
+        for (const auto & phase : g_phaseSeconds)
+        {
+            cout << fixed << setprecision(1) << "| " << phase.first << " | " << phase.second << " |" << endl;
+        }
+        cout << "DONE!" << endl;
+    }
+    catch (TCLAP::ArgException & e)
+    {
+        cerr << "error: " << e.error() << " for arg " << e.argId() << endl;
+        return 1;
     }
     catch (exception & e)
     {
@@ -223,26 +527,22 @@ int idx(const int idx68)
 
 double interocular_distance(const full_object_detection & det)
 {
-    dlib::vector<double, 2> l, r;
-    double cnt = 0;
-    // Find the center of the left eye by averaging the points around
-    // the eye.
-    for (unsigned long i = 37; i <= 42; ++i)
-    {
-        l += det.part(idx(i));
-        ++cnt;
-    }
-    l /= cnt;
-
-    // Find the center of the right eye by averaging the points around
-    // the eye.
-    cnt = 0;
-    for (unsigned long i = 43; i <= 48; ++i)
-    {
-        r += det.part(idx(i));
-        ++cnt;
-    }
-    r /= cnt;
+    // Find the center of each eye by averaging the points around the eye that the model predicts
+    const auto eyeCenter = [&det](const int firstIdx68, const int lastIdx68) {
+        dlib::vector<double, 2> center;
+        double cnt = 0;
+        for (auto i = firstIdx68; i <= lastIdx68; ++i)
+        {
+            if (g_removedLandmarksIndices.count(i) == 0)
+            {
+                center += det.part(idx(i));
+                ++cnt;
+            }
+        }
+        return center / cnt;
+    };
+    const auto l = eyeCenter(37, 42);
+    const auto r = eyeCenter(43, 48);
 
     // Now return the distance between the centers of the eyes
     return length(l - r);
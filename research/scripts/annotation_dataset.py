@@ -0,0 +1,313 @@
+"""
+Compiles landmark annotations into a single memory-mappable dataset file
+
+Supported annotation sources:
+ - VIA CSV files (e.g. mugshot_frontal_original_all/via_region_data_dpd.csv)
+ - SCface .pos files (one "x y" line per point, next to the .jpg they annotate)
+ - LandMarks JSON files named <image>.json (e.g. libppp/test/data/*.jpg.json)
+Directories are scanned for .pos and .json files.
+
+File layout (all integers little endian):
+ - 8 bytes magic, 8 bytes header length
+ - JSON header: landmark names, array table and the manifest of compiled sources
+ - arrays, each aligned to 64 bytes:
+     points      float32 [N, L, 2]  landmark coordinates, NaN when not annotated
+     source      int32   [N]        index of the source the row came from
+     pathOffsets int64   [N + 1]    offsets of each image path in pathData
+     pathData    uint8   [...]      utf-8 image paths relative to the dataset file
+
+The loader maps the file and returns NumPy views, nothing is parsed but the header.
+Recompiling only re-reads sources that were added or modified since the last run.
+"""
+import argparse
+import csv
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = b'PPPDSET1'
+VERSION = 1
+ALIGNMENT = 64
+
+LANDMARK_NAMES = ['crownPoint', 'chinPoint', 'eyeLeftPupil', 'eyeRightPupil', 'lipLeftCorner', 'lipRightCorner',
+                  'noseTip', 'eyeLeftCorner', 'eyeRightCorner']
+
+# Order of the points in the VIA CSV annotations
+VIA_LANDMARKS = ['crownPoint', 'chinPoint', 'eyeLeftPupil', 'eyeRightPupil', 'lipLeftCorner', 'lipRightCorner']
+
+# Lines of the SCface .pos files holding each landmark (same selection as landmarks_to_via.py)
+POS_LANDMARK_LINES = {'crownPoint': 0, 'chinPoint': 16, 'eyeLeftPupil': 6, 'eyeRightPupil': 9,
+                      'lipLeftCorner': 14, 'lipRightCorner': 15}
+
+
+def _empty_points():
+    return np.full((len(LANDMARK_NAMES), 2), np.nan, dtype=np.float32)
+
+
+def parse_via_csv(csv_file):
+    """
+    Returns a list of (image_path, points) from a VIA CSV file
+    """
+    image_dir = os.path.dirname(os.path.abspath(csv_file))
+    rows = {}
+    with open(csv_file, 'r') as fp:
+        for row in csv.reader(line for line in fp if not line.startswith('#')):
+            if len(row) < 6:
+                continue
+            image_name, region_id, shape = row[0], int(row[4]), json.loads(row[5])
+            points = rows.setdefault(os.path.join(image_dir, image_name), _empty_points())
+            points[LANDMARK_NAMES.index(VIA_LANDMARKS[region_id])] = (shape['cx'], shape['cy'])
+    return sorted(rows.items())
+
+
+def parse_pos_file(pos_file):
+    """
+    Returns [(image_path, points)] from a SCface .pos file
+    """
+    with open(pos_file, 'r') as fp:
+        lines = [line.split() for line in fp if line.strip()]
+    points = _empty_points()
+    for name, line_idx in POS_LANDMARK_LINES.items():
+        points[LANDMARK_NAMES.index(name)] = (float(lines[line_idx][0]), float(lines[line_idx][1]))
+    return [(os.path.splitext(os.path.abspath(pos_file))[0] + '.jpg', points)]
+
+
+def parse_landmarks_json(json_file):
+    """
+    Returns [(image_path, points)] from a LandMarks JSON file named <image>.json
+    """
+    with open(json_file, 'r') as fp:
+        landmarks = json.load(fp)
+    points = _empty_points()
+    for i, name in enumerate(LANDMARK_NAMES):
+        if name in landmarks:
+            points[i] = (landmarks[name]['x'], landmarks[name]['y'])
+    return [(os.path.abspath(json_file)[:-len('.json')], points)]
+
+
+def parse_source(source_file):
+    """
+    Parses one annotation file according to its extension
+    """
+    lower_name = source_file.lower()
+    if lower_name.endswith('.csv'):
+        return parse_via_csv(source_file)
+    if lower_name.endswith('.pos'):
+        return parse_pos_file(source_file)
+    if lower_name.endswith('.json'):
+        return parse_landmarks_json(source_file)
+    raise ValueError('Unsupported annotation source %s' % source_file)
+
+
+def expand_sources(sources):
+    """
+    Replaces directories by the annotation files they contain
+    """
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(sorted(glob.glob(os.path.join(source, '*.pos'))))
+            files.extend(sorted(glob.glob(os.path.join(source, '*.*.json'))))
+        else:
+            files.append(source)
+    return [os.path.abspath(f) for f in files]
+
+
+def _source_signature(source_file):
+    stat = os.stat(source_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_dataset(dataset_file, rows, manifest):
+    """
+    Writes rows [(source_idx, image_path, points)] to dataset_file, replacing it atomically
+    """
+    dataset_dir = os.path.dirname(os.path.abspath(dataset_file))
+    points = np.stack([r[2] for r in rows]) if rows else np.zeros((0, len(LANDMARK_NAMES), 2), np.float32)
+    source = np.array([r[0] for r in rows], dtype='<i4')
+    encoded_paths = [os.path.relpath(r[1], dataset_dir).replace('\\', '/').encode('utf-8') for r in rows]
+    path_offsets = np.zeros(len(rows) + 1, dtype='<i8')
+    path_offsets[1:] = np.cumsum([len(p) for p in encoded_paths])
+    path_data = np.frombuffer(b''.join(encoded_paths), dtype=np.uint8)
+
+    arrays = [('points', points.astype('<f4')), ('source', source), ('pathOffsets', path_offsets),
+              ('pathData', path_data)]
+
+    # Two passes: the array offsets depend on the header length
+    header = {'version': VERSION, 'landmarks': LANDMARK_NAMES, 'sources': manifest, 'arrays': {}}
+    for _ in range(2):
+        header_bytes = json.dumps(header).encode('utf-8')
+        offset = _align(16 + len(header_bytes))
+        for name, array in arrays:
+            header['arrays'][name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    tmp_file = dataset_file + '.tmp'
+    with open(tmp_file, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack('<Q', len(header_bytes)))
+        fp.write(header_bytes)
+        for name, array in arrays:
+            fp.write(b'\0' * (header['arrays'][name]['offset'] - fp.tell()))
+            fp.write(array.tobytes())
+    os.replace(tmp_file, dataset_file)
+
+
+def compile_dataset(dataset_file, sources, verbose=True):
+    """
+    Compiles the annotation sources into dataset_file. Rows of sources that did not
+    change since the previous compilation are copied from the existing dataset.
+    Returns the number of sources that had to be parsed
+    """
+    source_files = expand_sources(sources)
+    previous = None
+    if os.path.isfile(dataset_file):
+        try:
+            previous = AnnotationDataset(dataset_file)
+        except ValueError:
+            previous = None  # Incompatible or corrupted, rebuild from scratch
+
+    previous_sources = {}
+    if previous is not None:
+        for idx, entry in enumerate(previous.sources):
+            previous_sources[entry['file']] = (idx, entry['signature'])
+
+    rows = []
+    manifest = []
+    num_parsed = 0
+    for source_idx, source_file in enumerate(source_files):
+        signature = _source_signature(source_file)
+        manifest.append({'file': source_file, 'signature': signature})
+        cached = previous_sources.get(source_file)
+        if cached is not None and cached[1] == signature:
+            for row in np.flatnonzero(previous.source == cached[0]):
+                rows.append((source_idx, previous.image_path(row), np.array(previous.points[row])))
+            continue
+        num_parsed += 1
+        for image_path, points in parse_source(source_file):
+            rows.append((source_idx, image_path, points))
+
+    if previous is not None:
+        previous.close()
+
+    write_dataset(dataset_file, rows, manifest)
+    if verbose:
+        print('Compiled %d annotated images from %d sources (%d parsed) into %s'
+              % (len(rows), len(source_files), num_parsed, dataset_file))
+    return num_parsed
+
+
+class AnnotationDataset(object):
+    """
+    Read only view of a compiled dataset, arrays are backed by the memory mapped file
+    """
+
+    def __init__(self, dataset_file):
+        self._dataset_dir = os.path.dirname(os.path.abspath(dataset_file))
+        self._file = open(dataset_file, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:8] != MAGIC:
+            self.close()
+            raise ValueError('%s is not an annotation dataset' % dataset_file)
+        header_len = struct.unpack('<Q', self._mmap[8:16])[0]
+        header = json.loads(self._mmap[16:16 + header_len].decode('utf-8'))
+        if header['version'] != VERSION:
+            self.close()
+            raise ValueError('Unsupported dataset version %s' % header['version'])
+
+        self.landmark_names = header['landmarks']
+        self.sources = header['sources']
+        for name, desc in header['arrays'].items():
+            count = int(np.prod(desc['shape'])) if desc['shape'] else 1
+            array = np.frombuffer(self._mmap, dtype=np.dtype(desc['dtype']), count=count, offset=desc['offset'])
+            setattr(self, '_' + name, array.reshape(desc['shape']))
+        self._index = None
+
+    @property
+    def points(self):
+        """
+        float32 array [N, L, 2] with the landmark coordinates (NaN when not annotated)
+        """
+        return self._points
+
+    @property
+    def source(self):
+        """
+        int32 array [N] with the index in self.sources each row was compiled from
+        """
+        return self._source
+
+    def __len__(self):
+        return self._points.shape[0]
+
+    def landmark(self, name):
+        """
+        [N, 2] view with the coordinates of one landmark for all images
+        """
+        return self._points[:, self.landmark_names.index(name), :]
+
+    def image_path(self, row):
+        """
+        Absolute path of the image annotated in a row
+        """
+        start, end = self._pathOffsets[row], self._pathOffsets[row + 1]
+        rel_path = bytes(self._pathData[start:end]).decode('utf-8')
+        return os.path.normpath(os.path.join(self._dataset_dir, rel_path))
+
+    def find(self, image_name):
+        """
+        Rows annotating an image, looked up by file name
+        """
+        if self._index is None:
+            self._index = {}
+            for row in range(len(self)):
+                self._index.setdefault(os.path.basename(self.image_path(row)), []).append(row)
+        return self._index.get(os.path.basename(image_name), [])
+
+    def close(self):
+        """
+        Releases the mapping. Arrays obtained from the dataset (points, landmark(), ...)
+        that are still referenced keep it alive, it is then unmapped once they are freed
+        """
+        for name in ('_points', '_source', '_pathOffsets', '_pathData'):
+            if hasattr(self, name):
+                delattr(self, name)
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Exported to numpy arrays the caller still holds, they own a reference to the mapping
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='Annotation files or directories')
+    parser.add_argument('-o', '--output', required=True, help='Dataset file to create or update')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    compile_dataset(args.output, args.sources)
+    print('Done in %.3f s' % (time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,90 +1,230 @@
 """
-Creates a C++ resource file embedding compressed data
-"""
+Creates a C++ resource file embedding binary files into libppp
+
+The generated EmbeddedContent.h declares res::getFileContent(name), returning a pointer to the content of an embedded
+file and its size. ConfigLoader picks the header up when it exists: resource nodes with "embed": "resource" are
+then served in place from the embedded content, using the "resource" field or the base name of "file" as the name.
+
+Modes:
+ - hex:    the content is written as a byte array, formatted in bulk with NumPy. Works with every compiler
+ - incbin: the .cpp only refers to the files with the assembler .incbin directive (GCC and Clang, not MSVC), the
+           compiler never sees the content so even the 100 MB shape predictor builds in no time
 
+With --compress the content is zlib compressed in the binary and inflated on first access. libppp's CMakeLists.txt
+links zlib when the generated source includes it, re-run CMake after switching.
+
+Examples:
+    python embed_resource.py libppp/share/sp_model.dat
+    python embed_resource.py --mode incbin libppp/share/sp_model.dat=shape_predictor.dat
+"""
+import argparse
 import os
-import string
-import cStringIO
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../..'))
+
+DEFAULT_FILES = [os.path.join(REPO_DIR, 'libppp/share/shape_predictor_68_face_landmarks.dat')]
+OUTPUT_SRC_FILE = os.path.join(REPO_DIR, 'libppp/src/EmbeddedContent.cpp')
+OUTPUT_HDR_FILE = os.path.join(REPO_DIR, 'libppp/include/EmbeddedContent.h')
+
+# Bytes per line of the generated arrays
+BYTES_PER_LINE = 32
 
 HDR_TEMPLATE = """// Autogenerated Resource file - DO NOT MODIFY DIRECTLY!
 #pragma once
 #include <map>
 #include <string>
 namespace res {
-     std::pair<const char *, size_t> getFileContent(const std::string &filename);
+    // Throws std::out_of_range if the file was not embedded
+    std::pair<const char *, size_t> getFileContent(const std::string &filename);
 }
 """
 
 CPP_TEMPLATE = """// Autogenerated Resource file - DO NOT MODIFY DIRECTLY!
 #include "EmbeddedContent.h"
+%(includes)s
 namespace res {
-    // const char _file_content_[] = [1,2,3];
-    %s
-
-    // colection of resource files: file name => file content
-    const std::map<std::string, std::pair<const char *, size_t> > s_resourceFiles = {
-        %s
-    };
+%(content)s
     std::pair<const char *, size_t> getFileContent(const std::string &filename)
     {
-        return s_resourceFiles.at(filename);
+        // collection of resource files: file name => file content
+        static const std::map<std::string, std::pair<const char *, size_t> > s_resourceFiles = {
+%(filemap)s
+        };
+%(lookup)s
     }
 }
 """
 
-LITERAL_BYTES_TEMPLATE = """
-    const char %s[] = { %s };
-    const size_t %s = %s;
+HEX_TEMPLATE = """
+    alignas(64) const unsigned char %(var)s[] = {
+%(bytes)s
+    };
 """
 
-FILES = [("../libppp/share/shape_predictor_68_face_landmarks.dat", "")]
-#FILES = [("../README.md", "")]
-
-OUTPUT_SRC_FILE = '../libppp/src/EmbeddedContent.cpp'
-OUTPUT_HDR_FILE = '../libppp/include/EmbeddedContent.h'
-
-VALID_VARIABLE_CHARS = string.ascii_lowercase + string.ascii_uppercase + string.digits
-
-TABLE = []
-for ch in range(256):
-    chrch = chr(ch)
-    chrch = repr(chrch)
-    chrch = chrch[1:-1]
-    if chrch == '"':
-        chrch = '\\"'
-    if chrch[0:2] == '\\x':
-        chrch = '\\' + format(ch, '03o')
-    TABLE.append(chrch)
-
-CPP_CONTENT = cStringIO.StringIO()
-CPP_FILEMAP = cStringIO.StringIO()
-
-for efile in FILES:
-    filePath = efile[0]
-    fileName = efile[1]
-    print 'Processing file %s' % filePath
-
-    chars = cStringIO.StringIO()
-    if not fileName:
-        fileName = os.path.basename(filePath)
-
-    with open(filePath, 'rb') as fp:
-        content = fp.read()
-
-    const_char_var_name = '_%s_' % ''.join([ch for ch in filePath if ch in VALID_VARIABLE_CHARS])
-    for byte in content:
-        chars.write('%s,' % ord(byte))
-    file_size = len(content)
-
-    CPP_CONTENT.write('    const char %s[] = { %s };\n'
-        % (const_char_var_name, chars.getvalue()))
-    CPP_FILEMAP.write('{ std::string("%s"), std::make_pair(%s, %d) },\n'
-        % (fileName, const_char_var_name, file_size))
-
+INCBIN_TEMPLATE = """
+    extern "C" const char %(var)s[];
+    extern "C" const char %(var)s_end[];
+    __asm__(RES_SECTION
+            ".balign 64\\n"
+            ".globl " RES_SYMBOL(%(var)s) "\\n"
+            RES_SYMBOL(%(var)s) ":\\n"
+            ".incbin \\"%(path)s\\"\\n"
+            ".globl " RES_SYMBOL(%(var)s_end) "\\n"
+            RES_SYMBOL(%(var)s_end) ":\\n"
+            ".byte 0\\n"
+            ".text\\n");
+"""
 
-CPP_RESOURCE_CONTENT = CPP_TEMPLATE % (CPP_CONTENT.getvalue(), CPP_FILEMAP.getvalue())
-with open(OUTPUT_SRC_FILE, 'w') as fp:
-    fp.write(CPP_RESOURCE_CONTENT)
+INCBIN_PREAMBLE = """
+#if defined(__APPLE__)
+#define RES_SECTION ".const_data\\n"
+#define RES_SYMBOL(name) "_" #name
+#else
+#define RES_SECTION ".section .rodata\\n"
+#define RES_SYMBOL(name) #name
+#endif
+"""
 
-with open(OUTPUT_HDR_FILE, 'w') as fp:
-    fp.write(HDR_TEMPLATE)
\ No newline at end of file
+PLAIN_LOOKUP = """        return s_resourceFiles.at(filename);"""
+
+# Compressed files are inflated once, the buffers live until the program exits
+COMPRESSED_LOOKUP = """        static const std::map<std::string, size_t> s_originalSizes = {
+%(sizes)s
+        };
+        static std::map<std::string, std::vector<char> > s_inflated;
+        static std::mutex s_mutex;
+
+        const auto &compressed = s_resourceFiles.at(filename);
+        std::lock_guard<std::mutex> lock(s_mutex);
+        auto &inflated = s_inflated[filename];
+        if (inflated.empty())
+        {
+            uLongf size = static_cast<uLongf>(s_originalSizes.at(filename));
+            inflated.resize(size);
+            if (uncompress(reinterpret_cast<Bytef *>(inflated.data()), &size,
+                           reinterpret_cast<const Bytef *>(compressed.first),
+                           static_cast<uLong>(compressed.second)) != Z_OK)
+            {
+                inflated.clear();
+                throw std::runtime_error("Unable to inflate embedded file " + filename);
+            }
+        }
+        return std::make_pair(inflated.data(), inflated.size());"""
+
+# "0xNN," for every byte value, formatting is then a table lookup over the whole content
+_HEX_TABLE = np.array([list(('0x%02x,' % b).encode('ascii')) for b in range(256)], dtype=np.uint8)
+
+
+def format_hex(content):
+    """
+    Formats the content as the body of a C byte array, BYTES_PER_LINE bytes per line
+    """
+    data = np.frombuffer(content, dtype=np.uint8)
+    num_full_lines = len(data) // BYTES_PER_LINE
+    line_width = BYTES_PER_LINE * _HEX_TABLE.shape[1]
+
+    full = _HEX_TABLE[data[:num_full_lines * BYTES_PER_LINE]].reshape(num_full_lines, line_width)
+    lines = np.empty((num_full_lines, line_width + 9), dtype=np.uint8)
+    lines[:, :8] = ord(' ')
+    lines[:, 8:-1] = full
+    lines[:, -1] = ord('\n')
+    text = lines.tobytes()
+
+    tail = data[num_full_lines * BYTES_PER_LINE:]
+    if len(tail):
+        text += b' ' * 8 + _HEX_TABLE[tail].tobytes() + b'\n'
+    return text.decode('ascii').rstrip('\n')
+
+
+def variable_name(file_name):
+    return '_%s_' % re.sub('[^A-Za-z0-9]', '', file_name)
+
+
+def generate(files, mode='hex', compress=False, src_file=OUTPUT_SRC_FILE, hdr_file=OUTPUT_HDR_FILE, verbose=True):
+    """
+    Writes the resource files for a list of (file path, embedded name)
+    """
+    if mode == 'incbin' and compress:
+        # The compressed payload is written next to the source so the assembler can include it
+        payload_dir = os.path.join(os.path.dirname(os.path.abspath(src_file)), 'EmbeddedContent')
+        os.makedirs(payload_dir, exist_ok=True)
+
+    content_parts = []
+    filemap_lines = []
+    size_lines = []
+    for file_path, file_name in files:
+        if verbose:
+            print('Processing file %s' % file_path)
+        var = variable_name(file_name)
+        payload_path = os.path.abspath(file_path)
+        with open(file_path, 'rb') as fp:
+            content = fp.read()
+        original_size = len(content)
+        if compress:
+            content = zlib.compress(content, 9)
+            size_lines.append('            { std::string("%s"), %d },' % (file_name, original_size))
+            if mode == 'incbin':
+                payload_path = os.path.join(payload_dir, file_name + '.z')
+                with open(payload_path, 'wb') as fp:
+                    fp.write(content)
+
+        if mode == 'hex':
+            content_parts.append(HEX_TEMPLATE % {'var': var, 'bytes': format_hex(content)})
+            pointer = 'reinterpret_cast<const char *>(%s)' % var
+            size = '%d' % len(content)
+        else:
+            content_parts.append(INCBIN_TEMPLATE % {'var': var, 'path': payload_path.replace('\\', '/')})
+            pointer = var
+            size = 'static_cast<size_t>(%s_end - %s)' % (var, var)
+        filemap_lines.append('            { std::string("%s"), std::make_pair(%s, %s) },' % (file_name, pointer, size))
+
+    includes = []
+    if compress:
+        includes += ['#include <mutex>', '#include <stdexcept>', '#include <vector>', '#include <zlib.h>']
+    content = ''.join(content_parts)
+    if mode == 'incbin':
+        content = INCBIN_PREAMBLE + content
+    lookup = COMPRESSED_LOOKUP % {'sizes': '\n'.join(size_lines)} if compress else PLAIN_LOOKUP
+
+    cpp_content = CPP_TEMPLATE % {'includes': '\n'.join(includes),
+                                  'content': content,
+                                  'filemap': '\n'.join(filemap_lines),
+                                  'lookup': lookup}
+    with open(src_file, 'w') as fp:
+        fp.write(cpp_content)
+
+    with open(hdr_file, 'w') as fp:
+        fp.write(HDR_TEMPLATE)
+
+
+def parse_file_arg(file_arg):
+    """
+    "path" or "path=name", the embedded name defaults to the file base name
+    """
+    file_path, _, file_name = file_arg.partition('=')
+    return file_path, file_name or os.path.basename(file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES, help='Files to embed, as path or path=name')
+    parser.add_argument('-m', '--mode', choices=['hex', 'incbin'], default='hex', help='How the content is embedded')
+    parser.add_argument('-z', '--compress', action='store_true', help='Embed zlib compressed content')
+    parser.add_argument('--src', default=OUTPUT_SRC_FILE, help='Generated source file')
+    parser.add_argument('--hdr', default=OUTPUT_HDR_FILE, help='Generated header file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate([parse_file_arg(f) for f in args.files], args.mode, args.compress, args.src, args.hdr)
+    print('Resources written to %s in %.3f s' % (args.src, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Scores landmark detection against the SCface annotated set (VIA CSV format)
+
+Runs detection in parallel worker processes through libpppwrapper, measures
+the per-landmark error normalized by the annotated interocular distance and
+the per-image latency, and reports both so that speed optimizations can be
+weighed against their accuracy cost. Passing several configuration files
+runs each of them over the same images and prints the results side by side.
+"""
+import argparse
+import csv
+import glob
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_ANNOTATIONS = os.path.join(ROOT_DIR, 'research', 'mugshot_frontal_original_all', 'via_region_data_dpd.csv')
+
+# Order of the points for each image in the VIA annotation file
+LANDMARK_NAMES = ['crownPoint', 'chinPoint', 'eyeLeftPupil', 'eyeRightPupil', 'lipLeftCorner', 'lipRightCorner']
+
+# Normalized error thresholds reported as success rates
+ERROR_THRESHOLDS = [0.05, 0.1, 0.2]
+
+ppp = None  # libpppwrapper module, imported in each worker process
+
+
+def find_wrapper_dir():
+    """
+    Finds the directory holding libpppwrapper.py, preferring an install directory
+    where the native library sits next to it
+    """
+    install_dirs = sorted(glob.glob(os.path.join(ROOT_DIR, 'install_*')), key=os.path.getmtime, reverse=True)
+    for install_dir in install_dirs:
+        if os.path.isfile(os.path.join(install_dir, 'libpppwrapper.py')):
+            return install_dir
+    return os.path.join(ROOT_DIR, 'libppp', 'python')
+
+
+def load_annotations(annotation_file):
+    """
+    Reads the VIA CSV annotations or a dataset compiled by annotation_dataset.py,
+    returns a dictionary image path -> {landmark name: (x, y)}
+    """
+    if not annotation_file.lower().endswith('.csv'):
+        return load_compiled_annotations(annotation_file)
+    csv_file = annotation_file
+    image_dir = os.path.dirname(os.path.abspath(csv_file))
+    annotations = {}
+    with open(csv_file, 'r') as fp:
+        for row in csv.reader(line for line in fp if not line.startswith('#')):
+            if len(row) < 6:
+                continue
+            image_name, region_id, shape = row[0], int(row[4]), json.loads(row[5])
+            if region_id >= len(LANDMARK_NAMES):
+                raise ValueError('Invalid landmark index %d for %s' % (region_id, image_name))
+            image_path = os.path.join(image_dir, image_name)
+            annotations.setdefault(image_path, {})[LANDMARK_NAMES[region_id]] = (shape['cx'], shape['cy'])
+    return annotations
+
+
+def load_compiled_annotations(dataset_file):
+    """
+    Reads the landmarks of LANDMARK_NAMES from a compiled annotation dataset
+    """
+    from annotation_dataset import AnnotationDataset
+    annotations = {}
+    with AnnotationDataset(dataset_file) as dataset:
+        columns = [(name, dataset.landmark_names.index(name)) for name in LANDMARK_NAMES]
+        points = dataset.points.tolist()
+        for row, row_points in enumerate(points):
+            # Landmarks that are not annotated are stored as NaN
+            annotations[dataset.image_path(row)] = {name: tuple(row_points[col]) for name, col in columns
+                                                    if not math.isnan(row_points[col][0])}
+    return annotations
+
+
+def init_worker(wrapper_dir, config_file):
+    """
+    Loads libppp in the worker process, configures the engine and waits for its models
+    """
+    global ppp
+    sys.path.insert(0, wrapper_dir)
+    import libpppwrapper
+    ppp = libpppwrapper
+    # Resources in the configuration are relative to the configuration file
+    os.chdir(os.path.dirname(config_file))
+    if not ppp.configure(config_file) or not ppp.wait_until_configured():
+        raise RuntimeError('Unable to configure libppp with %s' % config_file)
+
+
+def detect(image_path):
+    """
+    Runs landmark detection on one image, returns (image_path, latency in ms, landmarks or None)
+    """
+    with open(image_path, 'rb') as fp:
+        image_content = fp.read()
+    start = time.perf_counter()
+    img_key = ppp.set_image(image_content)
+    landmarks = ppp.detect_landmarks(img_key) if img_key else None
+    latency_ms = (time.perf_counter() - start) * 1000.0
+    return image_path, latency_ms, json.loads(landmarks) if landmarks else None
+
+
+def distance(p1, p2):
+    """
+    """
+    return math.hypot(p1[0] - p2[0], p1[1] - p2[1])
+
+
+def score_image(annotation, detection):
+    """
+    Error of each detected landmark divided by the annotated interocular distance
+    """
+    interocular = distance(annotation['eyeLeftPupil'], annotation['eyeRightPupil'])
+    errors = {}
+    for name in LANDMARK_NAMES:
+        if name in annotation and detection and name in detection:
+            point = detection[name]
+            errors[name] = distance(annotation[name], (point['x'], point['y'])) / interocular
+    return errors
+
+
+def percentile(values, p):
+    """
+    Nearest rank percentile
+    """
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    rank = int(math.ceil(p / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def summarize(values):
+    """
+    """
+    return {
+        'mean': sum(values) / len(values) if values else float('nan'),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'max': max(values) if values else float('nan')
+    }
+
+
+def validate(config_file, annotations, num_workers, wrapper_dir):
+    """
+    Runs detection over all annotated images with one configuration and scores the results
+    """
+    images = sorted(annotations.keys())
+    with multiprocessing.Pool(num_workers, init_worker, (wrapper_dir, config_file)) as pool:
+        start = time.perf_counter()
+        results = pool.map(detect, images, chunksize=1)
+        elapsed = time.perf_counter() - start
+
+    per_image = []
+    errors = {name: [] for name in LANDMARK_NAMES}
+    latencies = []
+    failures = 0
+    for image_path, latency_ms, detection in results:
+        latencies.append(latency_ms)
+        image_errors = score_image(annotations[image_path], detection) if detection else {}
+        if not detection:
+            failures += 1
+        for name, error in image_errors.items():
+            errors[name].append(error)
+        per_image.append({
+            'image': os.path.basename(image_path),
+            'latencyMs': latency_ms,
+            'detected': detection is not None,
+            'errors': image_errors
+        })
+
+    landmarks = {}
+    for name, values in errors.items():
+        stats = summarize(values)
+        for threshold in ERROR_THRESHOLDS:
+            stats['within%g' % threshold] = sum(1 for e in values if e <= threshold) / float(len(images))
+        landmarks[name] = stats
+
+    all_errors = [e for values in errors.values() for e in values]
+    return {
+        'config': config_file,
+        'numImages': len(images),
+        'failures': failures,
+        'imagesPerSecond': len(images) / elapsed,
+        'latencyMs': summarize(latencies),
+        'normalizedError': summarize(all_errors),
+        'landmarks': landmarks,
+        'images': per_image
+    }
+
+
+def print_report(reports):
+    """
+    Prints the speed and accuracy of each configuration side by side
+    """
+    names = [os.path.basename(r['config']) for r in reports]
+    col_width = max(14, max(len(n) for n in names) + 2)
+
+    def row(label, values, fmt):
+        print(label.ljust(34) + ''.join((fmt % v).rjust(col_width) for v in values))
+
+    print(''.ljust(34) + ''.join(n.rjust(col_width) for n in names))
+    row('detection failures', [r['failures'] for r in reports], '%d')
+    row('images/second', [r['imagesPerSecond'] for r in reports], '%.2f')
+    for p in ('mean', 'p50', 'p95', 'max'):
+        row('latency %s (ms)' % p, [r['latencyMs'][p] for r in reports], '%.1f')
+    for p in ('mean', 'p50', 'p95'):
+        row('normalized error %s' % p, [r['normalizedError'][p] for r in reports], '%.4f')
+    for name in LANDMARK_NAMES:
+        row('%s mean error' % name, [r['landmarks'][name]['mean'] for r in reports], '%.4f')
+        for threshold in ERROR_THRESHOLDS:
+            key = 'within%g' % threshold
+            row('%s <= %g' % (name, threshold), [r['landmarks'][name][key] * 100 for r in reports], '%.1f%%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('configs', nargs='+', help='Engine configuration file(s) to validate')
+    parser.add_argument('-a', '--annotations', default=DEFAULT_ANNOTATIONS, help='VIA CSV annotation file or compiled annotation dataset')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('-n', '--max-images', type=int, help='Only validate the first N annotated images')
+    parser.add_argument('-w', '--wrapper-dir', default=find_wrapper_dir(),
+                        help='Directory containing libpppwrapper.py and the native library')
+    parser.add_argument('-o', '--output', help='Write the full JSON report (including per image results) here')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.annotations):
+        print('Annotations not found at %s, run "build.py" to extract the validation data' % args.annotations)
+        return 1
+
+    annotations = load_annotations(args.annotations)
+    if args.max_images:
+        annotations = dict(sorted(annotations.items())[:args.max_images])
+
+    reports = [validate(os.path.abspath(c), annotations, args.jobs, args.wrapper_dir) for c in args.configs]
+    print_report(reports)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({'annotations': args.annotations, 'reports': reports}, fp, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())